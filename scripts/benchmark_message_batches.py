@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Message Batches Benchmark - batch throughput against a local mock upstream
+
+Runs the same set of independent prompts through the proxy two ways,
+against a local OpenAI-compatible mock upstream with fixed latency:
+
+- one /v1/messages call after another, as a naive evaluation script would,
+- one /v1/messages/batches submission, polled until it has ended.
+
+Usage:
+    python scripts/benchmark_message_batches.py [--requests 200] [--latency-ms 100] [--concurrency 16]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark message batch throughput")
+    parser.add_argument("--requests", type=int, default=200, help="Prompts to run")
+    parser.add_argument("--latency-ms", type=int, default=100, help="Mock upstream latency per request")
+    parser.add_argument("--concurrency", type=int, default=16, help="MESSAGE_BATCH_CONCURRENCY")
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+PORT = free_port()
+
+# Configure before the server modules read their config
+os.environ["OPENROUTER_BASE_URL"] = f"http://127.0.0.1:{PORT}/api/v1"
+os.environ.setdefault("OPENROUTER_API_KEY", "sk-bench")
+os.environ["MESSAGE_BATCH_CONCURRENCY"] = str(ARGS.concurrency)
+os.environ["MESSAGE_BATCH_DIR"] = tempfile.mkdtemp(prefix="batch-bench-")
+os.environ["USAGE_LEDGER_ENABLED"] = "false"
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from src.core.logging_config import setup_logging
+
+
+async def chat_completions(request: Request):
+    body = await request.json()
+    await asyncio.sleep(ARGS.latency_ms / 1000)
+    return JSONResponse({
+        "id": "chatcmpl-bench", "object": "chat.completion", "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": "Done."}}],
+        "usage": {"prompt_tokens": 12, "completion_tokens": 2, "total_tokens": 14}
+    })
+
+
+def start_upstream():
+    """Serve the mock upstream on a background thread."""
+    app = Starlette(routes=[Route("/api/v1/chat/completions", chat_completions, methods=["POST"])])
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+def prompt(i):
+    return {"model": "claude-3-5-haiku-20241022", "max_tokens": 64,
+            "messages": [{"role": "user", "content": f"Classify item {i}."}]}
+
+
+async def run_sequential(client, count):
+    start = time.perf_counter()
+    for i in range(count):
+        response = await client.post("/v1/messages", json=prompt(i))
+        assert response.status_code == 200, response.text
+    return time.perf_counter() - start
+
+
+async def run_batch(client, count):
+    start = time.perf_counter()
+    response = await client.post("/v1/messages/batches", json={
+        "requests": [{"custom_id": f"item-{i}", "params": prompt(i)} for i in range(count)]
+    })
+    batch = response.json()
+    while batch["processing_status"] != "ended":
+        await asyncio.sleep(0.05)
+        batch = (await client.get(f"/v1/messages/batches/{batch['id']}")).json()
+    elapsed = time.perf_counter() - start
+
+    results = (await client.get(batch["results_url"])).text.splitlines()
+    succeeded = sum(json.loads(line)["result"]["type"] == "succeeded" for line in results)
+    assert succeeded == count, f"{succeeded}/{count} batch items succeeded"
+    return elapsed
+
+
+async def run():
+    from src.main import create_app
+
+    app = create_app()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://proxy.local", timeout=600) as client:
+        await run_sequential(client, 3)  # warm up
+        sequential = await run_sequential(client, ARGS.requests)
+        batch = await run_batch(client, ARGS.requests)
+
+    print(f"📊 Message batches benchmark ({ARGS.requests} requests, "
+          f"{ARGS.latency_ms} ms upstream latency, batch concurrency {ARGS.concurrency})")
+    print(f"  Sequential /v1/messages:  {sequential:8.2f} s  {ARGS.requests / sequential:8.1f} req/s")
+    print(f"  /v1/messages/batches:     {batch:8.2f} s  {ARGS.requests / batch:8.1f} req/s")
+    print(f"  Speedup:                  {sequential / batch:8.1f}x")
+
+
+def main():
+    setup_logging("WARNING")
+    start_upstream()
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Optimistic Dispatch Benchmark - time to upstream dispatch and to response
+
+Runs the message workflow over a multi-turn tool-using conversation, with
+the upstream call replaced by a fixed --upstream-ms delay, once with the
+serial pipeline and once with optimistic dispatch. Reports how long after
+the workflow started the upstream call was sent and the response returned.
+
+Usage:
+    python scripts/benchmark_optimistic_dispatch.py [--requests 20] [--turns 20] [--upstream-ms 300]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.logging_config import setup_logging
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark optimistic upstream dispatch")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per mode")
+    parser.add_argument("--turns", type=int, default=20, help="Tool-use turns in the conversation")
+    parser.add_argument("--upstream-ms", type=float, default=300.0, help="Simulated upstream latency")
+    return parser.parse_args()
+
+
+def conversation(turns):
+    messages = [{"role": "user", "content": "Refactor the settings module"}]
+    for turn in range(turns):
+        messages.append({"role": "assistant", "content": [
+            {"type": "text", "text": f"Reading file {turn}"},
+            {"type": "tool_use", "id": f"toolu_{turn}", "name": "Read", "input": {"file_path": f"/src/file_{turn}.py"}}
+        ]})
+        messages.append({"role": "user", "content": [
+            {"type": "tool_result", "tool_use_id": f"toolu_{turn}", "content": "def settings():\n    pass\n" * 50}
+        ]})
+    return messages
+
+
+async def run(args, optimistic):
+    import src.services  # noqa: F401  (services first: avoids an import cycle)
+    from litellm.types.utils import ModelResponse
+    from src.models.anthropic import MessagesRequest
+    from src.services.http_client import HTTPClientService
+    from src.services.optimistic_dispatch import OptimisticDispatchService
+    from src.workflows import message_workflows
+
+    message_workflows.optimistic_dispatch_service = OptimisticDispatchService(enabled=optimistic)
+    dispatched_at = []
+
+    async def make_litellm_request(self, request_data, request_id, capture_debug=True):
+        dispatched_at.append(time.perf_counter())
+        await asyncio.sleep(args.upstream_ms / 1000)
+        return ModelResponse(model=request_data["model"], choices=[{
+            "index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "Done."}
+        }], usage={"prompt_tokens": 5000, "completion_tokens": 2, "total_tokens": 5002})
+    HTTPClientService.make_litellm_request = make_litellm_request
+
+    tool = {"name": "Read", "description": "Read a file", "input_schema": {
+        "type": "object", "properties": {"file_path": {"type": "string"}}, "required": ["file_path"]}}
+    request = MessagesRequest(model="claude-sonnet-4", max_tokens=1024, messages=conversation(args.turns),
+                              tools=[tool])
+    dispatch_ms, response_ms = [], []
+    for index in range(args.requests + 1):
+        start = time.perf_counter()
+        await message_workflows.process_message_request(request=request, request_id=f"bench-{index}",
+                                                            api_key="sk-bench")
+        if index:  # the first request warms up imports and Prefect
+            dispatch_ms.append((dispatched_at[-1] - start) * 1000)
+            response_ms.append((time.perf_counter() - start) * 1000)
+    return dispatch_ms, response_ms
+
+
+def main():
+    args = parse_args()
+    setup_logging("CRITICAL")
+    results = {mode: asyncio.run(run(args, optimistic=mode == "optimistic")) for mode in ("serial", "optimistic")}
+
+    print(f"📊 Optimistic dispatch benchmark ({args.requests} requests, {args.turns} tool turns, "
+          f"{args.upstream_ms:.0f} ms upstream)")
+    for mode, (dispatch_ms, response_ms) in results.items():
+        print(f"  {mode:<11} dispatch after p50 {statistics.median(dispatch_ms):7.1f} ms   "
+              f"response after p50 {statistics.median(response_ms):7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
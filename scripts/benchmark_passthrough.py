@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Passthrough Benchmark - proxy overhead for Anthropic-compatible upstreams
+
+Sends the same /v1/messages request, with a large conversation history,
+through three in-process setups against one fake upstream:
+
+- a plain reverse proxy that forwards the bytes unchanged,
+- PassthroughMiddleware (model rewrite, header rewrite, usage metering hook),
+- the request side of the conversion path (MessagesRequest parsing plus
+  Anthropic -> LiteLLM conversion), which passthrough skips.
+
+Usage:
+    python scripts/benchmark_passthrough.py [--history-kb 512] [--requests 200]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.logging_config import setup_logging
+from src.services.passthrough import PassthroughRoute, PassthroughService
+from src.middleware.passthrough_middleware import PassthroughMiddleware
+from src.flows.conversion.anthropic_to_litellm_flow import AnthropicToLiteLLMFlow
+from src.models.anthropic import MessagesRequest
+
+UPSTREAM_URL = "http://upstream.local"
+RESPONSE_BODY = json.dumps({
+    "id": "msg_bench", "type": "message", "role": "assistant", "model": "claude-sonnet-4-20250514",
+    "content": [{"type": "text", "text": "Done."}],
+    "stop_reason": "end_turn", "usage": {"input_tokens": 150000, "output_tokens": 3}
+}).encode()
+
+
+def build_request(history_kb):
+    """Build a /v1/messages body whose history is roughly history_kb large."""
+    messages = []
+    turn = 0
+    while len(json.dumps(messages)) < history_kb * 1024:
+        messages.append({"role": "assistant", "content": [
+            {"type": "tool_use", "id": f"toolu_{turn}", "name": "Read", "input": {"file_path": f"/repo/f{turn}.py"}}
+        ]})
+        messages.append({"role": "user", "content": [
+            {"type": "tool_result", "tool_use_id": f"toolu_{turn}", "content": "def f():\n    return 42\n" * 200}
+        ]})
+        turn += 1
+    messages.append({"role": "user", "content": "Summarize the files."})
+    return json.dumps({"model": "claude-sonnet-4", "max_tokens": 1024, "messages": messages}).encode()
+
+
+async def upstream(request: Request):
+    await request.body()
+    return Response(RESPONSE_BODY, media_type="application/json")
+
+
+def build_apps():
+    """Build the upstream, the plain reverse proxy and the passthrough app."""
+    upstream_app = Starlette(routes=[Route("/v1/messages", upstream, methods=["POST"])])
+    upstream_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=upstream_app))
+
+    async def reverse_proxy(request: Request):
+        upstream_request = upstream_client.build_request(
+            "POST", UPSTREAM_URL + request.url.path, content=await request.body(),
+            headers={"x-api-key": "sk-upstream", "anthropic-version": "2023-06-01",
+                     "content-type": "application/json"}
+        )
+        response = await upstream_client.send(upstream_request, stream=True)
+
+        async def body():
+            try:
+                async for chunk in response.aiter_raw():
+                    yield chunk
+            finally:
+                await response.aclose()
+
+        return StreamingResponse(body(), status_code=response.status_code,
+                                 media_type=response.headers.get("content-type"))
+
+    proxy_app = Starlette(routes=[Route("/v1/messages", reverse_proxy, methods=["POST"])])
+
+    service = PassthroughService(
+        routes=[PassthroughRoute(name="bench", base_url=UPSTREAM_URL, models=["claude-*"],
+                                 api_key="sk-upstream",
+                                 model_map={"claude-sonnet-4": "claude-sonnet-4-20250514"})],
+        client=upstream_client
+    )
+    service.hooks = []
+    usage_seen = []
+    service.add_hook(lambda exchange: usage_seen.append(exchange.usage))
+    passthrough_app = FastAPI()
+    passthrough_app.add_middleware(PassthroughMiddleware, service=service)
+    return proxy_app, passthrough_app, usage_seen
+
+
+async def time_requests(app, body, count):
+    """Send count requests through an app and return per-request latencies in ms."""
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://proxy.local")
+    headers = {"content-type": "application/json", "x-api-key": "client-key"}
+    latencies = []
+    async with client:
+        for _ in range(count):
+            start = time.perf_counter()
+            response = await client.post("/v1/messages", content=body, headers=headers)
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200 and response.content == RESPONSE_BODY
+    return latencies
+
+
+def time_conversion(body, count):
+    """Time the request-side work the conversion path does and passthrough skips."""
+    flow = AnthropicToLiteLLMFlow()
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        request = MessagesRequest(**json.loads(body))
+        flow.convert(request)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def median(values):
+    return sorted(values)[len(values) // 2]
+
+
+async def run(history_kb, count):
+    """Run the benchmark and print timings."""
+    body = build_request(history_kb)
+    proxy_app, passthrough_app, usage_seen = build_apps()
+
+    # Warm up both paths
+    await time_requests(proxy_app, body, 5)
+    await time_requests(passthrough_app, body, 5)
+
+    proxy = median(await time_requests(proxy_app, body, count))
+    passthrough = median(await time_requests(passthrough_app, body, count))
+    conversion = median(time_conversion(body, max(count // 10, 5)))
+
+    assert usage_seen[-1] == {"input_tokens": 150000, "output_tokens": 3}, "metering hook saw no usage"
+
+    print(f"📊 Passthrough benchmark ({len(body) / 1024:.0f} KB request, {count} requests, median)")
+    print(f"  Plain reverse proxy:                 {proxy:8.3f} ms")
+    print(f"  Passthrough (rewrite + metering):    {passthrough:8.3f} ms")
+    print(f"  Passthrough overhead vs proxy:       {passthrough - proxy:8.3f} ms")
+    print(f"  Conversion path, request side only:  {conversion:8.3f} ms (skipped by passthrough)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark passthrough proxy overhead")
+    parser.add_argument("--history-kb", type=int, default=512, help="Approximate request body size in KB")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per setup")
+    args = parser.parse_args()
+    setup_logging("WARNING")
+    asyncio.run(run(args.history_kb, args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Provider Affinity Benchmark - prompt-cache hits with and without session pinning
+
+Drives HTTPClientService with multi-turn conversations against a local
+OpenAI-compatible mock of OpenRouter that spreads requests over --providers
+providers at random unless the request pins one, and reports a turn's prompt
+as cache-read tokens when the serving provider already saw the conversation.
+
+Usage:
+    python scripts/benchmark_provider_affinity.py [--conversations 40] [--turns 6] [--providers 3]
+"""
+
+import argparse
+import asyncio
+import random
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from src.core.logging_config import setup_logging
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark conversation-affinity provider routing")
+    parser.add_argument("--conversations", type=int, default=40, help="Conversations per run")
+    parser.add_argument("--turns", type=int, default=6, help="Turns per conversation")
+    parser.add_argument("--providers", type=int, default=3, help="Providers the mock spreads requests over")
+    parser.add_argument("--concurrency", type=int, default=10, help="Conversations in flight")
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+PROVIDERS = [f"Provider{i}" for i in range(ARGS.providers)]
+warm = set()  # (provider, conversation) pairs whose prefix is cached
+
+
+async def chat_completions(request: Request):
+    body = await request.json()
+    order = (body.get("provider") or {}).get("order")
+    provider = order[0] if order else random.choice(PROVIDERS)
+    conversation = body["messages"][1]["content"]
+    prompt_tokens = 2000 + 500 * len(body["messages"])
+    # Everything but the newest turn was cached by the provider's previous response
+    cached = prompt_tokens - 500 if (provider, conversation) in warm else 0
+    warm.add((provider, conversation))
+    return JSONResponse({
+        "id": "chatcmpl-bench", "object": "chat.completion", "created": int(time.time()),
+        "model": body["model"], "provider": provider,
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "Noted."}}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 2, "total_tokens": prompt_tokens + 2,
+                  "prompt_tokens_details": {"cached_tokens": cached}}
+    })
+
+
+def start_upstream():
+    """Serve the mock upstream on a background thread."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    app = Starlette(routes=[Route("/api/v1/chat/completions", chat_completions, methods=["POST"])])
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="critical",
+                                          timeout_keep_alive=120))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}/api/v1"
+
+
+async def run(api_base, affinity_enabled):
+    import src.services as services
+    from src.services.http_client import HTTPClientService
+    from src.services.provider_affinity import ProviderAffinityService
+    from src.services.stream_stalls import StreamStallService
+
+    services.provider_affinity_service = ProviderAffinityService(enabled=affinity_enabled, providers={})
+    # The mock names the serving provider only in non-streamed responses
+    services.stream_stall_service = StreamStallService(enabled=False)
+    http_client = HTTPClientService()
+    warm.clear()
+    queue = asyncio.Queue()
+    for i in range(ARGS.conversations):
+        queue.put_nowait(i)
+    prompt_tokens = cached_tokens = 0
+
+    async def client():
+        nonlocal prompt_tokens, cached_tokens
+        while not queue.empty():
+            i = queue.get_nowait()
+            messages = [{"role": "system", "content": "You are a travel agent."},
+                        {"role": "user", "content": f"Conversation {i}: plan a trip"}]
+            for turn in range(ARGS.turns):
+                response = await http_client.make_litellm_request({
+                    "model": "openrouter/anthropic/claude-sonnet-4", "api_base": api_base,
+                    "api_key": "sk-bench", "max_tokens": 64, "messages": messages
+                }, f"bench-{i}-{turn}", capture_debug=False)
+                prompt_tokens += response.usage.prompt_tokens
+                cached_tokens += response.usage.prompt_tokens_details.cached_tokens
+                messages = messages + [{"role": "assistant", "content": "Noted."},
+                                       {"role": "user", "content": f"Turn {turn + 1}"}]
+
+    await asyncio.gather(*(client() for _ in range(ARGS.concurrency)))
+    return {"prompt": prompt_tokens, "cached": cached_tokens,
+            "stats": services.provider_affinity_service.get_stats()}
+
+
+def main():
+    setup_logging("CRITICAL")
+    api_base = start_upstream()
+
+    async def both():
+        return {
+            "affinity off": await run(api_base, affinity_enabled=False),
+            "affinity on": await run(api_base, affinity_enabled=True)
+        }
+
+    results = asyncio.run(both())
+
+    print(f"📊 Provider affinity benchmark ({ARGS.conversations} conversations x {ARGS.turns} turns, "
+          f"{ARGS.providers} providers)")
+    for name, r in results.items():
+        print(f"  {name:<12} prompt tokens {r['prompt']:>9}   cache reads {r['cached']:>9}   "
+              f"hit ratio {r['cached'] / r['prompt']:6.1%}   pinned requests {r['stats']['pinned_requests']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Rate Limiter Benchmark - per-check cost at sustained request rates
+
+Replays a simulated request stream (default 10k requests per second for
+60 seconds of simulated time) against:
+
+- RateLimiterService token buckets, for 1, 1k and 10k distinct clients,
+- the previous tool rate limit check, which rebuilt its whole window on
+  every call, for comparison.
+
+Per-check cost is reported per slice of the stream, so a cost that grows
+with history shows up as rising numbers down the table.
+
+Usage:
+    python scripts/benchmark_rate_limiter.py [--rps 10000] [--seconds 60]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.logging_config import setup_logging
+from src.services.rate_limiter import RateLimiterService
+
+SLICES = 6
+
+
+def rebuild_window_check(tracker, request_id, now, window=60, max_requests=10**9):
+    """The previous ToolExecutionService._check_rate_limit, with an injected clock."""
+    tracker = {rid: ts for rid, ts in tracker.items() if ts > now - window}
+    if len(tracker) < max_requests:
+        tracker[request_id] = now
+    return tracker
+
+
+def bench_buckets(clients, rps, seconds):
+    """Return ns per check for each slice of the stream."""
+    service = RateLimiterService(
+        requests_per_minute=rps * 60, tokens_per_minute=rps * 60 * 1000,
+        max_clients=max(clients, 1), enabled=True
+    )
+    keys = [f"key:{i:016x}" for i in range(clients)]
+    total = rps * seconds
+    per_slice = total // SLICES
+    results = []
+    i = 0
+    for _ in range(SLICES):
+        start = time.perf_counter_ns()
+        for _ in range(per_slice):
+            service.check(keys[i % clients], 500, now=i / rps)
+            i += 1
+        results.append((time.perf_counter_ns() - start) / per_slice)
+    return results
+
+
+def bench_rebuild(rps, seconds):
+    """Return ns per check for the window-rebuilding check (on a shorter stream)."""
+    total = rps * seconds
+    per_slice = total // SLICES
+    tracker = {}
+    results = []
+    i = 0
+    for _ in range(SLICES):
+        start = time.perf_counter_ns()
+        for _ in range(per_slice):
+            tracker = rebuild_window_check(tracker, f"req_{i}", now=i / rps)
+            i += 1
+        results.append((time.perf_counter_ns() - start) / per_slice)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rate limit check cost")
+    parser.add_argument("--rps", type=int, default=10000, help="Simulated requests per second")
+    parser.add_argument("--seconds", type=int, default=60, help="Simulated stream length")
+    args = parser.parse_args()
+    setup_logging("WARNING")
+
+    columns = {f"{clients} clients": bench_buckets(clients, args.rps, args.seconds)
+               for clients in (1, 1000, 10000)}
+    # The rebuild is O(window), so it only gets a short stream
+    rebuild_seconds = 2
+    rebuild = bench_rebuild(args.rps, rebuild_seconds)
+
+    print(f"📊 Rate limit check cost (ns/check), {args.rps} rps")
+    print(f"  {'slice':>14}" + "".join(f"{name:>16}" for name in columns))
+    for n in range(SLICES):
+        elapsed = args.seconds * (n + 1) / SLICES
+        print(f"  {f'<= {elapsed:.0f}s':>14}" + "".join(f"{values[n]:16.0f}" for values in columns.values()))
+
+    print(f"\n  Previous window-rebuild check ({rebuild_seconds}s stream):")
+    for n, value in enumerate(rebuild):
+        elapsed = rebuild_seconds * (n + 1) / SLICES
+        print(f"  {f'<= {elapsed:.2f}s':>14}{value:16.0f}")
+
+    worst = max(max(values) for values in columns.values())
+    print(f"\n  Token bucket worst slice: {worst:.0f} ns/check "
+          f"= {1e9 / worst:,.0f} checks/s on one core ({args.rps} needed)")
+
+
+if __name__ == "__main__":
+    main()
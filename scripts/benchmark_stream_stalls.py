@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Stream Stall Benchmark - hung upstreams with and without stall detection
+
+Drives HTTPClientService with non-streaming requests against a local
+OpenAI-compatible mock that hangs mid-response on the first attempt of
+every --stall-every'th request (streamed or not), and answers normally
+otherwise. Without stall detection such a request waits out the timeout
+and fails; with it the call is streamed internally, the stall is noticed
+after --interval seconds and the request is retried.
+
+Usage:
+    python scripts/benchmark_stream_stalls.py [--requests 60] [--stall-every 10] [--interval 1.0] [--timeout 10]
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from src.core.logging_config import setup_logging
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark upstream stall detection")
+    parser.add_argument("--requests", type=int, default=60, help="Requests per run")
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent clients")
+    parser.add_argument("--stall-every", type=int, default=10, help="Every Nth request hangs on its first attempt")
+    parser.add_argument("--interval", type=float, default=1.0, help="Stall interval in seconds")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Request timeout in seconds")
+    parser.add_argument("--chunks", type=int, default=20, help="Chunks per response")
+    parser.add_argument("--chunk-ms", type=int, default=20, help="Mock upstream delay per chunk")
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+attempts = {}
+
+
+def should_stall(body):
+    """Hang the first attempt of every ARGS.stall_every'th request."""
+    item = body["messages"][-1]["content"]
+    attempts[item] = attempts.get(item, 0) + 1
+    return int(item.split()[-1]) % ARGS.stall_every == 0 and attempts[item] == 1
+
+
+async def chat_completions(request: Request):
+    body = await request.json()
+    stall = should_stall(body)
+    words = [f"word{i} " for i in range(ARGS.chunks)]
+
+    if not body.get("stream"):
+        await asyncio.sleep(3600 if stall else ARGS.chunks * ARGS.chunk_ms / 1000)
+        return JSONResponse({
+            "id": "chatcmpl-bench", "object": "chat.completion", "created": int(time.time()),
+            "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "".join(words)}}],
+            "usage": {"prompt_tokens": 12, "completion_tokens": ARGS.chunks, "total_tokens": 12 + ARGS.chunks}
+        })
+
+    async def events():
+        for i, word in enumerate(words):
+            if stall and i == ARGS.chunks // 2:
+                await asyncio.sleep(3600)
+            await asyncio.sleep(ARGS.chunk_ms / 1000)
+            chunk = {"id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": body["model"],
+                     "choices": [{"index": 0, "delta": {"role": "assistant", "content": word}, "finish_reason": None}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+        done = {"id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": body["model"], "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 12, "completion_tokens": ARGS.chunks, "total_tokens": 12 + ARGS.chunks}}
+        yield f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def start_upstream():
+    """Serve the mock upstream on a background thread."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    app = Starlette(routes=[Route("/api/v1/chat/completions", chat_completions, methods=["POST"])])
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="critical",
+                                          timeout_keep_alive=120))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}/api/v1"
+
+
+async def run(api_base, detection_enabled):
+    import src.services as services
+    from src.services.adaptive_timeouts import AdaptiveTimeoutService
+    from src.services.http_client import HTTPClientService
+    from src.services.retry_policy import RetryPolicyService
+    from src.services.stream_stalls import StreamStallService
+
+    services.adaptive_timeout_service = AdaptiveTimeoutService(ceiling=ARGS.timeout)
+    services.stream_stall_service = StreamStallService(enabled=detection_enabled, interval=ARGS.interval,
+                                                       max_retries=1, fallback_models={})
+    services.retry_policy_service = RetryPolicyService(enabled=False)  # only stall recovery retries
+    http_client = HTTPClientService()
+    attempts.clear()
+    latencies, failures = [], 0
+    queue = asyncio.Queue()
+    for i in range(ARGS.requests):
+        queue.put_nowait(i)
+
+    async def client():
+        nonlocal failures
+        while not queue.empty():
+            i = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                await http_client.make_litellm_request({
+                    "model": "openrouter/anthropic/claude-3-5-haiku", "api_base": api_base,
+                    "api_key": "sk-bench", "max_tokens": 64, "num_retries": 0,
+                    "messages": [{"role": "user", "content": f"Item {i}"}]
+                }, f"bench-{i}", capture_debug=False)
+            except Exception:
+                failures += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(ARGS.concurrency)))
+    latencies.sort()
+    return {
+        "elapsed": time.perf_counter() - start,
+        "failures": failures,
+        "mean": statistics.mean(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "max": latencies[-1],
+        "stats": services.stream_stall_service.get_stats()
+    }
+
+
+def main():
+    setup_logging("CRITICAL")
+    api_base = start_upstream()
+
+    async def both():
+        return {
+            "detection off": await run(api_base, detection_enabled=False),
+            "detection on": await run(api_base, detection_enabled=True)
+        }
+
+    results = asyncio.run(both())
+    stalled = len([i for i in range(ARGS.requests) if i % ARGS.stall_every == 0])
+
+    print(f"📊 Stream stall benchmark ({ARGS.requests} requests, {stalled} hang on first attempt, "
+          f"timeout {ARGS.timeout:g}s, stall interval {ARGS.interval:g}s)")
+    for name, r in results.items():
+        print(f"  {name:<13} failed {r['failures']:>3}   total {r['elapsed']:6.2f} s   "
+              f"latency mean {r['mean']:5.2f} s  p95 {r['p95']:5.2f} s  max {r['max']:5.2f} s   "
+              f"stalls {r['stats']['stalls']}  recovered {r['stats']['recovered_requests']}")
+
+
+if __name__ == "__main__":
+    main()
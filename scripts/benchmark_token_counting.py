@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Token Counting Benchmark - per-message cache on long transcripts
+
+Simulates Claude Code calling /v1/messages/count_tokens after every turn of a
+500-message session and compares cached counting against the previous path,
+which re-validated every message and re-tokenized the whole history each time.
+
+Usage:
+    python scripts/benchmark_token_counting.py [--messages 500] [--turns 20]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import litellm
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.logging_config import setup_logging
+from src.models.anthropic import TokenCountRequest
+from src.services.token_counting import MessageTokenCache, TokenCountingService
+from src.services.validation import MessageValidationService
+
+MODEL = "openrouter/anthropic/claude-sonnet-4"
+
+
+def build_transcript(count):
+    """Build a realistic transcript with text, tool_use and tool_result blocks."""
+    messages = []
+    for i in range(count):
+        if i % 2 == 0:
+            messages.append({
+                "role": "user",
+                "content": [
+                    {"type": "tool_result", "tool_use_id": f"tool_{i - 1}",
+                     "content": f"def handler_{i}(event):\n    return process(event)\n" * 20}
+                ] if i else "Refactor the request handlers in this repository."
+            })
+        else:
+            messages.append({
+                "role": "assistant",
+                "content": [
+                    {"type": "text", "text": f"Next I will read module_{i}.py to check the handler."},
+                    {"type": "tool_use", "id": f"tool_{i}", "name": "Read",
+                     "input": {"file_path": f"/repo/src/module_{i}.py"}}
+                ]
+            })
+    return messages
+
+
+def count_full_history(request, validator):
+    """Previous endpoint path: validate every message, tokenize the whole history."""
+    for message in request.messages:
+        validator.validate(message)
+    return litellm.token_counter(
+        model=MODEL,
+        messages=[TokenCountingService.message_to_litellm(m) for m in request.messages]
+    )
+
+
+async def run(total_messages, turns):
+    """Run the benchmark and print timings."""
+    transcript = build_transcript(total_messages + turns)
+    service = TokenCountingService(cache=MessageTokenCache())
+    validator = MessageValidationService()
+
+    async def validate_message(message):
+        await validator.avalidate(message)
+
+    start = time.perf_counter()
+    cold = await service.count_request_tokens(
+        TokenCountRequest(model=MODEL, messages=transcript[:total_messages]),
+        model=MODEL,
+        validate_message=validate_message
+    )
+    cold_time = time.perf_counter() - start
+
+    cached_times, full_times = [], []
+    for turn in range(1, turns + 1):
+        request = TokenCountRequest(model=MODEL, messages=transcript[:total_messages + turn])
+
+        start = time.perf_counter()
+        cached_count = await service.count_request_tokens(
+            request, model=MODEL, validate_message=validate_message
+        )
+        cached_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        full_count = count_full_history(request, validator)
+        full_times.append(time.perf_counter() - start)
+
+        assert cached_count == full_count, "cached and full-history counts diverged"
+
+    avg_cached = sum(cached_times) / len(cached_times)
+    avg_full = sum(full_times) / len(full_times)
+
+    print(f"📊 Token counting benchmark ({total_messages} messages, {turns} growing turns)")
+    print(f"  Input tokens (cold):        {cold}")
+    print(f"  Cold count:                 {cold_time * 1000:8.2f} ms")
+    print(f"  Previous full-history path: {avg_full * 1000:8.2f} ms/turn")
+    print(f"  Cached, new messages only:  {avg_cached * 1000:8.2f} ms/turn")
+    print(f"  Speedup:                    {avg_full / avg_cached:8.1f}x")
+    print(f"  Cache stats:                {service.cache.get_stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-message token count caching")
+    parser.add_argument("--messages", type=int, default=500, help="Transcript length")
+    parser.add_argument("--turns", type=int, default=20, help="Incremental turns to count")
+    args = parser.parse_args()
+    setup_logging("WARNING")
+    asyncio.run(run(args.messages, args.turns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Tokenizer Accuracy Benchmark - offline engines against reference counts
+
+Measures per-kind error, mean absolute percentage error (MAPE) and throughput
+of each tokenizer engine over a corpus of typical Claude Code content (code,
+tool schemas, JSON, tracebacks, prose, CJK, base64, diffs).
+
+The bundled corpus carries exact cl100k_base reference counts. To measure
+error against the upstream API, pass --reference with a JSONL file of recorded
+/v1/messages/count_tokens results, one {"request": {...}, "input_tokens": N}
+object per line.
+
+Usage:
+    python scripts/benchmark_tokenizer_accuracy.py [--engines tiktoken approximate]
+    python scripts/benchmark_tokenizer_accuracy.py --reference recorded_counts.jsonl
+    python scripts/benchmark_tokenizer_accuracy.py --regenerate
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.logging_config import setup_logging
+from src.models.anthropic import TokenCountRequest
+from src.services.token_counting import MessageTokenCache, TokenCountingService
+from src.services.tokenizers import TOKENIZER_ENGINES, TiktokenEngine, create_tokenizer_engine
+
+CORPUS_PATH = Path(__file__).parent / "data" / "tokenizer_accuracy_corpus.jsonl"
+
+
+def load_jsonl(path):
+    """Load one JSON object per non-empty line."""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def regenerate_corpus():
+    """Recompute cl100k_base reference counts for the bundled corpus."""
+    engine = TiktokenEngine()
+    samples = load_jsonl(CORPUS_PATH)
+    with open(CORPUS_PATH, "w") as f:
+        for sample in samples:
+            sample["reference"] = "cl100k_base"
+            sample["reference_tokens"] = engine.count(sample["text"])
+            f.write(json.dumps(sample, ensure_ascii=False) + "\n")
+    print(f"✅ Regenerated {len(samples)} reference counts in {CORPUS_PATH}")
+
+
+def report(name, errors_by_kind, elapsed, units, unit_label):
+    """Print per-kind and overall error for one engine."""
+    all_errors = [e for errors in errors_by_kind.values() for e in errors]
+    print(f"\n📊 {name}: MAPE {sum(all_errors) / len(all_errors) * 100:5.1f}%  "
+          f"max {max(all_errors) * 100:5.1f}%  "
+          f"throughput {units / elapsed:,.0f} {unit_label}/s")
+    for kind, errors in sorted(errors_by_kind.items()):
+        print(f"  {kind:<12} {sum(errors) / len(errors) * 100:5.1f}%  (n={len(errors)})")
+
+
+def benchmark_corpus(engine_names):
+    """Compare engines on raw text against the bundled reference counts."""
+    samples = load_jsonl(CORPUS_PATH)
+    total_chars = sum(len(s["text"]) for s in samples)
+    print(f"Corpus: {len(samples)} samples, {total_chars:,} chars, reference {samples[0]['reference']}")
+
+    for name in engine_names:
+        engine = create_tokenizer_engine(name)
+        errors_by_kind = defaultdict(list)
+        start = time.perf_counter()
+        for sample in samples:
+            count = engine.count(sample["text"])
+            errors_by_kind[sample["kind"]].append(
+                abs(count - sample["reference_tokens"]) / sample["reference_tokens"]
+            )
+        report(engine.name, errors_by_kind, time.perf_counter() - start, total_chars, "chars")
+
+
+async def benchmark_recorded(engine_names, reference_path):
+    """Compare full request counts against recorded upstream count_tokens results."""
+    records = load_jsonl(reference_path)
+    print(f"Recorded upstream counts: {len(records)} requests")
+
+    for name in engine_names:
+        service = TokenCountingService(cache=MessageTokenCache(max_entries=0),
+                                       engine=create_tokenizer_engine(name))
+        errors_by_kind = defaultdict(list)
+        start = time.perf_counter()
+        for record in records:
+            request = TokenCountRequest(**record["request"])
+            count = await service.count_request_tokens(request, model=request.model)
+            errors_by_kind[record.get("kind", "request")].append(
+                abs(count - record["input_tokens"]) / record["input_tokens"]
+            )
+        report(service.engine.name, errors_by_kind, time.perf_counter() - start, len(records), "requests")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tokenizer engine accuracy")
+    parser.add_argument("--engines", nargs="+", default=list(TOKENIZER_ENGINES.keys()),
+                        help="Engines to compare")
+    parser.add_argument("--reference", help="JSONL of recorded upstream count_tokens results")
+    parser.add_argument("--regenerate", action="store_true",
+                        help="Recompute cl100k_base reference counts for the bundled corpus")
+    args = parser.parse_args()
+    setup_logging("WARNING")
+
+    if args.regenerate:
+        regenerate_corpus()
+    elif args.reference:
+        asyncio.run(benchmark_recorded(args.engines, args.reference))
+    else:
+        benchmark_corpus(args.engines)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Tool Argument Benchmark - raw argument reuse for large tool inputs
+
+Simulates an upstream Write tool call carrying a 1 MB payload that is
+converted to Anthropic format, detected for tool execution, and then sent
+back as history on every following turn. Compares the previous path, which
+parsed the arguments at each step and re-serialized them on every turn,
+against the raw-text reuse in ToolArgumentCache.
+
+Usage:
+    python scripts/benchmark_tool_arguments.py [--size-mb 1] [--turns 10]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.logging_config import setup_logging
+from src.models.anthropic import Message
+from src.tasks.conversion.message_conversion_tasks import convert_anthropic_message_to_litellm
+from src.tasks.tool_execution.conversation_continuation_tasks import create_assistant_tool_use_message
+from src.tasks.tool_execution.tool_detection_tasks import extract_tool_use_blocks
+from src.utils.tool_arguments import tool_argument_cache
+
+TOOL_CALL_ID = "call_write_large_file"
+
+
+def build_response(size_bytes):
+    """Build an upstream response with one Write tool call of roughly size_bytes."""
+    line = 'def handler(event):\n    return {"status": "ok", "path": "C:\\\\repo"}\n'
+    content = line * (size_bytes // len(line) + 1)
+    arguments = json.dumps({"file_path": "/repo/src/generated.py", "content": content[:size_bytes]})
+    tool_call = SimpleNamespace(
+        id=TOOL_CALL_ID,
+        type="function",
+        function=SimpleNamespace(name="Write", arguments=arguments)
+    )
+    message = SimpleNamespace(content=None, tool_calls=[tool_call])
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)]), arguments
+
+
+def previous_path(arguments, history_message, turns):
+    """Parse once per pipeline step and re-serialize on every history turn."""
+    json.loads(arguments)  # response conversion
+    json.loads(arguments)  # tool detection
+    json.loads(arguments)  # continuation assistant message
+    for _ in range(turns):
+        for block in history_message.content:
+            if block.type == "tool_use":
+                json.dumps(block.input)
+
+
+def current_path(response, history_message, turns):
+    """Parse once, then reuse the parsed object and the raw text."""
+    tool_argument_cache.parse(TOOL_CALL_ID, response.choices[0].message.tool_calls[0].function.arguments)
+    extract_tool_use_blocks(response)
+    create_assistant_tool_use_message(response)
+    for _ in range(turns):
+        converted = convert_anthropic_message_to_litellm(history_message, {"content_block_conversions": 0})
+    return converted
+
+
+def run(size_mb, turns, repeats):
+    """Run the benchmark and print timings."""
+    response, arguments = build_response(int(size_mb * 1024 * 1024))
+    # The client echoes the tool_use block back as history on the next turns
+    history_message = Message(role="assistant", content=[
+        {"type": "tool_use", "id": TOOL_CALL_ID, "name": "Write", "input": json.loads(arguments)}
+    ])
+
+    previous_times, current_times = [], []
+    for _ in range(repeats):
+        tool_argument_cache.clear()
+
+        start = time.perf_counter()
+        previous_path(arguments, history_message, turns)
+        previous_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        converted = current_path(response, history_message, turns)
+        current_times.append(time.perf_counter() - start)
+
+    sent = converted.tool_calls[0]["function"]["arguments"]
+    assert sent is arguments, "history did not reuse the original argument text"
+
+    best_previous = min(previous_times)
+    best_current = min(current_times)
+
+    print(f"📊 Tool argument benchmark ({len(arguments) / 1024 / 1024:.2f} MB input, {turns} history turns)")
+    print(f"  Previous parse/re-serialize path: {best_previous * 1000:8.2f} ms")
+    print(f"  Raw argument reuse:               {best_current * 1000:8.2f} ms")
+    print(f"  Speedup:                          {best_previous / best_current:8.1f}x")
+    print(f"  Cache stats:                      {tool_argument_cache.get_stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark raw tool argument reuse")
+    parser.add_argument("--size-mb", type=float, default=1.0, help="Tool input size in MB")
+    parser.add_argument("--turns", type=int, default=10, help="History turns that resend the tool call")
+    parser.add_argument("--repeats", type=int, default=5, help="Repetitions; the best run is reported")
+    args = parser.parse_args()
+    setup_logging("WARNING")
+    run(args.size_mb, args.turns, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
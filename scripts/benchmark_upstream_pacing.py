@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Upstream Pacing Benchmark - 429s and latency under sustained load
+
+Drives HTTPClientService against a local OpenAI-compatible mock that enforces
+a fixed-window request limit and reports it the way OpenAI-style upstreams do
+(x-ratelimit-limit/remaining/reset-requests, retry-after on 429). Each
+logical request is retried after retry-after when rejected, as SDK clients
+do, and the run is repeated with upstream pacing off and on.
+
+Usage:
+    python scripts/benchmark_upstream_pacing.py [--requests 300] [--concurrency 32] [--limit 40] [--window 2]
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from src.core.logging_config import setup_logging
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark upstream rate-limit pacing")
+    parser.add_argument("--requests", type=int, default=300, help="Logical requests per run")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent clients")
+    parser.add_argument("--limit", type=int, default=40, help="Mock upstream requests per window")
+    parser.add_argument("--window", type=float, default=2.0, help="Mock upstream window in seconds")
+    parser.add_argument("--latency-ms", type=int, default=50, help="Mock upstream latency per request")
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+
+
+class FixedWindowLimiter:
+    """Upstream-side limiter: ARGS.limit requests per ARGS.window, counted on arrival."""
+
+    def __init__(self):
+        self.window_start = time.time()
+        self.used = 0
+        self.accepted = 0
+        self.rejected = 0
+
+    def admit(self):
+        now = time.time()
+        if now - self.window_start >= ARGS.window:
+            self.window_start += (now - self.window_start) // ARGS.window * ARGS.window
+            self.used = 0
+        reset_in = self.window_start + ARGS.window - now
+        if self.used >= ARGS.limit:
+            self.rejected += 1
+            return False, reset_in
+        self.used += 1
+        self.accepted += 1
+        return True, reset_in
+
+    def headers(self, reset_in):
+        return {
+            "x-ratelimit-limit-requests": str(ARGS.limit),
+            "x-ratelimit-remaining-requests": str(max(ARGS.limit - self.used, 0)),
+            "x-ratelimit-reset-requests": f"{reset_in:.3f}s"
+        }
+
+
+limiter = FixedWindowLimiter()
+
+
+async def chat_completions(request: Request):
+    body = await request.json()
+    allowed, reset_in = limiter.admit()
+    headers = limiter.headers(reset_in)
+    if not allowed:
+        headers["retry-after"] = str(math.ceil(reset_in))
+        return JSONResponse({"error": {"message": "Rate limit exceeded", "code": 429}}, status_code=429, headers=headers)
+    await asyncio.sleep(ARGS.latency_ms / 1000)
+    return JSONResponse({
+        "id": "chatcmpl-bench", "object": "chat.completion", "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "Done."}}],
+        "usage": {"prompt_tokens": 12, "completion_tokens": 2, "total_tokens": 14}
+    }, headers=headers)
+
+
+def start_upstream():
+    """Serve the mock upstream on a background thread."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    app = Starlette(routes=[Route("/api/v1/chat/completions", chat_completions, methods=["POST"])])
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning",
+                                          timeout_keep_alive=120))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}/api/v1"
+
+
+async def run(api_base, pacing_enabled):
+    import litellm
+    import src.services as services
+    from src.services.http_client import HTTPClientService
+    from src.services.retry_policy import RetryPolicyService
+    from src.services.upstream_pacing import UpstreamPacingService
+
+    services.upstream_pacing_service = UpstreamPacingService(enabled=pacing_enabled)
+    services.retry_policy_service = RetryPolicyService(enabled=False)  # count every 429
+    http_client = HTTPClientService()
+    limiter.__init__()
+    latencies = []
+    queue = asyncio.Queue()
+    for i in range(ARGS.requests):
+        queue.put_nowait(i)
+
+    async def client():
+        while not queue.empty():
+            i = queue.get_nowait()
+            start = time.perf_counter()
+            for _ in range(20):
+                try:
+                    await http_client.make_litellm_request({
+                        "model": "openrouter/anthropic/claude-3-5-haiku", "api_base": api_base,
+                        "api_key": "sk-bench", "max_tokens": 16, "num_retries": 0,
+                        "messages": [{"role": "user", "content": f"Item {i}"}]
+                    }, f"bench-{i}", capture_debug=False)
+                    break
+                except litellm.RateLimitError as e:
+                    retry_after = (getattr(e, "litellm_response_headers", None) or {}).get("retry-after", "1")
+                    await asyncio.sleep(float(retry_after))
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(ARGS.concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "elapsed": elapsed,
+        "rejected": limiter.rejected,
+        "mean": statistics.mean(latencies),
+        "p95": sorted(latencies)[int(len(latencies) * 0.95) - 1],
+        "stats": services.upstream_pacing_service.get_stats()
+    }
+
+
+def main():
+    setup_logging("ERROR")
+    api_base = start_upstream()
+
+    async def both():
+        return {
+            "pacing off": await run(api_base, pacing_enabled=False),
+            "pacing on": await run(api_base, pacing_enabled=True)
+        }
+
+    results = asyncio.run(both())
+    ideal = ARGS.requests / ARGS.limit * ARGS.window
+
+    print(f"📊 Upstream pacing benchmark ({ARGS.requests} requests, {ARGS.concurrency} clients, "
+          f"upstream limit {ARGS.limit}/{ARGS.window:g}s, ideal {ideal:.1f} s)")
+    for name, r in results.items():
+        print(f"  {name:<11} 429s {r['rejected']:>5}   total {r['elapsed']:6.2f} s   "
+              f"latency mean {r['mean']:6.2f} s  p95 {r['p95']:6.2f} s   "
+              f"paced {r['stats']['paced_requests']}")
+
+
+if __name__ == "__main__":
+    main()
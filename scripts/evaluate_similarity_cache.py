@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Similarity Cache Evaluation - hit rate and false-match rate on recorded traffic
+
+Replays request/response pairs in order through the near-duplicate cache at
+several similarity thresholds. Every lookup that hits is checked against the
+response actually recorded for that request: a hit whose cached text differs
+is a false match. "Reusable" counts requests whose recorded response had
+already been seen, i.e. the hits a perfect cache would get.
+
+Traffic is read from either:
+- a JSONL file with one {"request": {...}, "response": {...}} object per line,
+- a debug log directory (DEBUG_ENABLED=true), using claude_code_request and
+  anthropic_response of each request_response_*.json file.
+
+Without --traffic, a synthetic set of retried prompts (differing in
+timestamps, ids, whitespace or trailing noise) and near-miss prompts
+(differing in a word or number that changes the answer) is generated.
+
+Usage:
+    python scripts/evaluate_similarity_cache.py [--thresholds 0.8 0.9 0.95]
+    python scripts/evaluate_similarity_cache.py --traffic logs/debug --force-deterministic
+    python scripts/evaluate_similarity_cache.py --normalizers timestamps uuids hex numbers whitespace
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.logging_config import setup_logging
+from src.models.anthropic import MessagesRequest, MessagesResponse
+from src.models.base import Usage
+from src.services.similarity_cache import NORMALIZERS, SimilarityCacheService
+from src.utils.config import config
+
+ROUTE = "/v1/messages"
+
+TASKS = [
+    "Summarize the build log below and list the {which} tests with their error messages.",
+    "Review this diff of {file} and point out any bugs, missing error handling or style issues.",
+    "Classify support ticket {ticket} below as billing, outage, feature request or other.",
+    "Translate the release notes for version {version} below into German, keeping code identifiers unchanged.",
+    "Extract every function name defined in {file} below and return them as a JSON array, nothing else."
+]
+
+VARIANTS = {
+    "which": ["failing", "passing", "skipped"],
+    "file": ["src/services/passthrough.py", "src/services/rate_limiter.py", "src/main.py"],
+    "ticket": ["4812", "4813", "9120"],
+    "version": ["2.4.0", "2.5.0", "3.0.0"]
+}
+
+WORDS = ("request response cache model token stream retry upstream client server error timeout "
+         "message tool result batch queue worker config header route limit usage ledger").split()
+
+
+def document(index):
+    """A short synthetic document; each index gives different content."""
+    rng = random.Random(index)
+    return " ".join(rng.choice(WORDS) for _ in range(40))
+
+
+def load_traffic(path):
+    """Load recorded (request, response) pairs from a JSONL file or a debug log directory."""
+    path = Path(path)
+    if path.is_dir():
+        pairs = []
+        for file in sorted(path.glob("request_response_*.json"), key=lambda p: p.stat().st_mtime):
+            data = json.loads(file.read_text())
+            if data.get("claude_code_request") and data.get("anthropic_response"):
+                pairs.append((data["claude_code_request"], data["anthropic_response"]))
+        return pairs
+    with open(path) as f:
+        return [(line["request"], line["response"]) for line in map(json.loads, f) if line.get("response")]
+
+
+def synthetic_traffic(count, seed, documents=20):
+    """Generate retried and near-miss prompts with ground-truth answers."""
+    rng = random.Random(seed)
+    pairs = []
+    for _ in range(count):
+        task = rng.randrange(len(TASKS))
+        fields = {key: rng.choice(values) for key, values in VARIANTS.items() if "{" + key + "}" in TASKS[task]}
+        doc = rng.randrange(documents)
+        noise = rng.choice([
+            lambda: f"Requested at {time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(rng.randrange(1_700_000_000, 1_800_000_000)))}.",
+            lambda: f"request_id: {uuid.UUID(int=rng.getrandbits(128))}",
+            lambda: "  " * rng.randint(0, 3) + "\n",
+            lambda: f"(attempt {rng.randint(2, 4)})",
+            lambda: ""
+        ])()
+        # The answer depends on the task, its fields and the document - never on the noise
+        answer = f"answer to task {task} on document {doc} with {sorted(fields.items())}"
+        request = {"model": "claude-3-5-haiku-20241022", "max_tokens": 512, "temperature": 0,
+                   "messages": [{"role": "user", "content": f"{TASKS[task].format(**fields)}\n\n{document(doc)}\n{noise}"}]}
+        pairs.append((request, {"id": "msg_synthetic", "model": "claude-3-5-haiku-20241022",
+                                "content": [{"type": "text", "text": answer}], "stop_reason": "end_turn",
+                                "usage": {"input_tokens": 0, "output_tokens": 0}}))
+    return pairs
+
+
+def response_text(response):
+    """Text of a response for comparison; tool_use blocks compare by name and input."""
+    blocks = response.content if hasattr(response, "content") else response.get("content", [])
+    parts = []
+    for block in blocks:
+        block = block.model_dump() if hasattr(block, "model_dump") else block
+        parts.append(block.get("text") or json.dumps([block.get("name"), block.get("input")], sort_keys=True))
+    return "\n".join(parts)
+
+
+def evaluate(pairs, threshold, normalizers, force_deterministic):
+    """Replay traffic through a fresh cache and count hits and false matches."""
+    cache = SimilarityCacheService(enabled=True, routes=[ROUTE], threshold=threshold,
+                                   normalizers=normalizers, max_entries=len(pairs) + 1, ttl=10 ** 9)
+    seen, counts = set(), {"requests": 0, "cacheable": 0, "reusable": 0, "hits": 0, "false_matches": 0}
+    start = time.perf_counter()
+    for request_data, response_data in pairs:
+        request_data = {**request_data, "stream": False}
+        if force_deterministic:
+            request_data["temperature"] = 0
+        request = MessagesRequest(**request_data)
+        recorded = MessagesResponse(**{"stop_reason": "end_turn", **response_data,
+                                       "usage": Usage(**response_data.get("usage") or {})})
+        text = response_text(recorded)
+        counts["requests"] += 1
+        if not cache.applies_to(request, ROUTE):
+            continue
+
+        counts["cacheable"] += 1
+        counts["reusable"] += text in seen
+        seen.add(text)
+        cached = cache.lookup(request, ROUTE)
+        if cached is None:
+            cache.store(request, recorded, ROUTE)
+        else:
+            counts["hits"] += 1
+            counts["false_matches"] += response_text(cached) != text
+    counts["ms_per_request"] = (time.perf_counter() - start) * 1000 / max(counts["requests"], 1)
+    return counts
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Evaluate the near-duplicate response cache")
+    parser.add_argument("--traffic", help="JSONL of request/response pairs or a debug log directory")
+    parser.add_argument("--synthetic", type=int, default=2000, help="Synthetic requests when no traffic is given")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.7, 0.8, 0.9, 0.95, 1.0])
+    parser.add_argument("--normalizers", nargs="+", choices=list(NORMALIZERS),
+                        default=config.similarity_cache_normalizers)
+    parser.add_argument("--force-deterministic", action="store_true",
+                        help="Treat every recorded request as temperature 0")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    setup_logging("WARNING")
+    pairs = load_traffic(args.traffic) if args.traffic else synthetic_traffic(args.synthetic, args.seed)
+    source = args.traffic or f"synthetic ({args.synthetic} requests, seed {args.seed})"
+
+    print(f"📊 Similarity cache evaluation: {source}")
+    print(f"   normalizers: {', '.join(args.normalizers)}")
+    print(f"   {'threshold':>9} {'cacheable':>9} {'reusable':>8} {'hits':>6} {'hit rate':>8} "
+          f"{'false':>6} {'false rate':>10} {'ms/req':>7}")
+    for threshold in args.thresholds:
+        c = evaluate(pairs, threshold, args.normalizers, args.force_deterministic)
+        hit_rate = c["hits"] / c["cacheable"] if c["cacheable"] else 0.0
+        false_rate = c["false_matches"] / c["hits"] if c["hits"] else 0.0
+        print(f"   {threshold:>9.2f} {c['cacheable']:>9} {c['reusable']:>8} {c['hits']:>6} {hit_rate:>8.1%} "
+              f"{c['false_matches']:>6} {false_rate:>10.1%} {c['ms_per_request']:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
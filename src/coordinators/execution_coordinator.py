@@ -14,6 +14,7 @@ from ..core.logging_config import get_logger
 from ..services.context_manager import ContextManager
 from ..tasks.tool_execution.tool_result_formatting_tasks import ToolExecutionResult
 from ..models.anthropic import Message, MessagesRequest, MessagesResponse
+from ..utils.tool_use_index import get_tool_use_index
 from .tool_coordinator import tool_coordinator
 
 # Initialize logging and context management
@@ -299,6 +300,12 @@ class ExecutionCoordinator:
         )
         continuation_messages.append(user_message)
         
+        # Pair results with tool uses; the conversation's index only indexes the two appended turns
+        unmatched_results = get_tool_use_index(continuation_messages).unmatched_results()
+        if unmatched_results:
+            logger.warning("Continuation has tool results without matching tool uses",
+                          tool_use_ids=unmatched_results)
+        
         # Build continuation request
         continuation_request = MessagesRequest(
             model=original_request.model,
@@ -183,6 +183,15 @@ class AnthropicToLiteLLMFlow(ConversionService[MessagesRequest, LiteLLMRequest],
         # Add optional parameters
         self._add_optional_parameters(source, litellm_request_data, litellm_tools)
         
+        # Drop, clamp or translate parameters the target model does not accept
+        from ...services import parameter_compatibility_service
+        normalizations = parameter_compatibility_service.normalize(litellm_request_data)
+        if normalizations:
+            metadata["parameter_normalizations"] = normalizations
+            logger.info("Normalized request parameters for model",
+                       model=litellm_request_data["model"],
+                       changes=normalizations)
+        
         return litellm_request_data
     
     def _add_optional_parameters(
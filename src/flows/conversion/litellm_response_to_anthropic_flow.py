@@ -9,6 +9,7 @@ from ...models.anthropic import MessagesRequest, MessagesResponse
 from ...models.base import Usage
 from ...models.instructor import ConversionResult
 from ...core.logging_config import get_logger
+from ...utils.tool_arguments import tool_argument_cache
 
 logger = get_logger("conversion.litellm_response_to_anthropic")
 
@@ -143,7 +144,7 @@ class LiteLLMResponseToAnthropicFlow(ConversionService[Any, MessagesResponse]):
                     }
                     
                     # Parse tool arguments safely
-                    tool_content["input"] = self._parse_tool_arguments(tool_call.function)
+                    tool_content["input"] = self._parse_tool_arguments(tool_call.id, tool_call.function)
                     
                     content.append(tool_content)
                     metadata["tool_use_blocks"] += 1
@@ -162,11 +163,11 @@ class LiteLLMResponseToAnthropicFlow(ConversionService[Any, MessagesResponse]):
                 message.tool_calls and
                 not str(type(message.tool_calls)).startswith("<class 'unittest.mock.Mock"))
     
-    def _parse_tool_arguments(self, function: Any) -> Dict[str, Any]:
-        """Parse tool function arguments safely."""
+    def _parse_tool_arguments(self, tool_call_id: str, function: Any) -> Dict[str, Any]:
+        """Parse tool function arguments safely, keeping the raw text for reuse."""
         try:
             if hasattr(function, 'arguments'):
-                return json.loads(function.arguments)
+                return tool_argument_cache.parse(tool_call_id, function.arguments)
             else:
                 return {}
         except (json.JSONDecodeError, TypeError):
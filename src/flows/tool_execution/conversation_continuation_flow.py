@@ -1,12 +1,19 @@
 """Conversation continuation flow for tool results."""
 
-from typing import Any, List
+import json
+from typing import Any, List, Optional
 from ...tasks.tool_execution.conversation_continuation_tasks import (
     create_tool_result_messages
 )
 from ...tasks.tool_execution.tool_result_formatting_tasks import ToolExecutionResult
 from ...models.anthropic import Message, MessagesRequest
+from ...models.base import Tool
 from ...services.http_client import HTTPClientService
+from ...services.tool_output_store import (
+    READ_TOOL_OUTPUT_TOOL,
+    READ_TOOL_OUTPUT_TOOL_NAME,
+    STORED_OUTPUT_MARKER
+)
 from ...utils.config import config
 from ...utils.error_logger import log_error
 from ...core.logging_config import get_logger
@@ -54,6 +61,18 @@ class ConversationContinuationFlow:
             await self._log_continuation_error(e, original_request, tool_results, request_id)
             raise
     
+    @staticmethod
+    def _tools_with_output_reader(
+        tools: Optional[List[Tool]],
+        continuation_messages: List[dict]
+    ) -> Optional[List[Tool]]:
+        """Offer the ReadToolOutput tool when tool results point at stored outputs"""
+        if tools is None or any(tool.name == READ_TOOL_OUTPUT_TOOL_NAME for tool in tools):
+            return tools
+        if STORED_OUTPUT_MARKER not in json.dumps(continuation_messages, default=str):
+            return tools
+        return list(tools) + [Tool(**READ_TOOL_OUTPUT_TOOL)]
+    
     async def _make_continuation_request(
         self,
         original_request: MessagesRequest,
@@ -77,7 +96,7 @@ class ConversationContinuationFlow:
             max_tokens=original_request.max_tokens,
             temperature=original_request.temperature,
             stream=original_request.stream,
-            tools=original_request.tools,
+            tools=self._tools_with_output_reader(original_request.tools, continuation_messages),
             tool_choice=original_request.tool_choice,
             system=original_request.system
         )
@@ -96,7 +115,6 @@ class ConversationContinuationFlow:
             "model": litellm_request["model"],
             "messages": litellm_request["messages"],
             "max_tokens": litellm_request.get("max_tokens", original_request.max_tokens),
-            "temperature": litellm_request.get("temperature", original_request.temperature or 1.0),
             "stream": litellm_request.get("stream", original_request.stream or False),
             "api_key": config.openrouter_api_key,
             "api_base": "https://openrouter.ai/api/v1",
@@ -106,9 +124,10 @@ class ConversationContinuationFlow:
             }
         }
         
-        # Add tools if present
-        if litellm_request.get("tools"):
-            continuation_request["tools"] = litellm_request["tools"]
+        # Carry over the sampling parameters and tools the model accepts
+        for param in ("temperature", "tools"):
+            if litellm_request.get(param) is not None:
+                continuation_request[param] = litellm_request[param]
         
         # Log request details for debugging
         self._log_continuation_request(litellm_request, tool_results)
@@ -14,6 +14,7 @@ from ...core.logging_config import get_logger
 from ...services.context_manager import ContextManager
 from ...tasks.tools.system_tools import (
     execute_command_task,
+    read_tool_output_task,
     task_management_task
 )
 
@@ -31,7 +32,7 @@ async def system_operations_flow(
     
     Strategy:
     - Commands execute sequentially to avoid conflicts
-    - Task management operations can run concurrently
+    - Task management and stored output reads can run concurrently
     - Safety checks enforced at each step
     
     Args:
@@ -46,6 +47,7 @@ async def system_operations_flow(
     # Categorize operations by type
     command_operations = []
     task_operations = []
+    read_operations = []
     
     for request in tool_requests:
         tool_name = request.get('name', '').lower()
@@ -53,6 +55,8 @@ async def system_operations_flow(
             command_operations.append(request)
         elif tool_name == 'task':
             task_operations.append(request)
+        elif tool_name == 'readtooloutput':
+            read_operations.append(request)
     
     results = []
     
@@ -72,6 +76,20 @@ async def system_operations_flow(
         task_results = await asyncio.gather(*task_tasks, return_exceptions=True)
         results.extend(task_results)
     
+    # Phase 1b: Read stored tool outputs concurrently (read-only)
+    if read_operations:
+        logger.info("Reading stored tool outputs concurrently", 
+                   count=len(read_operations))
+        read_results = await asyncio.gather(*[
+            read_tool_output_task(
+                tool_call_id=request.get('tool_call_id'),
+                tool_name=request.get('name'),
+                tool_input=request.get('input', {})
+            )
+            for request in read_operations
+        ], return_exceptions=True)
+        results.extend(read_results)
+    
     # Phase 2: Execute command operations sequentially (safety)
     if command_operations:
         logger.info("Executing command operations sequentially", 
@@ -1,6 +1,7 @@
 """Tool execution orchestration flow."""
 
 import asyncio
+from collections import OrderedDict
 from typing import Any, Dict, List
 from ...tasks.tool_execution.tool_detection_tasks import (
     detect_tool_use_blocks,
@@ -37,7 +38,7 @@ class ToolExecutionFlow:
         self.rate_limit_max_requests = rate_limit_max_requests
         
         # Rate limiting tracker
-        self.rate_limit_tracker = {}
+        self.rate_limit_tracker = OrderedDict()
         
         # Metrics
         self.metrics = {
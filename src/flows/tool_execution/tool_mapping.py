@@ -22,6 +22,7 @@ TOOL_FLOW_MAPPING: Dict[str, str] = {
     # System operations
     "Bash": "system_operations_flow",
     "Task": "system_operations_flow",
+    "ReadToolOutput": "system_operations_flow",
     
     # Web operations
     "WebSearch": "web_operations_flow",
@@ -101,6 +102,7 @@ def get_concurrency_strategy(tool_name: str) -> Dict[str, Any]:
         # System operations - moderate concurrency
         "Bash": {"max_concurrent": 3, "timeout": 60},
         "Task": {"max_concurrent": 2, "timeout": 120},
+        "ReadToolOutput": {"max_concurrent": 5, "timeout": 10},
         
         # Web operations - limited concurrency
         "WebSearch": {"max_concurrent": 2, "timeout": 30},
@@ -27,6 +27,7 @@ class ToolRegistryFlow:
             "LS": self._execute_via_coordinator,
             "Bash": self._execute_via_coordinator,
             "Task": self._execute_via_coordinator,
+            "ReadToolOutput": self._execute_via_coordinator,
             "WebSearch": self._execute_via_coordinator,
             "WebFetch": self._execute_via_coordinator,
             "NotebookRead": self._execute_via_coordinator,
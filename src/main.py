@@ -32,10 +32,11 @@ from src.utils.debug import debug_logger
 from src.core.logging_config import configure_structlog, get_logger
 
 # Import routers
-from src.routers import messages_router, tokens_router, health_router, debug_router, mcp_router
+from src.routers import messages_router, tokens_router, health_router, debug_router, mcp_router, tool_results_router, usage_router, batches_router
 
 # Import middleware
-from src.middleware import LoggingMiddleware, UnifiedLoggingMiddleware, ErrorHandlingMiddleware, CORSMiddleware
+from src.middleware import LoggingMiddleware, UnifiedLoggingMiddleware, ErrorHandlingMiddleware, CORSMiddleware, PassthroughMiddleware, RateLimitMiddleware
+from src.middleware.error_middleware import anthropic_error_type
 
 
 @asynccontextmanager
@@ -81,6 +82,13 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("🛑 Shutting down OpenRouter Anthropic Server")
+    
+    from src.services import message_batch_service, usage_ledger_service
+    await message_batch_service.close()
+    await usage_ledger_service.close()
+    
+    from src.services.http_client import close_shared_async_client
+    await close_shared_async_client()
 
 
 def validate_environment():
@@ -160,13 +168,26 @@ def create_app() -> FastAPI:
             allowed_hosts=["*"]  # Configure appropriately for production
         )
     
-    # 2. CORS middleware
+    # 2. Passthrough middleware (innermost: runs after CORS, errors and logging)
+    if config.passthrough_routes:
+        app.add_middleware(PassthroughMiddleware)
+        unified_logger.info("⏩ Native passthrough enabled",
+                            routes=[route.get("name") for route in config.passthrough_routes])
+    
+    # 3. Rate limit middleware (outside passthrough, so passthrough traffic is limited too)
+    if config.rate_limit_enabled:
+        app.add_middleware(RateLimitMiddleware)
+        unified_logger.info("⛔ Rate limiting enabled",
+                            requests_per_minute=config.rate_limit_requests_per_minute,
+                            tokens_per_minute=config.rate_limit_tokens_per_minute)
+    
+    # 4. CORS middleware
     app.add_middleware(CORSMiddleware)
     
-    # 3. Error handling middleware
+    # 5. Error handling middleware
     app.add_middleware(ErrorHandlingMiddleware)
     
-    # 4. Logging middleware (should be last to capture everything)
+    # 6. Logging middleware (should be last to capture everything)
     if getattr(config, 'use_unified_logging', True):
         app.add_middleware(UnifiedLoggingMiddleware)
         unified_logger.info("🔄 Using unified logging middleware")
@@ -179,6 +200,9 @@ def create_app() -> FastAPI:
     app.include_router(messages_router)
     app.include_router(tokens_router)
     app.include_router(mcp_router)
+    app.include_router(tool_results_router)
+    app.include_router(usage_router)
+    app.include_router(batches_router)
     
     # Include debug router (only in development)
     if config.environment == "development":
@@ -222,7 +246,7 @@ def create_app() -> FastAPI:
             content={
                 "type": "error",
                 "error": {
-                    "type": "invalid_request_error" if exc.status_code == 400 else "api_error",
+                    "type": anthropic_error_type(exc.status_code),
                     "message": str(exc.detail)
                 }
             }
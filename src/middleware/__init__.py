@@ -5,16 +5,22 @@ This package contains FastAPI middleware for:
 - Request/response logging with structured output
 - Global error handling with Anthropic-format responses
 - CORS handling with environment-aware policies
+- Native passthrough to Anthropic-compatible upstreams
+- Per-client rate limiting
 """
 
 from .logging_middleware import LoggingMiddleware
 from .unified_logging_middleware import UnifiedLoggingMiddleware
 from .error_middleware import ErrorHandlingMiddleware
 from .cors_middleware import CORSMiddleware
+from .passthrough_middleware import PassthroughMiddleware
+from .rate_limit_middleware import RateLimitMiddleware
 
 __all__ = [
     "LoggingMiddleware",
     "UnifiedLoggingMiddleware",
     "ErrorHandlingMiddleware",
-    "CORSMiddleware"
+    "CORSMiddleware",
+    "PassthroughMiddleware",
+    "RateLimitMiddleware"
 ]
\ No newline at end of file
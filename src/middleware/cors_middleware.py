@@ -58,11 +58,13 @@ class CORSMiddleware(BaseHTTPMiddleware):
                 "X-Requested-With",
                 "X-Request-ID",
                 "anthropic-version",
-                "anthropic-beta"
+                "anthropic-beta",
+                "X-Load-Shedding"
             ]
         
         if expose_headers is None:
-            expose_headers = ["X-Request-ID", "X-Processing-Time"]
+            expose_headers = ["X-Request-ID", "X-Processing-Time", "X-Upstream-Retries", "X-Upstream-Retry-Reasons",
+                              "X-Model-Downgraded-From", "X-Model-Downgraded-To"]
         
         self.allow_origins = allow_origins
         self.allow_methods = allow_methods
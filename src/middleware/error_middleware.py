@@ -20,6 +20,25 @@ from src.utils.config import config
 
 logger = get_logger(__name__)
 
+# Anthropic error type for each HTTP status code; anything else is an api_error
+ANTHROPIC_ERROR_TYPES = {
+    400: "invalid_request_error",
+    401: "authentication_error",
+    403: "permission_error",
+    404: "not_found_error",
+    422: "invalid_request_error",
+    429: "rate_limit_error",
+    500: "api_error",
+    502: "api_error",
+    503: "overloaded_error",
+    529: "overloaded_error"
+}
+
+
+def anthropic_error_type(status_code: int) -> str:
+    """Map an HTTP status code to its Anthropic error type."""
+    return ANTHROPIC_ERROR_TYPES.get(status_code, "api_error")
+
 
 class ErrorHandlingMiddleware(BaseHTTPMiddleware):
     """
@@ -36,9 +55,23 @@ class ErrorHandlingMiddleware(BaseHTTPMiddleware):
         super().__init__(app)
         # Use config debug setting if not explicitly provided
         self.include_debug_info = include_debug_info if include_debug_info is not None else config.debug_enabled
+        from src.services import load_shedding_service, retry_policy_service
+        self.retry_policy = retry_policy_service
+        self.load_shedding = load_shedding_service
     
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
         """Process request with comprehensive error handling."""
+        # Collect upstream retries made for this request, for its response headers
+        retries = self.retry_policy.track_request()
+        # And whether its model was downgraded under load (or the client opted out)
+        downgrade = self.load_shedding.track_request(request.headers, request.client.host if request.client else None)
+        response = await self._dispatch(request, call_next)
+        response.headers.update(self.retry_policy.response_headers(retries))
+        response.headers.update(self.load_shedding.response_headers(downgrade))
+        return response
+    
+    async def _dispatch(self, request: Request, call_next: Callable) -> Response:
+        """Run the request, turning errors into structured responses."""
         try:
             response = await call_next(request)
             return response
@@ -211,16 +244,4 @@ class ErrorHandlingMiddleware(BaseHTTPMiddleware):
     
     def _get_anthropic_error_type(self, status_code: int) -> str:
         """Map HTTP status codes to Anthropic error types."""
-        mapping = {
-            400: "invalid_request_error",
-            401: "authentication_error",
-            403: "permission_error",
-            404: "not_found_error",
-            422: "invalid_request_error",
-            429: "rate_limit_error",
-            500: "api_error",
-            502: "api_error",
-            503: "overloaded_error",
-            529: "overloaded_error"
-        }
-        return mapping.get(status_code, "api_error")
\ No newline at end of file
+        return anthropic_error_type(status_code)
\ No newline at end of file
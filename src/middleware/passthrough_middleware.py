@@ -0,0 +1,82 @@
+"""
+Passthrough middleware for OpenRouter Anthropic Server.
+Forwards requests for passthrough-routed models before any request parsing.
+"""
+
+from typing import Callable
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+import httpx
+
+from src.core.logging_config import get_logger
+from src.services.passthrough import PassthroughService
+from src.services.rate_limiter import RateLimiterService
+
+logger = get_logger(__name__)
+
+
+class PassthroughMiddleware(BaseHTTPMiddleware):
+    """
+    Middleware that serves Anthropic-compatible upstreams without conversion.
+
+    Features:
+    - Routes by model name using PASSTHROUGH_ROUTES
+    - Forwards request bytes with only header rewriting and model mapping
+    - Streams JSON and SSE response bytes straight back to the client
+    - Requests for other models continue through the normal pipeline
+    """
+
+    def __init__(self, app, service: PassthroughService = None):
+        super().__init__(app)
+        if service is None:
+            from src.services import passthrough_service
+            service = passthrough_service
+        self.service = service
+
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        """Forward passthrough-routed requests, pass everything else on."""
+        if (
+            not self.service.enabled
+            or request.method != "POST"
+            or request.url.path not in self.service.PASSTHROUGH_PATHS
+        ):
+            return await call_next(request)
+
+        body = await request.body()
+        resolved = self.service.resolve(request.url.path, body)
+        if resolved is None:
+            return await call_next(request)
+
+        route, body, model, upstream_model = resolved
+        try:
+            status_code, headers, stream = await self.service.forward(
+                route=route,
+                path=request.url.path,
+                query=request.url.query,
+                body=body,
+                headers=request.headers,
+                model=model,
+                upstream_model=upstream_model,
+                client=RateLimiterService.client_key(
+                    request.headers, request.client.host if request.client else None
+                )
+            )
+        except httpx.HTTPError as e:
+            logger.error("❌ Passthrough upstream request failed",
+                        route=route.name,
+                        model=model,
+                        error_type=type(e).__name__,
+                        error_message=str(e))
+            return JSONResponse(
+                status_code=502,
+                content={
+                    "type": "error",
+                    "error": {
+                        "type": "api_error",
+                        "message": f"Passthrough upstream '{route.name}' unavailable: {type(e).__name__}"
+                    }
+                }
+            )
+
+        return StreamingResponse(stream, status_code=status_code, headers=headers)
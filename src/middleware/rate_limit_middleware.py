@@ -0,0 +1,101 @@
+"""
+Rate limit middleware for OpenRouter Anthropic Server.
+Rejects over-limit clients before request validation or upstream work.
+"""
+
+import json
+from typing import Callable
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from src.core.logging_config import get_logger
+from src.services.rate_limiter import RateLimiterService
+
+logger = get_logger(__name__)
+
+
+class RateLimitMiddleware(BaseHTTPMiddleware):
+    """
+    Middleware that enforces per-client request and token rates.
+
+    Features:
+    - Keys clients by API key, falling back to client IP
+    - Estimates input tokens from Content-Length, so the body of a single
+      request is never read; a request without one is charged a
+      conservative default
+    - Charges batch endpoints one request per item they carry
+    - Returns Anthropic-style rate_limit_error responses with retry-after
+    """
+
+    # Routes that spend upstream or tokenizer work, mapped to whether each
+    # call carries a list of requests to charge per item
+    LIMITED_PATHS = {
+        "/v1/messages": False,
+        "/v1/messages/stream": False,
+        "/v1/messages/count_tokens": False,
+        "/v1/messages/count_tokens/batch": True,
+        "/v1/messages/batches": True
+    }
+
+    def __init__(self, app, service: RateLimiterService = None):
+        super().__init__(app)
+        if service is None:
+            from src.services import rate_limiter_service
+            service = rate_limiter_service
+        self.service = service
+
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        """Check the client's buckets and reject or pass the request on."""
+        if (
+            not self.service.enabled
+            or request.method != "POST"
+            or request.url.path not in self.LIMITED_PATHS
+        ):
+            return await call_next(request)
+
+        client = self.service.client_key(
+            request.headers, request.client.host if request.client else None
+        )
+        if self.LIMITED_PATHS[request.url.path]:
+            body = await request.body()
+            decision = self.service.check(
+                client, self.service.estimate_tokens(str(len(body))), requests=self._count_items(body)
+            )
+        else:
+            decision = self.service.check(
+                client, self.service.estimate_tokens(request.headers.get("content-length"))
+            )
+        if decision.allowed:
+            return await call_next(request)
+
+        logger.warning("⛔ Rate limit exceeded",
+                       path=request.url.path,
+                       client=client,
+                       limit_type=decision.limit_type,
+                       retry_after=round(decision.retry_after, 2))
+        return JSONResponse(
+            status_code=429,
+            headers={
+                "retry-after": decision.retry_after_header,
+                "anthropic-ratelimit-requests-remaining": str(decision.requests_remaining),
+                "anthropic-ratelimit-tokens-remaining": str(decision.tokens_remaining)
+            },
+            content={
+                "type": "error",
+                "error": {
+                    "type": "rate_limit_error",
+                    "message": f"Rate limit exceeded: {decision.limit_type} per minute. "
+                               f"Retry after {decision.retry_after_header} seconds."
+                }
+            }
+        )
+
+    @staticmethod
+    def _count_items(body: bytes) -> int:
+        """Number of requests in a batch body (1 if it is not a valid batch)."""
+        try:
+            items = json.loads(body).get("requests")
+        except (ValueError, AttributeError):
+            return 1
+        return max(1, len(items)) if isinstance(items, list) else 1
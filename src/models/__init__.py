@@ -25,7 +25,12 @@ from .anthropic import (
     MessagesRequest,
     MessagesResponse,
     TokenCountRequest,
-    TokenCountResponse
+    TokenCountResponse,
+    TokenCountBatchRequest,
+    TokenCountBatchResult,
+    TokenCountBatchResponse,
+    MessageBatchRequestItem,
+    MessageBatchCreateRequest
 )
 
 from .litellm import (
@@ -52,6 +57,11 @@ __all__ = [
     "MessagesResponse",
     "TokenCountRequest",
     "TokenCountResponse",
+    "TokenCountBatchRequest",
+    "TokenCountBatchResult",
+    "TokenCountBatchResponse",
+    "MessageBatchRequestItem",
+    "MessageBatchCreateRequest",
     
     # LiteLLM models
     "LiteLLMMessage",
@@ -93,7 +93,9 @@ class Message(BaseOpenRouterModel):
                     # Attempt to parse consolidated input
                     full_input_str = "".join(tool_data['_raw_input_parts'])
                     try:
-                        parsed_input = json.loads(full_input_str)
+                        # Imported here to avoid a circular import through src.utils
+                        from ..utils.tool_arguments import tool_argument_cache
+                        parsed_input = tool_argument_cache.parse(tool_id, full_input_str)
                         tool_data['input'] = parsed_input
                     except json.JSONDecodeError:
                         # Keep as raw string if parsing fails
@@ -178,4 +180,32 @@ class TokenCountRequest(BaseOpenRouterModel):
 class TokenCountResponse(BaseOpenRouterModel):
     """Token count response."""
     
-    input_tokens: int
\ No newline at end of file
+    input_tokens: int
+
+class TokenCountBatchRequest(BaseOpenRouterModel):
+    """Batch token count request."""
+    
+    requests: List[TokenCountRequest] = Field(..., min_length=1)
+
+class TokenCountBatchResult(BaseOpenRouterModel):
+    """Result for one request in a batch; exactly one of input_tokens or error is set."""
+    
+    index: int
+    input_tokens: Optional[int] = None
+    error: Optional[Dict[str, Any]] = None
+
+class TokenCountBatchResponse(BaseOpenRouterModel):
+    """Batch token count response, results in request order."""
+    
+    results: List[TokenCountBatchResult]
+
+class MessageBatchRequestItem(BaseOpenRouterModel):
+    """One request in a message batch; params are validated when the item runs."""
+    
+    custom_id: str = Field(..., min_length=1, max_length=64, pattern=r"^[a-zA-Z0-9_-]+$")
+    params: Dict[str, Any]
+
+class MessageBatchCreateRequest(BaseOpenRouterModel):
+    """Message batch creation request."""
+    
+    requests: List[MessageBatchRequestItem] = Field(..., min_length=1)
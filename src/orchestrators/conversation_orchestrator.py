@@ -11,6 +11,7 @@ from fastapi import HTTPException
 
 from src.models.anthropic import MessagesRequest, MessagesResponse
 from src.workflows.message_workflows import process_message_request
+from src.services import load_shedding_service, request_lane_service, similarity_cache_service
 from src.core.logging_config import get_logger
 
 logger = get_logger(__name__)
@@ -59,15 +60,27 @@ class ConversationOrchestrator:
         
         request_logger.info("Processing message request via orchestrator")
         
+        cached = similarity_cache_service.lookup(request, route="/v1/messages")
+        if cached is not None:
+            request_logger.info("Message request served from similarity cache")
+            return cached
+        
+        # Serve expensive models with faster fallbacks while the proxy is saturated
+        request = load_shedding_service.apply(request)
+        
         try:
-            # Execute the main workflow
-            response = await process_message_request(
-                request=request,
-                request_id=request_id,
-                streaming=False,
-                api_key=api_key
-            )
+            # Execute the main workflow once the request is admitted to its lane
+            lane = request_lane_service.classify(request)
+            async with request_lane_service.admit(lane, request_id=request_id):
+                response = await process_message_request(
+                    request=request,
+                    request_id=request_id,
+                    streaming=False,
+                    api_key=api_key,
+                    pipeline_profile=lane.profile.name
+                )
             
+            similarity_cache_service.store(request, response, route="/v1/messages")
             request_logger.info("Message request processed successfully")
             return response
             
@@ -117,14 +130,26 @@ class ConversationOrchestrator:
         
         request_logger.info("Processing streaming message request via orchestrator")
         
+        # Serve expensive models with faster fallbacks while the proxy is saturated
+        request = load_shedding_service.apply(request)
+        
         try:
             # Execute the main workflow with streaming enabled
-            response = await process_message_request(
-                request=request,
-                request_id=request_id,
-                streaming=True,
-                api_key=api_key
-            )
+            lane = request_lane_service.classify(request)
+            await request_lane_service.acquire(lane, request_id=request_id)
+            try:
+                response = await process_message_request(
+                    request=request,
+                    request_id=request_id,
+                    streaming=True,
+                    api_key=api_key,
+                    pipeline_profile=lane.profile.name
+                )
+            except BaseException:
+                request_lane_service.release(lane)
+                raise
+            # The slot is held until the client has consumed or dropped the stream
+            request_lane_service.release_after_stream(lane, response)
             
             request_logger.info("Streaming message request processed successfully")
             return response
@@ -3,10 +3,13 @@ Routers package for OpenRouter Anthropic Server.
 
 This package contains FastAPI routers for:
 - Messages endpoint (/v1/messages)
-- Token counting endpoint (/v1/messages/count_tokens)
+- Token counting endpoints (/v1/messages/count_tokens, /v1/messages/count_tokens/batch)
 - Health check endpoints
 - Debug endpoints (/debug/*)
 - MCP server management endpoints (/v1/mcp/*)
+- Compacted tool result retrieval (/v1/tool_results/*)
+- Usage ledger queries (/v1/usage)
+- Message Batches API emulation (/v1/messages/batches)
 """
 
 from .messages import router as messages_router
@@ -14,11 +17,17 @@ from .tokens import router as tokens_router
 from .health import router as health_router
 from .debug import router as debug_router
 from .mcp import router as mcp_router
+from .tool_results import router as tool_results_router
+from .usage import router as usage_router
+from .batches import router as batches_router
 
 __all__ = [
     "messages_router",
     "tokens_router",
     "health_router",
     "debug_router",
-    "mcp_router"
+    "mcp_router",
+    "tool_results_router",
+    "usage_router",
+    "batches_router"
 ]
\ No newline at end of file
@@ -0,0 +1,95 @@
+"""
+Message batches router for OpenRouter Anthropic Server.
+Emulates the Anthropic Message Batches API (/v1/messages/batches).
+"""
+
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import FileResponse
+
+from src.core.logging_config import get_logger
+from src.models.anthropic import MessageBatchCreateRequest
+from src.services import message_batch_service
+from src.services.message_batches import MessageBatch
+from src.services.rate_limiter import RateLimiterService
+
+logger = get_logger(__name__)
+
+router = APIRouter(prefix="/v1/messages/batches", tags=["batches"])
+
+
+def _client(raw_request: Request) -> str:
+    """Key of the calling client: batches are only visible to the client that created them."""
+    return RateLimiterService.client_key(raw_request.headers, raw_request.client.host if raw_request.client else None)
+
+
+async def _get_batch(batch_id: str, raw_request: Request) -> MessageBatch:
+    batch = await message_batch_service.get(batch_id, client=_client(raw_request))
+    if batch is None:
+        raise HTTPException(
+            status_code=404,
+            detail={"error": "Batch not found", "message": f"No message batch {batch_id}"}
+        )
+    return batch
+
+
+@router.post("")
+async def create_batch(
+    request: MessageBatchCreateRequest,
+    raw_request: Request,
+    x_api_key: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None)
+) -> Dict[str, Any]:
+    """Queue a batch of message requests; poll it and fetch results when it has ended."""
+    api_key = x_api_key
+    if not api_key and authorization:
+        api_key = authorization[7:] if authorization.startswith("Bearer ") else authorization
+    batch = await message_batch_service.create(request.requests, api_key=api_key, client=_client(raw_request))
+    return batch.to_api()
+
+
+@router.get("")
+async def list_batches(raw_request: Request, limit: int = Query(20, ge=1, le=1000)) -> Dict[str, Any]:
+    """List the caller's message batches, most recent first."""
+    batches = [batch.to_api() for batch in await message_batch_service.list_batches(limit, client=_client(raw_request))]
+    return {
+        "data": batches,
+        "has_more": False,
+        "first_id": batches[0]["id"] if batches else None,
+        "last_id": batches[-1]["id"] if batches else None
+    }
+
+
+@router.get("/{batch_id}")
+async def get_batch(batch_id: str, raw_request: Request) -> Dict[str, Any]:
+    """Get a message batch's status and request counts."""
+    return (await _get_batch(batch_id, raw_request)).to_api()
+
+
+@router.post("/{batch_id}/cancel")
+async def cancel_batch(batch_id: str, raw_request: Request) -> Dict[str, Any]:
+    """Cancel a batch: items not yet started are reported as canceled."""
+    await _get_batch(batch_id, raw_request)
+    return (await message_batch_service.cancel(batch_id)).to_api()
+
+
+@router.get("/{batch_id}/results")
+async def get_batch_results(batch_id: str, raw_request: Request) -> FileResponse:
+    """Stream an ended batch's results as JSONL, one line per request."""
+    batch = await _get_batch(batch_id, raw_request)
+    if batch.processing_status != "ended":
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "Batch still processing", "message": f"Message batch {batch_id} has not ended yet"}
+        )
+    return FileResponse(message_batch_service.results_path(batch_id), media_type="application/x-jsonl")
+
+
+@router.delete("/{batch_id}")
+async def delete_batch(batch_id: str, raw_request: Request) -> Dict[str, Any]:
+    """Delete an ended batch and its results."""
+    await _get_batch(batch_id, raw_request)
+    await message_batch_service.delete(batch_id)
+    logger.info("🗑️ Message batch deleted", batch_id=batch_id)
+    return {"id": batch_id, "type": "message_batch_deleted"}
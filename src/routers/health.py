@@ -3,7 +3,7 @@ Health router for OpenRouter Anthropic Server.
 Handles health check and status endpoints.
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from typing import Dict, Any
 import time
 from datetime import datetime
@@ -15,6 +15,27 @@ logger = get_logger(__name__)
 from src.services.validation import MessageValidationService
 from src.services.conversion import ModelMappingService
 from src.services.tool_execution import ToolExecutionService
+from src.services import (
+    adaptive_timeout_service,
+    context_window_service,
+    disconnect_monitor_service,
+    get_tool_output_store,
+    load_shedding_service,
+    message_batch_service,
+    model_tiering_service,
+    optimistic_dispatch_service,
+    parameter_compatibility_service,
+    passthrough_service,
+    provider_affinity_service,
+    rate_limiter_service,
+    request_lane_service,
+    retry_policy_service,
+    similarity_cache_service,
+    stream_stall_service,
+    tool_result_compaction_service,
+    upstream_pacing_service,
+    usage_ledger_service
+)
 
 router = APIRouter(tags=["health"])
 
@@ -108,7 +129,26 @@ async def detailed_health_check() -> Dict[str, Any]:
             "configuration": config_status,
             "dependencies": {
                 "litellm": litellm_status
-            }
+            },
+            "context_preflight": context_window_service.get_stats(),
+            "tool_result_compaction": tool_result_compaction_service.get_stats(),
+            "tool_output_store": get_tool_output_store().get_stats(),
+            "passthrough": passthrough_service.get_stats(),
+            "client_disconnects": disconnect_monitor_service.get_stats(),
+            "request_lanes": request_lane_service.get_stats(),
+            "rate_limits": rate_limiter_service.get_stats(),
+            "usage_ledger": usage_ledger_service.get_stats(),
+            "message_batches": message_batch_service.get_stats(),
+            "similarity_cache": similarity_cache_service.get_stats(),
+            "upstream_pacing": upstream_pacing_service.get_stats(),
+            "adaptive_timeouts": adaptive_timeout_service.get_stats(),
+            "stream_stalls": stream_stall_service.get_stats(),
+            "upstream_retries": retry_policy_service.get_stats(),
+            "parameter_compatibility": parameter_compatibility_service.get_stats(),
+            "provider_affinity": provider_affinity_service.get_stats(),
+            "model_tiering": model_tiering_service.get_stats(),
+            "load_shedding": load_shedding_service.get_stats(),
+            "optimistic_dispatch": optimistic_dispatch_service.get_stats()
         }
         
     except Exception as e:
@@ -134,6 +174,7 @@ async def root() -> Dict[str, Any]:
             "endpoints": {
                 "messages": "/v1/messages",
                 "count_tokens": "/v1/messages/count_tokens",
+                "count_tokens_batch": "/v1/messages/count_tokens/batch",
                 "health": "/health",
                 "detailed_health": "/health/detailed",
                 "docs": "/docs"
@@ -207,6 +248,56 @@ async def status() -> Dict[str, Any]:
         )
 
 
+@router.get("/timeouts")
+async def get_timeouts(
+    prompt_tokens: int = Query(1000, ge=0, description="Prompt size to plan deadlines for"),
+    max_tokens: int = Query(1024, ge=1, description="max_tokens to plan deadlines for")
+) -> Dict[str, Any]:
+    """
+    Get the upstream deadlines learned per model.
+
+    Returns connect, first-byte, inter-chunk and total (non-streaming)
+    timeouts in seconds for a request of the given size, with the samples
+    and timeouts observed for each model.
+    """
+    return {
+        "enabled": adaptive_timeout_service.enabled,
+        "timestamp": datetime.utcnow().isoformat(),
+        **adaptive_timeout_service.get_timeouts(prompt_tokens=prompt_tokens, max_tokens=max_tokens)
+    }
+
+
+@router.get("/sessions")
+async def get_sessions(
+    limit: int = Query(50, ge=1, le=1000, description="Most recently active sessions to list")
+) -> Dict[str, Any]:
+    """
+    Get conversation sessions with their pinned provider and cache usage.
+
+    Each session lists its turns, prompt and cache-read tokens and cache hit
+    ratio; the totals compare pinned with unpinned turns.
+    """
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        **provider_affinity_service.get_stats(),
+        "recent_sessions": provider_affinity_service.get_sessions(limit)
+    }
+
+
+@router.get("/tiers")
+async def get_tiers() -> Dict[str, Any]:
+    """
+    Get latency, token and cost reports per model tier.
+
+    In shadow mode, big-tier requests the classifier would have sent to the
+    cheap tier are reported as big_would_tier.
+    """
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        **model_tiering_service.get_tiers()
+    }
+
+
 @router.get("/tool-metrics")
 async def get_tool_metrics() -> Dict[str, Any]:
     """
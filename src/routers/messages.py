@@ -7,7 +7,7 @@ replacing the monolithic 390+ line functions with simple orchestrator calls.
 """
 
 from fastapi import APIRouter, Request, HTTPException, Depends, Header
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.responses import Response, StreamingResponse, JSONResponse
 from typing import Dict, Any, Optional
 import json
 import uuid
@@ -26,8 +26,11 @@ from src.orchestrators.conversation_orchestrator import (
     process_message_stream_orchestrated
 )
 from src.services.context_manager import ContextManager
+from src.services import disconnect_monitor_service
+from src.services.disconnect_monitor import CLIENT_CLOSED_REQUEST
 from src.core.logging_config import get_logger
 from src.utils.config import config
+from src.utils.errors import ClientDisconnectedError
 
 # Create router instance
 router = APIRouter(prefix="/v1", tags=["messages"])
@@ -137,6 +140,7 @@ async def convert_response_to_anthropic(litellm_response: Any, original_request:
 @router.post("/messages")
 async def create_message(
     request: MessagesRequest,
+    raw_request: Request,
     x_api_key: Optional[str] = Header(None),
     authorization: Optional[str] = Header(None),
     x_correlation_id: Optional[str] = Header(None)
@@ -146,13 +150,21 @@ async def create_message(
     
     Now using workflow orchestration to replace the monolithic function.
     This provides clean, maintainable, and testable message processing.
+    The workflow is cancelled if the client disconnects before it completes.
     """
-    return await process_message_request_orchestrated(
-        request=request,
-        x_api_key=x_api_key,
-        authorization=authorization,
-        x_correlation_id=x_correlation_id
-    )
+    try:
+        return await disconnect_monitor_service.run(
+            raw_request,
+            process_message_request_orchestrated(
+                request=request,
+                x_api_key=x_api_key,
+                authorization=authorization,
+                x_correlation_id=x_correlation_id
+            ),
+            request_id=x_correlation_id or "unknown"
+        )
+    except ClientDisconnectedError:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
 
 
 @router.post("/messages/stream")
@@ -171,9 +183,16 @@ async def create_message_stream(
     authorization = raw_request.headers.get("authorization")
     x_correlation_id = raw_request.headers.get("x-correlation-id")
     
-    return await process_message_stream_orchestrated(
-        request=request,
-        x_api_key=x_api_key,
-        authorization=authorization,
-        x_correlation_id=x_correlation_id
-    )
\ No newline at end of file
+    try:
+        return await disconnect_monitor_service.run(
+            raw_request,
+            process_message_stream_orchestrated(
+                request=request,
+                x_api_key=x_api_key,
+                authorization=authorization,
+                x_correlation_id=x_correlation_id
+            ),
+            request_id=x_correlation_id or "unknown"
+        )
+    except ClientDisconnectedError:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
\ No newline at end of file
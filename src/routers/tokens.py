@@ -1,15 +1,24 @@
 """
 Tokens router for OpenRouter Anthropic Server.
-Handles /v1/messages/count_tokens endpoint with enhanced validation.
+Handles /v1/messages/count_tokens and /v1/messages/count_tokens/batch endpoints
+with enhanced validation.
 """
 
 from fastapi import APIRouter, HTTPException, Depends
 from typing import Dict, Any
-import json
+import time
 
-from src.models.anthropic import TokenCountRequest, TokenCountResponse
+from src.models.anthropic import (
+    Message,
+    TokenCountRequest,
+    TokenCountResponse,
+    TokenCountBatchRequest,
+    TokenCountBatchResult,
+    TokenCountBatchResponse
+)
 from src.services.validation import MessageValidationService
 from src.services.conversion import ModelMappingService
+from src.services import token_counting_service
 from src.core.logging_config import get_logger
 from src.utils.errors import OpenRouterProxyError
 
@@ -23,42 +32,27 @@ message_validator = MessageValidationService()
 model_mapper = ModelMappingService()
 
 
-async def validate_token_request(request: TokenCountRequest) -> TokenCountRequest:
-    """Validate token counting request."""
-    try:
-        # Validate individual messages
-        for message in request.messages:
-            validation_result = message_validator.validate(message)
-            if not validation_result.is_valid:
-                raise HTTPException(
-                    status_code=400,
-                    detail={
-                        "error": "Invalid message format",
-                        "errors": validation_result.errors,
-                        "warnings": validation_result.warnings
-                    }
-                )
-        
-        logger.info("✅ Token request validation passed",
-                   message_count=len(request.messages))
-        return request
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error("❌ Token request validation failed",
-                    error_type=type(e).__name__,
-                    error_message=str(e))
+async def validate_token_message(message: Message) -> None:
+    """Validate a single message that is not yet in the token count cache."""
+    validation_result = await message_validator.avalidate(message)
+    if not validation_result.is_valid:
         raise HTTPException(
-            status_code=500,
-            detail={"error": "Token request validation failed", "message": str(e)}
+            status_code=400,
+            detail={
+                "error": "Invalid message format",
+                "errors": validation_result.errors,
+                "warnings": validation_result.warnings
+            }
         )
 
 
-async def count_tokens_with_litellm(request: TokenCountRequest) -> int:
-    """Count tokens using LiteLLM's token counting functionality."""
-    import litellm
+async def count_request_tokens(request: TokenCountRequest) -> int:
+    """
+    Count a request's input tokens with the token counting service's offline tokenizer engine.
     
+    Messages are validated and tokenized once per (model family, fingerprint);
+    repeated calls over a growing history only process the new messages.
+    """
     try:
         # Map model if needed
         mapping_result = model_mapper.map_model(request.model)
@@ -68,44 +62,20 @@ async def count_tokens_with_litellm(request: TokenCountRequest) -> int:
                    model=model_to_use,
                    original_model=request.model)
         
-        # Convert messages to LiteLLM format for token counting
-        litellm_messages = []
-        for message in request.messages:
-            if isinstance(message.content, str):
-                litellm_messages.append({
-                    "role": message.role,
-                    "content": message.content
-                })
-            elif isinstance(message.content, list):
-                # Handle complex content blocks
-                content_text = ""
-                for block in message.content:
-                    if isinstance(block, dict):
-                        if block.get("type") == "text":
-                            content_text += block.get("text", "")
-                        elif block.get("type") == "tool_use":
-                            # Include tool use in token count
-                            content_text += f"Tool: {block.get('name', '')} {json.dumps(block.get('input', {}))}"
-                        elif block.get("type") == "tool_result":
-                            # Include tool result in token count
-                            content_text += f"Result: {block.get('content', '')}"
-                
-                litellm_messages.append({
-                    "role": message.role,
-                    "content": content_text
-                })
-        
-        # Count tokens using LiteLLM
-        token_count = litellm.token_counter(
+        token_count = await token_counting_service.count_request_tokens(
+            request,
             model=model_to_use,
-            messages=litellm_messages
+            validate_message=validate_token_message
         )
         
         logger.info("✅ Token count completed",
                    token_count=token_count,
-                   model=model_to_use)
+                   model=model_to_use,
+                   cache_stats=token_counting_service.cache.get_stats())
         return token_count
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("❌ Token counting failed",
                     error_type=type(e).__name__,
@@ -122,24 +92,20 @@ async def count_tokens(request: TokenCountRequest) -> TokenCountResponse:
     Count tokens in a set of messages.
     
     This endpoint:
-    1. Validates the incoming messages
-    2. Maps model names if needed
-    3. Converts messages to appropriate format for token counting
-    4. Uses LiteLLM to count tokens
-    5. Returns the token count in Anthropic format
+    1. Maps model names if needed
+    2. Looks up per-message counts in the token count cache
+    3. Validates and tokenizes only uncached messages with the tokenizer engine
+    4. Returns the token count in Anthropic format
     """
     try:
         logger.info("🔢 Received token count request",
                    model=request.model,
                    message_count=len(request.messages))
         
-        # Step 1: Validate request
-        validated_request = await validate_token_request(request)
+        # Step 1: Validate and count tokens (cached messages are skipped)
+        token_count = await count_request_tokens(request)
         
-        # Step 2: Count tokens
-        token_count = await count_tokens_with_litellm(validated_request)
-        
-        # Step 3: Create response
+        # Step 2: Create response
         response = TokenCountResponse(input_tokens=token_count)
         
         logger.info("✅ Token counting completed successfully",
@@ -156,4 +122,62 @@ async def count_tokens(request: TokenCountRequest) -> TokenCountResponse:
         raise HTTPException(
             status_code=500,
             detail={"error": "Token counting failed", "message": str(e)}
-        )
\ No newline at end of file
+        )
+
+
+@router.post("/count_tokens/batch", response_model_exclude_none=True)
+async def count_tokens_batch(batch: TokenCountBatchRequest) -> TokenCountBatchResponse:
+    """
+    Count tokens for many requests in one call.
+    
+    Requests are counted in order against the shared per-message cache, so
+    messages common to several requests (a shared conversation prefix, system
+    prompt or tool list) are validated and tokenized once. A request that
+    fails validation gets an error result without failing the batch.
+    """
+    if len(batch.requests) > config.token_count_batch_max_requests:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error": "Batch too large",
+                "message": f"At most {config.token_count_batch_max_requests} requests per batch"
+            }
+        )
+    
+    start_time = time.perf_counter()
+    logger.info("🔢 Received batch token count request",
+               request_count=len(batch.requests))
+    
+    mapped_models: Dict[str, str] = {}
+    results = []
+    for index, request in enumerate(batch.requests):
+        try:
+            if request.model not in mapped_models:
+                mapped_models[request.model] = model_mapper.map_model(request.model).mapped_model
+            token_count = await token_counting_service.count_request_tokens(
+                request,
+                model=mapped_models[request.model],
+                validate_message=validate_token_message
+            )
+            results.append(TokenCountBatchResult(index=index, input_tokens=token_count))
+        except HTTPException as e:
+            results.append(TokenCountBatchResult(
+                index=index,
+                error={"type": "invalid_request_error", "message": str(e.detail)}
+            ))
+        except Exception as e:
+            logger.error("❌ Batch token count item failed",
+                        index=index,
+                        error_type=type(e).__name__,
+                        error_message=str(e))
+            results.append(TokenCountBatchResult(
+                index=index,
+                error={"type": "api_error", "message": str(e)}
+            ))
+    
+    logger.info("✅ Batch token counting completed",
+               request_count=len(batch.requests),
+               failed=sum(1 for r in results if r.error is not None),
+               duration_ms=round((time.perf_counter() - start_time) * 1000, 2),
+               cache_stats=token_counting_service.cache.get_stats())
+    return TokenCountBatchResponse(results=results)
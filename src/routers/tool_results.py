@@ -0,0 +1,32 @@
+"""
+Tool results router for OpenRouter Anthropic Server.
+Serves original tool result content that was replaced by a compaction digest.
+"""
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from src.core.logging_config import get_logger
+from src.services import tool_result_compaction_service
+
+logger = get_logger(__name__)
+
+router = APIRouter(prefix="/v1/tool_results", tags=["tool_results"])
+
+
+@router.get("/{digest}", response_class=PlainTextResponse)
+async def get_tool_result(digest: str) -> PlainTextResponse:
+    """
+    Retrieve original tool result content by its sha256 digest.
+    
+    Digests appear in compacted tool results as
+    "[full content: GET /v1/tool_results/<digest>]".
+    """
+    content = tool_result_compaction_service.store.get(digest)
+    if content is None:
+        logger.warning("🔍 Tool result not found", digest=digest)
+        raise HTTPException(
+            status_code=404,
+            detail={"error": "Tool result not found", "message": f"No stored tool result for {digest}"}
+        )
+    return PlainTextResponse(content)
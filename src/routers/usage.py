@@ -0,0 +1,48 @@
+"""
+Usage router for OpenRouter Anthropic Server.
+Serves token usage rollups from the usage ledger.
+"""
+
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from src.core.logging_config import get_logger
+from src.services import usage_ledger_service
+
+logger = get_logger(__name__)
+
+router = APIRouter(prefix="/v1", tags=["usage"])
+
+
+@router.get("/usage")
+async def get_usage(
+    group_by: str = Query("model", description="Comma-separated: hour, day, model, requested_model, client, source"),
+    start: Optional[str] = Query(None, description="Inclusive start (epoch seconds or ISO 8601)"),
+    end: Optional[str] = Query(None, description="Exclusive end (epoch seconds or ISO 8601)"),
+    model: Optional[str] = Query(None, description="Only this upstream model"),
+    client: Optional[str] = Query(None, description="Only this client (key:<hash>, ip:<address> or anonymous)")
+) -> Dict[str, Any]:
+    """
+    Sum requests and tokens from the usage ledger, rolled up by hour.
+
+    Example: GET /v1/usage?group_by=model,hour&start=2025-06-01T00:00:00Z
+    """
+    if not usage_ledger_service.enabled:
+        raise HTTPException(
+            status_code=404,
+            detail={"error": "Usage ledger disabled", "message": "Set USAGE_LEDGER_ENABLED=true to record usage"}
+        )
+
+    columns = [column.strip() for column in group_by.split(",") if column.strip()]
+    try:
+        rows = await usage_ledger_service.query(
+            group_by=columns, start=start, end=end, model=model, client=client
+        )
+    except ValueError as e:
+        logger.warning("🔍 Invalid usage query", error=str(e))
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "Invalid usage query", "message": str(e)}
+        )
+    return {"group_by": columns, "data": rows}
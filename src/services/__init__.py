@@ -20,6 +20,35 @@ from .conversion import (
     StructuredOutputService
 )
 from .http_client import HTTPClientService, ProxyConfigurationService
+from .token_counting import TokenCountingService, MessageTokenCache
+from .compaction import ToolResultCompactionService, ToolResultStore, CompactionResult
+from .context_window import ContextWindowService, ModelLimits, PreflightResult
+from .tokenizers import (
+    TokenizerEngine,
+    TiktokenEngine,
+    HuggingFaceTokenizerEngine,
+    ApproximateTokenizerEngine,
+    create_tokenizer_engine,
+    register_tokenizer_engine
+)
+
+from .tool_output_store import ToolOutputStore, get_tool_output_store
+from .passthrough import PassthroughService, PassthroughRoute, PassthroughExchange
+from .disconnect_monitor import DisconnectMonitorService
+from .request_lanes import RequestLaneService, RequestLane, PipelineProfile
+from .rate_limiter import RateLimiterService, RateLimitDecision, TokenBucket
+from .usage_ledger import UsageLedgerService, UsageRecord
+from .message_batches import MessageBatchService, MessageBatch
+from .similarity_cache import SimilarityCacheService
+from .upstream_pacing import UpstreamPacingService, UpstreamBudget, PacingTicket
+from .adaptive_timeouts import AdaptiveTimeoutService, TimeoutPlan
+from .stream_stalls import StreamStallService
+from .retry_policy import RetryPolicyService
+from .parameter_compatibility import ModelCapabilities, ParameterCompatibilityService
+from .provider_affinity import ProviderAffinityService
+from .model_tiering import ModelTieringService, TierDecision
+from .load_shedding import LoadSheddingService
+from .optimistic_dispatch import OptimisticDispatchService
 
 # Service instances for global use
 message_validator = MessageValidationService()
@@ -33,6 +62,26 @@ model_mapper = ModelMappingService()
 structured_output_service = StructuredOutputService()
 http_client_service = HTTPClientService()
 proxy_configuration_service = ProxyConfigurationService()
+token_counting_service = TokenCountingService()
+context_window_service = ContextWindowService(token_counter=token_counting_service)
+tool_result_compaction_service = ToolResultCompactionService(engine=token_counting_service.engine)
+passthrough_service = PassthroughService()
+disconnect_monitor_service = DisconnectMonitorService()
+request_lane_service = RequestLaneService()
+rate_limiter_service = RateLimiterService()
+usage_ledger_service = UsageLedgerService()
+passthrough_service.add_hook(usage_ledger_service.record_passthrough)
+message_batch_service = MessageBatchService()
+similarity_cache_service = SimilarityCacheService()
+upstream_pacing_service = UpstreamPacingService()
+adaptive_timeout_service = AdaptiveTimeoutService()
+stream_stall_service = StreamStallService()
+retry_policy_service = RetryPolicyService()
+parameter_compatibility_service = ParameterCompatibilityService()
+provider_affinity_service = ProviderAffinityService()
+model_tiering_service = ModelTieringService()
+load_shedding_service = LoadSheddingService()
+optimistic_dispatch_service = OptimisticDispatchService()
 
 __all__ = [
     # Base classes
@@ -57,6 +106,91 @@ __all__ = [
     "HTTPClientService",
     "ProxyConfigurationService",
     
+    # Token counting services
+    "TokenCountingService",
+    "MessageTokenCache",
+    "TokenizerEngine",
+    "TiktokenEngine",
+    "HuggingFaceTokenizerEngine",
+    "ApproximateTokenizerEngine",
+    "create_tokenizer_engine",
+    "register_tokenizer_engine",
+    
+    # Tool result compaction services
+    "ToolResultCompactionService",
+    "ToolResultStore",
+    "CompactionResult",
+    
+    # Native passthrough services
+    "PassthroughService",
+    "PassthroughRoute",
+    "PassthroughExchange",
+    
+    # Client disconnect detection
+    "DisconnectMonitorService",
+    
+    # Priority lanes
+    "RequestLaneService",
+    "RequestLane",
+    "PipelineProfile",
+    
+    # Per-client rate limiting
+    "RateLimiterService",
+    "RateLimitDecision",
+    "TokenBucket",
+    
+    # Usage accounting
+    "UsageLedgerService",
+    "UsageRecord",
+    
+    # Message Batches API emulation
+    "MessageBatchService",
+    "MessageBatch",
+    
+    # Near-duplicate response cache
+    "SimilarityCacheService",
+    
+    # Upstream rate-limit pacing
+    "UpstreamPacingService",
+    "UpstreamBudget",
+    "PacingTicket",
+    
+    # Adaptive per-model upstream timeouts
+    "AdaptiveTimeoutService",
+    "TimeoutPlan",
+    
+    # Upstream stream stall detection
+    "StreamStallService",
+    
+    # Upstream retry policy
+    "RetryPolicyService",
+    
+    # Per-model parameter compatibility
+    "ParameterCompatibilityService",
+    "ModelCapabilities",
+    
+    # Conversation-affinity provider routing
+    "ProviderAffinityService",
+    
+    # Complexity-based model tiering
+    "ModelTieringService",
+    "TierDecision",
+    
+    # Load-shedding model downgrade
+    "LoadSheddingService",
+    
+    # Optimistic upstream dispatch
+    "OptimisticDispatchService",
+    
+    # Tool output spill-to-disk store
+    "ToolOutputStore",
+    "get_tool_output_store",
+    
+    # Context window services
+    "ContextWindowService",
+    "ModelLimits",
+    "PreflightResult",
+    
     # Service instances
     "message_validator",
     "tool_validator",
@@ -68,4 +202,23 @@ __all__ = [
     "structured_output_service",
     "http_client_service",
     "proxy_configuration_service",
+    "token_counting_service",
+    "context_window_service",
+    "tool_result_compaction_service",
+    "passthrough_service",
+    "disconnect_monitor_service",
+    "request_lane_service",
+    "rate_limiter_service",
+    "usage_ledger_service",
+    "message_batch_service",
+    "similarity_cache_service",
+    "upstream_pacing_service",
+    "adaptive_timeout_service",
+    "stream_stall_service",
+    "retry_policy_service",
+    "parameter_compatibility_service",
+    "provider_affinity_service",
+    "model_tiering_service",
+    "load_shedding_service",
+    "optimistic_dispatch_service",
 ]
\ No newline at end of file
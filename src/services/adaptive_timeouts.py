@@ -0,0 +1,320 @@
+"""
+Adaptive per-model upstream timeouts for OpenRouter Anthropic Server.
+
+One REQUEST_TIMEOUT for every model and request size either cuts off large
+generations or leaves a stuck small call hanging for minutes. This service
+keeps latency histograms per upstream model and derives each call's
+deadlines from them:
+
+- connect: ADAPTIVE_TIMEOUT_CONNECT (connection setup does not depend on the model),
+- first byte: the model's time-to-first-byte quantile, scaled by prompt size,
+- inter-chunk: the model's per-output-token quantile,
+- total (non-streaming): first byte plus max_tokens at the per-token quantile.
+
+Each quantile is multiplied by ADAPTIVE_TIMEOUT_MULTIPLIER and clamped
+between ADAPTIVE_TIMEOUT_FLOOR and REQUEST_TIMEOUT. A model keeps the
+static REQUEST_TIMEOUT until it has ADAPTIVE_TIMEOUT_MIN_SAMPLES
+observations. A call that times out is recorded as if it had used its
+whole deadline, so a model that slows down raises its own deadlines.
+"""
+
+import asyncio
+import bisect
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Dict, List, Optional
+
+import httpx
+import litellm
+
+from src.utils.config import config
+from .base import BaseService
+from .rate_limiter import BYTES_PER_TOKEN
+
+# Log-spaced bucket upper bounds from 1 ms to about 20 minutes
+HISTOGRAM_BOUNDS = tuple(0.001 * 1.25 ** i for i in range(64))
+# Halve all counts once a histogram holds this many samples, so recent traffic dominates
+HISTOGRAM_DECAY_AFTER = 2000
+# Prompt tokens that add roughly one unloaded time-to-first-byte of prefill
+PROMPT_SCALE_TOKENS = 8000
+# Completions this short are dominated by time-to-first-byte
+SHORT_COMPLETION_TOKENS = 16
+
+
+class LatencyHistogram:
+    """Decaying histogram of durations over HISTOGRAM_BOUNDS."""
+
+    __slots__ = ("counts", "total")
+
+    def __init__(self):
+        self.counts: List[float] = [0.0] * len(HISTOGRAM_BOUNDS)
+        self.total = 0.0
+
+    def observe(self, seconds: float) -> None:
+        index = min(bisect.bisect_left(HISTOGRAM_BOUNDS, seconds), len(HISTOGRAM_BOUNDS) - 1)
+        self.counts[index] += 1
+        self.total += 1
+        if self.total >= HISTOGRAM_DECAY_AFTER:
+            self.counts = [count / 2 for count in self.counts]
+            self.total /= 2
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile, or None when empty."""
+        if not self.total:
+            return None
+        target = q * self.total
+        cumulative = 0.0
+        for bound, count in zip(HISTOGRAM_BOUNDS, self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return HISTOGRAM_BOUNDS[-1]
+
+
+class ModelLatency:
+    """Latency histograms for one upstream model."""
+
+    __slots__ = ("first_byte", "per_token", "samples", "timeouts")
+
+    def __init__(self):
+        self.first_byte = LatencyHistogram()  # seconds per prompt scale unit
+        self.per_token = LatencyHistogram()   # seconds per output token
+        self.samples = 0
+        self.timeouts = 0
+
+
+@dataclass
+class TimeoutPlan:
+    """Deadlines for one upstream call."""
+    model: str
+    streaming: bool
+    prompt_tokens: int
+    max_tokens: int
+    connect: float
+    first_byte: float
+    inter_chunk: float
+    total: float
+    adaptive: bool
+
+    def httpx_timeout(self) -> httpx.Timeout:
+        """Timeout for LiteLLM: reads wait for the first byte, then for each chunk."""
+        read = max(self.first_byte, self.inter_chunk) if self.streaming else self.total
+        return httpx.Timeout(read, connect=self.connect)
+
+
+def estimate_prompt_tokens(request_data: Dict[str, Any]) -> int:
+    """Rough prompt tokens of a LiteLLM request from its message sizes."""
+    prompt_bytes = 0
+    for message in request_data.get("messages", []):
+        content = message.get("content", "") if isinstance(message, dict) else ""
+        prompt_bytes += len(content) if isinstance(content, str) else len(json.dumps(content, default=str))
+    return prompt_bytes // BYTES_PER_TOKEN
+
+
+class AdaptiveTimeoutService(BaseService):
+    """Service that learns per-model latency and plans upstream deadlines from it."""
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        quantile: Optional[float] = None,
+        multiplier: Optional[float] = None,
+        min_samples: Optional[int] = None,
+        connect_timeout: Optional[float] = None,
+        floor: Optional[float] = None,
+        ceiling: Optional[float] = None,
+        max_models: int = 500
+    ):
+        """Initialize adaptive timeouts from config unless overridden."""
+        super().__init__("AdaptiveTimeouts")
+        self.enabled = config.adaptive_timeouts_enabled if enabled is None else enabled
+        self.quantile = config.adaptive_timeout_quantile if quantile is None else quantile
+        self.multiplier = config.adaptive_timeout_multiplier if multiplier is None else multiplier
+        self.min_samples = config.adaptive_timeout_min_samples if min_samples is None else min_samples
+        self.connect_timeout = config.adaptive_timeout_connect if connect_timeout is None else connect_timeout
+        self.floor = config.adaptive_timeout_floor if floor is None else floor
+        self.ceiling = float(config.request_timeout if ceiling is None else ceiling)
+        self.max_models = max_models
+        self._models: "OrderedDict[str, ModelLatency]" = OrderedDict()
+        self.stats: Dict[str, int] = {
+            "planned_calls": 0,
+            "adaptive_calls": 0,
+            "timeouts": 0
+        }
+
+    def plan(self, request_data: Dict[str, Any]) -> Optional[TimeoutPlan]:
+        """
+        Work out the deadlines for a LiteLLM request.
+
+        Returns:
+            TimeoutPlan, or None when adaptive timeouts are disabled
+        """
+        if not self.enabled:
+            return None
+        self.stats["planned_calls"] += 1
+        plan = self._plan_for(
+            request_data.get("model", "unknown"),
+            estimate_prompt_tokens(request_data),
+            int(request_data.get("max_tokens") or 0),
+            bool(request_data.get("stream"))
+        )
+        if plan.adaptive:
+            self.stats["adaptive_calls"] += 1
+        return plan
+
+    async def run(self, plan: Optional[TimeoutPlan], call: Awaitable[Any]) -> Any:
+        """
+        Await an upstream call under its plan and record how long it took.
+
+        Non-streaming calls are cancelled at the total deadline and raise
+        litellm.Timeout, like a read timeout inside LiteLLM would.
+        """
+        if plan is None:
+            return await call
+
+        start = time.time()
+        try:
+            if plan.streaming:
+                response = await call
+            else:
+                response = await asyncio.wait_for(call, plan.total)
+        except asyncio.TimeoutError:
+            elapsed = self._timed_out(plan, start)
+            raise litellm.Timeout(
+                message=f"Upstream call exceeded its {elapsed:.1f}s deadline for {plan.model}",
+                model=plan.model,
+                llm_provider="openrouter"
+            ) from None
+        except litellm.Timeout:
+            self._timed_out(plan, start)
+            raise
+        self.record(plan, time.time() - start, response)
+        return response
+
+    def _timed_out(self, plan: TimeoutPlan, start: float) -> float:
+        """Record a call that hit its deadline; returns how long it ran."""
+        elapsed = time.time() - start
+        self.record(plan, elapsed, timed_out=True)
+        self.logger.warning("⏱️ Upstream call exceeded its deadline",
+                            model=plan.model, elapsed=round(elapsed, 2),
+                            deadline=round(plan.first_byte if plan.streaming else plan.total, 2))
+        return elapsed
+
+    def record(
+        self,
+        plan: TimeoutPlan,
+        elapsed: float,
+        response: Any = None,
+        timed_out: bool = False,
+        first_byte: Optional[float] = None
+    ) -> None:
+        """
+        Add one call to its model's histograms.
+
+        When the caller timed the first chunk, both histograms get exact
+        samples. Otherwise a streaming call returns once the first chunk
+        arrives, so its whole elapsed time is the first byte, and for a
+        non-streaming call short completions measure first byte and longer
+        ones the per-token rate.
+        """
+        usage = getattr(response, "usage", None)
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        completion_tokens = getattr(usage, "completion_tokens", None)
+        if not isinstance(prompt_tokens, int):
+            prompt_tokens = plan.prompt_tokens
+        if not isinstance(completion_tokens, int) or timed_out:
+            completion_tokens = plan.max_tokens
+
+        latency = self._model(plan.model)
+        latency.samples += 1
+        if timed_out:
+            latency.timeouts += 1
+            self.stats["timeouts"] += 1
+
+        scale = 1 + prompt_tokens / PROMPT_SCALE_TOKENS
+        if first_byte is not None:
+            latency.first_byte.observe(first_byte / scale)
+            if completion_tokens > 0:
+                latency.per_token.observe(max(elapsed - first_byte, 0.0) / completion_tokens)
+        elif plan.streaming or completion_tokens <= SHORT_COMPLETION_TOKENS:
+            latency.first_byte.observe(elapsed / scale)
+        else:
+            first_byte = (latency.first_byte.quantile(0.5) or 0.0) * scale
+            latency.per_token.observe(max(elapsed - first_byte, 0.0) / completion_tokens)
+
+    def get_timeouts(self, prompt_tokens: int = 1000, max_tokens: int = 1024) -> Dict[str, Any]:
+        """Learned deadlines per model for a request of the given size."""
+        models = {}
+        for model, latency in self._models.items():
+            streaming = self._plan_for(model, prompt_tokens, max_tokens, streaming=True)
+            blocking = self._plan_for(model, prompt_tokens, max_tokens, streaming=False)
+            models[model] = {
+                "samples": latency.samples,
+                "timeouts": latency.timeouts,
+                "adaptive": blocking.adaptive,
+                "connect": round(blocking.connect, 3),
+                "first_byte": round(streaming.first_byte, 3),
+                "inter_chunk": round(streaming.inter_chunk, 3),
+                "total": round(blocking.total, 3),
+                "first_byte_p50_per_scale": latency.first_byte.quantile(0.5),
+                "per_token_p50": latency.per_token.quantile(0.5)
+            }
+        return {
+            "prompt_tokens": prompt_tokens,
+            "max_tokens": max_tokens,
+            "default_timeout": self.ceiling,
+            "models": models
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get adaptive timeout counters and settings."""
+        return {
+            "enabled": self.enabled,
+            **self.stats,
+            "models_tracked": len(self._models),
+            "quantile": self.quantile,
+            "multiplier": self.multiplier,
+            "min_samples": self.min_samples
+        }
+
+    def _plan_for(self, model: str, prompt_tokens: int, max_tokens: int, streaming: bool) -> TimeoutPlan:
+        """Deadlines for a model and request size; the static timeout until the model is known."""
+        connect = min(self.connect_timeout, self.ceiling)
+        plan = TimeoutPlan(
+            model=model, streaming=streaming, prompt_tokens=prompt_tokens, max_tokens=max_tokens,
+            connect=connect, first_byte=self.ceiling, inter_chunk=self.ceiling, total=self.ceiling,
+            adaptive=False
+        )
+        latency = self._models.get(model)
+        if latency is None or latency.samples < self.min_samples:
+            return plan
+
+        first_byte = latency.first_byte.quantile(self.quantile)
+        per_token = latency.per_token.quantile(self.quantile)
+        if first_byte is not None:
+            scale = 1 + prompt_tokens / PROMPT_SCALE_TOKENS
+            plan.first_byte = self._clamp(self.multiplier * first_byte * scale)
+            plan.adaptive = True
+        if per_token is not None:
+            plan.inter_chunk = self._clamp(self.multiplier * per_token)
+            plan.adaptive = True
+        if first_byte is not None and per_token is not None:
+            plan.total = self._clamp(plan.first_byte + self.multiplier * per_token * max_tokens)
+        return plan
+
+    def _clamp(self, seconds: float) -> float:
+        return min(max(seconds, self.floor), self.ceiling)
+
+    def _model(self, model: str) -> ModelLatency:
+        """Get or create a model's histograms, evicting the least recently used."""
+        latency = self._models.get(model)
+        if latency is None:
+            latency = ModelLatency()
+            self._models[model] = latency
+            if len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+        else:
+            self._models.move_to_end(model)
+        return latency
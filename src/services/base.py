@@ -99,8 +99,9 @@ class InstructorService(BaseService):
     def __init__(self, name: str):
         """Initialize Instructor service."""
         super().__init__(name)
-        from ..utils.instructor_client import instructor_client
+        from ..utils.instructor_client import instructor_client, async_instructor_client
         self.instructor_client = instructor_client
+        self.async_instructor_client = async_instructor_client
     
     def create_structured_output(
         self,
@@ -137,6 +138,43 @@ class InstructorService(BaseService):
             )
             raise OpenRouterProxyError(f"Structured output creation failed: {e}")
     
+    async def acreate_structured_output(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        response_model: type,
+        timeout: Optional[float] = None,
+        **kwargs
+    ) -> Any:
+        """Create structured output using Instructor without blocking the event loop."""
+        try:
+            result = await self.async_instructor_client.create_structured_completion(
+                model=model,
+                messages=messages,
+                response_model=response_model,
+                timeout=timeout,
+                **kwargs
+            )
+            
+            self.log_operation(
+                "structured_output_async",
+                True,
+                model=model,
+                response_model=response_model.__name__
+            )
+            
+            return result
+            
+        except Exception as e:
+            self.log_operation(
+                "structured_output_async",
+                False,
+                model=model,
+                response_model=response_model.__name__,
+                error=str(e)
+            )
+            raise OpenRouterProxyError(f"Structured output creation failed: {e}")
+    
     def validate_with_instructor(
         self,
         data: Dict[str, Any],
@@ -0,0 +1,238 @@
+"""
+Tool result compaction for OpenRouter Anthropic Server.
+
+Replaces stale or oversized tool_result content in long agentic sessions with
+a compact, deterministic digest before the request is converted and sent
+upstream. Originals are kept in a content-addressed store so they stay
+retrievable via /v1/tool_results/{digest}.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.models.anthropic import ContentBlockToolResult, Message, MessagesRequest
+from src.utils.config import config
+from .base import BaseService
+from .tokenizers import TokenizerEngine, create_tokenizer_engine
+
+DIGEST_HEAD_LINES = 5
+DIGEST_TAIL_LINES = 5
+DIGEST_MAX_LINE_CHARS = 200
+DIGEST_CACHE_SIZE = 10000
+
+
+class ToolResultStore:
+    """Thread-safe, byte-bounded LRU store of original tool result content keyed by sha256."""
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        """Initialize the store with an upper bound on stored bytes."""
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def put(self, content: str) -> str:
+        """Store content and return its sha256 digest."""
+        encoded = content.encode("utf-8")
+        digest = hashlib.sha256(encoded).hexdigest()
+        with self._lock:
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+                return digest
+            if len(encoded) > self.max_bytes:
+                return digest
+            self._entries[digest] = content
+            self._sizes[digest] = len(encoded)
+            self._total_bytes += len(encoded)
+            while self._total_bytes > self.max_bytes:
+                evicted, _ = self._entries.popitem(last=False)
+                self._total_bytes -= self._sizes.pop(evicted)
+        return digest
+
+    def get(self, digest: str) -> Optional[str]:
+        """Return original content for a digest, if still stored."""
+        with self._lock:
+            content = self._entries.get(digest)
+            if content is not None:
+                self._entries.move_to_end(digest)
+            return content
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get store statistics."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes
+            }
+
+
+@dataclass
+class CompactionResult:
+    """Outcome of compacting one request."""
+    request: MessagesRequest
+    compacted_results: int = 0
+    original_tokens: int = 0
+    compacted_tokens: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.original_tokens - self.compacted_tokens
+
+
+def _tool_result_text(content: Any) -> Optional[str]:
+    """Return tool result content as text, or None if it holds non-text blocks (e.g. images)."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, dict):
+        content = [content]
+    if not isinstance(content, list):
+        return None
+    parts = []
+    for block in content:
+        if hasattr(block, "model_dump"):
+            block = block.model_dump()
+        if not isinstance(block, dict) or block.get("type") != "text":
+            return None
+        parts.append(block.get("text", ""))
+    return "\n".join(parts)
+
+
+def build_digest(content: str, digest: str) -> str:
+    """
+    Build a deterministic digest of tool result content.
+
+    The same content always yields the same digest text, so compacted turns
+    stay byte-identical across requests and keep upstream prompt caching intact.
+    """
+    lines = content.splitlines()
+    size = len(content.encode("utf-8"))
+
+    def clip(line: str) -> str:
+        if len(line) <= DIGEST_MAX_LINE_CHARS:
+            return line
+        return line[:DIGEST_MAX_LINE_CHARS] + f"... [{len(line) - DIGEST_MAX_LINE_CHARS} chars]"
+
+    parts = [f"[compacted tool result sha256:{digest[:16]} | {size} bytes, {len(lines)} lines]"]
+    if len(lines) <= DIGEST_HEAD_LINES + DIGEST_TAIL_LINES:
+        parts.extend(clip(line) for line in lines)
+    else:
+        parts.extend(clip(line) for line in lines[:DIGEST_HEAD_LINES])
+        parts.append(f"... [{len(lines) - DIGEST_HEAD_LINES - DIGEST_TAIL_LINES} lines omitted] ...")
+        parts.extend(clip(line) for line in lines[-DIGEST_TAIL_LINES:])
+    parts.append(f"[full content: GET /v1/tool_results/{digest}]")
+    return "\n".join(parts)
+
+
+class ToolResultCompactionService(BaseService):
+    """Service that compacts stale or oversized tool results before dispatch."""
+
+    def __init__(
+        self,
+        store: Optional[ToolResultStore] = None,
+        engine: Optional[TokenizerEngine] = None
+    ):
+        """Initialize tool result compaction service."""
+        super().__init__("ToolResultCompaction")
+        self.store = store or ToolResultStore(max_bytes=config.tool_result_store_max_bytes)
+        self.engine = engine or create_tokenizer_engine(
+            config.tokenizer_engine,
+            vocab_path=config.tokenizer_vocab_path
+        )
+        self.age_turns = config.tool_result_compaction_age_turns
+        self.max_bytes = config.tool_result_compaction_max_bytes
+        self.min_bytes = config.tool_result_compaction_min_bytes
+        self._digests: "OrderedDict[str, Tuple[str, int, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "compacted_requests": 0, "compacted_results": 0, "tokens_saved": 0}
+
+    def _digest(self, text: str) -> Tuple[str, int, int]:
+        """Store a result and render its digest, memoized so later turns skip re-tokenizing."""
+        digest = self.store.put(text)
+        with self._lock:
+            cached = self._digests.get(digest)
+            if cached is not None:
+                self._digests.move_to_end(digest)
+                return cached
+
+        digest_text = build_digest(text, digest)
+        entry = (digest_text, self.engine.count(text), self.engine.count(digest_text))
+        with self._lock:
+            self._digests[digest] = entry
+            while len(self._digests) > DIGEST_CACHE_SIZE:
+                self._digests.popitem(last=False)
+        return entry
+
+    def _should_compact(self, size: int, age: int) -> bool:
+        """Compact results older than age_turns, or oversized ones once they are no longer current."""
+        if age == 0 or size < self.min_bytes:
+            return False
+        return age >= self.age_turns or size >= self.max_bytes
+
+    def compact_request(self, request: MessagesRequest) -> CompactionResult:
+        """
+        Replace stale or oversized tool results with digests.
+
+        Age is counted in user turns after the message holding the result;
+        results in the latest user turn are never compacted.
+
+        Args:
+            request: Validated messages request
+
+        Returns:
+            CompactionResult with the compacted request and token savings
+        """
+        user_turns_after: List[int] = []
+        remaining = 0
+        for message in reversed(request.messages):
+            user_turns_after.append(remaining)
+            if message.role == "user":
+                remaining += 1
+        user_turns_after.reverse()
+
+        result = CompactionResult(request=request)
+        messages: List[Message] = []
+        for message, age in zip(request.messages, user_turns_after):
+            if message.role != "user" or isinstance(message.content, str):
+                messages.append(message)
+                continue
+
+            blocks = []
+            changed = False
+            for block in message.content:
+                text = _tool_result_text(block.content) if isinstance(block, ContentBlockToolResult) else None
+                if text is None or not self._should_compact(len(text.encode("utf-8")), age):
+                    blocks.append(block)
+                    continue
+
+                digest_text, original_tokens, digest_tokens = self._digest(text)
+                blocks.append(block.model_copy(update={"content": digest_text}))
+                result.compacted_results += 1
+                result.original_tokens += original_tokens
+                result.compacted_tokens += digest_tokens
+                changed = True
+
+            messages.append(message.model_copy(update={"content": blocks}) if changed else message)
+
+        if result.compacted_results:
+            result.request = request.model_copy(update={"messages": messages})
+
+        with self._lock:
+            self.stats["requests"] += 1
+            if result.compacted_results:
+                self.stats["compacted_requests"] += 1
+                self.stats["compacted_results"] += result.compacted_results
+                self.stats["tokens_saved"] += result.tokens_saved
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get compaction statistics."""
+        with self._lock:
+            return {**self.stats, "store": self.store.get_stats()}
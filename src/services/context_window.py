@@ -0,0 +1,204 @@
+"""
+Context window pre-flight checks for OpenRouter Anthropic Server.
+
+Estimates input tokens before a request is converted and sent upstream, and
+rejects (or optionally trims) requests that cannot fit the target model's
+context window, so oversized requests fail fast instead of after a full
+provider round-trip.
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from src.models.anthropic import Message, MessagesRequest
+from src.utils.config import config
+from .base import BaseService
+from .token_counting import TokenCountingService, get_model_family
+
+# Smallest output budget left after lowering max_tokens in trim mode
+MIN_TRIMMED_OUTPUT_TOKENS = 1024
+
+
+@dataclass(frozen=True)
+class ModelLimits:
+    """Context window and output limits for a model family."""
+    context_window: int
+    max_output_tokens: int
+
+
+# Known limits by model family (see get_model_family); variants match by longest prefix
+MODEL_LIMITS: Dict[str, ModelLimits] = {
+    "anthropic/claude-opus-4": ModelLimits(200000, 32000),
+    "anthropic/claude-sonnet-4": ModelLimits(200000, 64000),
+    "anthropic/claude-3.7-sonnet": ModelLimits(200000, 64000),
+    "anthropic/claude-3.5-sonnet": ModelLimits(200000, 8192),
+    "anthropic/claude-3.5-haiku": ModelLimits(200000, 8192),
+    "anthropic/claude-3-opus": ModelLimits(200000, 4096),
+    "anthropic/claude-3-haiku": ModelLimits(200000, 4096),
+    "openai/gpt-4o": ModelLimits(128000, 16384),
+    "openai/gpt-4.1": ModelLimits(1047576, 32768),
+    "google/gemini-2.5-pro": ModelLimits(1048576, 65536),
+    "google/gemini-2.5-flash": ModelLimits(1048576, 65536),
+}
+
+
+@dataclass
+class PreflightResult:
+    """Outcome of a pre-flight context window check."""
+    request: MessagesRequest
+    fits: bool
+    input_tokens: Optional[int] = None
+    limits: Optional[ModelLimits] = None
+    trimmed_messages: int = 0
+    error_message: Optional[str] = None
+
+
+class ContextWindowService(BaseService):
+    """Service that checks requests against per-model context limits before dispatch."""
+
+    def __init__(self, token_counter: Optional[TokenCountingService] = None):
+        """Initialize context window service."""
+        super().__init__("ContextWindow")
+        self.token_counter = token_counter or TokenCountingService()
+        self.model_limits: Dict[str, ModelLimits] = dict(MODEL_LIMITS)
+        for family, limits in config.model_context_limits.items():
+            self.model_limits[family] = ModelLimits(
+                context_window=int(limits["context_window"]),
+                max_output_tokens=int(limits["max_output_tokens"])
+            )
+        self._lock = threading.Lock()
+        self.stats = {"checks": 0, "passed": 0, "rejected": 0, "trimmed": 0, "unknown_model": 0}
+
+    def get_limits(self, model: str) -> Optional[ModelLimits]:
+        """Look up limits for a model by its family, falling back to the longest known prefix."""
+        family = get_model_family(model).split(":", 1)[0]
+        if family in self.model_limits:
+            return self.model_limits[family]
+        matches = [known for known in self.model_limits if family.startswith(known)]
+        if not matches:
+            return None
+        return self.model_limits[max(matches, key=len)]
+
+    def _record(self, outcome: str) -> None:
+        with self._lock:
+            self.stats["checks"] += 1
+            self.stats[outcome] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pre-flight statistics, including upstream calls avoided by fast rejection."""
+        with self._lock:
+            return {**self.stats, "upstream_calls_avoided": self.stats["rejected"]}
+
+    @staticmethod
+    def _is_clean_user_turn(message: Message) -> bool:
+        """Check a message can start a trimmed conversation (user turn without tool results)."""
+        if message.role != "user":
+            return False
+        if isinstance(message.content, str):
+            return True
+        return not any(getattr(block, "type", None) == "tool_result" for block in message.content)
+
+    def _trim(
+        self,
+        request: MessagesRequest,
+        input_tokens: int,
+        limits: ModelLimits
+    ) -> Optional[PreflightResult]:
+        """Lower max_tokens or drop the oldest turns until the request fits."""
+        max_tokens = min(request.max_tokens, limits.max_output_tokens)
+        room = limits.context_window - input_tokens
+        if room >= max_tokens:
+            trimmed = request.model_copy(update={"max_tokens": max_tokens})
+            return PreflightResult(request=trimmed, fits=True, input_tokens=input_tokens, limits=limits)
+        if room >= MIN_TRIMMED_OUTPUT_TOKENS:
+            trimmed = request.model_copy(update={"max_tokens": room})
+            return PreflightResult(request=trimmed, fits=True, input_tokens=input_tokens, limits=limits)
+
+        # Drop whole turns from the front, resuming at a user turn so no tool_result is orphaned
+        max_tokens = min(max_tokens, limits.context_window // 4)
+        overflow = input_tokens + max_tokens - limits.context_window
+        messages = request.messages
+        freed = 0
+        drop = 0
+        while drop < len(messages) - 1 and (freed < overflow or not self._is_clean_user_turn(messages[drop])):
+            freed += self.token_counter.count_message_tokens(messages[drop])
+            drop += 1
+        if freed < overflow or not self._is_clean_user_turn(messages[drop]):
+            return None
+
+        trimmed = request.model_copy(update={"messages": messages[drop:], "max_tokens": max_tokens})
+        return PreflightResult(
+            request=trimmed,
+            fits=True,
+            input_tokens=input_tokens - freed,
+            limits=limits,
+            trimmed_messages=drop
+        )
+
+    async def check_request(self, request: MessagesRequest, trim: Optional[bool] = None) -> PreflightResult:
+        """
+        Check whether a request fits its model's context window.
+
+        Args:
+            request: Validated messages request (model already mapped)
+            trim: Trim instead of rejecting; defaults to CONTEXT_PREFLIGHT_MODE == "trim"
+
+        Returns:
+            PreflightResult with the (possibly trimmed) request, or an
+            Anthropic-style error message when the request cannot fit
+        """
+        limits = self.get_limits(request.model)
+        if limits is None:
+            self._record("unknown_model")
+            return PreflightResult(request=request, fits=True)
+
+        if trim is None:
+            trim = config.context_preflight_mode == "trim"
+
+        input_tokens = await self.token_counter.count_request_tokens(request, model=request.model)
+        fits = (
+            request.max_tokens <= limits.max_output_tokens
+            and input_tokens + request.max_tokens <= limits.context_window
+        )
+        if fits:
+            self._record("passed")
+            return PreflightResult(request=request, fits=True, input_tokens=input_tokens, limits=limits)
+
+        if trim:
+            result = self._trim(request, input_tokens, limits)
+            if result is not None:
+                self._record("trimmed")
+                self.logger.warning("✂️ Request trimmed to fit context window",
+                                    model=request.model,
+                                    input_tokens=input_tokens,
+                                    trimmed_input_tokens=result.input_tokens,
+                                    trimmed_messages=result.trimmed_messages,
+                                    max_tokens=result.request.max_tokens,
+                                    context_window=limits.context_window)
+                return result
+
+        if request.max_tokens > limits.max_output_tokens:
+            message = (f"max_tokens: {request.max_tokens} > {limits.max_output_tokens}, which is the "
+                       f"maximum allowed number of output tokens for {request.model}")
+        elif input_tokens > limits.context_window:
+            message = f"prompt is too long: {input_tokens} tokens > {limits.context_window} maximum"
+        else:
+            message = (f"input length and `max_tokens` exceed context limit: {input_tokens} + "
+                       f"{request.max_tokens} > {limits.context_window}, decrease input length "
+                       f"or `max_tokens` and try again")
+
+        self._record("rejected")
+        self.logger.warning("🚫 Request rejected before upstream dispatch",
+                            model=request.model,
+                            input_tokens=input_tokens,
+                            max_tokens=request.max_tokens,
+                            context_window=limits.context_window,
+                            upstream_calls_avoided=self.stats["rejected"])
+        return PreflightResult(
+            request=request,
+            fits=False,
+            input_tokens=input_tokens,
+            limits=limits,
+            error_message=message
+        )
@@ -0,0 +1,134 @@
+"""
+Client disconnect detection for OpenRouter Anthropic Server.
+
+When a client abandons a request (e.g. the user presses Esc) the handler
+would otherwise keep running the whole message workflow: the upstream
+completion keeps generating billable tokens and tools keep running. The
+monitor runs the workflow as a task, watches the connection, and cancels
+the task on disconnect. Cancellation propagates through the Prefect flow
+into the upstream HTTP call (closing its connection) and into running
+tools, which kill their child processes.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Dict, Optional, TypeVar
+
+from fastapi import Request
+
+from src.utils.config import config
+from src.utils.errors import ClientDisconnectedError
+from .base import BaseService
+
+T = TypeVar("T")
+
+# Nginx convention for "client closed request"; the client never sees it
+CLIENT_CLOSED_REQUEST = 499
+
+
+class DisconnectMonitorService(BaseService):
+    """Service that cancels in-flight work when the client disconnects."""
+
+    def __init__(self, enabled: Optional[bool] = None):
+        """Initialize disconnect monitor from config unless overridden."""
+        super().__init__("DisconnectMonitor")
+        self.enabled = config.disconnect_detection_enabled if enabled is None else enabled
+        self.stats: Dict[str, Any] = {
+            "monitored_requests": 0,
+            "active_requests": 0,
+            "cancelled_requests": 0,
+            "cancelled_upstream_calls": 0,
+            "cancelled_tool_executions": 0,
+            "killed_processes": 0,
+            "cancelled_work_seconds": 0.0
+        }
+
+    async def run(self, request: Request, work: Awaitable[T], request_id: str = "unknown") -> T:
+        """
+        Run work until it completes or the client disconnects.
+
+        Args:
+            request: The incoming request whose connection is watched
+            work: Coroutine processing the request
+            request_id: Request ID for logging
+
+        Returns:
+            The result of work
+
+        Raises:
+            ClientDisconnectedError: If the client disconnected and work was cancelled
+        """
+        if not self.enabled:
+            return await work
+
+        task = asyncio.ensure_future(work)
+        watcher = asyncio.ensure_future(self._wait_for_disconnect(request))
+        start = time.perf_counter()
+        self.stats["monitored_requests"] += 1
+        self.stats["active_requests"] += 1
+        try:
+            await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            # The handler itself was cancelled (e.g. server shutdown): take the work with it
+            task.cancel()
+            raise
+        finally:
+            watcher.cancel()
+            self.stats["active_requests"] -= 1
+
+        if task.done():
+            return task.result()
+
+        await self._cancel(task)
+        elapsed = time.perf_counter() - start
+        self.stats["cancelled_requests"] += 1
+        self.stats["cancelled_work_seconds"] += elapsed
+        self.logger.warning("🔌 Client disconnected, cancelled in-flight request",
+                            request_id=request_id,
+                            path=request.url.path,
+                            elapsed_ms=round(elapsed * 1000, 2))
+        raise ClientDisconnectedError(
+            "Client disconnected before the request completed",
+            details={"request_id": request_id}
+        )
+
+    async def _wait_for_disconnect(self, request: Request) -> None:
+        """
+        Block until the server reports the client disconnected.
+
+        The body has already been read, so the only message left on the
+        channel is http.disconnect. Request.is_disconnected() is not used:
+        its non-blocking check loses the message behind BaseHTTPMiddleware.
+        """
+        while True:
+            message = await request.receive()
+            if message.get("type") == "http.disconnect":
+                return
+
+    async def _cancel(self, task: "asyncio.Future[Any]") -> None:
+        """Cancel work and wait until its cleanup (connection close, process kill) is done."""
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self.logger.debug("Cancelled request raised during cleanup", error=str(e))
+
+    def record_cancelled(self, stat: str, count: int = 1) -> None:
+        """
+        Count work abandoned because its request was cancelled.
+
+        Args:
+            stat: cancelled_upstream_calls, cancelled_tool_executions or killed_processes
+            count: Amount to add
+        """
+        self.stats[stat] += count
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cancelled-work statistics."""
+        return {
+            **self.stats,
+            "cancelled_work_seconds": round(self.stats["cancelled_work_seconds"], 3),
+            "enabled": self.enabled
+        }
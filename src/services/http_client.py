@@ -6,6 +6,7 @@ Provides proper HTTP client configuration for LiteLLM with proxy support.
 import os
 import asyncio
 from typing import Dict, Any, Optional
+import httpx
 import litellm
 from litellm import acompletion
 from datetime import datetime
@@ -21,6 +22,51 @@ from ..utils.error_logger import log_error
 from .base import BaseService
 
 
+# Shared pooled upstream client used by LiteLLM and the async Instructor client
+_shared_async_client: Optional[httpx.AsyncClient] = None
+
+
+def get_shared_async_client() -> httpx.AsyncClient:
+    """
+    Get the process-wide pooled async HTTP client for upstream calls.
+    
+    The pool is sized from MAX_CONCURRENT_REQUESTS so that LiteLLM completions
+    and structured-output calls reuse the same keep-alive connections.
+    
+    Returns:
+        Shared httpx.AsyncClient instance
+    """
+    global _shared_async_client
+    
+    if _shared_async_client is None or _shared_async_client.is_closed:
+        limits = httpx.Limits(
+            max_connections=max(config.max_concurrent_requests * 2, 10),
+            max_keepalive_connections=max(config.max_concurrent_requests, 5)
+        )
+        _shared_async_client = httpx.AsyncClient(
+            limits=limits,
+            timeout=httpx.Timeout(config.request_timeout)
+        )
+        logger.info("Shared upstream connection pool created",
+                   max_connections=limits.max_connections,
+                   max_keepalive_connections=limits.max_keepalive_connections)
+    
+    return _shared_async_client
+
+
+async def close_shared_async_client() -> None:
+    """Close the shared pooled async HTTP client if it was created."""
+    global _shared_async_client
+    
+    if _shared_async_client is not None and not _shared_async_client.is_closed:
+        await _shared_async_client.aclose()
+        logger.info("Shared upstream connection pool closed")
+    
+    if litellm.aclient_session is _shared_async_client:
+        litellm.aclient_session = None
+    _shared_async_client = None
+
+
 class HTTPClientService(BaseService):
     """Service for managing HTTP client configuration and LiteLLM calls."""
     
@@ -38,6 +84,9 @@ class HTTPClientService(BaseService):
             # Set timeout configuration
             litellm.request_timeout = config.request_timeout
             
+            # Route LiteLLM's OpenAI-compatible calls through the shared pool
+            litellm.aclient_session = get_shared_async_client()
+            
             # Configure proxy settings if needed
             self._configure_proxy_settings()
             
@@ -85,13 +134,19 @@ class HTTPClientService(BaseService):
         
         logger.info("Configured proxy bypass for OpenRouter domains", domains=openrouter_domains)
     
-    async def make_litellm_request(self, request_data: Dict[str, Any], request_id: str) -> Any:
+    async def make_litellm_request(
+        self,
+        request_data: Dict[str, Any],
+        request_id: str,
+        capture_debug: bool = True
+    ) -> Any:
         """
         Make a LiteLLM API request with proper HTTP client configuration.
         
         Args:
             request_data: The LiteLLM request data
             request_id: Unique request ID for tracking
+            capture_debug: Log request and response details (skipped on the lightweight pipeline)
             
         Returns:
             LiteLLM response object
@@ -103,29 +158,44 @@ class HTTPClientService(BaseService):
             logger.info("Making LiteLLM API call", request_id=request_id)
             
             # Log request details (excluding sensitive data)
-            self._log_request_details(request_data)
+            if capture_debug:
+                self._log_request_details(request_data)
             
             # Configure request-specific settings
             request_config = self._prepare_request_config(request_data)
-            
-            # Make the API call with proper configuration
-            response = await self._execute_litellm_request(request_config)
+
+            # Retry rate limits, 5xx, connection errors and timeouts by policy
+            from . import parameter_compatibility_service, retry_policy_service
+            try:
+                response = await retry_policy_service.run(
+                    request_config.get('model', 'unknown'),
+                    lambda: self._attempt_upstream_call(request_config)
+                )
+            except litellm.BadRequestError as e:
+                # A parameter the model rejects: remember it and retry once without it
+                if not parameter_compatibility_service.learn_rejection(request_config, e):
+                    raise
+                response = await retry_policy_service.run(
+                    request_config.get('model', 'unknown'),
+                    lambda: self._attempt_upstream_call(request_config)
+                )
             
             processing_time = time.time() - start_time
             
             # DEBUG: Log response details for diagnosis
-            logger.debug("LiteLLM response received",
-                        response_type=str(type(response)),
-                        response_attributes=[attr for attr in dir(response) if not attr.startswith('_')],
-                        request_id=request_id)
-            if hasattr(response, 'choices'):
-                logger.debug("Response choices info",
-                           choices_count=len(response.choices) if response.choices else 0,
-                           request_id=request_id)
-            if hasattr(response, 'object'):
-                logger.debug("Response object type",
-                           object_type=response.object,
-                           request_id=request_id)
+            if capture_debug:
+                logger.debug("LiteLLM response received",
+                            response_type=str(type(response)),
+                            response_attributes=[attr for attr in dir(response) if not attr.startswith('_')],
+                            request_id=request_id)
+                if hasattr(response, 'choices'):
+                    logger.debug("Response choices info",
+                               choices_count=len(response.choices) if response.choices else 0,
+                               request_id=request_id)
+                if hasattr(response, 'object'):
+                    logger.debug("Response object type",
+                               object_type=response.object,
+                               request_id=request_id)
             
             self.log_operation("litellm_api_call", success=True,
                              request_id=request_id,
@@ -138,6 +208,14 @@ class HTTPClientService(BaseService):
             
             return response
             
+        except asyncio.CancelledError:
+            # Client went away: abandoning the call closes the upstream connection
+            from . import disconnect_monitor_service
+            disconnect_monitor_service.record_cancelled("cancelled_upstream_calls")
+            logger.warning("🔌 LiteLLM API call cancelled",
+                          processing_time=f"{time.time() - start_time:.2f}s",
+                          request_id=request_id)
+            raise
         except Exception as e:
             processing_time = time.time() - start_time
             error_msg = f"LiteLLM API call failed: {e}"
@@ -187,6 +265,46 @@ class HTTPClientService(BaseService):
                         exc_info=True)
             raise
     
+    async def _attempt_upstream_call(self, request_config: Dict[str, Any]) -> Any:
+        """Make one paced, deadline-bound attempt of an upstream call."""
+        # Wait for room in the upstream rate-limit budget (may reroute to a fallback model)
+        from . import (adaptive_timeout_service, load_shedding_service, provider_affinity_service,
+                       stream_stall_service, upstream_pacing_service)
+        ticket = await upstream_pacing_service.acquire(request_config)
+
+        # Keep the conversation on one provider so its prompt cache is reused
+        affinity = provider_affinity_service.pin(request_config)
+
+        if stream_stall_service.applies_to(request_config):
+            # Stream internally so a stalled upstream is retried instead of waited out
+            upstream_call = stream_stall_service.complete(request_config, self._execute_litellm_request)
+        else:
+            # Per-model deadlines learned from observed latency (REQUEST_TIMEOUT until known)
+            timeout_plan = adaptive_timeout_service.plan(request_config)
+            if timeout_plan:
+                request_config['timeout'] = timeout_plan.httpx_timeout()
+            upstream_call = adaptive_timeout_service.run(
+                timeout_plan, self._execute_litellm_request(request_config)
+            )
+
+        # Make the API call with proper configuration
+        counted = load_shedding_service.upstream_started()
+        try:
+            response = await upstream_call
+        except BaseException as e:
+            if counted:
+                load_shedding_service.upstream_finished()
+            upstream_pacing_service.complete(ticket, getattr(e, "litellm_response_headers", None),
+                                             getattr(e, "status_code", None))
+            provider_affinity_service.failed(affinity, e)
+            raise
+        # A client stream stays in flight until its body is consumed
+        if counted and not load_shedding_service.track_stream(response):
+            load_shedding_service.upstream_finished()
+        upstream_pacing_service.complete(ticket, getattr(response, "_response_headers", None))
+        provider_affinity_service.complete(affinity, response)
+        return response
+    
     def _log_request_details(self, request_data: Dict[str, Any]):
         """Log request details for debugging."""
         # Extract request details for structured logging
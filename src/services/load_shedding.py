@@ -0,0 +1,214 @@
+"""
+Load-shedding model downgrade for OpenRouter Anthropic Server.
+
+When every slot is busy, new requests queue behind slow big-model calls
+and wait for as long as those calls take. While the proxy is saturated,
+this service maps expensive models to faster fallbacks for new requests,
+so the queue drains sooner and clients get a quicker, cheaper answer
+instead of waiting indefinitely.
+
+The proxy is saturated when either:
+
+- in-flight upstream calls reach LOAD_SHEDDING_MAX_IN_FLIGHT (a streamed
+  call stays in flight until its body is consumed or dropped, and
+  message-batch calls are not counted), or
+- the oldest request waiting for a lane slot has waited
+  LOAD_SHEDDING_MAX_QUEUE_WAIT_MS.
+
+It recovers only when both signals fall to LOAD_SHEDDING_RECOVERY_RATIO
+of their thresholds and it has been saturated for at least
+LOAD_SHEDDING_MIN_DURATION seconds, so it does not flap on the edge.
+
+Clients opt out per request with an "X-Load-Shedding: off" header, or
+always via LOAD_SHEDDING_EXEMPT_CLIENTS. Downgraded responses carry
+X-Model-Downgraded-From and X-Model-Downgraded-To headers.
+"""
+
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Mapping, Optional
+
+from src.models.anthropic import MessagesRequest
+from src.utils.config import config
+from src.utils.upstream_streams import observe_stream
+from .base import BaseService
+from .rate_limiter import RateLimiterService
+
+OPT_OUT_HEADER = "x-load-shedding"
+
+# Opt-out and downgrade of the current client request, for its response headers
+_request_downgrade: ContextVar[Optional[Dict[str, Any]]] = ContextVar("model_downgrade", default=None)
+
+# Set while running message batches, whose upstream calls do not count towards saturation
+_batch_traffic: ContextVar[bool] = ContextVar("batch_traffic", default=False)
+
+
+def _strip_prefix(model: str) -> str:
+    return model[len("openrouter/"):] if model.startswith("openrouter/") else model
+
+
+class LoadSheddingService(BaseService):
+    """Service that downgrades expensive models for new requests while the proxy is saturated."""
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        max_in_flight: Optional[int] = None,
+        max_queue_wait_ms: Optional[float] = None,
+        recovery_ratio: Optional[float] = None,
+        min_duration: Optional[float] = None,
+        fallbacks: Optional[Dict[str, str]] = None,
+        exempt_clients: Optional[List[str]] = None
+    ):
+        """Initialize load shedding from config unless overridden."""
+        super().__init__("LoadShedding")
+        self.enabled = config.load_shedding_enabled if enabled is None else enabled
+        self.max_in_flight = (max_in_flight or config.load_shedding_max_in_flight
+                              or config.max_concurrent_requests)
+        self.max_queue_wait_ms = (config.load_shedding_max_queue_wait_ms
+                                  if max_queue_wait_ms is None else max_queue_wait_ms)
+        self.recovery_ratio = config.load_shedding_recovery_ratio if recovery_ratio is None else recovery_ratio
+        self.min_duration = config.load_shedding_min_duration if min_duration is None else min_duration
+        fallbacks = config.load_shedding_fallbacks if fallbacks is None else fallbacks
+        self.fallbacks = {
+            _strip_prefix(model): _strip_prefix(fallback)
+            for model, fallback in (fallbacks or {config.big_model: config.small_model}).items()
+            if _strip_prefix(model) != _strip_prefix(fallback)
+        }
+        self.exempt_clients = set(config.load_shedding_exempt_clients if exempt_clients is None else exempt_clients)
+        self.in_flight = 0
+        self.saturated = False
+        self.saturated_since: Optional[float] = None
+        self.saturated_seconds = 0.0
+        self.stats: Dict[str, int] = {
+            "episodes": 0,
+            "downgraded": 0,
+            "opted_out": 0
+        }
+        self.downgrades: Dict[str, int] = {}
+
+    @staticmethod
+    def mark_batch_traffic() -> None:
+        """Exclude upstream calls made from the current context (a message batch) from saturation."""
+        _batch_traffic.set(True)
+
+    def upstream_started(self) -> bool:
+        """
+        Count an upstream call as in flight.
+
+        Returns:
+            Whether it was counted (message-batch calls are not); only counted
+            calls are passed to upstream_finished or track_stream
+        """
+        if _batch_traffic.get():
+            return False
+        self.in_flight += 1
+        return True
+
+    def upstream_finished(self) -> None:
+        """Count an upstream call as no longer in flight."""
+        self.in_flight = max(self.in_flight - 1, 0)
+
+    def track_stream(self, response: Any) -> bool:
+        """
+        Keep a streamed upstream call in flight until its body is consumed or dropped.
+
+        Args:
+            response: The upstream call's response, counted by upstream_started
+
+        Returns:
+            Whether the response is a stream now tracked; when False the caller
+            reports the call finished itself
+        """
+        return observe_stream(response, on_end=self.upstream_finished)
+
+    def queue_wait_ms(self) -> float:
+        """How long the oldest request waiting for a lane slot has waited."""
+        from . import request_lane_service
+        return request_lane_service.oldest_wait_ms()
+
+    def update(self) -> bool:
+        """Re-evaluate saturation, with hysteresis, and return whether the proxy is saturated."""
+        now = time.time()
+        in_flight, queue_wait_ms = self.in_flight, self.queue_wait_ms()
+        if not self.saturated:
+            if in_flight >= self.max_in_flight or queue_wait_ms >= self.max_queue_wait_ms:
+                self.saturated = True
+                self.saturated_since = now
+                self.stats["episodes"] += 1
+                self.logger.warning("🪫 Proxy saturated, downgrading expensive models for new requests",
+                                    in_flight=in_flight, queue_wait_ms=round(queue_wait_ms, 1))
+        elif (in_flight <= self.max_in_flight * self.recovery_ratio
+              and queue_wait_ms <= self.max_queue_wait_ms * self.recovery_ratio
+              and now - self.saturated_since >= self.min_duration):
+            self.saturated = False
+            self.saturated_seconds += now - self.saturated_since
+            self.logger.info("🔋 Proxy recovered, serving requested models again",
+                             in_flight=in_flight, queue_wait_ms=round(queue_wait_ms, 1),
+                             saturated_for=round(now - self.saturated_since, 1))
+            self.saturated_since = None
+        return self.saturated
+
+    def apply(self, request: MessagesRequest) -> MessagesRequest:
+        """
+        Downgrade a new request's model while the proxy is saturated.
+
+        Returns:
+            The request, with the fallback model when downgraded
+        """
+        if not self.enabled:
+            return request
+        model = _strip_prefix(request.model)
+        fallback = self.fallbacks.get(model)
+        if fallback is None or not self.update():
+            return request
+
+        record = _request_downgrade.get()
+        if record is not None and record["opt_out"]:
+            self.stats["opted_out"] += 1
+            return request
+
+        self.stats["downgraded"] += 1
+        pair = f"{model} -> {fallback}"
+        self.downgrades[pair] = self.downgrades.get(pair, 0) + 1
+        if record is not None:
+            record["from"], record["to"] = model, fallback
+        self.logger.info("🪫 Model downgraded under load",
+                         requested_model=model, model=fallback, in_flight=self.in_flight)
+        return request.model_copy(update={"model": f"openrouter/{fallback}"})
+
+    def track_request(self, headers: Mapping[str, str], client_host: Optional[str]) -> Dict[str, Any]:
+        """Start tracking the current client request's opt-out and downgrade."""
+        opt_out = (headers.get(OPT_OUT_HEADER, "").lower() in ("off", "false", "0")
+                   or RateLimiterService.client_key(headers, client_host) in self.exempt_clients)
+        record: Dict[str, Any] = {"opt_out": opt_out, "from": None, "to": None}
+        _request_downgrade.set(record)
+        return record
+
+    @staticmethod
+    def response_headers(record: Dict[str, Any]) -> Dict[str, str]:
+        """Headers naming a client request's model downgrade (none when it was not downgraded)."""
+        if not record["from"]:
+            return {}
+        return {
+            "X-Model-Downgraded-From": record["from"],
+            "X-Model-Downgraded-To": record["to"]
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get saturation state, signals and downgrade counters."""
+        saturated = self.update() if self.enabled else False
+        current = time.time() - self.saturated_since if saturated else 0.0
+        return {
+            "enabled": self.enabled,
+            "saturated": saturated,
+            "in_flight": self.in_flight,
+            "queue_wait_ms": round(self.queue_wait_ms(), 1),
+            "max_in_flight": self.max_in_flight,
+            "max_queue_wait_ms": self.max_queue_wait_ms,
+            "recovery_ratio": self.recovery_ratio,
+            **self.stats,
+            "saturated_seconds": round(self.saturated_seconds + current, 1),
+            "fallbacks": self.fallbacks,
+            "downgrades": dict(self.downgrades)
+        }
@@ -0,0 +1,451 @@
+"""
+Message Batches API emulation for OpenRouter Anthropic Server.
+
+Batches of independent /v1/messages requests are queued locally and run
+through the normal message workflow with a per-batch concurrency limit,
+outside the interactive request lanes. Each batch lives in its own
+directory:
+
+- requests.jsonl: the submitted requests, written once at creation,
+- results.jsonl: one result line per request, appended as items finish,
+- batch.json: batch metadata, rewritten on status changes.
+
+A batch belongs to the client that created it (its API key, else its IP
+address, keyed as by the rate limiter); other clients cannot see it.
+
+Upstream calls are retried by the retry policy (RETRY_POLICY_ENABLED).
+Only when it is disabled are items that fail with a retryable error (429,
+5xx, connection errors) retried here, with exponential backoff, before
+being reported as errored.
+"""
+
+import asyncio
+import json
+import shutil
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, IO, Iterator, List, Optional, Set
+
+from fastapi import HTTPException
+from prefect.context import AsyncClientContext
+from pydantic import ValidationError
+
+from src.models.anthropic import MessageBatchRequestItem, MessagesRequest
+from src.utils.config import config
+from .base import BaseService
+
+BATCH_ID_PREFIX = "msgbatch_"
+BATCH_EXPIRY_SECONDS = 24 * 3600
+
+_ERROR_TYPES = {
+    400: "invalid_request_error",
+    401: "authentication_error",
+    403: "permission_error",
+    404: "not_found_error",
+    413: "request_too_large",
+    429: "rate_limit_error",
+    503: "overloaded_error",
+    529: "overloaded_error"
+}
+
+
+def _rfc3339(ts: Optional[float]) -> Optional[str]:
+    if ts is None:
+        return None
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+@dataclass
+class MessageBatch:
+    """State of one message batch."""
+    id: str
+    created_at: float
+    expires_at: float
+    total: int
+    processing_status: str = "in_progress"  # in_progress, canceling, ended
+    succeeded: int = 0
+    errored: int = 0
+    canceled: int = 0
+    expired: int = 0
+    retries: int = 0
+    ended_at: Optional[float] = None
+    cancel_initiated_at: Optional[float] = None
+    # Client key of the creator, as from RateLimiterService.client_key
+    client: Optional[str] = None
+    # Never persisted: used only while the batch runs in this process
+    api_key: Optional[str] = field(default=None, repr=False)
+
+    @property
+    def processing(self) -> int:
+        return self.total - self.succeeded - self.errored - self.canceled - self.expired
+
+    def to_api(self) -> Dict[str, Any]:
+        """Render as an Anthropic MessageBatch object."""
+        return {
+            "id": self.id,
+            "type": "message_batch",
+            "processing_status": self.processing_status,
+            "request_counts": {
+                "processing": self.processing,
+                "succeeded": self.succeeded,
+                "errored": self.errored,
+                "canceled": self.canceled,
+                "expired": self.expired
+            },
+            "ended_at": _rfc3339(self.ended_at),
+            "created_at": _rfc3339(self.created_at),
+            "expires_at": _rfc3339(self.expires_at),
+            "archived_at": None,
+            "cancel_initiated_at": _rfc3339(self.cancel_initiated_at),
+            "results_url": f"/v1/messages/batches/{self.id}/results" if self.processing_status == "ended" else None
+        }
+
+    def to_file(self) -> Dict[str, Any]:
+        data = asdict(self)
+        del data["api_key"]
+        return data
+
+
+class MessageBatchService(BaseService):
+    """Service that queues message batches and runs them against the upstream."""
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        concurrency: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        retry_backoff: Optional[float] = None,
+        max_requests: Optional[int] = None
+    ):
+        """Initialize message batch service from config unless overridden."""
+        super().__init__("MessageBatches")
+        self.directory = Path(directory or config.message_batch_dir)
+        self.concurrency = concurrency or config.message_batch_concurrency
+        self.max_retries = config.message_batch_max_retries if max_retries is None else max_retries
+        self.retry_backoff = config.message_batch_retry_backoff if retry_backoff is None else retry_backoff
+        self.max_requests = max_requests or config.message_batch_max_requests
+        self._batches: Dict[str, MessageBatch] = {}
+        self._runners: Dict[str, "asyncio.Task[None]"] = {}
+        self.stats: Dict[str, int] = {"batches": 0, "requests": 0, "retries": 0}
+
+    def _batch_dir(self, batch_id: str) -> Path:
+        return self.directory / batch_id
+
+    async def create(
+        self,
+        items: List[MessageBatchRequestItem],
+        api_key: Optional[str] = None,
+        client: Optional[str] = None
+    ) -> MessageBatch:
+        """
+        Queue a batch and start running it.
+
+        Raises:
+            HTTPException: 400 if the batch is too large or custom_ids repeat
+        """
+        if len(items) > self.max_requests:
+            raise HTTPException(status_code=400, detail={
+                "error": "Batch too large",
+                "message": f"A batch may contain at most {self.max_requests} requests"
+            })
+        seen = set()
+        for item in items:
+            if item.custom_id in seen:
+                raise HTTPException(status_code=400, detail={
+                    "error": "Duplicate custom_id",
+                    "message": f"custom_id '{item.custom_id}' appears more than once"
+                })
+            seen.add(item.custom_id)
+
+        now = time.time()
+        batch = MessageBatch(
+            id=BATCH_ID_PREFIX + uuid.uuid4().hex[:24],
+            created_at=now,
+            expires_at=now + BATCH_EXPIRY_SECONDS,
+            total=len(items),
+            client=client,
+            api_key=api_key
+        )
+        lines = [json.dumps({"custom_id": item.custom_id, "params": item.params}) for item in items]
+        await asyncio.to_thread(self._write_new_batch, batch, lines)
+
+        self._batches[batch.id] = batch
+        self._runners[batch.id] = asyncio.get_running_loop().create_task(self._run(batch))
+        self.stats["batches"] += 1
+        self.stats["requests"] += batch.total
+        self.logger.info("📦 Message batch created", batch_id=batch.id, requests=batch.total,
+                         concurrency=self.concurrency)
+        return batch
+
+    def _write_new_batch(self, batch: MessageBatch, lines: List[str]) -> None:
+        batch_dir = self._batch_dir(batch.id)
+        batch_dir.mkdir(parents=True, exist_ok=True)
+        with open(batch_dir / "requests.jsonl", "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        (batch_dir / "results.jsonl").touch()
+        self._save(batch)
+
+    def _save(self, batch: MessageBatch) -> None:
+        path = self._batch_dir(batch.id) / "batch.json"
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(batch.to_file()), encoding="utf-8")
+        tmp.replace(path)
+
+    def _iter_requests(self, batch_id: str) -> Iterator[Dict[str, Any]]:
+        with open(self._batch_dir(batch_id) / "requests.jsonl", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    async def _run(self, batch: MessageBatch) -> None:
+        """
+        Run a batch's items with bounded concurrency, streaming results to disk.
+
+        Items run the message workflow's body directly rather than as one
+        flow run each, and share one Prefect client: creating a flow run and
+        an API client per item costs more than the upstream call itself.
+
+        If the run fails, the items it did not finish are reported as errored
+        and the batch still ends. A run stopped by close() is left for the
+        next load to report as expired.
+        """
+        from src.services import load_shedding_service
+
+        # Batch calls must not make the proxy look saturated to interactive requests
+        load_shedding_service.mark_batch_traffic()
+        start = time.perf_counter()
+        requests: List[Dict[str, Any]] = []
+        finished: Set[str] = set()
+        results: Optional[IO[str]] = None
+        stopped = False
+        try:
+            requests = await asyncio.to_thread(lambda: list(self._iter_requests(batch.id)))
+            results = await asyncio.to_thread(open, self.results_path(batch.id), "a", encoding="utf-8")
+            items, write_lock = iter(requests), asyncio.Lock()
+            async with AsyncClientContext.get_or_create():
+                workers = [
+                    asyncio.ensure_future(self._worker(batch, items, results, write_lock, finished))
+                    for _ in range(min(self.concurrency, batch.total))
+                ]
+                try:
+                    await asyncio.gather(*workers)
+                finally:
+                    for worker in workers:
+                        worker.cancel()
+                    await asyncio.gather(*workers, return_exceptions=True)
+        except asyncio.CancelledError:
+            stopped = True
+            raise
+        except Exception as e:
+            self.logger.error("📦 Message batch failed",
+                              batch_id=batch.id,
+                              error=str(e),
+                              error_type=type(e).__name__)
+            error = self._error("api_error", f"Batch processing failed: {type(e).__name__}: {e}")
+            lines = [self._result_line(item["custom_id"], error)
+                     for item in requests if item["custom_id"] not in finished]
+            batch.errored += batch.processing
+            try:
+                await asyncio.to_thread(self._append_results, batch.id, lines)
+            except OSError as write_error:
+                self.logger.error("📦 Could not write errored batch results",
+                                  batch_id=batch.id, error=str(write_error))
+        finally:
+            if results is not None:
+                results.close()
+            self._runners.pop(batch.id, None)
+            if not stopped:
+                batch.processing_status = "ended"
+                batch.ended_at = time.time()
+                batch.api_key = None
+                await asyncio.to_thread(self._save, batch)
+                self.logger.info("📦 Message batch ended",
+                                 batch_id=batch.id,
+                                 succeeded=batch.succeeded,
+                                 errored=batch.errored,
+                                 canceled=batch.canceled,
+                                 retries=batch.retries,
+                                 duration_ms=round((time.perf_counter() - start) * 1000, 2))
+
+    async def _worker(
+        self,
+        batch: MessageBatch,
+        items: Iterator[Dict[str, Any]],
+        results: IO[str],
+        write_lock: asyncio.Lock,
+        finished: Set[str]
+    ) -> None:
+        for item in items:
+            if batch.processing_status == "canceling":
+                result = {"type": "canceled"}
+            else:
+                result = await self._execute(batch, item)
+            # Written from a worker thread, one line at a time, so the event loop never waits on disk
+            async with write_lock:
+                await asyncio.to_thread(self._write_result, results, self._result_line(item["custom_id"], result))
+            setattr(batch, result["type"], getattr(batch, result["type"]) + 1)
+            finished.add(item["custom_id"])
+
+    @staticmethod
+    def _result_line(custom_id: str, result: Dict[str, Any]) -> str:
+        return json.dumps({"custom_id": custom_id, "result": result}) + "\n"
+
+    @staticmethod
+    def _write_result(results: IO[str], line: str) -> None:
+        results.write(line)
+        results.flush()
+
+    def _append_results(self, batch_id: str, lines: List[str]) -> None:
+        with open(self.results_path(batch_id), "a", encoding="utf-8") as results:
+            results.writelines(lines)
+
+    async def _execute(self, batch: MessageBatch, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Run one item through the message workflow, retrying retryable failures the retry policy does not."""
+        # Imported here: the workflow module imports the services package
+        from src.workflows.message_workflows import process_message_request
+        from src.services import retry_policy_service, similarity_cache_service
+
+        try:
+            request = MessagesRequest(**{**item["params"], "stream": False})
+        except (ValidationError, TypeError) as e:
+            return self._error("invalid_request_error", str(e))
+
+        cached = similarity_cache_service.lookup(request, route="/v1/messages/batches")
+        if cached is not None:
+            return {"type": "succeeded", "message": cached.model_dump(exclude_none=True)}
+
+        request_id = f"{batch.id}:{item['custom_id']}"
+        # The retry policy already retried the item's upstream calls within its global budget
+        max_retries = 0 if retry_policy_service.enabled else self.max_retries
+        for attempt in range(max_retries + 1):
+            try:
+                response = await process_message_request.fn(
+                    request=request,
+                    request_id=request_id,
+                    streaming=False,
+                    api_key=batch.api_key,
+                    usage_source="batch"
+                )
+            except HTTPException as e:
+                retryable = e.status_code == 429 or e.status_code >= 500
+                detail = e.detail if isinstance(e.detail, dict) else {"message": str(e.detail)}
+                error = self._error(_ERROR_TYPES.get(e.status_code, "api_error"),
+                                    detail.get("message") or detail.get("error") or str(e.detail))
+            except Exception as e:
+                retryable = True
+                error = self._error("api_error", f"{type(e).__name__}: {e}")
+            else:
+                similarity_cache_service.store(request, response, route="/v1/messages/batches")
+                message = response.model_dump(exclude_none=True) if hasattr(response, "model_dump") else response
+                return {"type": "succeeded", "message": message}
+
+            if not retryable or attempt == max_retries or batch.processing_status == "canceling":
+                return error
+            batch.retries += 1
+            self.stats["retries"] += 1
+            await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+        return error
+
+    @staticmethod
+    def _error(error_type: str, message: str) -> Dict[str, Any]:
+        return {"type": "errored", "error": {"type": "error", "error": {"type": error_type, "message": message}}}
+
+    async def get(self, batch_id: str, client: Optional[str] = None) -> Optional[MessageBatch]:
+        """
+        Look up a batch, loading it from disk if it ran in an earlier process.
+
+        Args:
+            batch_id: Batch to look up
+            client: Only find the batch if this client created it (None: any client)
+        """
+        batch = self._batches.get(batch_id)
+        if batch is None and batch_id.startswith(BATCH_ID_PREFIX) and batch_id.isascii() and batch_id.replace("_", "").isalnum():
+            loaded = await asyncio.to_thread(self._load, batch_id)
+            if loaded is not None:
+                batch = self._batches.setdefault(batch_id, loaded)
+        if batch is not None and client is not None and batch.client != client:
+            return None
+        return batch
+
+    def _load(self, batch_id: str) -> Optional[MessageBatch]:
+        """Read a batch from disk, expiring it if the process running it stopped."""
+        path = self._batch_dir(batch_id) / "batch.json"
+        if not path.exists():
+            return None
+        batch = MessageBatch(**json.loads(path.read_text(encoding="utf-8")))
+        if batch.processing_status != "ended":
+            # The process running it stopped: report what never finished as expired
+            with open(self._batch_dir(batch_id) / "results.jsonl", "a+", encoding="utf-8") as results:
+                results.seek(0)
+                done = {json.loads(line)["custom_id"] for line in results if line.strip()}
+                for item in self._iter_requests(batch_id):
+                    if item["custom_id"] not in done:
+                        results.write(self._result_line(item["custom_id"], {"type": "expired"}))
+            batch.expired = batch.total - len(done)
+            batch.processing_status = "ended"
+            batch.ended_at = time.time()
+            self._save(batch)
+        return batch
+
+    def _load_unknown(self, known: Set[str]) -> List[MessageBatch]:
+        """Read the batches on disk that are not in known."""
+        if not self.directory.exists():
+            return []
+        loaded = (self._load(batch_dir.name) for batch_dir in self.directory.iterdir()
+                  if batch_dir.name not in known and batch_dir.name.startswith(BATCH_ID_PREFIX))
+        return [batch for batch in loaded if batch is not None]
+
+    async def list_batches(self, limit: int = 20, client: Optional[str] = None) -> List[MessageBatch]:
+        """Most recent batches first, including those from earlier processes (only a client's own, if given)."""
+        for batch in await asyncio.to_thread(self._load_unknown, set(self._batches)):
+            self._batches.setdefault(batch.id, batch)
+        batches = [batch for batch in self._batches.values() if client is None or batch.client == client]
+        batches.sort(key=lambda batch: batch.created_at, reverse=True)
+        return batches[:limit]
+
+    async def cancel(self, batch_id: str) -> Optional[MessageBatch]:
+        """Stop starting new items; queued items are reported as canceled."""
+        batch = await self.get(batch_id)
+        if batch is not None and batch.processing_status == "in_progress":
+            batch.processing_status = "canceling"
+            batch.cancel_initiated_at = time.time()
+            await asyncio.to_thread(self._save, batch)
+            self.logger.info("📦 Message batch canceling", batch_id=batch_id, processing=batch.processing)
+        return batch
+
+    def results_path(self, batch_id: str) -> Path:
+        return self._batch_dir(batch_id) / "results.jsonl"
+
+    async def delete(self, batch_id: str) -> bool:
+        """Delete an ended batch and its files."""
+        batch = await self.get(batch_id)
+        if batch is None:
+            return False
+        if batch.processing_status != "ended":
+            raise HTTPException(status_code=400, detail={
+                "error": "Batch still processing",
+                "message": "Cancel the batch and wait for it to end before deleting it"
+            })
+        self._batches.pop(batch_id, None)
+        await asyncio.to_thread(shutil.rmtree, self._batch_dir(batch_id), True)
+        return True
+
+    async def close(self) -> None:
+        """Stop running batches; their unfinished items are reported as expired on next load."""
+        runners = list(self._runners.values())
+        for runner in runners:
+            runner.cancel()
+        await asyncio.gather(*runners, return_exceptions=True)
+        self._runners.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get message batch statistics."""
+        return {
+            **self.stats,
+            "running_batches": len(self._runners),
+            "concurrency": self.concurrency,
+            "directory": str(self.directory)
+        }
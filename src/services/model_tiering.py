@@ -0,0 +1,238 @@
+"""
+Complexity-based model tiering for OpenRouter Anthropic Server.
+
+Every request for the big model alias goes to the big model, including
+trivial ones such as one-line answers or short acknowledgements of tool
+results. This service scores a request locally from a few cheap features
+and routes it to the cheaper, faster tier when it is confident the
+request is simple:
+
+- prompt size (estimated from the request bytes) against max_prompt_tokens,
+- tool count against max_tools,
+- type of the last message: plain text, tool results, or images and
+  documents (never tiered),
+- requested output: extended thinking or a max_tokens above
+  max_output_tokens is never tiered.
+
+Each feature gives a score from 0 to 1, and the request's confidence is
+the lowest of them. A request is tiered down when the confidence reaches
+min_confidence. All four thresholds are set in MODEL_TIERING_THRESHOLDS. In "shadow" mode the decision is only
+logged and counted. Latency, tokens and cost are reported per tier, so
+shadow decisions can be checked before the mode is set to "on".
+"""
+
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import litellm
+
+from src.models.anthropic import MessagesRequest
+from src.utils.config import config
+from .base import BaseService
+from .rate_limiter import BYTES_PER_TOKEN
+
+TIERING_MODES = ("off", "shadow", "on")
+BIG_TIER = "big"
+CHEAP_TIER = "cheap"
+
+# Latency samples kept per tier for the percentile report
+LATENCY_SAMPLES = 1000
+
+# Per-feature confidence by the type of the last message
+LAST_MESSAGE_SCORES = {"text": 1.0, "tool_result": 0.9, "assistant": 0.5, "media": 0.0}
+
+
+@dataclass
+class TierDecision:
+    """Where one request was (or in shadow mode would have been) routed."""
+    requested_model: str
+    model: str
+    tier: str
+    would_tier: bool
+    confidence: float
+    features: Dict[str, Any]
+    started: float
+
+
+def last_message_type(request: MessagesRequest) -> str:
+    """Classify the last message: text, tool_result, assistant (prefill) or media."""
+    if not request.messages:
+        return "text"
+    message = request.messages[-1]
+    if message.role == "assistant":
+        return "assistant"
+    if isinstance(message.content, str):
+        return "text"
+    types = {getattr(block, "type", None) for block in message.content}
+    if types & {"image", "document"}:
+        return "media"
+    return "tool_result" if "tool_result" in types else "text"
+
+
+class ModelTieringService(BaseService):
+    """Service that sends simple requests for the big model to a cheaper tier."""
+
+    def __init__(
+        self,
+        mode: Optional[str] = None,
+        big_models: Optional[List[str]] = None,
+        cheap_model: Optional[str] = None,
+        thresholds: Optional[Dict[str, float]] = None,
+        prices: Optional[Dict[str, List[float]]] = None
+    ):
+        """Initialize model tiering from config unless overridden."""
+        super().__init__("ModelTiering")
+        self.mode = config.model_tiering_mode if mode is None else mode
+        if self.mode not in TIERING_MODES:
+            raise ValueError(f"MODEL_TIERING_MODE must be one of {', '.join(TIERING_MODES)}, got {self.mode!r}")
+        self.big_models = set(self._prefixed(model) for model in (big_models or [config.big_model]))
+        self.cheap_model = self._prefixed(cheap_model or config.model_tiering_cheap_model or config.small_model)
+        thresholds = config.model_tiering_thresholds if thresholds is None else thresholds
+        self.max_prompt_tokens = int(thresholds.get("max_prompt_tokens", 4000))
+        self.max_tools = int(thresholds.get("max_tools", 32))
+        self.max_output_tokens = int(thresholds.get("max_output_tokens", 4096))
+        self.min_confidence = float(thresholds.get("min_confidence", 0.6))
+        self.prices = config.model_tiering_prices if prices is None else prices
+        self.stats: Dict[str, int] = {
+            "classified": 0,
+            "tiered": 0,
+            "shadow_tiered": 0,
+            "kept": 0
+        }
+        self._tiers: Dict[str, Dict[str, Any]] = defaultdict(
+            lambda: {"requests": 0, "input_tokens": 0, "output_tokens": 0, "cost": 0.0, "unpriced": 0}
+        )
+        self._latencies: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=LATENCY_SAMPLES))
+
+    @staticmethod
+    def _prefixed(model: str) -> str:
+        return model if model.startswith("openrouter/") else f"openrouter/{model}"
+
+    def classify(self, request: MessagesRequest) -> Tuple[float, Dict[str, Any]]:
+        """
+        Score how confidently a request can be served by the cheap tier.
+
+        Returns:
+            Confidence from 0 to 1 (the weakest feature score) and the features
+        """
+        prompt_bytes = len(request.model_dump_json(include={"system", "messages", "tools"}))
+        features = {
+            "prompt_tokens": prompt_bytes // BYTES_PER_TOKEN,
+            "tool_count": len(request.tools or []),
+            "last_message": last_message_type(request),
+            "max_tokens": request.max_tokens,
+            "thinking": request.thinking is not None
+        }
+        scores = [
+            1.0 - features["prompt_tokens"] / self.max_prompt_tokens,
+            1.0 - features["tool_count"] / (self.max_tools + 1),
+            LAST_MESSAGE_SCORES[features["last_message"]],
+            0.0 if features["thinking"] or features["max_tokens"] > self.max_output_tokens else 1.0
+        ]
+        return round(max(min(scores), 0.0), 3), features
+
+    def route(self, request: MessagesRequest) -> Tuple[MessagesRequest, Optional[TierDecision]]:
+        """
+        Decide the tier of a request and, unless in shadow mode, apply it.
+
+        Returns:
+            The request (with the cheap model when tiered) and the decision,
+            or None when tiering is off or the request is not for a big model
+        """
+        if self.mode == "off" or request.model not in self.big_models:
+            return request, None
+
+        confidence, features = self.classify(request)
+        would_tier = confidence >= self.min_confidence
+        tier = CHEAP_TIER if would_tier and self.mode == "on" else BIG_TIER
+        decision = TierDecision(
+            requested_model=request.model,
+            model=self.cheap_model if tier == CHEAP_TIER else request.model,
+            tier=tier,
+            would_tier=would_tier,
+            confidence=confidence,
+            features=features,
+            started=time.time()
+        )
+        self.stats["classified"] += 1
+        if tier == CHEAP_TIER:
+            self.stats["tiered"] += 1
+        elif would_tier:
+            self.stats["shadow_tiered"] += 1
+        else:
+            self.stats["kept"] += 1
+
+        self.logger.info("🪜 Model tier decided",
+                         mode=self.mode, tier=tier, would_tier=would_tier,
+                         confidence=confidence, model=decision.model, **features)
+        if tier == CHEAP_TIER:
+            request = request.model_copy(update={"model": self.cheap_model})
+        return request, decision
+
+    def record(self, decision: Optional[TierDecision], usage: Any) -> None:
+        """Add a completed request's latency, tokens and cost to its tier's report."""
+        if decision is None:
+            return
+        # Big-tier requests the classifier would have tiered are reported apart in shadow mode
+        tier = decision.tier if decision.tier == CHEAP_TIER or not decision.would_tier else "big_would_tier"
+        report = self._tiers[tier]
+        report["requests"] += 1
+        self._latencies[tier].append(time.time() - decision.started)
+
+        input_tokens = int(getattr(usage, "input_tokens", 0) or 0)
+        output_tokens = int(getattr(usage, "output_tokens", 0) or 0)
+        report["input_tokens"] += input_tokens
+        report["output_tokens"] += output_tokens
+        cost = self._cost(decision.model, input_tokens, output_tokens)
+        if cost is None:
+            report["unpriced"] += 1
+        else:
+            report["cost"] += cost
+
+    def _cost(self, model: str, input_tokens: int, output_tokens: int) -> Optional[float]:
+        """USD cost from MODEL_TIERING_PRICES (per million tokens), else LiteLLM's price table."""
+        for name in (model, model[len("openrouter/"):]):
+            if name in self.prices:
+                input_price, output_price = self.prices[name]
+                return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+        try:
+            input_cost, output_cost = litellm.cost_per_token(
+                model=model, prompt_tokens=input_tokens, completion_tokens=output_tokens
+            )
+        except Exception:
+            return None
+        return input_cost + output_cost
+
+    def get_tiers(self) -> Dict[str, Any]:
+        """Latency, token and cost report per tier."""
+        tiers = {}
+        for tier, report in self._tiers.items():
+            latencies = sorted(self._latencies[tier])
+            requests = report["requests"]
+            tiers[tier] = {
+                **report,
+                "cost": round(report["cost"], 6),
+                "cost_per_request": round(report["cost"] / requests, 6) if requests else None,
+                "latency_mean": round(sum(latencies) / len(latencies), 3) if latencies else None,
+                "latency_p50": round(latencies[len(latencies) // 2], 3) if latencies else None,
+                "latency_p95": round(latencies[max(int(len(latencies) * 0.95) - 1, 0)], 3) if latencies else None
+            }
+        return {
+            "mode": self.mode,
+            "big_models": sorted(self.big_models),
+            "cheap_model": self.cheap_model,
+            "tiers": tiers
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get tiering counters and thresholds."""
+        return {
+            "mode": self.mode,
+            **self.stats,
+            "min_confidence": self.min_confidence,
+            "max_prompt_tokens": self.max_prompt_tokens,
+            "max_tools": self.max_tools,
+            "max_output_tokens": self.max_output_tokens
+        }
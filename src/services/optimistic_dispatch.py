@@ -0,0 +1,105 @@
+"""
+Optimistic upstream dispatch for OpenRouter Anthropic Server.
+
+The message workflow runs every local stage before the upstream call
+starts, although most of them only check the request: validation,
+mixed content detection (which usually finds nothing) and the pre-flight
+context check in reject mode. With OPTIMISTIC_DISPATCH_ENABLED the
+request is converted and sent upstream at once, and those checks run
+while the upstream call is in flight:
+
+- a failing check cancels the upstream call and fails the request as the
+  serial pipeline would,
+- a check that changes the request (mixed content cleaning) cancels the
+  upstream call and dispatches the changed request instead.
+
+An abandoned call that had already returned a stream has the stream
+closed, so its upstream connection is not left open.
+
+Time to first byte improves by the time the checks take, at the cost of
+an occasional upstream call cancelled right after it started.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from src.models.anthropic import MessagesRequest
+from src.utils.config import config
+from src.utils.upstream_streams import close_stream
+from .base import BaseService
+
+
+class OptimisticDispatchService(BaseService):
+    """Service that overlaps the upstream call with the request checks."""
+
+    def __init__(self, enabled: Optional[bool] = None):
+        """Initialize optimistic dispatch from config unless overridden."""
+        super().__init__("OptimisticDispatch")
+        self.enabled = config.optimistic_dispatch_enabled if enabled is None else enabled
+        self.stats: Dict[str, Any] = {
+            "dispatched": 0,
+            "aborted": 0,
+            "redispatched": 0,
+            "overlapped_ms": 0.0
+        }
+
+    async def run(
+        self,
+        request: MessagesRequest,
+        dispatch: Callable[[MessagesRequest], Awaitable[Any]],
+        checks: Callable[[MessagesRequest], Awaitable[MessagesRequest]]
+    ) -> Tuple[MessagesRequest, Any]:
+        """
+        Dispatch a request upstream while its checks run.
+
+        Args:
+            request: Request to dispatch
+            dispatch: Converts and sends a request upstream, returning the response
+            checks: Checks a request, raising when it must not be sent and
+                returning a changed request when it must be sent differently
+
+        Returns:
+            The request that was sent and its upstream response
+        """
+        self.stats["dispatched"] += 1
+        upstream = asyncio.ensure_future(dispatch(request))
+        start = time.perf_counter()
+        try:
+            checked = await checks(request)
+        except BaseException as e:
+            await self._abandon(upstream)
+            self.stats["aborted"] += 1
+            self.logger.warning("🏁 Request check failed, upstream call cancelled",
+                                error_type=type(e).__name__)
+            raise
+        self.stats["overlapped_ms"] += (time.perf_counter() - start) * 1000
+
+        if checked is not request:
+            await self._abandon(upstream)
+            self.stats["redispatched"] += 1
+            self.logger.info("🏁 Request changed by its checks, dispatching it again")
+            upstream = asyncio.ensure_future(dispatch(checked))
+        return checked, await upstream
+
+    async def _abandon(self, upstream: "asyncio.Future[Any]") -> None:
+        """Cancel an upstream call and wait for it to wind down, discarding its outcome."""
+        upstream.cancel()
+        await asyncio.gather(upstream, return_exceptions=True)
+        if upstream.cancelled() or upstream.exception() is not None:
+            return
+        # The call had already returned: a stream's connection stays open until closed
+        try:
+            await close_stream(upstream.result())
+        except Exception as e:
+            self.logger.warning("🏁 Could not close abandoned upstream stream", error=str(e))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get optimistic dispatch counters and the check time taken off the critical path."""
+        dispatched = self.stats["dispatched"]
+        return {
+            "enabled": self.enabled,
+            **self.stats,
+            "overlapped_ms": round(self.stats["overlapped_ms"], 1),
+            "avg_overlapped_ms": round(self.stats["overlapped_ms"] / dispatched, 2) if dispatched else 0.0
+        }
@@ -0,0 +1,288 @@
+"""
+Per-model parameter compatibility for OpenRouter Anthropic Server.
+
+Providers behind OpenRouter differ in which request parameters they
+accept: reasoning models reject temperature, OpenAI models ignore top_k
+and reject more than four stop sequences, newer Claude models reject
+temperature together with top_p, some models take no tools at all.
+Sending such a parameter costs a failed round-trip, or is silently
+ignored.
+
+This service keeps a capability table per model family and normalizes
+each LiteLLM request before it is sent. Depending on the parameter, it
+drops it, clamps it into range, or translates it to the closest
+supported form. Every change is recorded on the conversion metadata and
+counted per model.
+
+An upstream 400 whose error names a sampling parameter of the request as
+unsupported, in one of the forms providers use for that (e.g.
+"Unsupported parameter: 'top_p'"), is remembered for that model family
+for PARAMETER_REJECTION_TTL seconds. Until then later requests drop that
+parameter, and the failed request is retried once without it. Tools are
+never learned: a 400 about a tool schema must not strip tools from every
+later request.
+"""
+
+import re
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from src.utils.config import config
+from .base import BaseService
+from .token_counting import get_model_family
+
+ALL_TOOL_CHOICES = frozenset({"auto", "none", "required", "function"})
+
+# Closest accepted tool_choice, from the most to the least specific
+TOOL_CHOICE_FALLBACKS = {"function": ("required", "auto"), "required": ("auto",)}
+
+# Parameters an upstream rejection can be learned for
+LEARNABLE_PARAMETERS = ("temperature", "top_p", "top_k", "stop")
+
+# Provider error forms that name a parameter ({param}) as not accepted
+_REJECTION_FORMS = (
+    r"unsupported parameter:?\s*['\"`]?{param}\b",                  # OpenAI
+    r"unsupported value:\s*['\"`]{param}['\"`]",                    # OpenAI reasoning models
+    r"unrecognized request arguments? supplied:\s*(?:\w+,\s*)*{param}\b",
+    r"(?:^|[\s.,;])['\"`]?{param}['\"`]?:\s*(?:extra inputs are not permitted|unrecognized|unsupported|not supported)",
+    r"['\"`]{param}['\"`] (?:parameter )?is (?:not supported|unsupported|not permitted|not allowed)",
+    r"(?:does not|doesn't) support (?:the )?['\"`]?{param}['\"`]? parameter",
+    r"unknown (?:parameter|field):?\s*['\"`]?{param}\b",
+)
+
+_REJECTION_PATTERNS = {
+    param: re.compile("|".join(form.format(param=re.escape(param)) for form in _REJECTION_FORMS), re.IGNORECASE)
+    for param in LEARNABLE_PARAMETERS
+}
+
+
+@dataclass(frozen=True)
+class ModelCapabilities:
+    """Request parameters a model family accepts."""
+    temperature_range: Optional[Tuple[float, float]] = (0.0, 2.0)  # None: temperature unsupported
+    top_p: bool = True
+    top_k: bool = True
+    temperature_with_top_p: bool = True
+    max_stop_sequences: Optional[int] = None  # None: no limit, 0: stop unsupported
+    tools: bool = True
+    tool_choices: FrozenSet[str] = field(default=ALL_TOOL_CHOICES)
+
+
+# Used for models the table does not know: nothing is changed but tool_choice without tools
+DEFAULT_CAPABILITIES = ModelCapabilities()
+
+_REASONING = ModelCapabilities(temperature_range=None, top_p=False, top_k=False, max_stop_sequences=0)
+
+# Known capabilities by model family (see get_model_family); variants match by longest prefix
+MODEL_CAPABILITIES: Dict[str, ModelCapabilities] = {
+    "anthropic/claude": ModelCapabilities(temperature_range=(0.0, 1.0)),
+    "anthropic/claude-opus-4.1": ModelCapabilities(temperature_range=(0.0, 1.0), temperature_with_top_p=False),
+    "anthropic/claude-sonnet-4.5": ModelCapabilities(temperature_range=(0.0, 1.0), temperature_with_top_p=False),
+    "anthropic/claude-haiku-4.5": ModelCapabilities(temperature_range=(0.0, 1.0), temperature_with_top_p=False),
+    "openai/gpt": ModelCapabilities(top_k=False, max_stop_sequences=4),
+    "openai/gpt-5": _REASONING,
+    "openai/o1": _REASONING,
+    "openai/o1-mini": replace(_REASONING, tools=False, tool_choices=frozenset()),
+    "openai/o3": _REASONING,
+    "openai/o4-mini": _REASONING,
+    "google/gemini": ModelCapabilities(max_stop_sequences=5),
+}
+
+
+def _tool_choice_variant(tool_choice: Any) -> str:
+    """Name a LiteLLM tool_choice: auto, none, required or function."""
+    if isinstance(tool_choice, dict):
+        return str(tool_choice.get("type", "auto"))
+    return str(tool_choice)
+
+
+class ParameterCompatibilityService(BaseService):
+    """Service that fits LiteLLM request parameters to what the target model accepts."""
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        overrides: Optional[Dict[str, Dict[str, Any]]] = None,
+        rejection_ttl: Optional[float] = None
+    ):
+        """Initialize the capability table from config unless overridden."""
+        super().__init__("ParameterCompatibility")
+        self.enabled = config.parameter_normalization_enabled if enabled is None else enabled
+        self.rejection_ttl = config.parameter_rejection_ttl if rejection_ttl is None else rejection_ttl
+        self.capabilities: Dict[str, ModelCapabilities] = dict(MODEL_CAPABILITIES)
+        overrides = config.model_parameter_capabilities if overrides is None else overrides
+        for family, settings in overrides.items():
+            settings = dict(settings)
+            if settings.get("temperature_range") is not None:
+                settings["temperature_range"] = tuple(settings["temperature_range"])
+            if "tool_choices" in settings:
+                settings["tool_choices"] = frozenset(settings["tool_choices"])
+            self.capabilities[family] = replace(self.get_capabilities(family), **settings)
+        # Learned rejections: model family -> parameter -> monotonic expiry
+        self._learned: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            "requests": 0,
+            "normalized_requests": 0,
+            "dropped": 0,
+            "clamped": 0,
+            "translated": 0,
+            "rejections_learned": 0
+        }
+        self._model_changes: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def get_capabilities(self, model: str) -> ModelCapabilities:
+        """Look up a model's capabilities by its family, falling back to the longest known prefix."""
+        family = get_model_family(model).split(":", 1)[0]
+        if family in self.capabilities:
+            return self.capabilities[family]
+        matches = [known for known in self.capabilities if family.startswith(known)]
+        if not matches:
+            return DEFAULT_CAPABILITIES
+        return self.capabilities[max(matches, key=len)]
+
+    def normalize(self, request_data: Dict[str, Any]) -> List[str]:
+        """
+        Drop, clamp or translate parameters the request's model does not accept.
+
+        Args:
+            request_data: LiteLLM request, changed in place
+
+        Returns:
+            Description of each change made, e.g. "top_k: dropped"
+        """
+        if not self.enabled:
+            return []
+        model = request_data.get("model", "unknown")
+        caps = self.get_capabilities(model)
+        changes: List[Tuple[str, str, str]] = []
+
+        def drop(param: str, reason: str) -> None:
+            if param in request_data:
+                del request_data[param]
+                changes.append((param, "dropped", reason))
+
+        for param in self._learned_parameters(get_model_family(model)):
+            drop(param, "rejected upstream")
+
+        temperature = request_data.get("temperature")
+        if temperature is not None:
+            if caps.temperature_range is None:
+                drop("temperature", "unsupported")
+            else:
+                low, high = caps.temperature_range
+                clamped = min(max(temperature, low), high)
+                if clamped != temperature:
+                    request_data["temperature"] = clamped
+                    changes.append(("temperature", "clamped", f"{temperature} -> {clamped}"))
+        if "top_p" in request_data and not caps.top_p:
+            drop("top_p", "unsupported")
+        if "top_k" in request_data and not caps.top_k:
+            drop("top_k", "unsupported")
+        if not caps.temperature_with_top_p and "temperature" in request_data and "top_p" in request_data:
+            # The request default temperature (1.0) gives way to an explicit top_p
+            drop("top_p" if request_data["temperature"] != 1.0 else "temperature", "exclusive with the other")
+
+        stop = request_data.get("stop")
+        if stop and caps.max_stop_sequences is not None:
+            if caps.max_stop_sequences == 0:
+                drop("stop", "unsupported")
+            elif isinstance(stop, list) and len(stop) > caps.max_stop_sequences:
+                request_data["stop"] = stop[:caps.max_stop_sequences]
+                changes.append(("stop", "clamped", f"{len(stop)} -> {caps.max_stop_sequences} sequences"))
+
+        if request_data.get("tools") and not caps.tools:
+            drop("tools", "unsupported")
+        if "tool_choice" in request_data:
+            self._normalize_tool_choice(request_data, caps, changes, drop)
+
+        self._record(model, changes)
+        return [f"{param}: {action} ({detail})" for param, action, detail in changes]
+
+    @staticmethod
+    def _normalize_tool_choice(
+        request_data: Dict[str, Any],
+        caps: ModelCapabilities,
+        changes: List[Tuple[str, str, str]],
+        drop: Callable[[str, str], None]
+    ) -> None:
+        """Fit tool_choice to the variants the model accepts."""
+        if not request_data.get("tools"):
+            drop("tool_choice", "no tools")
+            return
+        variant = _tool_choice_variant(request_data["tool_choice"])
+        if variant in caps.tool_choices:
+            return
+        for fallback in TOOL_CHOICE_FALLBACKS.get(variant, ()):
+            if fallback in caps.tool_choices:
+                request_data["tool_choice"] = fallback
+                changes.append(("tool_choice", "translated", f"{variant} -> {fallback}"))
+                return
+        if variant == "none":
+            # Not offering the tools is what tool_choice none asks for
+            drop("tools", "tool_choice none unsupported")
+        drop("tool_choice", "unsupported")
+
+    def _learned_parameters(self, family: str) -> List[str]:
+        """Parameters learned as rejected for a model family, forgetting expired ones."""
+        learned = self._learned.get(family)
+        if not learned:
+            return []
+        now = time.monotonic()
+        with self._lock:
+            for param in [param for param, expires in learned.items() if expires <= now]:
+                del learned[param]
+            return list(learned)
+
+    def learn_rejection(self, request_data: Dict[str, Any], error: BaseException) -> List[str]:
+        """
+        Remember parameters an upstream 400 rejected, and drop them from the request.
+
+        Args:
+            request_data: LiteLLM request that failed, changed in place
+            error: The upstream error
+
+        Returns:
+            Parameters dropped (empty when the error does not name a parameter of the request as unsupported)
+        """
+        if not self.enabled or getattr(error, "status_code", None) != 400:
+            return []
+        message = str(error)
+        rejected = [param for param in LEARNABLE_PARAMETERS
+                    if param in request_data and _REJECTION_PATTERNS[param].search(message)]
+        if not rejected:
+            return []
+
+        model = request_data.get("model", "unknown")
+        expires = time.monotonic() + self.rejection_ttl
+        with self._lock:
+            self._learned[get_model_family(model)].update((param, expires) for param in rejected)
+            self.stats["rejections_learned"] += 1
+        for param in rejected:
+            del request_data[param]
+        self.logger.warning("🧹 Upstream rejected request parameters, dropping them for this model",
+                            model=model, parameters=rejected, ttl_seconds=self.rejection_ttl)
+        return rejected
+
+    def _record(self, model: str, changes: List[Tuple[str, str, str]]) -> None:
+        with self._lock:
+            self.stats["requests"] += 1
+            if not changes:
+                return
+            self.stats["normalized_requests"] += 1
+            for param, action, _ in changes:
+                self.stats[action] += 1
+                self._model_changes[get_model_family(model)][f"{param}_{action}"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get normalization counters overall and per model family."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                **self.stats,
+                "models": {family: dict(changes) for family, changes in self._model_changes.items()},
+                "learned_rejections": {family: sorted(params) for family, params in self._learned.items() if params}
+            }
@@ -0,0 +1,315 @@
+"""
+Native passthrough for Anthropic-compatible upstreams.
+
+Requests whose model matches a configured passthrough route skip the
+Anthropic <-> OpenAI conversion entirely: the request body is forwarded
+as-is apart from an in-place model rewrite, headers are rewritten for the
+upstream, and the response bytes (JSON or SSE) are streamed straight back.
+Logging and usage metering run as optional hooks on the byte stream.
+"""
+
+import fnmatch
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Mapping, Optional, Tuple
+
+import httpx
+
+from src.utils.config import config
+from .base import BaseService
+from .http_client import get_shared_async_client
+
+# Request headers that never go upstream (hop-by-hop, or rewritten per route)
+_DROPPED_REQUEST_HEADERS = {
+    "host", "content-length", "connection", "keep-alive", "transfer-encoding",
+    "te", "upgrade", "proxy-authorization", "proxy-connection"
+}
+# Response headers that must not be copied back to the client
+_DROPPED_RESPONSE_HEADERS = {"connection", "keep-alive", "transfer-encoding", "content-length"}
+
+_STRING = re.compile(rb'"(?:[^"\\]|\\.)*"')
+_USAGE_OBJECT = re.compile(rb'"usage"\s*:\s*(\{[^{}]*\})')
+_MODEL_FIELD = re.compile(rb'"model"\s*:\s*("(?:[^"\\]|\\.)*")')
+
+
+@dataclass
+class PassthroughRoute:
+    """An Anthropic-compatible upstream and the models routed to it."""
+    name: str
+    base_url: str
+    models: List[str]
+    api_key: Optional[str] = None
+    model_map: Dict[str, str] = field(default_factory=dict)
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    def matches(self, model: str) -> bool:
+        """Check a client model name against the route's glob patterns."""
+        return any(fnmatch.fnmatchcase(model, pattern) for pattern in self.models)
+
+    def map_model(self, model: str) -> str:
+        """Map a client model name to the upstream model name."""
+        return self.model_map.get(model, model)
+
+
+@dataclass
+class PassthroughExchange:
+    """One forwarded request, passed to hooks when the response has been streamed."""
+    route: str
+    path: str
+    model: str
+    upstream_model: str
+    status_code: int
+    request_bytes: int
+    response_bytes: int = 0
+    ttfb_ms: float = 0.0
+    duration_ms: float = 0.0
+    usage: Dict[str, int] = field(default_factory=dict)
+    client: str = ""
+
+
+PassthroughHook = Callable[[PassthroughExchange], None]
+
+
+def find_top_level_model(body: bytes) -> Optional[Tuple[int, int, str]]:
+    """
+    Locate the top-level "model" string in a JSON request body without parsing it.
+
+    Returns:
+        (start, end, model) of the JSON string value, or None if absent
+    """
+    for match in _MODEL_FIELD.finditer(body):
+        # Depth of the key: count brackets outside string literals before it
+        prefix = _STRING.sub(b"", body[:match.start()])
+        depth = prefix.count(b"{") + prefix.count(b"[") - prefix.count(b"}") - prefix.count(b"]")
+        if depth == 1:
+            start, end = match.span(1)
+            return start, end, json.loads(body[start:end])
+    return None
+
+
+class UsageMeter:
+    """Collects Anthropic usage counts from a response as its bytes pass through."""
+
+    # Anthropic JSON responses end with the usage object, so only this much of the tail is kept
+    JSON_TAIL_BYTES = 4096
+
+    def __init__(self, event_stream: bool):
+        """Initialize the meter for an SSE event stream or a single JSON body."""
+        self.event_stream = event_stream
+        self.usage: Dict[str, int] = {}
+        self._buffer = b""
+
+    def feed(self, chunk: bytes) -> None:
+        """Scan a chunk; only SSE lines mentioning usage are parsed."""
+        if not self.event_stream:
+            self._buffer = (self._buffer + chunk)[-self.JSON_TAIL_BYTES:]
+            return
+        lines = (self._buffer + chunk).split(b"\n")
+        self._buffer = lines.pop()
+        for line in lines:
+            if b'"usage"' in line:
+                self._parse_event(line)
+
+    def finish(self) -> Dict[str, int]:
+        """Parse any trailing data and return the collected usage."""
+        if self.event_stream:
+            if b'"usage"' in self._buffer:
+                self._parse_event(self._buffer)
+        else:
+            match = _USAGE_OBJECT.search(self._buffer)
+            if match:
+                self._merge(match.group(1))
+        self._buffer = b""
+        return self.usage
+
+    def _parse_event(self, line: bytes) -> None:
+        if line.startswith(b"data:"):
+            line = line[5:]
+        try:
+            event = json.loads(line)
+        except ValueError:
+            return
+        usage = event.get("usage") or event.get("message", {}).get("usage")
+        if usage:
+            self._merge(usage)
+
+    def _merge(self, usage: Any) -> None:
+        if isinstance(usage, bytes):
+            try:
+                usage = json.loads(usage)
+            except ValueError:
+                return
+        for key, value in usage.items():
+            if isinstance(value, int):
+                # message_delta carries cumulative output_tokens, so keep the latest value
+                self.usage[key] = value
+
+
+class PassthroughService(BaseService):
+    """Service that forwards Anthropic-native requests to Anthropic-compatible upstreams."""
+
+    # Anthropic API endpoints that can be passed through unchanged
+    PASSTHROUGH_PATHS = ("/v1/messages", "/v1/messages/count_tokens")
+
+    def __init__(self, routes: Optional[List[PassthroughRoute]] = None, client: Optional[httpx.AsyncClient] = None):
+        """Initialize passthrough service from PASSTHROUGH_ROUTES unless routes are given."""
+        super().__init__("Passthrough")
+        if routes is None:
+            routes = [PassthroughRoute(**route) for route in config.passthrough_routes]
+        self.routes = routes
+        self._client = client
+        self.hooks: List[PassthroughHook] = []
+        self.metering_enabled = config.passthrough_metering_enabled
+        self.stats = {"requests": 0, "upstream_errors": 0, "request_bytes": 0, "response_bytes": 0}
+        if config.passthrough_log_requests:
+            self.add_hook(self._log_exchange)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.routes)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._client or get_shared_async_client()
+
+    def add_hook(self, hook: PassthroughHook) -> None:
+        """Register a hook called with each completed exchange (logging, metering, billing)."""
+        self.hooks.append(hook)
+
+    def match(self, model: str) -> Optional[PassthroughRoute]:
+        """Find the first route serving a model."""
+        for route in self.routes:
+            if route.matches(model):
+                return route
+        return None
+
+    def resolve(self, path: str, body: bytes) -> Optional[Tuple[PassthroughRoute, bytes, str, str]]:
+        """
+        Decide whether a request is passed through, and rewrite its model in place.
+
+        Returns:
+            (route, body, model, upstream_model) or None when the request takes the normal path
+        """
+        if not self.routes or path not in self.PASSTHROUGH_PATHS:
+            return None
+        located = find_top_level_model(body)
+        if located is None:
+            return None
+        start, end, model = located
+        route = self.match(model)
+        if route is None:
+            return None
+
+        upstream_model = route.map_model(model)
+        if upstream_model != model:
+            body = body[:start] + json.dumps(upstream_model).encode("utf-8") + body[end:]
+        return route, body, model, upstream_model
+
+    def build_headers(self, incoming: Mapping[str, str], route: PassthroughRoute) -> Dict[str, str]:
+        """Rewrite client headers for the upstream: strip hop-by-hop headers and apply route credentials."""
+        headers = {
+            name: value for name, value in incoming.items()
+            if name.lower() not in _DROPPED_REQUEST_HEADERS
+        }
+        if route.api_key:
+            for name in list(headers):
+                if name.lower() in ("x-api-key", "authorization"):
+                    del headers[name]
+            headers["x-api-key"] = route.api_key
+        headers.setdefault("anthropic-version", "2023-06-01")
+        if self.metering_enabled:
+            # Metering reads usage from the raw bytes, which must not be compressed
+            headers = {name: value for name, value in headers.items() if name.lower() != "accept-encoding"}
+            headers["accept-encoding"] = "identity"
+        headers.update(route.headers)
+        return headers
+
+    async def forward(
+        self,
+        route: PassthroughRoute,
+        path: str,
+        query: str,
+        body: bytes,
+        headers: Mapping[str, str],
+        model: str,
+        upstream_model: str,
+        client: str = ""
+    ) -> Tuple[int, Dict[str, str], AsyncIterator[bytes]]:
+        """
+        Send a request upstream and return its status, headers and raw body stream.
+
+        The stream closes the upstream response and runs hooks when it is exhausted.
+        """
+        url = route.base_url.rstrip("/") + path + (f"?{query}" if query else "")
+        start = time.perf_counter()
+        upstream_request = self.client.build_request(
+            "POST", url, content=body, headers=self.build_headers(headers, route)
+        )
+        try:
+            response = await self.client.send(upstream_request, stream=True)
+        except httpx.HTTPError:
+            self.stats["upstream_errors"] += 1
+            raise
+
+        exchange = PassthroughExchange(
+            route=route.name,
+            path=path,
+            model=model,
+            upstream_model=upstream_model,
+            status_code=response.status_code,
+            request_bytes=len(body),
+            ttfb_ms=(time.perf_counter() - start) * 1000,
+            client=client
+        )
+        response_headers = {
+            name: value for name, value in response.headers.items()
+            if name.lower() not in _DROPPED_RESPONSE_HEADERS
+        }
+        meter = None
+        if self.metering_enabled and self.hooks:
+            meter = UsageMeter(event_stream="text/event-stream" in response.headers.get("content-type", ""))
+
+        async def body_stream() -> AsyncIterator[bytes]:
+            try:
+                async for chunk in response.aiter_raw():
+                    exchange.response_bytes += len(chunk)
+                    if meter is not None:
+                        meter.feed(chunk)
+                    yield chunk
+            finally:
+                await response.aclose()
+                exchange.duration_ms = (time.perf_counter() - start) * 1000
+                if meter is not None:
+                    exchange.usage = meter.finish()
+                self._record(exchange)
+
+        return response.status_code, response_headers, body_stream()
+
+    def _record(self, exchange: PassthroughExchange) -> None:
+        self.stats["requests"] += 1
+        self.stats["request_bytes"] += exchange.request_bytes
+        self.stats["response_bytes"] += exchange.response_bytes
+        for hook in self.hooks:
+            try:
+                hook(exchange)
+            except Exception as e:
+                self.logger.warning("Passthrough hook failed", hook=getattr(hook, "__name__", str(hook)), error=str(e))
+
+    def _log_exchange(self, exchange: PassthroughExchange) -> None:
+        self.logger.info("⏩ Passthrough request completed",
+                         route=exchange.route,
+                         path=exchange.path,
+                         model=exchange.model,
+                         upstream_model=exchange.upstream_model,
+                         status_code=exchange.status_code,
+                         request_bytes=exchange.request_bytes,
+                         response_bytes=exchange.response_bytes,
+                         ttfb_ms=round(exchange.ttfb_ms, 2),
+                         duration_ms=round(exchange.duration_ms, 2),
+                         usage=exchange.usage or None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get passthrough statistics."""
+        return {**self.stats, "routes": [route.name for route in self.routes]}
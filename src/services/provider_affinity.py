@@ -0,0 +1,282 @@
+"""
+Conversation-affinity provider routing for OpenRouter Anthropic Server.
+
+OpenRouter spreads requests for a model over several providers, but a
+provider's prompt cache only pays off when the next turn of a
+conversation reaches the same provider. This service derives a session
+key from the conversation prefix, which stays the same from turn to turn:
+the model family, the system prompt, the tool names and the first user
+message. It then pins the session's OpenRouter provider preference with
+allow_fallbacks, so OpenRouter can still route around an outage.
+
+The provider pinned for a session is either:
+
+- picked by rendezvous hashing from PROVIDER_AFFINITY_PROVIDERS for the
+  model family, which spreads sessions evenly and keeps them stable, or
+- learned from the provider that served the session's first turn, for
+  models without a configured list. The provider is read from the
+  response, or for a client stream from its chunks once it has been
+  consumed.
+
+When the pinned provider fails, or OpenRouter served the turn from
+another provider, the provider is skipped for PROVIDER_FAILURE_COOLDOWN
+seconds. The session then moves to the next provider and stays there.
+
+Prompt and cache-read tokens are counted per session and in total, split
+into pinned and unpinned turns, to show the cache hit rate pinning gains.
+"""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.utils.config import config
+from src.utils.upstream_streams import observe_stream
+from .base import BaseService
+from .retry_policy import classify_error
+from .token_counting import get_model_family
+
+# Seconds a provider is skipped after it failed a pinned request
+PROVIDER_FAILURE_COOLDOWN = 60.0
+
+
+@dataclass
+class AffinitySession:
+    """Routing and cache usage of one conversation."""
+    key: str
+    model: str
+    provider: Optional[str] = None
+    turns: int = 0
+    fallbacks: int = 0
+    prompt_tokens: int = 0
+    cache_read_tokens: int = 0
+    last_seen: float = 0.0
+
+
+@dataclass
+class AffinityTicket:
+    """Provider pinned for one upstream attempt."""
+    session: AffinitySession
+    provider: Optional[str]
+
+
+def session_key(request_data: Dict[str, Any]) -> str:
+    """Stable key of a conversation: model family, system prompt, tool names and first user turn."""
+    prefix = []
+    for message in request_data.get("messages", []):
+        role = message.get("role") if isinstance(message, dict) else None
+        prefix.append([role, message.get("content") if isinstance(message, dict) else None])
+        if role == "user":
+            break
+    tools = [tool.get("function", {}).get("name") for tool in request_data.get("tools") or []
+             if isinstance(tool, dict)]
+    payload = json.dumps([get_model_family(request_data.get("model", "")), tools, prefix],
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _field(obj: Any, name: str) -> Any:
+    return obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+
+
+def cache_read_tokens(usage: Any) -> int:
+    """Prompt tokens a response read from the provider's cache."""
+    cached = _field(usage, "cache_read_input_tokens")
+    if not isinstance(cached, int):
+        cached = _field(_field(usage, "prompt_tokens_details"), "cached_tokens")
+    return cached if isinstance(cached, int) else 0
+
+
+class ProviderAffinityService(BaseService):
+    """Service that keeps each conversation on one upstream provider."""
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        providers: Optional[Dict[str, List[str]]] = None,
+        session_ttl: Optional[float] = None,
+        max_sessions: int = 10000
+    ):
+        """Initialize affinity routing from config unless overridden."""
+        super().__init__("ProviderAffinity")
+        self.enabled = config.provider_affinity_enabled if enabled is None else enabled
+        self.providers = config.provider_affinity_providers if providers is None else providers
+        self.session_ttl = config.provider_affinity_session_ttl if session_ttl is None else session_ttl
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, AffinitySession]" = OrderedDict()
+        self._cooling: Dict[Tuple[str, str], float] = {}
+        self.stats: Dict[str, int] = {
+            "pinned_requests": 0,
+            "unpinned_requests": 0,
+            "fallbacks": 0,
+            "pin_failures": 0,
+            "pinned_prompt_tokens": 0,
+            "pinned_cache_read_tokens": 0,
+            "unpinned_prompt_tokens": 0,
+            "unpinned_cache_read_tokens": 0
+        }
+
+    def pin(self, request_data: Dict[str, Any]) -> Optional[AffinityTicket]:
+        """
+        Pin the request's conversation to a provider.
+
+        Args:
+            request_data: LiteLLM request; gets the OpenRouter provider preference in extra_body
+
+        Returns:
+            AffinityTicket to report the outcome with, or None when disabled
+        """
+        if not self.enabled:
+            return None
+        model = request_data.get("model", "unknown")
+        session = self._session(session_key(request_data), model)
+
+        family = get_model_family(model)
+        if session.provider and self._is_cooling(family, session.provider):
+            session.provider = None
+        if session.provider is None:
+            session.provider = self._choose(family, session.key)
+
+        if session.provider:
+            self.stats["pinned_requests"] += 1
+            request_data["extra_body"] = {
+                **(request_data.get("extra_body") or {}),
+                "provider": {"order": [session.provider], "allow_fallbacks": True}
+            }
+        else:
+            self.stats["unpinned_requests"] += 1
+        return AffinityTicket(session=session, provider=session.provider)
+
+    def complete(self, ticket: Optional[AffinityTicket], response: Any) -> None:
+        """
+        Record a served turn: cache usage, and where OpenRouter actually routed it.
+
+        A client stream is recorded when it ends, from the provider and usage
+        its chunks carried.
+        """
+        if ticket is None:
+            return
+        seen: Dict[str, Any] = {"provider": None, "usage": None}
+
+        def on_chunk(chunk: Any) -> None:
+            provider, usage = _field(chunk, "provider"), _field(chunk, "usage")
+            if provider:
+                seen["provider"] = provider
+            if usage is not None:
+                seen["usage"] = usage
+
+        if observe_stream(response, on_chunk, lambda: self._record(ticket, seen["provider"], seen["usage"])):
+            return
+        self._record(ticket, getattr(response, "provider", None), getattr(response, "usage", None))
+
+    def _record(self, ticket: AffinityTicket, served: Any, usage: Any) -> None:
+        session = ticket.session
+        session.turns += 1
+
+        if isinstance(served, str) and served:
+            if ticket.provider and served != ticket.provider:
+                # OpenRouter fell back: the cache is now warm on the provider that served
+                session.fallbacks += 1
+                self.stats["fallbacks"] += 1
+                self._cool(session.model, ticket.provider)
+                self.logger.info("🧲 Pinned provider was bypassed, re-pinning session",
+                                 model=session.model, pinned=ticket.provider, served_by=served)
+            session.provider = served
+
+        prompt_tokens = _field(usage, "prompt_tokens")
+        if not isinstance(prompt_tokens, int):
+            return
+        cached = cache_read_tokens(usage)
+        session.prompt_tokens += prompt_tokens
+        session.cache_read_tokens += cached
+        kind = "pinned" if ticket.provider else "unpinned"
+        self.stats[f"{kind}_prompt_tokens"] += prompt_tokens
+        self.stats[f"{kind}_cache_read_tokens"] += cached
+
+    def failed(self, ticket: Optional[AffinityTicket], error: BaseException) -> None:
+        """Unpin a session whose provider failed, so its next attempt can go elsewhere."""
+        if ticket is None or not ticket.provider or classify_error(error) is None:
+            return
+        self.stats["pin_failures"] += 1
+        self._cool(ticket.session.model, ticket.provider)
+        if ticket.session.provider == ticket.provider:
+            ticket.session.provider = None
+        self.logger.warning("🧲 Pinned provider failed, unpinning session",
+                            model=ticket.session.model, provider=ticket.provider,
+                            error_type=type(error).__name__)
+
+    def _choose(self, family: str, key: str) -> Optional[str]:
+        """Rendezvous-hash the session onto a configured provider that is not cooling down."""
+        candidates = [provider for provider in self._providers_for(family)
+                      if not self._is_cooling(family, provider)]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda provider: hashlib.sha256(f"{key}:{provider}".encode()).digest())
+
+    def _providers_for(self, family: str) -> List[str]:
+        """Configured providers of a model family, by longest prefix."""
+        matches = [known for known in self.providers if family.startswith(known)]
+        return list(self.providers[max(matches, key=len)]) if matches else []
+
+    def _cool(self, model: str, provider: str) -> None:
+        self._cooling[(get_model_family(model), provider)] = time.time() + PROVIDER_FAILURE_COOLDOWN
+
+    def _is_cooling(self, family: str, provider: str) -> bool:
+        until = self._cooling.get((family, provider))
+        if until is None:
+            return False
+        if until <= time.time():
+            del self._cooling[(family, provider)]
+            return False
+        return True
+
+    def _session(self, key: str, model: str) -> AffinitySession:
+        """Get or create a session, dropping idle and least recently used ones."""
+        now = time.time()
+        session = self._sessions.get(key)
+        if session is None or now - session.last_seen > self.session_ttl:
+            session = AffinitySession(key=key, model=model)
+            self._sessions[key] = session
+        self._sessions.move_to_end(key)
+        session.last_seen = now
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return session
+
+    def get_sessions(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recently active sessions with their provider and cache usage."""
+        sessions = list(self._sessions.values())[-limit:] if limit > 0 else []
+        return [
+            {
+                "session": session.key[:16],
+                "model": session.model,
+                "provider": session.provider,
+                "turns": session.turns,
+                "fallbacks": session.fallbacks,
+                "prompt_tokens": session.prompt_tokens,
+                "cache_read_tokens": session.cache_read_tokens,
+                "cache_hit_ratio": round(session.cache_read_tokens / session.prompt_tokens, 3)
+                if session.prompt_tokens else None,
+                "last_seen": session.last_seen
+            }
+            for session in reversed(sessions)
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get affinity counters and cache hit ratios of pinned and unpinned turns."""
+        def ratio(kind: str) -> Optional[float]:
+            prompt = self.stats[f"{kind}_prompt_tokens"]
+            return round(self.stats[f"{kind}_cache_read_tokens"] / prompt, 3) if prompt else None
+
+        return {
+            "enabled": self.enabled,
+            "sessions": len(self._sessions),
+            **self.stats,
+            "pinned_cache_hit_ratio": ratio("pinned"),
+            "unpinned_cache_hit_ratio": ratio("unpinned"),
+            "cooling_providers": sorted(f"{family}:{provider}" for (family, provider), until
+                                        in self._cooling.items() if until > time.time())
+        }
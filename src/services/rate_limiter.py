@@ -0,0 +1,202 @@
+"""
+Per-client rate limiting for OpenRouter Anthropic Server.
+
+Each client (API key, or IP address when no key is sent) gets two token
+buckets: one for requests and one for estimated input tokens, both refilled
+continuously at their per-minute rate. A check refills and debits the
+buckets in constant time, independent of how many requests the client
+has made, and the per-client state lives in an LRU map so idle clients
+are evicted in O(1) as well.
+"""
+
+import hashlib
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from src.utils.config import config
+from .base import BaseService
+
+# Rough request-body bytes per input token, used to estimate token cost
+# from Content-Length without parsing the body
+BYTES_PER_TOKEN = 4
+
+# Tokens charged for a request without a usable Content-Length (e.g. a
+# chunked body): a typical agent request, so such clients are not waved through
+UNKNOWN_LENGTH_TOKENS = 8192
+
+
+class TokenBucket:
+    """Bucket holding up to capacity tokens, refilled at refill_rate per second."""
+
+    __slots__ = ("capacity", "refill_rate", "tokens", "updated")
+
+    def __init__(self, capacity: float, refill_rate: float, now: float):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = capacity
+        self.updated = now
+
+    def refill(self, now: float) -> None:
+        """Add the tokens accrued since the last refill."""
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+            self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount tokens are available (0 if they are now)."""
+        # A cost larger than the bucket only needs a full bucket
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_rate
+
+    def consume(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+
+@dataclass
+class RateLimitDecision:
+    """Outcome of a rate limit check."""
+    allowed: bool
+    client: str
+    limit_type: Optional[str] = None  # "requests" or "tokens" when rejected
+    retry_after: float = 0.0
+    requests_remaining: int = 0
+    tokens_remaining: int = 0
+
+    @property
+    def retry_after_header(self) -> str:
+        """Retry-After value in whole seconds, rounded up."""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class RateLimiterService(BaseService):
+    """Service that enforces per-client request and token rates."""
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        max_clients: Optional[int] = None,
+        enabled: Optional[bool] = None
+    ):
+        """Initialize rate limiter from config unless overridden."""
+        super().__init__("RateLimiter")
+        self.enabled = config.rate_limit_enabled if enabled is None else enabled
+        self.requests_per_minute = requests_per_minute or config.rate_limit_requests_per_minute
+        self.tokens_per_minute = tokens_per_minute or config.rate_limit_tokens_per_minute
+        self.max_clients = max_clients or config.rate_limit_max_clients
+        self._clients: "OrderedDict[str, Tuple[TokenBucket, TokenBucket]]" = OrderedDict()
+        self.stats: Dict[str, int] = {
+            "checked_requests": 0,
+            "rejected_requests": 0,
+            "rejected_by_requests": 0,
+            "rejected_by_tokens": 0,
+            "evicted_clients": 0
+        }
+
+    @staticmethod
+    def client_key(headers: Mapping[str, str], client_host: Optional[str]) -> str:
+        """
+        Identify the client of a request.
+
+        API keys are hashed so they never appear in stats or logs.
+        """
+        api_key = headers.get("x-api-key")
+        if not api_key:
+            authorization = headers.get("authorization", "")
+            if authorization.lower().startswith("bearer "):
+                api_key = authorization[7:].strip()
+        if api_key:
+            return "key:" + hashlib.blake2b(api_key.encode(), digest_size=8).hexdigest()
+        return f"ip:{client_host}" if client_host else "anonymous"
+
+    @staticmethod
+    def estimate_tokens(content_length: Optional[str]) -> int:
+        """Estimate input tokens from a Content-Length header value."""
+        try:
+            return max(1, int(content_length) // BYTES_PER_TOKEN)
+        except (TypeError, ValueError):
+            return UNKNOWN_LENGTH_TOKENS
+
+    def _buckets(self, client: str, now: float) -> Tuple[TokenBucket, TokenBucket]:
+        buckets = self._clients.get(client)
+        if buckets is None:
+            buckets = (
+                TokenBucket(self.requests_per_minute, self.requests_per_minute / 60.0, now),
+                TokenBucket(self.tokens_per_minute, self.tokens_per_minute / 60.0, now)
+            )
+            self._clients[client] = buckets
+            if len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+                self.stats["evicted_clients"] += 1
+        else:
+            self._clients.move_to_end(client)
+        return buckets
+
+    def check(
+        self,
+        client: str,
+        tokens: int = 1,
+        now: Optional[float] = None,
+        requests: int = 1
+    ) -> RateLimitDecision:
+        """
+        Admit or reject one call from a client.
+
+        Both buckets are debited only when both have room, so a request
+        rejected on tokens does not use up a request slot.
+
+        Args:
+            client: Client key from client_key()
+            tokens: Estimated input tokens of the request
+            now: Monotonic timestamp (defaults to time.monotonic())
+            requests: Requests the call carries (the item count of a batch)
+
+        Returns:
+            RateLimitDecision, with retry_after set when rejected
+        """
+        if now is None:
+            now = time.monotonic()
+        self.stats["checked_requests"] += 1
+        request_bucket, token_bucket = self._buckets(client, now)
+        request_bucket.refill(now)
+        token_bucket.refill(now)
+
+        request_wait = request_bucket.wait_time(requests)
+        token_wait = token_bucket.wait_time(tokens)
+        if request_wait or token_wait:
+            limit_type = "requests" if request_wait >= token_wait else "tokens"
+            self.stats["rejected_requests"] += 1
+            self.stats[f"rejected_by_{limit_type}"] += 1
+            return RateLimitDecision(
+                allowed=False,
+                client=client,
+                limit_type=limit_type,
+                retry_after=max(request_wait, token_wait),
+                requests_remaining=int(request_bucket.tokens),
+                tokens_remaining=int(token_bucket.tokens)
+            )
+
+        request_bucket.consume(requests)
+        token_bucket.consume(tokens)
+        return RateLimitDecision(
+            allowed=True,
+            client=client,
+            requests_remaining=int(request_bucket.tokens),
+            tokens_remaining=int(token_bucket.tokens)
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get rate limiting statistics."""
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "requests_per_minute": self.requests_per_minute,
+            "tokens_per_minute": self.tokens_per_minute,
+            "tracked_clients": len(self._clients)
+        }
@@ -0,0 +1,252 @@
+"""
+Request lanes (priority classes) for OpenRouter Anthropic Server.
+
+Claude Code mixes cheap background calls (titles, quick checks on
+haiku-class models) with heavy main-loop requests. Each request is
+classified into a lane with its own concurrency pool, and all lanes share
+the MAX_CONCURRENT_REQUESTS ceiling:
+
+- the main lane may not take the slots reserved for background calls,
+- when a slot frees up, waiting background calls are admitted first,
+- background calls run a lightweight pipeline profile that skips
+  non-essential stages.
+
+So background calls keep low latency while heavy requests saturate the proxy.
+A streamed request holds its slot until the client has consumed or dropped
+the stream, not just until the upstream call returns.
+A request that waits longer than REQUEST_LANE_MAX_QUEUE_WAIT seconds for a
+slot is turned away with a 529 overloaded_error, which clients retry with
+backoff, instead of queueing until it times out.
+"""
+
+import asyncio
+import fnmatch
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from src.models.anthropic import MessagesRequest
+from src.utils.config import config
+from src.utils.upstream_streams import observe_stream
+from .base import BaseService
+
+
+@dataclass(frozen=True)
+class PipelineProfile:
+    """Which optional stages of the message workflow run for a request."""
+    name: str
+    mixed_content_detection: bool = True
+    tool_result_compaction: bool = True
+    debug_capture: bool = True
+
+
+FULL_PROFILE = PipelineProfile(name="full")
+LIGHTWEIGHT_PROFILE = PipelineProfile(
+    name="lightweight",
+    mixed_content_detection=False,
+    tool_result_compaction=False,
+    debug_capture=False
+)
+PIPELINE_PROFILES = {profile.name: profile for profile in (FULL_PROFILE, LIGHTWEIGHT_PROFILE)}
+
+MAIN_LANE = "main"
+BACKGROUND_LANE = "background"
+
+
+@dataclass
+class RequestLane:
+    """A request class with its own concurrency pool and queue priority."""
+    name: str
+    max_concurrent: int
+    priority: int  # lower is admitted first
+    profile: PipelineProfile = FULL_PROFILE
+    active: int = 0
+    waiters: Deque["asyncio.Future[None]"] = field(default_factory=deque, repr=False)
+    queued_since: Dict["asyncio.Future[None]", float] = field(default_factory=dict, repr=False)
+    stats: Dict[str, Any] = field(default_factory=lambda: {
+        "admitted": 0, "queued": 0, "timed_out": 0, "total_wait_ms": 0.0, "max_wait_ms": 0.0
+    }, repr=False)
+
+
+def get_pipeline_profile(name: Optional[str]) -> PipelineProfile:
+    """Look up a pipeline profile by name, defaulting to the full pipeline."""
+    return PIPELINE_PROFILES.get(name or FULL_PROFILE.name, FULL_PROFILE)
+
+
+class RequestLaneService(BaseService):
+    """Service that classifies requests into lanes and admits them by priority."""
+
+    def __init__(
+        self,
+        max_concurrent: Optional[int] = None,
+        background_max_concurrent: Optional[int] = None,
+        background_reserved_slots: Optional[int] = None,
+        background_model_patterns: Optional[List[str]] = None,
+        enabled: Optional[bool] = None,
+        max_queue_wait: Optional[float] = None
+    ):
+        """Initialize lanes from config unless overridden."""
+        super().__init__("RequestLanes")
+        self.enabled = config.request_lanes_enabled if enabled is None else enabled
+        self.max_concurrent = max_concurrent or config.max_concurrent_requests
+        self.max_queue_wait = config.request_lane_max_queue_wait if max_queue_wait is None else max_queue_wait
+        reserved = config.background_reserved_slots if background_reserved_slots is None else background_reserved_slots
+        self.background_model_patterns = [
+            pattern.lower() for pattern in (
+                background_model_patterns if background_model_patterns is not None
+                else config.background_model_patterns
+            )
+        ]
+        self.active = 0
+        self.lanes: Dict[str, RequestLane] = {
+            BACKGROUND_LANE: RequestLane(
+                name=BACKGROUND_LANE,
+                max_concurrent=background_max_concurrent or config.background_max_concurrent,
+                priority=0,
+                profile=LIGHTWEIGHT_PROFILE if config.background_lightweight_pipeline else FULL_PROFILE
+            ),
+            MAIN_LANE: RequestLane(
+                name=MAIN_LANE,
+                max_concurrent=max(1, self.max_concurrent - reserved),
+                priority=1
+            )
+        }
+        self._by_priority = sorted(self.lanes.values(), key=lambda lane: lane.priority)
+
+    def classify(self, request: MessagesRequest) -> RequestLane:
+        """Pick the lane for a request from the model name the client asked for."""
+        model = (request.original_model or request.model or "").lower()
+        if any(fnmatch.fnmatchcase(model, pattern) for pattern in self.background_model_patterns):
+            return self.lanes[BACKGROUND_LANE]
+        return self.lanes[MAIN_LANE]
+
+    def _has_capacity(self, lane: RequestLane) -> bool:
+        return self.active < self.max_concurrent and lane.active < lane.max_concurrent
+
+    def _start(self, lane: RequestLane) -> None:
+        lane.active += 1
+        self.active += 1
+        lane.stats["admitted"] += 1
+
+    def _release(self, lane: RequestLane) -> None:
+        lane.active -= 1
+        self.active -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Hand free slots to waiters, highest-priority lane first."""
+        admitted = True
+        while admitted:
+            admitted = False
+            for lane in self._by_priority:
+                while lane.waiters and lane.waiters[0].done():
+                    lane.waiters.popleft()  # cancelled while queued
+                if lane.waiters and self._has_capacity(lane):
+                    self._start(lane)
+                    lane.waiters.popleft().set_result(None)
+                    admitted = True
+                    break
+
+    async def acquire(self, lane: RequestLane, request_id: str = "unknown") -> None:
+        """
+        Take a slot in a lane, to be given back with release().
+
+        Requests queue when their lane or the shared ceiling is full; a
+        cancelled request (e.g. client disconnect) leaves the queue or frees
+        its slot.
+
+        Raises:
+            HTTPException: 529 when no slot frees up within max_queue_wait
+        """
+        if not self.enabled:
+            return
+
+        if lane.waiters or not self._has_capacity(lane):
+            waiter = asyncio.get_running_loop().create_future()
+            lane.waiters.append(waiter)
+            lane.stats["queued"] += 1
+            start = time.perf_counter()
+            lane.queued_since[waiter] = start
+            try:
+                await asyncio.wait({waiter}, timeout=self.max_queue_wait or None)
+            except asyncio.CancelledError:
+                if waiter.done():
+                    # Admitted just as we were cancelled: give the slot back
+                    self._release(lane)
+                waiter.cancel()
+                raise
+            finally:
+                del lane.queued_since[waiter]
+            if not waiter.done():
+                waiter.cancel()
+                lane.stats["timed_out"] += 1
+                self.logger.warning("🚦 Request queue wait exceeded, rejecting as overloaded",
+                                    lane=lane.name,
+                                    request_id=request_id,
+                                    max_queue_wait=self.max_queue_wait)
+                raise HTTPException(
+                    status_code=529,
+                    detail=f"Overloaded: no {lane.name} lane slot within {self.max_queue_wait:g}s"
+                )
+            wait_ms = (time.perf_counter() - start) * 1000
+            lane.stats["total_wait_ms"] += wait_ms
+            lane.stats["max_wait_ms"] = max(lane.stats["max_wait_ms"], wait_ms)
+            self.logger.info("🚦 Request admitted from queue",
+                             lane=lane.name,
+                             request_id=request_id,
+                             wait_ms=round(wait_ms, 2))
+        else:
+            self._start(lane)
+
+    def release(self, lane: RequestLane) -> None:
+        """Give back a slot taken with acquire()."""
+        if self.enabled:
+            self._release(lane)
+
+    def release_after_stream(self, lane: RequestLane, response: Any) -> None:
+        """Give back a slot once the client stream in response ends or is dropped (at once for anything else)."""
+        if self.enabled and not observe_stream(response, on_end=lambda: self._release(lane)):
+            self._release(lane)
+
+    @asynccontextmanager
+    async def admit(self, lane: RequestLane, request_id: str = "unknown") -> AsyncIterator[RequestLane]:
+        """Hold a slot in a lane for the duration of the block (see acquire)."""
+        await self.acquire(lane, request_id=request_id)
+        try:
+            yield lane
+        finally:
+            self.release(lane)
+
+    def oldest_wait_ms(self) -> float:
+        """How long the longest-waiting queued request has waited, in any lane."""
+        started = [since for lane in self.lanes.values() for since in lane.queued_since.values()]
+        return (time.perf_counter() - min(started)) * 1000 if started else 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-lane concurrency and queueing statistics."""
+        return {
+            "enabled": self.enabled,
+            "max_concurrent": self.max_concurrent,
+            "max_queue_wait": self.max_queue_wait,
+            "active": self.active,
+            "lanes": {
+                lane.name: {
+                    "max_concurrent": lane.max_concurrent,
+                    "priority": lane.priority,
+                    "profile": lane.profile.name,
+                    "active": lane.active,
+                    "waiting": sum(1 for waiter in lane.waiters if not waiter.done()),
+                    "admitted": lane.stats["admitted"],
+                    "queued": lane.stats["queued"],
+                    "timed_out": lane.stats["timed_out"],
+                    "avg_wait_ms": round(lane.stats["total_wait_ms"] / lane.stats["queued"], 2)
+                    if lane.stats["queued"] else 0.0,
+                    "max_wait_ms": round(lane.stats["max_wait_ms"], 2)
+                }
+                for lane in self._by_priority
+            }
+        }
@@ -0,0 +1,318 @@
+"""
+Upstream retry policy for OpenRouter Anthropic Server.
+
+Failed upstream calls are classified and retried according to a policy
+per error class:
+
+- rate_limit: HTTP 429,
+- server_error: HTTP 5xx,
+- connection: connection refused or reset, broken transport,
+- timeout: connect, read or deadline timeouts.
+
+Each class has a maximum number of attempts and an exponential backoff
+with full jitter (a random delay up to base_delay * 2^retry, capped at
+max_delay). A Retry-After (or retry-after-ms) header from the upstream
+takes precedence when it asks for a longer wait; one asking for more than
+the class's max_delay is not waited out and the error is returned at once.
+Other errors (4xx, cancellation) are never retried.
+
+A global retry budget keeps an outage from turning into a retry storm:
+every upstream request deposits RETRY_BUDGET_RATIO tokens, the budget
+refills by RETRY_BUDGET_MIN_PER_SECOND tokens per second so quiet
+periods can still retry, and every retry withdraws one token.
+
+Layers that retry on their own schedule (stalled stream recovery) take
+their retries from the same budget with allow_retry(), and mark the error
+they finally give up with so run() does not retry it once more.
+
+Retries are counted per class and model for /health/detailed, and the
+retries made for a client request are reported in its
+X-Upstream-Retries and X-Upstream-Retry-Reasons response headers.
+"""
+
+import asyncio
+import email.utils
+import random
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional
+
+import httpx
+import litellm
+
+from src.utils.config import config
+from .base import BaseService
+
+# Tokens the retry budget can accumulate, bounding a burst of retries
+RETRY_BUDGET_BURST = 10.0
+
+# Policies used for classes RETRY_POLICIES does not override
+DEFAULT_RETRY_POLICIES: Dict[str, Dict[str, float]] = {
+    "rate_limit": {"max_attempts": 4, "base_delay": 1.0, "max_delay": 30.0},
+    "server_error": {"max_attempts": 3, "base_delay": 0.5, "max_delay": 8.0},
+    "connection": {"max_attempts": 3, "base_delay": 0.2, "max_delay": 4.0},
+    "timeout": {"max_attempts": 2, "base_delay": 0.5, "max_delay": 4.0}
+}
+
+# Retries made for the current client request, set up by the error handling middleware
+_request_retries: ContextVar[Optional[Dict[str, Any]]] = ContextVar("upstream_retries", default=None)
+
+
+@dataclass
+class RetryPolicy:
+    """How one class of upstream errors is retried."""
+    max_attempts: int
+    base_delay: float
+    max_delay: float
+
+    def backoff(self, retry: int) -> float:
+        """Full-jitter exponential backoff before the given retry (1 for the first)."""
+        return random.uniform(0.0, min(self.max_delay, self.base_delay * 2 ** (retry - 1)))
+
+
+def classify_error(error: BaseException) -> Optional[str]:
+    """
+    Map an upstream error to its retry class.
+
+    Returns:
+        "rate_limit", "server_error", "connection", "timeout", or None when
+        the error must not be retried
+    """
+    if isinstance(error, (litellm.Timeout, asyncio.TimeoutError, httpx.TimeoutException)):
+        return "timeout"
+    # Checked before the status code: LiteLLM reports connection errors as 500
+    if isinstance(error, (litellm.APIConnectionError, httpx.TransportError, ConnectionError)):
+        return "connection"
+    status_code = getattr(error, "status_code", None)
+    if not isinstance(status_code, int):
+        return None
+    if status_code == 429:
+        return "rate_limit"
+    if status_code >= 500:
+        return "server_error"
+    return None
+
+
+def mark_retries_exhausted(error: BaseException) -> BaseException:
+    """Flag an error whose retries were already made, so run() does not retry it again."""
+    error.upstream_retries_exhausted = True
+    return error
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Wait the upstream asked for in Retry-After or retry-after-ms, if any."""
+    headers = getattr(error, "litellm_response_headers", None)
+    if not isinstance(headers, Mapping):
+        headers = getattr(getattr(error, "response", None), "headers", None)
+    if not isinstance(headers, Mapping):
+        return None
+    headers = {str(key).lower(): value for key, value in headers.items()}
+
+    try:
+        if "retry-after-ms" in headers:
+            return max(float(headers["retry-after-ms"]) / 1000, 0.0)
+        if "retry-after" in headers:
+            return max(float(headers["retry-after"]), 0.0)
+    except (TypeError, ValueError):
+        pass
+    try:
+        # Retry-After may also be an HTTP date
+        retry_at = email.utils.parsedate_to_datetime(headers["retry-after"])
+        return max(retry_at.timestamp() - time.time(), 0.0)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class RetryPolicyService(BaseService):
+    """Service that retries failed upstream calls by error class within a global budget."""
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        policies: Optional[Dict[str, Dict[str, float]]] = None,
+        budget_ratio: Optional[float] = None,
+        budget_min_per_second: Optional[float] = None
+    ):
+        """Initialize retry policies from config unless overridden."""
+        super().__init__("RetryPolicy")
+        self.enabled = config.retry_policy_enabled if enabled is None else enabled
+        overrides = config.retry_policies if policies is None else policies
+        self.policies: Dict[str, RetryPolicy] = {}
+        for error_class, defaults in DEFAULT_RETRY_POLICIES.items():
+            settings = {**defaults, **overrides.get(error_class, {})}
+            self.policies[error_class] = RetryPolicy(
+                max_attempts=int(settings["max_attempts"]),
+                base_delay=float(settings["base_delay"]),
+                max_delay=float(settings["max_delay"])
+            )
+        self.budget_ratio = config.retry_budget_ratio if budget_ratio is None else budget_ratio
+        self.budget_min_per_second = (
+            config.retry_budget_min_per_second if budget_min_per_second is None else budget_min_per_second
+        )
+        self._budget = RETRY_BUDGET_BURST
+        self._budget_updated = time.monotonic()
+        self.stats: Dict[str, int] = {
+            "requests": 0,
+            "retries": 0,
+            "recovered_requests": 0,
+            "failed_after_retries": 0,
+            "retry_after_honored": 0,
+            "retry_after_too_long": 0,
+            "budget_exhausted": 0
+        }
+        self._class_stats: Dict[str, Dict[str, int]] = {
+            error_class: {"retries": 0, "exhausted": 0} for error_class in self.policies
+        }
+        self._model_retries: Dict[str, int] = defaultdict(int)
+
+    async def run(self, model: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Make an upstream call, retrying retryable failures by policy.
+
+        Args:
+            model: Upstream model, for attribution
+            call: Makes one attempt of the upstream call
+
+        Returns:
+            The first successful attempt's response
+
+        Raises:
+            The last attempt's error when it is not retryable, its class ran
+            out of attempts, or the retry budget is exhausted
+        """
+        if not self.enabled:
+            return await call()
+
+        self.stats["requests"] += 1
+        self._refill(self.budget_ratio)
+        retries = 0
+        while True:
+            try:
+                response = await call()
+            except Exception as e:
+                error_class = None if getattr(e, "upstream_retries_exhausted", False) else classify_error(e)
+                delay = self._retry_delay(e, error_class, retries + 1)
+                if delay is None:
+                    if retries:
+                        self.stats["failed_after_retries"] += 1
+                    raise
+                retries += 1
+                self._attribute(error_class, model)
+                self.logger.warning("🔁 Retrying upstream call",
+                                    model=model, error_class=error_class,
+                                    error_type=type(e).__name__, retry=retries,
+                                    delay=round(delay, 2))
+                await asyncio.sleep(delay)
+                continue
+
+            if retries:
+                self.stats["recovered_requests"] += 1
+            return response
+
+    def allow_retry(self, error_class: str, model: str) -> bool:
+        """
+        Take a retry made outside run() from the budget and count it.
+
+        Returns:
+            False when the retry budget is exhausted and the caller must give up
+        """
+        if not self.enabled:
+            return True
+        if not self._withdraw():
+            self.stats["budget_exhausted"] += 1
+            self.logger.warning("🪫 Retry budget exhausted, not retrying upstream call",
+                                error_class=error_class)
+            return False
+        self._attribute(error_class, model)
+        return True
+
+    def _retry_delay(self, error: BaseException, error_class: Optional[str], attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying after the given failed attempt, or None to give up."""
+        if error_class is None:
+            return None
+        policy = self.policies[error_class]
+        if attempt >= policy.max_attempts:
+            self._class_stats[error_class]["exhausted"] += 1
+            return None
+
+        delay = policy.backoff(attempt)
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            if retry_after > policy.max_delay:
+                self.stats["retry_after_too_long"] += 1
+                return None
+            self.stats["retry_after_honored"] += 1
+            delay = max(delay, retry_after)
+
+        if not self._withdraw():
+            self.stats["budget_exhausted"] += 1
+            self.logger.warning("🪫 Retry budget exhausted, not retrying upstream call",
+                                error_class=error_class)
+            return None
+        return delay
+
+    def _refill(self, tokens: float = 0.0) -> None:
+        """Add the time-based refill plus the given tokens to the retry budget."""
+        now = time.monotonic()
+        self._budget = min(
+            self._budget + (now - self._budget_updated) * self.budget_min_per_second + tokens,
+            RETRY_BUDGET_BURST
+        )
+        self._budget_updated = now
+
+    def _withdraw(self) -> bool:
+        """Take one retry from the budget, if it has one."""
+        self._refill()
+        if self._budget < 1.0:
+            return False
+        self._budget -= 1.0
+        return True
+
+    def _attribute(self, error_class: str, model: str) -> None:
+        """Count a retry overall, per class and model, and on the current client request."""
+        self.stats["retries"] += 1
+        self._class_stats[error_class]["retries"] += 1
+        self._model_retries[model] += 1
+        record = _request_retries.get()
+        if record is not None:
+            record["retries"] += 1
+            record["reasons"].append(error_class)
+
+    def track_request(self) -> Dict[str, Any]:
+        """Start collecting the retries made for the current client request."""
+        record: Dict[str, Any] = {"retries": 0, "reasons": []}
+        _request_retries.set(record)
+        return record
+
+    @staticmethod
+    def response_headers(record: Dict[str, Any]) -> Dict[str, str]:
+        """Headers attributing a client request's upstream retries (none when there were none)."""
+        if not record["retries"]:
+            return {}
+        reasons: List[str] = list(dict.fromkeys(record["reasons"]))
+        return {
+            "X-Upstream-Retries": str(record["retries"]),
+            "X-Upstream-Retry-Reasons": ",".join(reasons)
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get retry counters overall, per error class and per model."""
+        self._refill()
+        return {
+            "enabled": self.enabled,
+            **self.stats,
+            "budget_tokens": round(self._budget, 2),
+            "budget_ratio": self.budget_ratio,
+            "classes": {
+                error_class: {
+                    "max_attempts": policy.max_attempts,
+                    "base_delay": policy.base_delay,
+                    "max_delay": policy.max_delay,
+                    **self._class_stats[error_class]
+                }
+                for error_class, policy in self.policies.items()
+            },
+            "models": dict(self._model_retries)
+        }
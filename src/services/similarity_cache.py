@@ -0,0 +1,305 @@
+"""
+Near-duplicate response cache for OpenRouter Anthropic Server.
+
+Clients often retry a deterministic prompt that differs from the previous
+attempt only in a timestamp, a request id, whitespace or trailing noise, so
+an exact-hash cache never hits. This cache keys deterministic requests
+(temperature 0, non-streaming) on a MinHash signature of word shingles over
+normalized message text and serves a stored response when the estimated
+Jaccard similarity reaches the configured threshold.
+
+Everything that changes the answer other than the conversation text - model,
+max_tokens, sampling parameters, stop sequences, tools, images - is hashed
+exactly into a scope, and only requests in the same scope are compared.
+Candidates are found with LSH banding, so a lookup costs one signature and a
+handful of band probes rather than a scan of the cache.
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from src.models.anthropic import MessagesRequest, MessagesResponse
+from src.utils.config import config
+from .base import BaseService
+from .token_counting import flatten_content
+
+# Signature length and LSH banding: 128 permutations keep the estimate within
+# about 0.02 near the threshold; 32 bands of 4 rows surface pairs above roughly
+# 0.45 similarity as candidates, and the threshold is checked afterwards
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 32
+SHINGLE_SIZE = 3
+
+# Only complete answers are reused; tool_use ids must stay unique per conversation
+CACHEABLE_STOP_REASONS = ("end_turn", "stop_sequence")
+
+# Normalization rules in the order they are applied; timestamps and ids are
+# masked before numbers, and whitespace is collapsed last
+NORMALIZERS: "OrderedDict[str, Callable[[str], str]]" = OrderedDict([
+    ("timestamps", lambda text: _TIMESTAMP.sub(" <ts> ", text)),
+    ("uuids", lambda text: _UUID.sub(" <uuid> ", text)),
+    ("hex", lambda text: _HEX.sub(" <hex> ", text)),
+    ("numbers", lambda text: _NUMBER.sub(" <n> ", text)),
+    ("case", lambda text: text.lower()),
+    ("whitespace", lambda text: " ".join(text.split()))
+])
+
+_TIMESTAMP = re.compile(
+    r"\b\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?)?\b"
+    r"|\b\d{1,2}:\d{2}:\d{2}(?:\.\d+)?\b"
+    r"|\b1\d{9}(?:\d{3})?\b"
+)
+_UUID = re.compile(r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b")
+_HEX = re.compile(r"\b[0-9a-fA-F]{16,}\b")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+# Multiply-shift hash family over 64-bit shingle hashes (arithmetic wraps mod 2**64)
+_rng = np.random.default_rng(20250615)
+_MULTIPLIERS = _rng.integers(1, 2 ** 63, size=NUM_PERMUTATIONS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_OFFSETS = _rng.integers(0, 2 ** 63, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def normalize_text(text: str, normalizers: Sequence[str]) -> str:
+    """Apply the named normalization rules to text, in their canonical order."""
+    for name, rule in NORMALIZERS.items():
+        if name in normalizers:
+            text = rule(text)
+    return text
+
+
+def minhash_signature(text: str, shingle_size: int = SHINGLE_SIZE) -> np.ndarray:
+    """Compute the MinHash signature of the word shingles of text."""
+    words = text.split() or [""]
+    count = max(len(words) - shingle_size + 1, 1)
+    shingles = {" ".join(words[i:i + shingle_size]) for i in range(count)}
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles)
+    )
+    with np.errstate(over="ignore"):
+        permuted = hashes[:, None] * _MULTIPLIERS[None, :] + _OFFSETS[None, :]
+    return (permuted >> np.uint64(32)).min(axis=0)
+
+
+def estimate_similarity(first: np.ndarray, second: np.ndarray) -> float:
+    """Estimate the Jaccard similarity of two shingle sets from their signatures."""
+    return float(np.count_nonzero(first == second)) / len(first)
+
+
+@dataclass
+class _Entry:
+    """A cached response and what it was stored under."""
+    scope: str
+    text_hash: str
+    signature: np.ndarray
+    bands: Tuple[bytes, ...]
+    response: MessagesResponse
+    expires_at: float
+
+
+class SimilarityCacheService(BaseService):
+    """Service that serves stored responses to near-duplicate deterministic requests."""
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        routes: Optional[Sequence[str]] = None,
+        threshold: Optional[float] = None,
+        normalizers: Optional[Sequence[str]] = None,
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None
+    ):
+        """Initialize the cache from config unless overridden."""
+        super().__init__("SimilarityCache")
+        self.enabled = config.similarity_cache_enabled if enabled is None else enabled
+        self.routes = set(config.similarity_cache_routes if routes is None else routes)
+        self.threshold = config.similarity_cache_threshold if threshold is None else threshold
+        self.normalizers = tuple(config.similarity_cache_normalizers if normalizers is None else normalizers)
+        self.max_entries = max_entries or config.similarity_cache_max_entries
+        self.ttl = ttl or config.cache_ttl
+
+        unknown = set(self.normalizers) - set(NORMALIZERS)
+        if unknown:
+            raise ValueError(f"Unknown similarity cache normalizers: {sorted(unknown)}")
+
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._exact: Dict[Tuple[str, str], int] = {}
+        self._buckets: Dict[Tuple[str, int, bytes], Set[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            "lookups": 0,
+            "exact_hits": 0,
+            "near_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0
+        }
+
+    def applies_to(self, request: MessagesRequest, route: str) -> bool:
+        """Whether the cache may answer this request on this route."""
+        return (
+            self.enabled
+            and route in self.routes
+            and not request.stream
+            and request.temperature == 0
+        )
+
+    def lookup(self, request: MessagesRequest, route: str) -> Optional[MessagesResponse]:
+        """
+        Return a stored response for a near-duplicate of this request.
+
+        Args:
+            request: The incoming request
+            route: Route the request arrived on; only opted-in routes are served
+
+        Returns:
+            A copy of the cached response with a fresh message id, or None
+        """
+        if not self.applies_to(request, route):
+            return None
+
+        scope, text = self._fingerprint(request)
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        now = time.time()
+        with self._lock:
+            self.stats["lookups"] += 1
+            entry_id = self._exact.get((scope, text_hash))
+            if entry_id is not None and self._live(entry_id, now):
+                self.stats["exact_hits"] += 1
+                return self._serve(entry_id, 1.0)
+
+        signature = minhash_signature(text)
+        with self._lock:
+            best_id, best_similarity = None, 0.0
+            for entry_id in self._candidates(scope, self._bands(signature)):
+                if not self._live(entry_id, now):
+                    continue
+                similarity = estimate_similarity(signature, self._entries[entry_id].signature)
+                if similarity > best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+
+            if best_id is not None and best_similarity >= self.threshold:
+                self.stats["near_hits"] += 1
+                return self._serve(best_id, best_similarity)
+            self.stats["misses"] += 1
+            return None
+
+    def store(self, request: MessagesRequest, response: MessagesResponse, route: str) -> None:
+        """Store a completed response for later near-duplicates of this request."""
+        if not self.applies_to(request, route) or not isinstance(response, MessagesResponse):
+            return
+        if response.stop_reason not in CACHEABLE_STOP_REASONS:
+            return
+
+        scope, text = self._fingerprint(request)
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        signature = minhash_signature(text)
+        bands = self._bands(signature)
+        with self._lock:
+            previous = self._exact.get((scope, text_hash))
+            if previous is not None:
+                self._remove(previous)
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _Entry(scope, text_hash, signature, bands, response, time.time() + self.ttl)
+            self._exact[(scope, text_hash)] = entry_id
+            for index, band in enumerate(bands):
+                self._buckets.setdefault((scope, index, band), set()).add(entry_id)
+            self.stats["stores"] += 1
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        """Drop every cached response."""
+        with self._lock:
+            self._entries.clear()
+            self._exact.clear()
+            self._buckets.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache hit rates and size."""
+        with self._lock:
+            hits = self.stats["exact_hits"] + self.stats["near_hits"]
+            return {
+                "enabled": self.enabled,
+                "routes": sorted(self.routes),
+                "threshold": self.threshold,
+                "normalizers": list(self.normalizers),
+                "entries": len(self._entries),
+                "hit_rate": round(hits / self.stats["lookups"], 4) if self.stats["lookups"] else 0.0,
+                **self.stats
+            }
+
+    def _fingerprint(self, request: MessagesRequest) -> Tuple[str, str]:
+        """Split a request into its exact scope hash and its normalized conversation text."""
+        parts: List[str] = []
+        images: List[Dict[str, Any]] = []
+        if request.system:
+            text, _ = flatten_content(request.system)
+            parts.append(f"system: {text}")
+        for message in request.messages:
+            text, message_images = flatten_content(message.content)
+            parts.append(f"{message.role}: {text}")
+            images.extend(message_images)
+
+        scope = request.model_dump(
+            mode="json", exclude_none=True,
+            include={"model", "max_tokens", "stop_sequences", "temperature", "top_p", "top_k",
+                     "tools", "tool_choice", "thinking"}
+        )
+        scope["images"] = images
+        scope_hash = hashlib.sha256(json.dumps(scope, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        return scope_hash, normalize_text("\n".join(parts), self.normalizers)
+
+    @staticmethod
+    def _bands(signature: np.ndarray) -> Tuple[bytes, ...]:
+        return tuple(band.tobytes() for band in np.split(signature, LSH_BANDS))
+
+    def _candidates(self, scope: str, bands: Tuple[bytes, ...]) -> Set[int]:
+        candidates: Set[int] = set()
+        for index, band in enumerate(bands):
+            candidates |= self._buckets.get((scope, index, band), set())
+        return candidates
+
+    def _live(self, entry_id: int, now: float) -> bool:
+        """Whether an entry exists and has not expired; expired entries are dropped."""
+        entry = self._entries.get(entry_id)
+        if entry is None:
+            return False
+        if entry.expires_at <= now:
+            self._remove(entry_id)
+            return False
+        return True
+
+    def _serve(self, entry_id: int, similarity: float) -> MessagesResponse:
+        self._entries.move_to_end(entry_id)
+        response = self._entries[entry_id].response
+        self.logger.info("♻️ Similarity cache hit", similarity=round(similarity, 3), cached_id=response.id)
+        return response.model_copy(update={"id": f"msg_{uuid.uuid4().hex[:24]}"})
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        if self._exact.get((entry.scope, entry.text_hash)) == entry_id:
+            del self._exact[(entry.scope, entry.text_hash)]
+        for index, band in enumerate(entry.bands):
+            bucket = self._buckets.get((entry.scope, index, band))
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[(entry.scope, index, band)]
@@ -0,0 +1,201 @@
+"""
+Upstream stall detection for OpenRouter Anthropic Server.
+
+A hung upstream is otherwise only noticed when the whole request timeout
+expires. For requests the client does not stream, the upstream call is made
+in streaming mode internally and reassembled into a normal response, so
+progress can be watched chunk by chunk:
+
+- the first chunk must arrive within the model's first-byte deadline
+  (learned by the adaptive timeout service),
+- every following chunk within STREAM_STALL_INTERVAL.
+
+A stalled attempt is aborted and retried up to STREAM_STALL_MAX_RETRIES
+times on the same model, then failed over to STREAM_STALL_FALLBACK_MODELS.
+Each retry and failover is a "timeout" retry taken from the retry policy's
+global budget, and the timeout raised once they are used up is not retried
+again by the policy. Nothing has reached the client at that point, so
+recovery only shows as latency. Requests the client streams itself are passed through unchanged.
+"""
+
+import asyncio
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import litellm
+
+from src.utils.config import config
+from src.utils.errors import UpstreamStallError
+from .adaptive_timeouts import TimeoutPlan
+from .base import BaseService
+from .retry_policy import mark_retries_exhausted
+
+
+class StreamStallService(BaseService):
+    """Service that watches internal upstream streams and recovers from stalls."""
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        interval: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        fallback_models: Optional[Dict[str, List[str]]] = None
+    ):
+        """Initialize stall detection from config unless overridden."""
+        super().__init__("StreamStalls")
+        self.enabled = config.stream_stall_detection_enabled if enabled is None else enabled
+        self.interval = config.stream_stall_interval if interval is None else interval
+        self.max_retries = config.stream_stall_max_retries if max_retries is None else max_retries
+        self.fallback_models = config.stream_stall_fallback_models if fallback_models is None else fallback_models
+        self.stats: Dict[str, int] = {
+            "internal_streams": 0,
+            "stalls": 0,
+            "retries": 0,
+            "failovers": 0,
+            "recovered_requests": 0,
+            "failed_requests": 0
+        }
+        self._model_stalls: Dict[str, Dict[str, int]] = defaultdict(lambda: {"first_byte": 0, "inter_chunk": 0})
+
+    def applies_to(self, request_data: Dict[str, Any]) -> bool:
+        """Whether a LiteLLM request should go upstream as an internal stream."""
+        return self.enabled and not request_data.get("stream")
+
+    async def complete(
+        self,
+        request_data: Dict[str, Any],
+        call: Callable[[Dict[str, Any]], Awaitable[Any]]
+    ) -> Any:
+        """
+        Make a non-streaming request through an internal stream, recovering from stalls.
+
+        Args:
+            request_data: LiteLLM request the client did not ask to stream
+            call: Makes the LiteLLM call for a request dict
+
+        Returns:
+            ModelResponse assembled from the streamed chunks
+
+        Raises:
+            litellm.Timeout: If every attempt stalled or the retry budget ran out
+        """
+        from . import retry_policy_service
+
+        model = request_data.get("model", "unknown")
+        attempts = [model] * (self.max_retries + 1) + list(self.fallback_models.get(model, []))
+        self.stats["internal_streams"] += 1
+
+        made = 0
+        for attempt, attempt_model in enumerate(attempts):
+            if attempt:
+                if not retry_policy_service.allow_retry("timeout", attempt_model):
+                    break
+                self.stats["retries" if attempt_model == model else "failovers"] += 1
+            made += 1
+            data = {**request_data, "model": attempt_model, "stream": True,
+                    "stream_options": {"include_usage": True}}
+            try:
+                response = await self._collect(data, call)
+            except UpstreamStallError as e:
+                phase = e.details["phase"]
+                self.stats["stalls"] += 1
+                self._model_stalls[attempt_model][phase] += 1
+                self.logger.warning("🐌 Upstream stream stalled, aborting attempt",
+                                    model=attempt_model, phase=phase,
+                                    attempt=attempt + 1, attempts=len(attempts))
+                continue
+
+            if attempt:
+                self.stats["recovered_requests"] += 1
+                self.logger.info("🔁 Recovered from upstream stall",
+                                 model=model, served_by=attempt_model, attempts=attempt + 1)
+            return response
+
+        self.stats["failed_requests"] += 1
+        raise mark_retries_exhausted(litellm.Timeout(
+            message=f"Upstream stream stalled on {made} attempts for {model}",
+            model=model,
+            llm_provider="openrouter"
+        ))
+
+    async def _collect(self, data: Dict[str, Any], call: Callable[[Dict[str, Any]], Awaitable[Any]]) -> Any:
+        """Run one attempt, raising UpstreamStallError when the stream stops producing chunks."""
+        from . import adaptive_timeout_service
+
+        plan = adaptive_timeout_service.plan(data)
+        if plan:
+            data["timeout"] = plan.httpx_timeout()
+        first_byte_deadline = plan.first_byte if plan else float(config.request_timeout)
+
+        start = time.time()
+        try:
+            stream = await asyncio.wait_for(call(data), first_byte_deadline)
+        except asyncio.TimeoutError:
+            raise self._stalled(plan, "first_byte", start) from None
+        if not hasattr(stream, "__aiter__"):
+            return stream  # upstream answered without streaming
+
+        chunks = []
+        first_byte = None
+        iterator = stream.__aiter__()
+        while True:
+            if first_byte is None:
+                deadline = max(first_byte_deadline - (time.time() - start), 0.0)
+            else:
+                deadline = self.interval
+            try:
+                chunk = await asyncio.wait_for(iterator.__anext__(), deadline)
+            except StopAsyncIteration:
+                break
+            except asyncio.TimeoutError:
+                await self._close(stream)
+                raise self._stalled(plan, "first_byte" if first_byte is None else "inter_chunk", start) from None
+            if first_byte is None:
+                first_byte = time.time() - start
+            chunks.append(chunk)
+
+        response = litellm.stream_chunk_builder(chunks, messages=data.get("messages"))
+        if response is None:
+            raise self._stalled(plan, "first_byte", start)
+        # Keep the rate-limit headers for upstream pacing
+        response._response_headers = getattr(stream, "_response_headers", None)
+        # Keep the provider that served the stream for provider affinity
+        providers = [getattr(chunk, "provider", None) for chunk in chunks]
+        response.provider = next((provider for provider in reversed(providers) if provider), None)
+        if plan:
+            adaptive_timeout_service.record(plan, time.time() - start, response, first_byte=first_byte)
+        return response
+
+    def _stalled(self, plan: Optional[TimeoutPlan], phase: str, start: float) -> UpstreamStallError:
+        """Build the stall error, counting a missed first byte against the model's deadlines."""
+        elapsed = time.time() - start
+        if plan and phase == "first_byte":
+            from . import adaptive_timeout_service
+            adaptive_timeout_service.record(plan, elapsed, timed_out=True)
+        model = plan.model if plan else "unknown"
+        return UpstreamStallError(
+            f"No {phase.replace('_', ' ')} from {model} after {elapsed:.1f}s",
+            details={"model": model, "phase": phase, "elapsed": elapsed}
+        )
+
+    @staticmethod
+    async def _close(stream: Any) -> None:
+        """Best-effort close of an abandoned upstream stream's connection."""
+        lines = getattr(getattr(stream, "completion_stream", None), "streaming_response", None)
+        aclose = getattr(lines, "aclose", None)
+        if aclose is not None:
+            try:
+                await aclose()
+            except Exception:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get stall counters overall and per model."""
+        return {
+            "enabled": self.enabled,
+            "interval": self.interval,
+            "max_retries": self.max_retries,
+            **self.stats,
+            "models": {model: dict(stalls) for model, stalls in self._model_stalls.items()}
+        }
@@ -0,0 +1,297 @@
+"""
+Token counting service for OpenRouter Anthropic Server.
+
+Counts input tokens for /v1/messages/count_tokens - messages, system prompt,
+tools, images and tool results - with an offline tokenizer engine and a
+per-message cache, so a count over a growing conversation only tokenizes
+content it has not seen before.
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from src.models.anthropic import Message, TokenCountRequest
+from src.utils.config import config
+from .base import BaseService
+from .tokenizers import TokenizerEngine, create_tokenizer_engine, estimate_image_tokens
+
+# Per-message framing tokens and reply priming (matches litellm.token_counter)
+MESSAGE_OVERHEAD_TOKENS = 3
+REPLY_PRIMING_TOKENS = 3
+# Framing for the tool definitions block
+TOOLS_OVERHEAD_TOKENS = 9
+
+_DATE_SUFFIX = re.compile(r"-\d{8}$")
+
+
+def get_model_family(model: str) -> str:
+    """
+    Derive the tokenizer family for a model name.
+
+    Dated snapshots and the openrouter/ routing prefix share a tokenizer with
+    the base model, so they share cache entries.
+    """
+    family = model.lower()
+    if family.startswith("openrouter/"):
+        family = family[len("openrouter/"):]
+    return _DATE_SUFFIX.sub("", family)
+
+
+def fingerprint_message(message: Message) -> str:
+    """Compute a stable content fingerprint for a message."""
+    payload = message.model_dump_json(exclude_none=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _fingerprint_payload(payload: Any) -> str:
+    """Compute a stable fingerprint for system prompts and tool lists."""
+    if hasattr(payload, "model_dump"):
+        payload = payload.model_dump(exclude_none=True)
+    elif isinstance(payload, list):
+        payload = [item.model_dump(exclude_none=True) if hasattr(item, "model_dump") else item
+                   for item in payload]
+    serialized = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+def flatten_content(content: Any) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Flatten Anthropic content into countable text and image sources.
+
+    Tool results are flattened recursively, so text and images returned by
+    tools are counted like any other content.
+    """
+    if content is None:
+        return "", []
+    if isinstance(content, str):
+        return content, []
+    if hasattr(content, "model_dump"):
+        content = content.model_dump()
+    if isinstance(content, dict):
+        content = [content]
+    if not isinstance(content, list):
+        return str(content), []
+
+    text_parts: List[str] = []
+    images: List[Dict[str, Any]] = []
+    for block in content:
+        if hasattr(block, "model_dump"):
+            block = block.model_dump()
+        if isinstance(block, str):
+            text_parts.append(block)
+            continue
+        if not isinstance(block, dict):
+            continue
+
+        block_type = block.get("type")
+        if block_type == "text":
+            text_parts.append(block.get("text", ""))
+        elif block_type == "image":
+            images.append(block.get("source", {}))
+        elif block_type == "tool_use":
+            # Include tool use in token count
+            text_parts.append(f"Tool: {block.get('name', '')} {json.dumps(block.get('input', {}))}")
+        elif block_type == "tool_result":
+            # Include tool result in token count
+            result_text, result_images = flatten_content(block.get("content", ""))
+            text_parts.append(f"Result: {result_text}")
+            images.extend(result_images)
+        else:
+            text_parts.append(json.dumps(block, default=str))
+
+    return "".join(text_parts), images
+
+
+class MessageTokenCache:
+    """Thread-safe LRU cache of per-message token counts."""
+
+    def __init__(self, max_entries: int = 10000):
+        """Initialize the cache with an upper bound on stored entries."""
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Tuple[str, str]) -> Optional[int]:
+        """Return the cached count for a (model family, fingerprint) key."""
+        with self._lock:
+            count = self._entries.get(key)
+            if count is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return count
+
+    def put(self, key: Tuple[str, str], count: int) -> None:
+        """Store a count, evicting the least recently used entries past the bound."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = count
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop all entries and reset statistics."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+class TokenCountingService(BaseService):
+    """Service for counting request tokens with per-message memoization."""
+
+    def __init__(
+        self,
+        cache: Optional[MessageTokenCache] = None,
+        engine: Optional[TokenizerEngine] = None
+    ):
+        """Initialize token counting service."""
+        super().__init__("TokenCounting")
+        self.cache = cache or MessageTokenCache(max_entries=config.token_count_cache_size)
+        self.engine = engine or create_tokenizer_engine(
+            config.tokenizer_engine,
+            vocab_path=config.tokenizer_vocab_path
+        )
+        self.offload_threshold = config.tokenizer_offload_threshold
+
+    @staticmethod
+    def message_to_litellm(message: Message) -> Dict[str, Any]:
+        """Flatten an Anthropic message into a LiteLLM message for token counting."""
+        text, _ = flatten_content(message.content)
+        return {"role": message.role, "content": text}
+
+    def _count_framed(self, role: str, text: str, images: List[Dict[str, Any]]) -> int:
+        return (
+            MESSAGE_OVERHEAD_TOKENS
+            + self.engine.count(role)
+            + self.engine.count(text)
+            + sum(estimate_image_tokens(source) for source in images)
+        )
+
+    def count_message_tokens(self, message: Message) -> int:
+        """Tokenize a single message, bypassing the cache."""
+        text, images = flatten_content(message.content)
+        return self._count_framed(message.role, text, images)
+
+    def count_system_tokens(self, system: Any) -> int:
+        """Tokenize a system prompt given as a string or text blocks."""
+        text, images = flatten_content(system)
+        return self._count_framed("system", text, images)
+
+    def count_tools_tokens(self, tools: List[Any]) -> int:
+        """Tokenize tool definitions (name, description and input schema)."""
+        total = TOOLS_OVERHEAD_TOKENS
+        for tool in tools:
+            definition = tool.model_dump(exclude_none=True) if hasattr(tool, "model_dump") else tool
+            total += self.engine.count(json.dumps(definition, separators=(",", ":")))
+        return total
+
+    def _count_pending(self, pending: List[Tuple[Any, Callable[[], int]]]) -> List[int]:
+        return [count() for _, count in pending]
+
+    async def count_request_tokens(
+        self,
+        request: TokenCountRequest,
+        model: str,
+        validate_message: Optional[Callable[[Message], Awaitable[None]]] = None
+    ) -> int:
+        """
+        Count input tokens for a request, tokenizing only uncached content.
+
+        Large uncached inputs are tokenized in a worker thread so the event
+        loop keeps serving other requests.
+
+        Args:
+            request: Token count request
+            model: Mapped model used to select the cache family
+            validate_message: Optional async validator run on uncached messages only;
+                messages already in the cache have passed validation before
+
+        Returns:
+            Total input token count
+        """
+        family = f"{self.engine.name}:{get_model_family(model)}"
+        total = REPLY_PRIMING_TOKENS
+        new_messages: List[Tuple[Tuple[str, str], Message]] = []
+        pending: List[Tuple[Tuple[str, str], Callable[[], int]]] = []
+        pending_size = 0
+
+        for message in request.messages:
+            key = (family, fingerprint_message(message))
+            cached = self.cache.get(key)
+            if cached is None:
+                new_messages.append((key, message))
+            else:
+                total += cached
+
+        if validate_message is not None:
+            for _, message in new_messages:
+                await validate_message(message)
+
+        for key, message in new_messages:
+            pending.append((key, lambda message=message: self.count_message_tokens(message)))
+            pending_size += len(str(message.content))
+
+        if request.system:
+            key = (family, "system:" + _fingerprint_payload(request.system))
+            cached = self.cache.get(key)
+            if cached is None:
+                pending.append((key, lambda: self.count_system_tokens(request.system)))
+                pending_size += len(str(request.system))
+            else:
+                total += cached
+
+        if request.tools:
+            key = (family, "tools:" + _fingerprint_payload(request.tools))
+            cached = self.cache.get(key)
+            if cached is None:
+                pending.append((key, lambda: self.count_tools_tokens(request.tools)))
+                pending_size += len(str(request.tools))
+            else:
+                total += cached
+
+        if pending_size >= self.offload_threshold:
+            counts = await asyncio.to_thread(self._count_pending, pending)
+        else:
+            counts = self._count_pending(pending)
+
+        for (key, _), count in zip(pending, counts):
+            self.cache.put(key, count)
+            total += count
+
+        self.logger.debug("Request tokens counted",
+                          engine=self.engine.name,
+                          model_family=family,
+                          message_count=len(request.messages),
+                          tokenized_items=len(pending),
+                          offloaded=pending_size >= self.offload_threshold,
+                          token_count=total)
+        return total
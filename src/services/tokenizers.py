@@ -0,0 +1,287 @@
+"""
+Offline tokenizer engines for token counting.
+
+Engines are pluggable and load their vocabularies from local files, so
+counting never needs network access. If an engine cannot be loaded, the
+approximate engine is used as a fast fallback.
+"""
+
+import base64
+import importlib.util
+import itertools
+import math
+import os
+import re
+import struct
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional, Tuple, Type
+
+from src.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Anthropic image sizing: images are downscaled to fit these bounds,
+# then cost roughly (width * height) / 750 tokens
+IMAGE_MAX_EDGE = 1568
+IMAGE_MAX_PIXELS = 1_150_000
+IMAGE_PIXELS_PER_TOKEN = 750
+IMAGE_DEFAULT_TOKENS = 1600  # Used when dimensions are unknown (e.g. URL sources)
+
+
+def _bundled_tokenizer_dir() -> Optional[str]:
+    """Locate the tokenizer vocab files bundled with LiteLLM."""
+    spec = importlib.util.find_spec("litellm.litellm_core_utils.tokenizers")
+    if spec is None or not spec.submodule_search_locations:
+        return None
+    return list(spec.submodule_search_locations)[0]
+
+
+class TokenizerEngine(ABC):
+    """Base class for tokenizer engines."""
+
+    name: str = "base"
+    exact: bool = True
+
+    @abstractmethod
+    def count(self, text: str) -> int:
+        """Count tokens in a piece of text."""
+        pass
+
+
+class TiktokenEngine(TokenizerEngine):
+    """BPE tokenizer backed by tiktoken with vocab files from a local directory."""
+
+    name = "tiktoken"
+
+    def __init__(self, vocab_path: Optional[str] = None, encoding_name: str = "cl100k_base"):
+        """
+        Initialize the engine.
+
+        Args:
+            vocab_path: Directory laid out as a tiktoken cache; defaults to
+                TIKTOKEN_CACHE_DIR, then the vocab files bundled with LiteLLM
+            encoding_name: tiktoken encoding to load
+        """
+        import tiktoken
+
+        # tiktoken only reads its vocab directory from TIKTOKEN_CACHE_DIR: an
+        # operator's setting wins over the bundled files, and the variable is
+        # put back once the encoding is loaded
+        if vocab_path is None and "TIKTOKEN_CACHE_DIR" not in os.environ:
+            vocab_path = _bundled_tokenizer_dir()
+        previous = os.environ.get("TIKTOKEN_CACHE_DIR")
+        if vocab_path:
+            os.environ["TIKTOKEN_CACHE_DIR"] = vocab_path
+        try:
+            self.encoding_name = encoding_name
+            self._encoding = tiktoken.get_encoding(encoding_name)
+        finally:
+            if previous is None:
+                os.environ.pop("TIKTOKEN_CACHE_DIR", None)
+            else:
+                os.environ["TIKTOKEN_CACHE_DIR"] = previous
+
+    def count(self, text: str) -> int:
+        """Count tokens, treating special-token markers as plain text."""
+        if not text:
+            return 0
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+
+class HuggingFaceTokenizerEngine(TokenizerEngine):
+    """Tokenizer loaded from a local HuggingFace tokenizer.json file."""
+
+    name = "huggingface"
+
+    def __init__(self, vocab_path: Optional[str] = None):
+        """
+        Initialize the engine.
+
+        Args:
+            vocab_path: Path to tokenizer.json; defaults to the Claude tokenizer
+                bundled with LiteLLM
+        """
+        from tokenizers import Tokenizer
+
+        if vocab_path is None:
+            bundled_dir = _bundled_tokenizer_dir()
+            if bundled_dir is None:
+                raise FileNotFoundError("No bundled tokenizer.json found")
+            vocab_path = os.path.join(bundled_dir, "anthropic_tokenizer.json")
+        self._tokenizer = Tokenizer.from_file(vocab_path)
+
+    def count(self, text: str) -> int:
+        """Count tokens in a piece of text."""
+        if not text:
+            return 0
+        return len(self._tokenizer.encode(text).ids)
+
+
+class ApproximateTokenizerEngine(TokenizerEngine):
+    """
+    Fast vocabulary-free estimator.
+
+    Splits text like a BPE pre-tokenizer and prices each piece with rules
+    calibrated against cl100k_base (see scripts/benchmark_tokenizer_accuracy.py).
+    """
+
+    name = "approximate"
+    exact = False
+
+    _PIECES = re.compile(
+        r"'(?:[sdmtSDMT]|ll|ve|re)|(?:[^\r\n\w]|_)?[^\W\d_]+|\d{1,3}"
+        r"| ?(?:[^\s\w]|_)+[\r\n]*|\s*[\r\n]+|\s+(?!\S)|\s+"
+    )
+
+    def __init__(self, vocab_path: Optional[str] = None):
+        """Initialize the engine (no vocabulary is needed)."""
+        pass
+
+    @staticmethod
+    def _word_tokens(word: str) -> float:
+        if not word.isascii():
+            if any(ord(ch) > 0x2E80 for ch in word):
+                return len(word)  # CJK: about one token per character
+            return len(word) / 3
+        # Case changes inside a word (identifiers, base64) split into more tokens
+        changes = sum(1 for a, b in zip(word, word[1:]) if a.islower() and b.isupper())
+        if changes >= 3:
+            return len(word) / 2.4
+        if changes:
+            return changes + 1 + len(word) / 8
+        return 1 + max(0, len(word) - 6) / 4
+
+    @staticmethod
+    def _punct_tokens(punct: str) -> float:
+        tokens = 0.0
+        for ch, group in itertools.groupby(punct):
+            run = len(list(group))
+            if run >= 3:
+                tokens += math.ceil(run / (16 if ch.isascii() else 7))
+            else:
+                tokens += run * (0.5 if ch.isascii() else 1.3)
+        return tokens
+
+    def count(self, text: str) -> int:
+        """Estimate tokens in a piece of text."""
+        if not text:
+            return 0
+        tokens = 0.0
+        for match in self._PIECES.finditer(text):
+            core = match.group().strip(" \t")
+            if not core.strip():
+                tokens += 1
+            elif core[-1].isalpha():
+                tokens += self._word_tokens(core if core[0].isalpha() else core[1:])
+            elif core[-1].isdigit():
+                tokens += 1
+            else:
+                punct = core.rstrip("\r\n")
+                tokens += self._punct_tokens(punct) if punct else 1
+        return max(1, round(tokens))
+
+
+# Registry of available engines, keyed by TOKENIZER_ENGINE value
+TOKENIZER_ENGINES: Dict[str, Type[TokenizerEngine]] = {
+    TiktokenEngine.name: TiktokenEngine,
+    HuggingFaceTokenizerEngine.name: HuggingFaceTokenizerEngine,
+    ApproximateTokenizerEngine.name: ApproximateTokenizerEngine,
+}
+
+
+def register_tokenizer_engine(name: str, engine_cls: Type[TokenizerEngine]) -> None:
+    """Register a custom tokenizer engine under a name."""
+    TOKENIZER_ENGINES[name] = engine_cls
+    logger.info("Tokenizer engine registered", engine=name)
+
+
+def create_tokenizer_engine(name: str, vocab_path: Optional[str] = None) -> TokenizerEngine:
+    """
+    Create a tokenizer engine, falling back to the approximate engine.
+
+    Args:
+        name: Registered engine name
+        vocab_path: Optional local vocabulary file or directory
+
+    Returns:
+        Loaded tokenizer engine
+    """
+    engine_cls = TOKENIZER_ENGINES.get(name)
+    if engine_cls is None:
+        logger.warning("Unknown tokenizer engine, using approximate fallback",
+                       engine=name,
+                       available=list(TOKENIZER_ENGINES.keys()))
+        return ApproximateTokenizerEngine()
+
+    try:
+        engine = engine_cls(vocab_path=vocab_path)
+        logger.info("Tokenizer engine loaded", engine=name, exact=engine.exact)
+        return engine
+    except Exception as e:
+        logger.warning("Tokenizer engine failed to load, using approximate fallback",
+                       engine=name,
+                       vocab_path=vocab_path,
+                       error=str(e))
+        return ApproximateTokenizerEngine()
+
+
+def _image_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """Read width and height from PNG, GIF, JPEG or WebP header bytes."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if data[:6] in (b"GIF87a", b"GIF89a") and len(data) >= 10:
+        return struct.unpack("<HH", data[6:10])
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP" and len(data) >= 30:
+        chunk = data[12:16]
+        if chunk == b"VP8X":
+            width = int.from_bytes(data[24:27], "little") + 1
+            height = int.from_bytes(data[27:30], "little") + 1
+            return width, height
+        if chunk == b"VP8 ":
+            width, height = struct.unpack("<HH", data[26:30])
+            return width & 0x3FFF, height & 0x3FFF
+        if chunk == b"VP8L" and len(data) >= 25:
+            bits = int.from_bytes(data[21:25], "little")
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        return None
+    if data[:2] == b"\xff\xd8":
+        index = 2
+        while index + 9 < len(data):
+            if data[index] != 0xFF:
+                index += 1
+                continue
+            marker = data[index + 1]
+            if marker in (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF):
+                height, width = struct.unpack(">HH", data[index + 5:index + 9])
+                return width, height
+            segment_length = struct.unpack(">H", data[index + 2:index + 4])[0]
+            index += 2 + segment_length
+    return None
+
+
+def estimate_image_tokens(source: Dict[str, Any]) -> int:
+    """
+    Estimate tokens for an Anthropic image source.
+
+    Base64 sources are sized from their header; other sources use the
+    maximum cost of a downscaled image.
+    """
+    if not isinstance(source, dict) or source.get("type") != "base64":
+        return IMAGE_DEFAULT_TOKENS
+
+    encoded = source.get("data") or ""
+    try:
+        # Headers sit at the start of the file; 64KB covers JPEG metadata segments
+        prefix = encoded[:87384]
+        header = base64.b64decode(prefix[:len(prefix) - len(prefix) % 4])
+        dimensions = _image_dimensions(header)
+    except (ValueError, struct.error):
+        dimensions = None
+
+    if not dimensions or not all(dimensions):
+        return IMAGE_DEFAULT_TOKENS
+
+    width, height = dimensions
+    scale = min(1.0, IMAGE_MAX_EDGE / max(width, height))
+    scale = min(scale, math.sqrt(IMAGE_MAX_PIXELS / (width * height)))
+    return max(1, math.ceil((width * scale) * (height * scale) / IMAGE_PIXELS_PER_TOKEN))
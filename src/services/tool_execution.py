@@ -4,10 +4,12 @@ This is the new modular implementation that replaces the monolithic tool_executi
 It maintains full backward compatibility while using the new task-based architecture.
 """
 
+from collections import OrderedDict
 from typing import Any, Dict, List
 from .base import BaseService
 from ..coordinators.tool_execution_coordinator import tool_execution_coordinator
 from ..tasks.tool_execution.tool_result_formatting_tasks import ToolExecutionResult
+from ..tasks.tool_execution.metrics_tasks import check_rate_limit
 from ..models.anthropic import MessagesRequest
 from ..core.logging_config import get_logger
 
@@ -172,7 +174,7 @@ class ToolExecutionService(BaseService):
         # Initialize rate limiting attributes
         self.rate_limit_max_requests = 100
         self.rate_limit_window = 60
-        self.rate_limit_tracker = {}
+        self.rate_limit_tracker = OrderedDict()
         
         logger.info("ToolExecutionService initialized (new modular architecture)")
     
@@ -257,30 +259,17 @@ class ToolExecutionService(BaseService):
     
     def _check_rate_limit(self, request_id: str) -> bool:
         """Check rate limit for backward compatibility"""
-        import time
-        current_time = time.time()
+        # Initialize rate_limit_tracker if not exists (or replaced with a plain dict)
+        if not isinstance(getattr(self, 'rate_limit_tracker', None), OrderedDict):
+            self.rate_limit_tracker = OrderedDict(getattr(self, 'rate_limit_tracker', None) or {})
         
-        # Use configurable rate limits
-        max_requests = getattr(self, 'rate_limit_max_requests', 100)
-        window = getattr(self, 'rate_limit_window', 60)
-        
-        window_start = current_time - window
-        
-        # Initialize rate_limit_tracker if not exists
-        if not hasattr(self, 'rate_limit_tracker'):
-            self.rate_limit_tracker = {}
-        
-        # Clean old requests
-        self.rate_limit_tracker = {
-            rid: timestamp for rid, timestamp in self.rate_limit_tracker.items()
-            if timestamp > window_start
-        }
-        
-        # Check if under limit
-        if len(self.rate_limit_tracker) < max_requests:
-            self.rate_limit_tracker[request_id] = current_time
-            return True
-        return False
+        # Use configurable rate limits; expired entries are evicted in amortized O(1)
+        return check_rate_limit(
+            self.rate_limit_tracker,
+            request_id,
+            rate_limit_window=getattr(self, 'rate_limit_window', 60),
+            rate_limit_max_requests=getattr(self, 'rate_limit_max_requests', 100)
+        )
     
     @property
     def metrics(self) -> Dict[str, Any]:
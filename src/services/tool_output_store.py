@@ -0,0 +1,273 @@
+"""
+Spill-to-disk storage for oversized tool outputs.
+
+Large tool outputs are streamed to files in a bounded local directory instead
+of being held in memory or truncated. The model receives a head/tail summary
+plus a handle, and can page through the full output with the ReadToolOutput
+tool.
+"""
+
+import re
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, IO, List, Optional, Tuple
+
+from src.utils.config import config
+from .base import BaseService
+
+READ_TOOL_OUTPUT_TOOL_NAME = "ReadToolOutput"
+# Kept small enough that a command's STDOUT and STDERR summaries together fit one tool result
+SUMMARY_HEAD_LINES = 15
+SUMMARY_TAIL_LINES = 15
+SUMMARY_MAX_LINE_CHARS = 100
+SUMMARY_SCAN_BYTES = 16384
+COPY_CHUNK_BYTES = 1024 * 1024
+DEFAULT_PAGE_LINES = 200
+
+# Appears in every summary; used to detect conversations that need the ReadToolOutput tool
+STORED_OUTPUT_MARKER = "stored: handle="
+
+_HANDLE_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+# Tool definition offered to the model when a continuation contains stored outputs
+READ_TOOL_OUTPUT_TOOL: Dict[str, Any] = {
+    "name": READ_TOOL_OUTPUT_TOOL_NAME,
+    "description": (
+        "Read a page of a large tool output that was stored instead of returned in full. "
+        "Use the handle from the stored output summary; offset is the 1-based first line."
+    ),
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "handle": {"type": "string", "description": "Handle of the stored output"},
+            "offset": {"type": "integer", "description": "First line to read (1-based)"},
+            "limit": {"type": "integer", "description": "Maximum number of lines to read"}
+        },
+        "required": ["handle"]
+    }
+}
+
+
+def _clip(line: str) -> str:
+    line = line.rstrip("\r\n")
+    if len(line) <= SUMMARY_MAX_LINE_CHARS:
+        return line
+    return line[:SUMMARY_MAX_LINE_CHARS] + f"... [{len(line) - SUMMARY_MAX_LINE_CHARS} chars]"
+
+
+class ToolOutputStore(BaseService):
+    """Bounded on-disk store of large tool outputs, addressed by opaque handles."""
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        inline_limit: Optional[int] = None
+    ):
+        """
+        Initialize the store.
+
+        Args:
+            directory: Directory for stored outputs; created if missing
+            max_bytes: Upper bound on stored bytes; oldest outputs are evicted first
+            inline_limit: Outputs up to this many bytes are returned inline
+        """
+        super().__init__("ToolOutputStore")
+        self.directory = Path(directory or config.tool_output_dir)
+        self.max_bytes = max_bytes if max_bytes is not None else config.tool_output_store_max_bytes
+        self.inline_limit = inline_limit if inline_limit is not None else config.tool_output_inline_limit
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Stored outputs oldest first, with their sizes; the directory is scanned only once here
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        for path in sorted(self.directory.glob("*.out"), key=lambda p: p.stat().st_mtime):
+            if _HANDLE_PATTERN.match(path.stem):
+                size = path.stat().st_size
+                self._entries[path.stem] = size
+                self._total_bytes += size
+
+    def _path(self, handle: str) -> Path:
+        if not _HANDLE_PATTERN.match(handle or ""):
+            raise ValueError(f"Invalid tool output handle: {handle!r}")
+        return self.directory / f"{handle}.out"
+
+    def new_spool(self) -> Tuple[str, IO[bytes]]:
+        """Create an empty output file and return its handle and a binary write handle."""
+        handle = uuid.uuid4().hex
+        return handle, open(self._path(handle), "w+b")
+
+    def discard(self, handle: str) -> None:
+        """Delete a stored output."""
+        path = self._path(handle)
+        with self._lock:
+            self._total_bytes -= self._entries.pop(handle, 0)
+        path.unlink(missing_ok=True)
+
+    def exists(self, handle: str) -> bool:
+        """Check whether a handle refers to a stored output."""
+        try:
+            return self._path(handle).is_file()
+        except ValueError:
+            return False
+
+    def size(self, handle: str) -> int:
+        """Size of a stored output in bytes."""
+        return self._path(handle).stat().st_size
+
+    def _register(self, handle: str) -> None:
+        """
+        Account for a newly written output and evict the oldest others past max_bytes.
+
+        The new output itself is never evicted, so an output larger than
+        max_bytes is kept until the next one arrives.
+        """
+        size = self.size(handle)
+        evicted: List[str] = []
+        with self._lock:
+            self._total_bytes += size - self._entries.pop(handle, 0)
+            for old_handle in list(self._entries):
+                if self._total_bytes <= self.max_bytes:
+                    break
+                self._total_bytes -= self._entries.pop(old_handle)
+                evicted.append(old_handle)
+            self._entries[handle] = size
+        for old_handle in evicted:
+            self._path(old_handle).unlink(missing_ok=True)
+            self.logger.info("Tool output evicted", handle=old_handle)
+
+    def put_text(self, text: str) -> str:
+        """Store text that is already in memory and return its handle."""
+        handle, spool = self.new_spool()
+        with spool:
+            spool.write(text.encode("utf-8"))
+        self._register(handle)
+        return handle
+
+    def put_file(self, source: Path) -> str:
+        """Copy a file into the store in fixed-size chunks and return its handle."""
+        handle, spool = self.new_spool()
+        with spool, open(source, "rb") as src:
+            shutil.copyfileobj(src, spool, COPY_CHUNK_BYTES)
+        self._register(handle)
+        return handle
+
+    def count_lines(self, handle: str) -> int:
+        """Count lines in a stored output without loading it."""
+        lines = 0
+        last = b"\n"
+        with open(self._path(handle), "rb") as f:
+            for chunk in iter(lambda: f.read(COPY_CHUNK_BYTES), b""):
+                lines += chunk.count(b"\n")
+                last = chunk[-1:]
+        return lines + (0 if last == b"\n" else 1)
+
+    def resolve(self, handle: str, label: str = "Output") -> str:
+        """
+        Turn a spooled output into tool result text.
+
+        Outputs within the inline limit are returned in full and removed from
+        disk; larger ones are kept and summarized with their handle.
+        """
+        size = self.size(handle)
+        if size <= self.inline_limit:
+            with open(self._path(handle), "rb") as f:
+                text = f.read().decode("utf-8", errors="replace")
+            self.discard(handle)
+            return text
+        self._register(handle)
+        return self.summarize(handle, label)
+
+    def summarize(self, handle: str, label: str = "Output") -> str:
+        """Build a head/tail summary of a stored output, reading only its ends."""
+        path = self._path(handle)
+        size = path.stat().st_size
+        total_lines = self.count_lines(handle)
+
+        with open(path, "rb") as f:
+            head = f.read(SUMMARY_SCAN_BYTES).decode("utf-8", errors="replace").splitlines()[:SUMMARY_HEAD_LINES]
+            f.seek(max(0, size - SUMMARY_SCAN_BYTES))
+            tail = f.read().decode("utf-8", errors="replace").splitlines()[-SUMMARY_TAIL_LINES:]
+
+        remaining = total_lines - len(head)
+        tail = tail[-remaining:] if remaining > 0 else []
+        omitted = total_lines - len(head) - len(tail)
+        parts = [
+            f"[{label} {STORED_OUTPUT_MARKER}{handle}, {size} bytes, {total_lines} lines. "
+            f"Showing first {len(head)} and last {len(tail)} lines. "
+            f'Use the {READ_TOOL_OUTPUT_TOOL_NAME} tool with {{"handle": "{handle}", "offset": <line>, '
+            f'"limit": <lines>}} to page through the rest.]'
+        ]
+        parts.extend(_clip(line) for line in head)
+        if omitted > 0:
+            parts.append(f"... [{omitted} lines omitted] ...")
+        parts.extend(_clip(line) for line in tail)
+        return "\n".join(parts)
+
+    def read_page(self, handle: str, offset: int = 1, limit: int = DEFAULT_PAGE_LINES) -> Dict[str, Any]:
+        """
+        Read a page of lines from a stored output.
+
+        Pages stop early at the inline limit so a single page never exceeds
+        what would be returned inline; next_offset tells the caller where to resume.
+        """
+        start = max(1, offset)
+        lines: List[str] = []
+        page_bytes = 0
+        line_number = 1
+        next_offset = None
+        with open(self._path(handle), "r", encoding="utf-8", errors="replace") as f:
+            while True:
+                # Bounded reads: an over-long line never lands in memory whole
+                segment = f.readline(self.inline_limit)
+                if not segment:
+                    break
+                complete = segment.endswith("\n")
+                if line_number >= start:
+                    if len(lines) >= limit or (lines and page_bytes + len(segment) > self.inline_limit):
+                        next_offset = line_number
+                        break
+                    if not complete:
+                        # Keep the first chunk of an over-long line and skip the rest of it
+                        segment = segment + " ... [line truncated]\n"
+                        rest = f.readline(self.inline_limit)
+                        while rest and not rest.endswith("\n"):
+                            rest = f.readline(self.inline_limit)
+                        complete = True
+                    lines.append(segment)
+                    page_bytes += len(segment)
+                if complete:
+                    line_number += 1
+
+        return {
+            "content": "".join(lines),
+            "start_line": start,
+            "end_line": start + len(lines) - 1,
+            "next_offset": next_offset
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get store statistics."""
+        with self._lock:
+            outputs, total_bytes = len(self._entries), self._total_bytes
+        return {
+            "outputs": outputs,
+            "bytes": total_bytes,
+            "max_bytes": self.max_bytes,
+            "inline_limit": self.inline_limit,
+            "directory": str(self.directory)
+        }
+
+
+_tool_output_store: Optional[ToolOutputStore] = None
+
+
+def get_tool_output_store() -> ToolOutputStore:
+    """Get the process-wide tool output store, creating it on first use."""
+    global _tool_output_store
+    if _tool_output_store is None:
+        _tool_output_store = ToolOutputStore()
+    return _tool_output_store
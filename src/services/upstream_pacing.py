@@ -0,0 +1,363 @@
+"""
+Upstream rate-limit pacing for OpenRouter Anthropic Server.
+
+OpenRouter and the providers behind it report what is left of the caller's
+rate limits on every response (x-ratelimit-*, anthropic-ratelimit-*,
+retry-after). This service reads those headers, keeps a budget per upstream
+key and model, and paces dispatch so the limit is approached smoothly
+instead of being discovered through 429s:
+
+- above the pacing threshold requests go out immediately,
+- below it the remaining requests are spread evenly until the reset,
+- once the budget is spent requests wait for the reset (queued into
+  following windows if more are waiting than one window allows),
+- after a 429 the budget is blocked until retry-after.
+
+Requests that would wait longer than the reroute delay are sent to a
+configured fallback model whose budget is free, when there is one.
+
+Every dispatch is counted against the budget locally as it goes out, so
+concurrent requests and streaming responses (whose headers LiteLLM does not
+expose) are accounted for before the next headers arrive.
+"""
+
+import asyncio
+import email.utils
+import json
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from src.utils.config import config
+from .base import BaseService
+from .rate_limiter import BYTES_PER_TOKEN, RateLimiterService
+
+# Header names per budget field, in order of preference
+REQUEST_LIMIT_HEADERS = ("x-ratelimit-limit-requests", "anthropic-ratelimit-requests-limit", "x-ratelimit-limit")
+REQUEST_REMAINING_HEADERS = ("x-ratelimit-remaining-requests", "anthropic-ratelimit-requests-remaining", "x-ratelimit-remaining")
+REQUEST_RESET_HEADERS = ("x-ratelimit-reset-requests", "anthropic-ratelimit-requests-reset", "x-ratelimit-reset")
+TOKEN_LIMIT_HEADERS = ("x-ratelimit-limit-tokens", "anthropic-ratelimit-tokens-limit")
+TOKEN_REMAINING_HEADERS = ("x-ratelimit-remaining-tokens", "anthropic-ratelimit-tokens-remaining")
+TOKEN_RESET_HEADERS = ("x-ratelimit-reset-tokens", "anthropic-ratelimit-tokens-reset")
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_reset(value: str, now: float) -> Optional[float]:
+    """
+    Parse a rate-limit reset header into an absolute time.
+
+    Accepts epoch milliseconds or seconds, seconds from now, durations such
+    as "1m30s" or "250ms", and RFC 3339 / HTTP dates.
+    """
+    value = value.strip()
+    try:
+        number = float(value)
+    except ValueError:
+        pass
+    else:
+        if number > 1e12:
+            return number / 1000
+        if number > 1e9:
+            return number
+        return now + number
+
+    parts = _DURATION_PART.findall(value)
+    if parts and "".join(n + u for n, u in parts) == value:
+        return now + sum(float(n) * _DURATION_UNITS[u] for n, u in parts)
+
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        pass
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _first_header(headers: Mapping[str, str], names: Tuple[str, ...]) -> Optional[str]:
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            return value
+    return None
+
+
+def _int_header(headers: Mapping[str, str], names: Tuple[str, ...]) -> Optional[int]:
+    value = _first_header(headers, names)
+    try:
+        return int(float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+class UpstreamBudget:
+    """What is left of one key and model's upstream rate limits."""
+
+    __slots__ = (
+        "limit_requests", "remaining_requests", "requests_reset_at",
+        "limit_tokens", "remaining_tokens", "tokens_reset_at",
+        "blocked_until", "window", "next_slot", "queued", "in_flight"
+    )
+
+    def __init__(self):
+        """Start with an unknown budget: nothing is paced until headers arrive."""
+        self.limit_requests: Optional[int] = None
+        self.remaining_requests: Optional[int] = None
+        self.requests_reset_at = 0.0
+        self.limit_tokens: Optional[int] = None
+        self.remaining_tokens: Optional[int] = None
+        self.tokens_reset_at = 0.0
+        self.blocked_until = 0.0
+        self.window = 0.0
+        self.next_slot = 0.0
+        self.queued = 0
+        self.in_flight = 0
+
+    def dispatch_time(self, tokens: int, now: float, threshold: float, commit: bool = False) -> float:
+        """
+        Earliest time a request of this size can go out without exceeding the budget.
+
+        With commit the request is counted against the budget (or queued into
+        a later window) and the pacing slot is taken.
+        """
+        self._roll(now)
+        start = max(now, self.blocked_until)
+        next_slot, queued = self.next_slot, self.queued
+
+        remaining = self.remaining_requests
+        if remaining is not None:
+            if remaining <= 0:
+                windows_ahead = queued // max(self.limit_requests or 1, 1)
+                start = max(start, self.requests_reset_at + windows_ahead * self.window)
+                queued += 1
+            else:
+                if self.limit_requests and remaining / self.limit_requests < threshold:
+                    start = max(start, next_slot)
+                    next_slot = start + max(self.requests_reset_at - now, 0.0) / remaining
+                remaining -= 1
+
+        remaining_tokens = self.remaining_tokens
+        if remaining_tokens is not None:
+            if remaining_tokens < tokens:
+                start = max(start, self.tokens_reset_at)
+            else:
+                remaining_tokens -= tokens
+
+        if commit:
+            self.in_flight += 1
+            self.next_slot, self.queued = next_slot, queued
+            self.remaining_requests, self.remaining_tokens = remaining, remaining_tokens
+        return start
+
+    def update(self, headers: Mapping[str, str], status_code: Optional[int], now: float) -> bool:
+        """
+        Update the budget from a finished request's headers; returns whether any were recognised.
+
+        Within a window headers only lower the local count (requests still in
+        flight are not in them yet); a later reset starts a new window, less
+        whatever is still in flight, and headers from an earlier window are ignored.
+        """
+        self._roll(now)
+        self.in_flight = max(self.in_flight - 1, 0)
+        seen = False
+        remaining = _int_header(headers, REQUEST_REMAINING_HEADERS)
+        if remaining is not None:
+            seen = True
+            self.limit_requests = _int_header(headers, REQUEST_LIMIT_HEADERS) or self.limit_requests
+            reset = _first_header(headers, REQUEST_RESET_HEADERS)
+            reset_at = parse_reset(reset, now) if reset else None
+            if reset_at is not None:
+                self.window = max(self.window, reset_at - now)
+            if self.remaining_requests is None or (reset_at or 0) > self.requests_reset_at + self.window / 2:
+                self.remaining_requests = max(remaining - self.in_flight, 0)
+                self.requests_reset_at = reset_at or now + self.window
+            elif reset_at is None or reset_at > self.requests_reset_at - self.window / 2:
+                self.remaining_requests = min(self.remaining_requests, remaining)
+                self.requests_reset_at = max(self.requests_reset_at, reset_at or 0.0)
+
+        remaining = _int_header(headers, TOKEN_REMAINING_HEADERS)
+        if remaining is not None:
+            seen = True
+            self.limit_tokens = _int_header(headers, TOKEN_LIMIT_HEADERS) or self.limit_tokens
+            reset = _first_header(headers, TOKEN_RESET_HEADERS)
+            reset_at = parse_reset(reset, now) if reset else None
+            if self.remaining_tokens is None or (reset_at or 0) > self.tokens_reset_at:
+                self.remaining_tokens = remaining
+                self.tokens_reset_at = reset_at or now
+            else:
+                self.remaining_tokens = min(self.remaining_tokens, remaining)
+
+        if status_code == 429:
+            retry_at = None
+            if headers.get("retry-after-ms"):
+                retry_at = now + float(headers["retry-after-ms"]) / 1000
+            elif headers.get("retry-after"):
+                retry_at = parse_reset(headers["retry-after"], now)
+            self.blocked_until = max(self.blocked_until, retry_at or now + 1.0)
+            seen = True
+        return seen
+
+    def _roll(self, now: float) -> None:
+        """Start the next window once the reset has passed, releasing queued requests into it."""
+        if self.remaining_requests is not None and now >= self.requests_reset_at:
+            if self.limit_requests and self.window > 0:
+                windows = int((now - self.requests_reset_at) // self.window) + 1
+                self.requests_reset_at += windows * self.window
+                self.queued = max(self.queued - self.limit_requests * (windows - 1), 0)
+                released = min(self.queued, self.limit_requests)
+                self.queued -= released
+                self.remaining_requests = self.limit_requests - released
+                self.next_slot = 0.0
+            else:
+                self.remaining_requests = None
+                self.queued = 0
+        if self.remaining_tokens is not None and now >= self.tokens_reset_at:
+            self.remaining_tokens = None
+
+
+@dataclass
+class PacingTicket:
+    """A paced request: the budget it was counted against and how long it waited."""
+    budget_key: Tuple[str, str]
+    model: str
+    delay: float = 0.0
+    rerouted_from: Optional[str] = None
+
+
+class UpstreamPacingService(BaseService):
+    """Service that paces upstream calls against reported rate-limit budgets."""
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        threshold: Optional[float] = None,
+        max_delay: Optional[float] = None,
+        reroute_after: Optional[float] = None,
+        fallback_models: Optional[Dict[str, List[str]]] = None,
+        max_budgets: int = 1000
+    ):
+        """Initialize pacing from config unless overridden."""
+        super().__init__("UpstreamPacing")
+        self.enabled = config.upstream_pacing_enabled if enabled is None else enabled
+        self.threshold = config.upstream_pacing_threshold if threshold is None else threshold
+        self.max_delay = config.upstream_pacing_max_delay if max_delay is None else max_delay
+        self.reroute_after = config.upstream_pacing_reroute_after if reroute_after is None else reroute_after
+        self.fallback_models = config.upstream_pacing_fallback_models if fallback_models is None else fallback_models
+        self.max_budgets = max_budgets
+        self._budgets: "OrderedDict[Tuple[str, str], UpstreamBudget]" = OrderedDict()
+        self.stats: Dict[str, Any] = {
+            "paced_requests": 0,
+            "total_delay_ms": 0.0,
+            "rerouted_requests": 0,
+            "upstream_429s": 0,
+            "header_updates": 0
+        }
+
+    async def acquire(self, request_data: Dict[str, Any]) -> Optional[PacingTicket]:
+        """
+        Wait until the request fits its upstream budget, rerouting if a fallback is free sooner.
+
+        May replace request_data["model"] with a fallback model.
+
+        Returns:
+            Ticket to pass to complete(), or None when pacing is disabled
+        """
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        model = request_data.get("model", "unknown")
+        key = self._key(request_data.get("api_key"))
+        tokens = self.estimate_tokens(request_data)
+
+        budget = self._budget((key, model))
+        start = budget.dispatch_time(tokens, now, self.threshold)
+        rerouted_from = None
+        if start - now > self.reroute_after:
+            for fallback in self.fallback_models.get(model, []):
+                fallback_start = self._budget((key, fallback)).dispatch_time(tokens, now, self.threshold)
+                if fallback_start < start:
+                    rerouted_from, model, start = model, fallback, fallback_start
+                    break
+
+        start = self._budget((key, model)).dispatch_time(tokens, now, self.threshold, commit=True)
+        ticket = PacingTicket(budget_key=(key, model), model=model, rerouted_from=rerouted_from)
+        if rerouted_from:
+            request_data["model"] = model
+            self.stats["rerouted_requests"] += 1
+            self.logger.info("🔀 Rerouting request ahead of upstream rate limit",
+                             model=rerouted_from, fallback_model=model)
+
+        delay = min(start - now, self.max_delay)
+        if delay > 0:
+            ticket.delay = delay
+            self.stats["paced_requests"] += 1
+            self.stats["total_delay_ms"] += delay * 1000
+            self.logger.debug("⏳ Pacing upstream request", model=model, delay_ms=round(delay * 1000, 1))
+            await asyncio.sleep(delay)
+        return ticket
+
+    def complete(
+        self,
+        ticket: Optional[PacingTicket],
+        headers: Optional[Mapping[str, str]] = None,
+        status_code: Optional[int] = None
+    ) -> None:
+        """Update a paced request's budget from its response headers, if any."""
+        if ticket is None:
+            return
+        budget = self._budget(ticket.budget_key)
+        if status_code == 429:
+            self.stats["upstream_429s"] += 1
+        headers = headers if isinstance(headers, Mapping) else {}
+        if budget.update({k.lower(): v for k, v in headers.items()}, status_code, time.time()):
+            self.stats["header_updates"] += 1
+
+    @staticmethod
+    def estimate_tokens(request_data: Dict[str, Any]) -> int:
+        """Rough prompt plus completion tokens, for token budgets."""
+        prompt_bytes = 0
+        for message in request_data.get("messages", []):
+            content = message.get("content", "") if isinstance(message, dict) else ""
+            prompt_bytes += len(content) if isinstance(content, str) else len(json.dumps(content, default=str))
+        return prompt_bytes // BYTES_PER_TOKEN + int(request_data.get("max_tokens") or 0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pacing counters and the current budgets."""
+        now = time.time()
+        return {
+            "enabled": self.enabled,
+            **self.stats,
+            "total_delay_ms": round(self.stats["total_delay_ms"], 1),
+            "budgets": {
+                f"{key}|{model}": {
+                    "remaining_requests": budget.remaining_requests,
+                    "limit_requests": budget.limit_requests,
+                    "requests_reset_in": round(max(budget.requests_reset_at - now, 0), 3),
+                    "remaining_tokens": budget.remaining_tokens,
+                    "blocked_for": round(max(budget.blocked_until - now, 0), 3),
+                    "queued_requests": budget.queued
+                }
+                for (key, model), budget in self._budgets.items()
+            }
+        }
+
+    @staticmethod
+    def _key(api_key: Optional[str]) -> str:
+        return RateLimiterService.client_key({"x-api-key": api_key} if api_key else {}, None)
+
+    def _budget(self, budget_key: Tuple[str, str]) -> UpstreamBudget:
+        budget = self._budgets.get(budget_key)
+        if budget is None:
+            budget = self._budgets[budget_key] = UpstreamBudget()
+            if len(self._budgets) > self.max_budgets:
+                self._budgets.popitem(last=False)
+        else:
+            self._budgets.move_to_end(budget_key)
+        return budget
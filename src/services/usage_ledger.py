@@ -0,0 +1,356 @@
+"""
+Usage accounting ledger for OpenRouter Anthropic Server.
+
+Token usage of every completed request (converted or passthrough) is
+appended to a local SQLite ledger and rolled up by hour, model and client,
+so operators can answer "tokens per model per hour" without grepping logs.
+
+Recording only appends to an in-memory buffer; a background task writes
+the buffer in batches from a worker thread, so the request path never
+waits on disk.
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+from dataclasses import astuple, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from src.utils.config import config
+from .base import BaseService
+
+# Ledger file in UNIFIED_LOGS_DIR when USAGE_LEDGER_PATH is not set
+LEDGER_FILENAME = "usage_ledger.sqlite3"
+
+# Failed writes of the same batch before its records are dropped
+MAX_FLUSH_ATTEMPTS = 3
+
+# Columns that can be grouped on, mapped to their SQL expression over usage_hourly
+GROUP_COLUMNS = {
+    "hour": "hour",
+    "day": "substr(hour, 1, 10)",
+    "model": "model",
+    "requested_model": "requested_model",
+    "client": "client",
+    "source": "source"
+}
+
+USAGE_FIELDS = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage_records (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    request_id TEXT,
+    source TEXT NOT NULL,
+    model TEXT NOT NULL,
+    requested_model TEXT NOT NULL,
+    client TEXT NOT NULL,
+    input_tokens INTEGER NOT NULL,
+    output_tokens INTEGER NOT NULL,
+    cache_creation_input_tokens INTEGER NOT NULL,
+    cache_read_input_tokens INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS usage_records_ts ON usage_records (ts);
+CREATE TABLE IF NOT EXISTS usage_hourly (
+    hour TEXT NOT NULL,
+    source TEXT NOT NULL,
+    model TEXT NOT NULL,
+    requested_model TEXT NOT NULL,
+    client TEXT NOT NULL,
+    requests INTEGER NOT NULL,
+    input_tokens INTEGER NOT NULL,
+    output_tokens INTEGER NOT NULL,
+    cache_creation_input_tokens INTEGER NOT NULL,
+    cache_read_input_tokens INTEGER NOT NULL,
+    PRIMARY KEY (hour, source, model, requested_model, client)
+);
+"""
+
+_INSERT_RECORD = """
+INSERT INTO usage_records (
+    ts, request_id, source, model, requested_model, client,
+    input_tokens, output_tokens, cache_creation_input_tokens, cache_read_input_tokens
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_UPSERT_HOURLY = """
+INSERT INTO usage_hourly VALUES (
+    strftime('%Y-%m-%dT%H:00:00Z', ?, 'unixepoch'), ?, ?, ?, ?, 1, ?, ?, ?, ?
+)
+ON CONFLICT (hour, source, model, requested_model, client) DO UPDATE SET
+    requests = requests + 1,
+    input_tokens = input_tokens + excluded.input_tokens,
+    output_tokens = output_tokens + excluded.output_tokens,
+    cache_creation_input_tokens = cache_creation_input_tokens + excluded.cache_creation_input_tokens,
+    cache_read_input_tokens = cache_read_input_tokens + excluded.cache_read_input_tokens
+"""
+
+
+@dataclass
+class UsageRecord:
+    """Token usage of one completed request."""
+    ts: float
+    request_id: Optional[str]
+    source: str  # "conversion", "passthrough" or "batch"
+    model: str  # model the request was sent to upstream
+    requested_model: str  # model name the client asked for
+    client: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_creation_input_tokens: int = 0
+    cache_read_input_tokens: int = 0
+
+
+def hour_bucket(value: Any) -> Optional[str]:
+    """Normalize a query bound (epoch seconds or ISO 8601) to its hour bucket."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)) or str(value).replace(".", "", 1).isdigit():
+        moment = datetime.fromtimestamp(float(value), tz=timezone.utc)
+    else:
+        moment = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:00:00Z")
+
+
+class UsageLedgerService(BaseService):
+    """Service that records token usage and serves hourly rollups."""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        flush_interval: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        enabled: Optional[bool] = None
+    ):
+        """Initialize usage ledger from config unless overridden."""
+        super().__init__("UsageLedger")
+        self.enabled = config.usage_ledger_enabled if enabled is None else enabled
+        self.path = Path(path or config.usage_ledger_path or Path(config.unified_logs_dir) / LEDGER_FILENAME)
+        self.flush_interval = flush_interval or config.usage_ledger_flush_interval
+        self.batch_size = batch_size or config.usage_ledger_batch_size
+        self._pending: List[UsageRecord] = []
+        self._failed_flushes = 0
+        self._connection: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._flusher: Optional["asyncio.Task[None]"] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.stats: Dict[str, Any] = {
+            "recorded": 0,
+            "written": 0,
+            "flushes": 0,
+            "write_errors": 0,
+            "dropped": 0,
+            "last_flush_ms": 0.0
+        }
+
+    def record(self, record: UsageRecord) -> None:
+        """
+        Queue a usage record for the next batch write.
+
+        Only appends to memory; never blocks on disk.
+        """
+        if not self.enabled:
+            return
+        self._pending.append(record)
+        self.stats["recorded"] += 1
+        self._ensure_flusher()
+        if len(self._pending) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    def record_response(
+        self,
+        response: Any,
+        model: str,
+        requested_model: str,
+        client: str,
+        request_id: Optional[str] = None,
+        source: str = "conversion"
+    ) -> None:
+        """Record the usage of a converted (MessagesResponse or dict) response."""
+        usage = response.get("usage") if isinstance(response, dict) else getattr(response, "usage", None)
+        if usage is None:
+            return
+        if not isinstance(usage, dict):
+            usage = usage.model_dump() if hasattr(usage, "model_dump") else vars(usage)
+        self.record(UsageRecord(
+            ts=time.time(),
+            request_id=request_id,
+            source=source,
+            model=model or "",
+            requested_model=requested_model or model or "",
+            client=client,
+            **{name: int(usage.get(name) or 0) for name in USAGE_FIELDS}
+        ))
+
+    def record_passthrough(self, exchange: Any) -> None:
+        """Passthrough hook: record the usage metered from a forwarded response."""
+        if exchange.path != "/v1/messages" or not exchange.usage or exchange.status_code >= 400:
+            return
+        self.record(UsageRecord(
+            ts=time.time(),
+            request_id=None,
+            source="passthrough",
+            model=exchange.upstream_model,
+            requested_model=exchange.model,
+            client=exchange.client,
+            **{name: int(exchange.usage.get(name) or 0) for name in USAGE_FIELDS}
+        ))
+
+    def _ensure_flusher(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # no loop (e.g. scripts): records are written by flush()
+        if self._flusher is not None and not self._flusher.done() and self._flusher.get_loop() is loop:
+            return
+        self._wakeup = asyncio.Event()
+        self._flusher = loop.create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        """
+        Write all queued records in one transaction, off the event loop.
+
+        A failed batch goes back to the front of the queue and is retried on
+        the next flush; after MAX_FLUSH_ATTEMPTS failures in a row it is dropped.
+
+        Returns:
+            Number of records written
+        """
+        if not self._pending:
+            return 0
+        batch, self._pending = self._pending, []
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(self._write, batch)
+        except Exception as e:
+            self.stats["write_errors"] += 1
+            self.logger.error("❌ Usage ledger write failed",
+                              records=len(batch),
+                              error_type=type(e).__name__,
+                              error_message=str(e))
+            self._failed_flushes += 1
+            if self._failed_flushes < MAX_FLUSH_ATTEMPTS:
+                self._pending[:0] = batch
+            else:
+                self._failed_flushes = 0
+                self.stats["dropped"] += len(batch)
+            return 0
+        self._failed_flushes = 0
+        self.stats["written"] += len(batch)
+        self.stats["flushes"] += 1
+        self.stats["last_flush_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return len(batch)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def _write(self, batch: Sequence[UsageRecord]) -> None:
+        rows = [astuple(record) for record in batch]
+        # usage_hourly takes ts first, then everything but request_id
+        hourly_rows = [(row[0],) + row[2:] for row in rows]
+        with self._db_lock:
+            connection = self._connect()
+            with connection:
+                connection.executemany(_INSERT_RECORD, rows)
+                connection.executemany(_UPSERT_HOURLY, hourly_rows)
+
+    async def query(
+        self,
+        group_by: Sequence[str] = ("model",),
+        start: Any = None,
+        end: Any = None,
+        model: Optional[str] = None,
+        client: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Sum usage from the hourly rollup.
+
+        Args:
+            group_by: Any of hour, day, model, requested_model, client, source
+            start: Inclusive lower bound (epoch seconds or ISO 8601), truncated to the hour
+            end: Exclusive upper bound (epoch seconds or ISO 8601), truncated to the hour
+            model: Only usage of this upstream model
+            client: Only usage of this client
+
+        Returns:
+            One row per group with request and token totals
+
+        Raises:
+            ValueError: If a group_by column or time bound is invalid
+        """
+        unknown = [column for column in group_by if column not in GROUP_COLUMNS]
+        if unknown:
+            raise ValueError(f"Cannot group usage by {', '.join(unknown)}; "
+                             f"expected any of {', '.join(GROUP_COLUMNS)}")
+
+        conditions, params = [], []
+        for clause, value in (("hour >= ?", hour_bucket(start)), ("hour < ?", hour_bucket(end)),
+                              ("model = ?", model), ("client = ?", client)):
+            if value is not None:
+                conditions.append(clause)
+                params.append(value)
+
+        selected = [f"{GROUP_COLUMNS[column]} AS {column}" for column in group_by]
+        totals = ["SUM(requests) AS requests"] + [f"SUM({name}) AS {name}" for name in USAGE_FIELDS]
+        sql = f"SELECT {', '.join(selected + totals)} FROM usage_hourly"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        if group_by:
+            sql += f" GROUP BY {', '.join(group_by)} ORDER BY {', '.join(group_by)}"
+
+        # Make records that are still queued visible to the query
+        await self.flush()
+        return await asyncio.to_thread(self._read, sql, params)
+
+    def _read(self, sql: str, params: Sequence[Any]) -> List[Dict[str, Any]]:
+        with self._db_lock:
+            cursor = self._connect().execute(sql, params)
+            columns = [description[0] for description in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        # An ungrouped query over no usage yields a single row of NULL sums
+        return [row for row in rows if row["requests"] is not None]
+
+    async def close(self) -> None:
+        """Stop the background writer and write what is still queued."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush()
+        with self._db_lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get ledger write statistics."""
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "path": str(self.path),
+            "pending": len(self._pending)
+        }
@@ -58,6 +58,18 @@ class MessageValidationService(ValidationService[Message], InstructorService):
                 suggestions=["Check message format and try again"]
             )
     
+    async def avalidate(self, data: Any, **kwargs) -> ValidationResult:
+        """Validate message data on the running event loop, without a worker thread."""
+        try:
+            return await self._coordinator.validate_message(data, **kwargs)
+        except Exception as e:
+            self.logger.error("Message validation failed", error=str(e), exc_info=True)
+            return self.create_validation_result(
+                False,
+                errors=[f"Validation failed: {str(e)}"],
+                suggestions=["Check message format and try again"]
+            )
+    
     def validate_messages_request(self, request: MessagesRequest) -> MessagesRequest:
         """Validate a MessagesRequest using coordinator."""
         try:
@@ -78,6 +90,23 @@ class MessageValidationService(ValidationService[Message], InstructorService):
             self.logger.error("Messages request validation failed", error=str(e), exc_info=True)
             raise ValueError(f"Request validation failed: {str(e)}")
 
+    async def avalidate_messages_request(self, request: MessagesRequest) -> MessagesRequest:
+        """Validate a MessagesRequest on the running event loop, without a worker thread."""
+        try:
+            result = await self._coordinator.validate_messages_request(request)
+
+            if not result.is_valid:
+                error_message = f"Request validation failed: {'; '.join(result.errors)}"
+                self.logger.error("Messages request validation failed", error=error_message)
+                raise ValueError(error_message)
+
+            from ..tasks.validation.message_validation_tasks import validate_messages_request_data
+            return validate_messages_request_data(request)
+
+        except Exception as e:
+            self.logger.error("Messages request validation failed", error=str(e), exc_info=True)
+            raise ValueError(f"Request validation failed: {str(e)}")
+
 
 class ToolValidationService(ValidationService[Tool], InstructorService):
     """Service for validating tools with enhanced functionality - Refactored."""
@@ -6,6 +6,7 @@ import json
 from ...models.anthropic import Message
 from ...models.litellm import LiteLLMMessage
 from ...core.logging_config import get_logger
+from ...utils.tool_arguments import tool_argument_cache
 
 logger = get_logger("conversion.message")
 
@@ -54,7 +55,7 @@ def convert_anthropic_message_to_litellm(message: Message, metadata: Dict[str, A
                         "type": "function",
                         "function": {
                             "name": getattr(block, 'name', ''),
-                            "arguments": json.dumps(getattr(block, 'input', {}))
+                            "arguments": tool_argument_cache.serialize(getattr(block, 'id', ''), getattr(block, 'input', {}))
                         }
                     }
                     tool_calls.append(tool_call)
@@ -111,7 +112,7 @@ def convert_litellm_message_to_anthropic(litellm_message: LiteLLMMessage, metada
                 function = tool_call.function
                 try:
                     # Parse arguments from JSON string
-                    arguments = json.loads(function.arguments) if isinstance(function.arguments, str) else function.arguments
+                    arguments = tool_argument_cache.parse(tool_call.id, function.arguments)
                 except json.JSONDecodeError:
                     arguments = {}
                 
@@ -14,6 +14,8 @@ from ...models.litellm import LiteLLMMessage
 from ...models.instructor import ConversionResult
 from ...core.logging_config import get_logger
 from ...services.context_manager import ContextManager
+from ...utils.tool_arguments import tool_argument_cache
+from ...utils.tool_use_index import get_tool_use_index
 
 # Initialize logging and context management
 logger = get_logger("message_transformation")
@@ -95,7 +97,7 @@ async def _convert_anthropic_to_litellm_message(
                         "type": "function",
                         "function": {
                             "name": getattr(block, 'name', ''),
-                            "arguments": json.dumps(getattr(block, 'input', {}))
+                            "arguments": tool_argument_cache.serialize(getattr(block, 'id', ''), getattr(block, 'input', {}))
                         }
                     }
                     tool_calls.append(tool_call)
@@ -158,7 +160,7 @@ async def _convert_litellm_to_anthropic_message(
     if message.tool_calls:
         for tool_call in message.tool_calls:
             try:
-                arguments = json.loads(tool_call["function"]["arguments"])
+                arguments = tool_argument_cache.parse(tool_call.get("id"), tool_call["function"]["arguments"])
             except (json.JSONDecodeError, KeyError):
                 arguments = {}
             
@@ -313,7 +315,7 @@ async def _transform_tool_calls(
             # Parse tool arguments safely
             try:
                 if 'arguments' in tool_call['function']:
-                    tool_content["input"] = json.loads(tool_call['function']['arguments'])
+                    tool_content["input"] = tool_argument_cache.parse(tool_call['id'], tool_call['function']['arguments'])
                 else:
                     tool_content["input"] = {}
             except (json.JSONDecodeError, TypeError):
@@ -338,7 +340,7 @@ async def _transform_tool_calls(
                     "type": "function",
                     "function": {
                         "name": block.get('name', ''),
-                        "arguments": json.dumps(block.get('input', {}))
+                        "arguments": tool_argument_cache.serialize(block.get('id'), block.get('input', {}))
                     }
                 }
                 litellm_tool_calls.append(tool_call)
@@ -498,24 +500,14 @@ async def find_tool_name_for_id_task(
     try:
         logger.debug("Looking for tool name for ID", tool_use_id=tool_use_id)
         
-        for i, msg in enumerate(messages):
-            logger.debug("Checking message", message_index=i+1, role=msg.get("role"))
-            
-            content = msg.get("content")
-            if isinstance(content, list):
-                for j, block in enumerate(content):
-                    if isinstance(block, dict) and block.get("type") == "tool_use":
-                        block_id = block.get("id")
-                        block_name = block.get("name")
-                        logger.debug("Found tool_use block", block_id=block_id, block_name=block_name)
-                        
-                        if block_id == tool_use_id:
-                            logger.debug("Found matching tool name", tool_name=block_name)
-                            return ConversionResult(
-                                success=True,
-                                converted_data=block_name,
-                                metadata={"tool_name": block_name}
-                            )
+        entry = get_tool_use_index(messages).get(tool_use_id)
+        if entry is not None:
+            logger.debug("Found matching tool name", tool_name=entry.name)
+            return ConversionResult(
+                success=True,
+                converted_data=entry.name,
+                metadata={"tool_name": entry.name}
+            )
         
         # Fallback if not found
         logger.warning("Could not find tool name for ID", tool_use_id=tool_use_id)
@@ -4,6 +4,7 @@ from typing import Any, Dict, List, Union
 
 from ...models.anthropic import Tool, Message
 from ...core.logging_config import get_logger
+from ...utils.tool_use_index import get_tool_use_index
 
 logger = get_logger("conversion.tool")
 
@@ -103,23 +104,13 @@ def find_tool_name_for_id(messages: List[Message], tool_use_id: str) -> str:
     """Find the tool name for a given tool_use_id from previous messages."""
     logger.debug("Looking for tool name for ID", tool_use_id=tool_use_id)
 
-    for i, msg in enumerate(messages):
-        logger.debug("Checking message", message_index=i+1, role=msg.role)
-        if isinstance(msg.content, list):
-            for j, block in enumerate(msg.content):
-                logger.debug("Checking content block", block_index=j+1, 
-                           block_type=getattr(block, 'type', 'unknown'))
-                if hasattr(block, 'type') and block.type == "tool_use":
-                    block_id = getattr(block, 'id', '')
-                    block_name = getattr(block, 'name', '')
-                    logger.debug("Found tool_use block", 
-                               block_id=block_id, 
-                               block_name=block_name)
-                    if block_id == tool_use_id:
-                        logger.info("Found matching tool name", 
-                                   tool_use_id=tool_use_id, 
-                                   tool_name=block_name)
-                        return block_name
+    entry = get_tool_use_index(messages).get(tool_use_id)
+    if entry is not None:
+        logger.info("Found matching tool name", 
+                   tool_use_id=tool_use_id, 
+                   tool_name=entry.name,
+                   message_index=entry.message_index)
+        return entry.name
 
     logger.warning("Tool name not found for ID", tool_use_id=tool_use_id)
     return "unknown_tool"
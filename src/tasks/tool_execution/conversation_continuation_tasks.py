@@ -1,10 +1,10 @@
 """Conversation continuation task functions."""
 
-import json
 from typing import Any, Dict, List
 from .tool_result_formatting_tasks import ToolExecutionResult, create_tool_result_block
 from ...models.anthropic import Message
 from ...core.logging_config import get_logger
+from ...utils.tool_arguments import tool_argument_cache
 
 logger = get_logger("tool_execution.continuation")
 
@@ -38,7 +38,7 @@ def create_assistant_tool_use_message(tool_use_response: Any) -> Dict[str, Any]:
                             "type": "tool_use",
                             "id": tool_call.id,
                             "name": tool_call.function.name,
-                            "input": json.loads(tool_call.function.arguments) if tool_call.function.arguments else {}
+                            "input": tool_argument_cache.parse(tool_call.id, tool_call.function.arguments)
                         })
         
         return {
@@ -1,6 +1,7 @@
 """Tool execution metrics and rate limiting task functions."""
 
 import time
+from collections import OrderedDict
 from typing import Any, Dict
 from .tool_result_formatting_tasks import ToolExecutionResult
 from ...core.logging_config import get_logger
@@ -33,22 +34,29 @@ def update_tool_execution_metrics(metrics: Dict[str, Any], result: ToolExecution
 
 
 def check_rate_limit(
-    rate_limit_tracker: Dict[str, float],
+    rate_limit_tracker: "OrderedDict[str, float]",
     request_id: str,
     rate_limit_window: float = 60,
     rate_limit_max_requests: int = 100
 ) -> bool:
-    """Check if request is within rate limits"""
+    """
+    Check if request is within rate limits.
+    
+    The tracker is an OrderedDict kept in timestamp order, so expired entries
+    are popped from the front and each check costs amortized O(1) instead of
+    a scan of the whole window.
+    """
     current_time = time.time()
     
     # Clean old entries
     cutoff_time = current_time - rate_limit_window
-    to_remove = [
-        req_id for req_id, timestamp in rate_limit_tracker.items() 
-        if timestamp <= cutoff_time
-    ]
-    for req_id in to_remove:
-        del rate_limit_tracker[req_id]
+    while rate_limit_tracker:
+        oldest_id, timestamp = rate_limit_tracker.popitem(last=False)
+        if timestamp > cutoff_time:
+            # Still in the window: put it back at the front
+            rate_limit_tracker[oldest_id] = timestamp
+            rate_limit_tracker.move_to_end(oldest_id, last=False)
+            break
     
     # Check if over limit
     if len(rate_limit_tracker) >= rate_limit_max_requests:
@@ -58,8 +66,9 @@ def check_rate_limit(
                       max_requests=rate_limit_max_requests)
         return False
     
-    # Track this request
+    # Track this request (moved to the end to keep the order)
     rate_limit_tracker[request_id] = current_time
+    rate_limit_tracker.move_to_end(request_id)
     return True
 
 
@@ -1,8 +1,8 @@
 """Tool detection and validation task functions."""
 
-import json
 from typing import Any, Dict, List
 from ...core.logging_config import get_logger
+from ...utils.tool_arguments import tool_argument_cache
 
 logger = get_logger("tool_execution.detection")
 
@@ -67,7 +67,7 @@ def extract_tool_use_blocks(response: Any) -> List[Dict[str, Any]]:
                             "type": "tool_use",
                             "id": tool_call.id,
                             "name": tool_call.function.name,
-                            "input": json.loads(tool_call.function.arguments) if tool_call.function.arguments else {}
+                            "input": tool_argument_cache.parse(tool_call.id, tool_call.function.arguments)
                         }
                         tool_use_blocks.append(tool_use_block)
         
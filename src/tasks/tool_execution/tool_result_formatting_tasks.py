@@ -39,20 +39,25 @@ def format_tool_result_content(result: ToolExecutionResult) -> str:
 
 
 def truncate_result_content(content: str, max_length: int = 10000) -> str:
-    """Truncate content if it exceeds maximum length"""
+    """Spill content exceeding maximum length to the tool output store and return a summary"""
     if len(content) <= max_length:
         return content
     
+    # Imported here to avoid a circular import through the services package
+    from ...services.tool_output_store import get_tool_output_store
+    
+    store = get_tool_output_store()
     original_length = len(content)
-    truncated_content = content[:max_length]
-    truncated_content += f"\n\n[Content truncated - {original_length} total characters, showing first {max_length}]"
+    handle = store.put_text(content)
+    summarized_content = store.summarize(handle, label="Tool result")
     
-    logger.warning("Tool result truncated",
+    logger.warning("Tool result spilled to disk",
                   original_length=original_length,
                   max_length=max_length,
-                  truncated_length=len(truncated_content))
+                  handle=handle,
+                  summarized_length=len(summarized_content))
     
-    return truncated_content
+    return summarized_content
 
 
 def create_tool_result_block(result: ToolExecutionResult) -> Dict[str, Any]:
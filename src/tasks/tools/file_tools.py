@@ -255,27 +255,38 @@ async def read_file_task(
                 execution_time=time.time() - start_time
             )
         
-        # Read file content
-        content = safe_path.read_text(encoding='utf-8')
-        
-        # Apply offset and limit if specified
-        if offset is not None or limit is not None:
-            lines = content.splitlines(keepends=True)
-            
-            start_line = max(0, (offset or 1) - 1)  # Convert to 0-indexed
-            end_line = len(lines)
-            
-            if limit is not None:
-                end_line = min(len(lines), start_line + limit)
-            
-            if start_line >= len(lines):
-                content = ""
-            else:
-                content = ''.join(lines[start_line:end_line])
-            
-            result_info = f"Lines {start_line + 1}-{end_line} of {len(lines)} total lines"
-        else:
-            result_info = f"Complete file ({len(content.splitlines())} lines, {len(content)} characters)"
+        # Stream the file into a spool so large files never sit in memory whole;
+        # resolve() returns small outputs inline and summarizes large ones
+        from ...services.tool_output_store import COPY_CHUNK_BYTES, get_tool_output_store
+        store = get_tool_output_store()
+        handle, spool = store.new_spool()
+        try:
+            with spool, open(safe_path, 'r', encoding='utf-8', newline='') as f:
+                if offset is not None or limit is not None:
+                    start_line = max(0, (offset or 1) - 1)  # Convert to 0-indexed
+                    end_line = start_line
+                    total_lines = 0
+                    for line in f:
+                        if start_line <= total_lines and (limit is None or total_lines < start_line + limit):
+                            spool.write(line.encode('utf-8'))
+                            end_line = total_lines + 1
+                        total_lines += 1
+                    result_info = f"Lines {start_line + 1}-{end_line} of {total_lines} total lines"
+                else:
+                    characters = 0
+                    newlines = 0
+                    last = "\n"
+                    for chunk in iter(lambda: f.read(COPY_CHUNK_BYTES), ""):
+                        spool.write(chunk.encode('utf-8'))
+                        characters += len(chunk)
+                        newlines += chunk.count("\n")
+                        last = chunk[-1]
+                    total_lines = newlines + (0 if last == "\n" else 1)
+                    result_info = f"Complete file ({total_lines} lines, {characters} characters)"
+        except BaseException:
+            store.discard(handle)
+            raise
+        content = store.resolve(handle, label=f"File {safe_path.name}")
         
         logger.info("Read tool executed successfully",
                    file_path=str(safe_path),
@@ -4,9 +4,12 @@ Converts SystemToolExecutor methods into modular Prefect tasks.
 Part of Phase 6A comprehensive refactoring - Task-per-Tool Architecture.
 """
 
+import asyncio
 import json
+import os
 import re
 import shlex
+import signal
 import subprocess
 import time
 from pathlib import Path
@@ -125,6 +128,63 @@ def _requires_deletion_confirmation(command: str) -> bool:
     return False
 
 
+def _kill_process_tree(process: asyncio.subprocess.Process) -> None:
+    """Kill a command's shell and every child it started."""
+    if process.returncode is not None:
+        return
+    try:
+        if hasattr(os, "killpg"):
+            # Commands run in their own session, so the group id is the shell's pid
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+
+
+async def _run_command(command: str, stdout_file, stderr_file, timeout: float, stdin_input: str = None) -> int:
+    """
+    Run a shell command without blocking the event loop.
+
+    The command's process group is killed on timeout and when the calling
+    task is cancelled (e.g. the client disconnected), so no children outlive it.
+
+    Returns:
+        The command's exit code
+
+    Raises:
+        subprocess.TimeoutExpired: If the command ran longer than timeout
+    """
+    process = await asyncio.create_subprocess_shell(
+        command,
+        stdin=asyncio.subprocess.PIPE if stdin_input else asyncio.subprocess.DEVNULL,
+        stdout=stdout_file,
+        stderr=stderr_file,
+        cwd=str(Path.cwd()),
+        start_new_session=hasattr(os, "killpg")
+    )
+    try:
+        await asyncio.wait_for(
+            process.communicate(input=stdin_input.encode('utf-8') if stdin_input else None),
+            timeout=timeout
+        )
+    except asyncio.TimeoutError:
+        _kill_process_tree(process)
+        await process.wait()
+        raise subprocess.TimeoutExpired(command, timeout)
+    except asyncio.CancelledError:
+        running = process.returncode is None
+        _kill_process_tree(process)
+        await process.wait()
+        from ...services import disconnect_monitor_service
+        disconnect_monitor_service.record_cancelled("cancelled_tool_executions")
+        if running:
+            disconnect_monitor_service.record_cancelled("killed_processes")
+        logger.warning("🔌 Bash command cancelled", command=command, killed=running)
+        raise
+    return process.returncode
+
+
 @task(name="execute_command", retries=1, retry_delay_seconds=2)
 async def execute_command_task(
     tool_call_id: str,
@@ -204,36 +264,37 @@ async def execute_command_task(
                 requires_user_input=True  # Indicate this needs user input
             )
         
-        # Execute command with optional stdin input
+        # Execute command with optional stdin input; stdout/stderr stream straight
+        # to spool files so memory stays bounded however much the command prints
+        from ...services.tool_output_store import get_tool_output_store
+        store = get_tool_output_store()
+        stdout_handle, stdout_file = store.new_spool()
+        stderr_handle, stderr_file = store.new_spool()
         try:
-            result = subprocess.run(
-                command,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-                cwd=str(Path.cwd()),
-                input=stdin_input  # Provide input to stdin if specified
-            )
+            with stdout_file, stderr_file:
+                returncode = await _run_command(command, stdout_file, stderr_file, timeout, stdin_input)
+            
+            stdout_text = store.resolve(stdout_handle, label="STDOUT")
+            stderr_text = store.resolve(stderr_handle, label="STDERR")
             
             # Format output with input information
             output_parts = []
             if stdin_input:
                 output_parts.append(f"INPUT PROVIDED:\n{stdin_input}")
-            if result.stdout:
-                output_parts.append(f"STDOUT:\n{result.stdout}")
-            if result.stderr:
-                output_parts.append(f"STDERR:\n{result.stderr}")
+            if stdout_text:
+                output_parts.append(f"STDOUT:\n{stdout_text}")
+            if stderr_text:
+                output_parts.append(f"STDERR:\n{stderr_text}")
             
             output = "\n".join(output_parts) if output_parts else "(no output)"
             
-            if result.returncode != 0:
-                error_msg = f"Command failed with exit code {result.returncode}\n{output}"
+            if returncode != 0:
+                error_msg = f"Command failed with exit code {returncode}\n{output}"
                 logger.warning("Bash tool command failed with non-zero exit code",
                              command=command,
-                             exit_code=result.returncode,
-                             stdout=result.stdout[:500] if result.stdout else None,
-                             stderr=result.stderr[:500] if result.stderr else None,
+                             exit_code=returncode,
+                             stdout=stdout_text[:500] if stdout_text else None,
+                             stderr=stderr_text[:500] if stderr_text else None,
                              tool_call_id=tool_call_id)
                 return ToolExecutionResult(
                     tool_call_id=tool_call_id,
@@ -250,8 +311,8 @@ async def execute_command_task(
             logger.info("Bash tool executed successfully",
                        command=command,
                        stdin_input_lines=len(stdin_input.splitlines()) if stdin_input else 0,
-                       stdout_length=len(result.stdout) if result.stdout else 0,
-                       stderr_length=len(result.stderr) if result.stderr else 0,
+                       stdout_length=len(stdout_text),
+                       stderr_length=len(stderr_text),
                        tool_call_id=tool_call_id)
             
             return ToolExecutionResult(
@@ -263,6 +324,8 @@ async def execute_command_task(
             )
             
         except subprocess.TimeoutExpired:
+            store.discard(stdout_handle)
+            store.discard(stderr_handle)
             return ToolExecutionResult(
                 tool_call_id=tool_call_id,
                 tool_name=tool_name,
@@ -271,6 +334,10 @@ async def execute_command_task(
                 error=f"Command timed out after {timeout} seconds",
                 execution_time=time.time() - start_time
             )
+        except (Exception, asyncio.CancelledError):
+            store.discard(stdout_handle)
+            store.discard(stderr_handle)
+            raise
             
     except Exception as e:
         error_msg = f"Failed to execute command '{command}': {e}"
@@ -289,6 +356,90 @@ async def execute_command_task(
         )
 
 
+@task(name="read_tool_output", retries=1, retry_delay_seconds=1)
+async def read_tool_output_task(
+    tool_call_id: str,
+    tool_name: str,
+    tool_input: Dict[str, Any]
+) -> ToolExecutionResult:
+    """
+    Page through a stored tool output as Prefect task.
+    
+    Args:
+        tool_call_id: Unique identifier for the tool call
+        tool_name: Name of the tool (ReadToolOutput)
+        tool_input: Dictionary containing handle, optional offset and limit
+    
+    Returns:
+        ToolExecutionResult with the requested lines or error
+    """
+    start_time = time.time()
+    
+    # Create tool context for structured logging
+    context_manager.create_tool_context(
+        tool_name=tool_name,
+        tool_call_id=tool_call_id,
+        input_data=tool_input,
+        execution_step=1
+    )
+    
+    handle = tool_input.get('handle', '')
+    try:
+        from ...services.tool_output_store import DEFAULT_PAGE_LINES, get_tool_output_store
+        store = get_tool_output_store()
+        if not store.exists(handle):
+            return ToolExecutionResult(
+                tool_call_id=tool_call_id,
+                tool_name=tool_name,
+                success=False,
+                result=None,
+                error=f"Stored tool output not found (it may have been evicted): {handle}",
+                execution_time=time.time() - start_time
+            )
+        
+        page = store.read_page(
+            handle,
+            offset=int(tool_input.get('offset') or 1),
+            limit=int(tool_input.get('limit') or DEFAULT_PAGE_LINES)
+        )
+        if page['next_offset']:
+            footer = f"[more lines follow; continue with offset={page['next_offset']}]"
+        else:
+            footer = "[end of output]"
+        output = (f"[Lines {page['start_line']}-{page['end_line']} of {handle}]\n"
+                  f"{page['content']}{footer}")
+        
+        logger.info("ReadToolOutput tool executed successfully",
+                   handle=handle,
+                   start_line=page['start_line'],
+                   end_line=page['end_line'],
+                   tool_call_id=tool_call_id)
+        
+        return ToolExecutionResult(
+            tool_call_id=tool_call_id,
+            tool_name=tool_name,
+            success=True,
+            result=output,
+            execution_time=time.time() - start_time
+        )
+        
+    except Exception as e:
+        error_msg = f"Failed to read stored tool output '{handle}': {e}"
+        logger.error("ReadToolOutput tool execution failed",
+                    handle=handle,
+                    error=str(e),
+                    tool_call_id=tool_call_id,
+                    exc_info=True)
+        return ToolExecutionResult(
+            tool_call_id=tool_call_id,
+            tool_name=tool_name,
+            success=False,
+            result=None,
+            error=error_msg,
+            execution_time=time.time() - start_time
+        )
+
+
 @task(name="task_management", retries=2, retry_delay_seconds=1)
 async def task_management_task(
     tool_call_id: str,
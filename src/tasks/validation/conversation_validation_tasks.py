@@ -4,6 +4,7 @@ from typing import List
 from ...models.anthropic import Message
 from ...models.instructor import ConversationFlowResult
 from ...core.logging_config import get_logger
+from ...utils.tool_use_index import get_tool_use_index
 
 logger = get_logger("validation.conversation_tasks")
 
@@ -135,32 +136,18 @@ def validate_tool_flow_in_conversation(messages: List[Message], errors: List[str
     Returns:
         True if tool flow is valid, False otherwise
     """
-    tool_uses = set()
-    tool_results = set()
-    
-    for msg in messages:
-        if isinstance(msg.content, list):
-            for block in msg.content:
-                if hasattr(block, 'type'):
-                    if block.type == "tool_use":
-                        tool_id = getattr(block, 'id', None)
-                        if tool_id:
-                            tool_uses.add(tool_id)
-                    elif block.type == "tool_result":
-                        tool_use_id = getattr(block, 'tool_use_id', None)
-                        if tool_use_id:
-                            tool_results.add(tool_use_id)
+    index = get_tool_use_index(messages)
     
     # Check for orphaned tools
-    orphaned = tool_uses - tool_results
+    orphaned = index.orphaned_tool_uses()
     if orphaned:
-        errors.append(f"Orphaned tool uses found: {list(orphaned)}")
+        errors.append(f"Orphaned tool uses found: {orphaned}")
         return False
     
     # Check for results without uses
-    missing_uses = tool_results - tool_uses
+    missing_uses = index.unmatched_results()
     if missing_uses:
-        errors.append(f"Tool results without corresponding uses: {list(missing_uses)}")
+        errors.append(f"Tool results without corresponding uses: {missing_uses}")
         return False
     
     return True
\ No newline at end of file
@@ -4,6 +4,7 @@ from typing import Any, Dict, List
 from ...models.anthropic import Message, Tool
 from ...models.instructor import ToolValidationResult
 from ...core.logging_config import get_logger
+from ...utils.tool_use_index import get_tool_use_index
 
 logger = get_logger("validation.tool_tasks")
 
@@ -123,37 +124,11 @@ def validate_tool_flow_data(messages: List[Message], available_tools: List[Tool]
         ToolValidationResult with orphaned tools and validation errors
     """
     try:
-        tool_uses = {}
-        tool_results = {}
-        orphaned_tools = []
-        missing_results = []
-        validation_errors = []
-        
-        # Extract tool uses and results from messages
-        for msg_idx, message in enumerate(messages):
-            if isinstance(message.content, list):
-                for block in message.content:
-                    if hasattr(block, 'type'):
-                        if block.type == "tool_use":
-                            tool_id = getattr(block, 'id', None)
-                            if tool_id:
-                                tool_uses[tool_id] = {
-                                    "message_index": msg_idx,
-                                    "name": getattr(block, 'name', ''),
-                                    "input": getattr(block, 'input', {})
-                                }
-                            else:
-                                validation_errors.append(f"Tool use in message {msg_idx} missing ID")
-                        
-                        elif block.type == "tool_result":
-                            tool_use_id = getattr(block, 'tool_use_id', None)
-                            if tool_use_id:
-                                tool_results[tool_use_id] = {
-                                    "message_index": msg_idx,
-                                    "content": getattr(block, 'content', '')
-                                }
-                            else:
-                                validation_errors.append(f"Tool result in message {msg_idx} missing tool_use_id")
+        # Tool uses and results come from the conversation's incremental index
+        index = get_tool_use_index(messages)
+        tool_uses = index.tool_uses
+        tool_results = index.tool_results
+        validation_errors = list(index.errors)
         
         # Find orphaned tools and missing results
         orphaned_tools = find_orphaned_tools(tool_uses, tool_results)
@@ -1,6 +1,8 @@
 """Enhanced configuration management for the OpenRouter Anthropic Server."""
 
+import json
 import os
+import tempfile
 from typing import Optional, Dict, Any, List
 from pydantic import BaseModel, Field, field_validator
 from dotenv import load_dotenv
@@ -85,6 +87,88 @@ class ServerConfig(BaseModel):
     enable_caching: bool = Field(..., description="Enable response caching")
     cache_ttl: int = Field(..., description="Cache TTL in seconds")
     max_concurrent_requests: int = Field(..., description="Max concurrent requests")
+    token_count_cache_size: int = Field(default=10000, description="Max cached per-message token counts")
+    token_count_batch_max_requests: int = Field(default=256, description="Max requests per batch token count call")
+    context_preflight_enabled: bool = Field(default=False, description="Check context window limits before dispatch")
+    context_preflight_mode: str = Field(default="reject", description="Oversized request handling (reject/trim)")
+    model_context_limits: Dict[str, Dict[str, int]] = Field(default_factory=dict, description="Per-model context limit overrides")
+    request_lanes_enabled: bool = Field(default=True, description="Admit requests through priority lanes")
+    background_model_patterns: List[str] = Field(default_factory=lambda: ["*haiku*", "small"], description="Model name globs routed to the background lane")
+    background_max_concurrent: int = Field(default=4, description="Max concurrent background-lane requests")
+    background_reserved_slots: int = Field(default=2, description="Slots of MAX_CONCURRENT_REQUESTS the main lane cannot take")
+    background_lightweight_pipeline: bool = Field(default=True, description="Skip non-essential pipeline stages for background requests")
+    request_lane_max_queue_wait: float = Field(default=30.0, description="Seconds a request may wait for a lane slot before a 529 (0 waits indefinitely)")
+    rate_limit_enabled: bool = Field(default=False, description="Enforce per-client request and token rates")
+    rate_limit_requests_per_minute: int = Field(default=60, description="Requests per minute per client")
+    rate_limit_tokens_per_minute: int = Field(default=100000, description="Estimated input tokens per minute per client")
+    rate_limit_max_clients: int = Field(default=10000, description="Max clients tracked before evicting the least recent")
+    usage_ledger_enabled: bool = Field(default=True, description="Record token usage in the local usage ledger")
+    usage_ledger_path: str = Field(default="", description="SQLite file of the usage ledger (default: usage_ledger.sqlite3 in UNIFIED_LOGS_DIR)")
+    usage_ledger_flush_interval: float = Field(default=2.0, description="Seconds between batched usage ledger writes")
+    usage_ledger_batch_size: int = Field(default=500, description="Queued usage records that trigger an early write")
+    message_batch_dir: str = Field(default="", description="Directory for message batch requests and results")
+    message_batch_concurrency: int = Field(default=8, description="Concurrent upstream requests per message batch")
+    message_batch_max_retries: int = Field(default=3, description="Retries of a batch item after a retryable failure, when the retry policy is disabled")
+    message_batch_retry_backoff: float = Field(default=1.0, description="Initial batch retry delay in seconds, doubled per retry")
+    message_batch_max_requests: int = Field(default=100000, description="Max requests in one message batch")
+    similarity_cache_enabled: bool = Field(default=False, description="Serve near-duplicate deterministic requests from cache")
+    similarity_cache_routes: List[str] = Field(default_factory=lambda: ["/v1/messages"], description="Routes the near-duplicate cache answers on")
+    similarity_cache_threshold: float = Field(default=0.95, description="Estimated Jaccard similarity required for a cache hit")
+    similarity_cache_normalizers: List[str] = Field(default_factory=lambda: ["timestamps", "uuids", "hex", "whitespace"], description="Text normalization rules applied before comparison")
+    similarity_cache_max_entries: int = Field(default=10000, description="Max cached responses before evicting the least recent")
+    upstream_pacing_enabled: bool = Field(default=False, description="Pace upstream calls using reported rate-limit headers")
+    upstream_pacing_threshold: float = Field(default=0.2, description="Fraction of a request budget below which requests are spread until reset")
+    upstream_pacing_max_delay: float = Field(default=30.0, description="Max seconds a request is held back before dispatch")
+    upstream_pacing_reroute_after: float = Field(default=5.0, description="Delay in seconds above which a free fallback model is used")
+    upstream_pacing_fallback_models: Dict[str, List[str]] = Field(default_factory=dict, description="Fallback models per upstream model when its budget is spent")
+    adaptive_timeouts_enabled: bool = Field(default=False, description="Derive per-model upstream deadlines from observed latency")
+    adaptive_timeout_quantile: float = Field(default=0.99, description="Latency quantile deadlines are based on")
+    adaptive_timeout_multiplier: float = Field(default=3.0, description="Headroom multiplier applied to the latency quantile")
+    adaptive_timeout_min_samples: int = Field(default=20, description="Calls observed before a model's deadlines adapt")
+    adaptive_timeout_connect: float = Field(default=10.0, description="Connect timeout in seconds for upstream calls")
+    adaptive_timeout_floor: float = Field(default=10.0, description="Shortest first-byte, inter-chunk or total deadline in seconds")
+    stream_stall_detection_enabled: bool = Field(default=False, description="Stream non-streaming requests upstream internally to detect stalls")
+    stream_stall_interval: float = Field(default=30.0, description="Seconds without a chunk before an upstream stream counts as stalled")
+    stream_stall_max_retries: int = Field(default=1, description="Retries of a stalled upstream call on the same model")
+    stream_stall_fallback_models: Dict[str, List[str]] = Field(default_factory=dict, description="Models to fail over to after a model's retries stall")
+    retry_policy_enabled: bool = Field(default=True, description="Retry failed upstream calls by error class")
+    retry_policies: Dict[str, Dict[str, float]] = Field(default_factory=dict, description="Per error class overrides of max_attempts, base_delay and max_delay")
+    retry_budget_ratio: float = Field(default=0.2, description="Retries each upstream request adds to the global retry budget")
+    retry_budget_min_per_second: float = Field(default=1.0, description="Retries per second the budget allows regardless of traffic")
+    parameter_normalization_enabled: bool = Field(default=False, description="Drop, clamp or translate request parameters the target model does not accept")
+    model_parameter_capabilities: Dict[str, Dict[str, Any]] = Field(default_factory=dict, description="Per-model parameter capability overrides")
+    parameter_rejection_ttl: float = Field(default=3600.0, description="Seconds a parameter rejected upstream is dropped for its model family")
+    provider_affinity_enabled: bool = Field(default=False, description="Pin each conversation to one OpenRouter provider for prompt-cache hits")
+    provider_affinity_providers: Dict[str, List[str]] = Field(default_factory=dict, description="OpenRouter providers to spread sessions over, per model family")
+    provider_affinity_session_ttl: float = Field(default=3600.0, description="Seconds an idle conversation keeps its pinned provider")
+    model_tiering_mode: str = Field(default="off", description="Route simple big-model requests to a cheaper tier: off, shadow or on")
+    model_tiering_cheap_model: str = Field(default="", description="Cheap tier model (defaults to the small model)")
+    model_tiering_thresholds: Dict[str, float] = Field(default_factory=dict, description="Classifier thresholds: max_prompt_tokens, max_tools, max_output_tokens, min_confidence")
+    model_tiering_prices: Dict[str, List[float]] = Field(default_factory=dict, description="USD per million input and output tokens per model, for tier cost reports")
+    load_shedding_enabled: bool = Field(default=False, description="Downgrade expensive models for new requests while saturated")
+    load_shedding_max_in_flight: int = Field(default=0, description="In-flight upstream calls that mean saturation (0 = MAX_CONCURRENT_REQUESTS)")
+    load_shedding_max_queue_wait_ms: float = Field(default=2000.0, description="Lane queue wait that means saturation")
+    load_shedding_recovery_ratio: float = Field(default=0.5, description="Fraction of both thresholds the signals must fall to before recovering")
+    load_shedding_min_duration: float = Field(default=30.0, description="Minimum seconds a saturation episode lasts")
+    load_shedding_fallbacks: Dict[str, str] = Field(default_factory=dict, description="Fallback model per expensive model (defaults to big model -> small model)")
+    load_shedding_exempt_clients: List[str] = Field(default_factory=list, description="Client keys never downgraded")
+    optimistic_dispatch_enabled: bool = Field(default=False, description="Start the upstream call while request checks run")
+    disconnect_detection_enabled: bool = Field(default=True, description="Cancel upstream calls and tools when the client disconnects")
+    passthrough_routes: List[Dict[str, Any]] = Field(default_factory=list, description="Anthropic-compatible upstreams served without format conversion")
+    passthrough_metering_enabled: bool = Field(default=True, description="Collect usage from passthrough responses for hooks")
+    passthrough_log_requests: bool = Field(default=True, description="Log each passthrough exchange")
+    tool_result_compaction_enabled: bool = Field(default=False, description="Compact stale tool results before dispatch")
+    tool_result_compaction_age_turns: int = Field(default=4, description="Compact tool results older than this many user turns")
+    tool_result_compaction_max_bytes: int = Field(default=32768, description="Compact non-current tool results larger than this")
+    tool_result_compaction_min_bytes: int = Field(default=2048, description="Never compact tool results smaller than this")
+    tool_result_store_max_bytes: int = Field(default=268435456, description="Max bytes of original tool results kept for retrieval")
+    tool_argument_cache_max_bytes: int = Field(default=67108864, description="Max bytes of raw tool-call argument text kept for reuse")
+    tool_output_dir: str = Field(default="", description="Directory for spilled tool outputs")
+    tool_output_store_max_bytes: int = Field(default=1073741824, description="Max bytes of spilled tool outputs on disk")
+    tool_output_inline_limit: int = Field(default=10000, description="Tool outputs larger than this are spilled to disk")
+    tokenizer_engine: str = Field(default="tiktoken", description="Token counting engine (tiktoken/huggingface/approximate)")
+    tokenizer_vocab_path: Optional[str] = Field(default=None, description="Local vocab file or directory for the tokenizer engine")
+    tokenizer_offload_threshold: int = Field(default=32768, description="Uncached characters above which counting runs off the event loop")
     
     @field_validator('openrouter_api_key')
     @classmethod
@@ -182,6 +266,88 @@ class ServerConfig(BaseModel):
             enable_caching=os.environ["ENABLE_CACHING"].lower() == "true",
             cache_ttl=int(os.environ["CACHE_TTL"]),
             max_concurrent_requests=int(os.environ["MAX_CONCURRENT_REQUESTS"]),
+            token_count_cache_size=int(os.environ.get("TOKEN_COUNT_CACHE_SIZE", "10000")),
+            token_count_batch_max_requests=int(os.environ.get("TOKEN_COUNT_BATCH_MAX_REQUESTS", "256")),
+            context_preflight_enabled=os.environ.get("CONTEXT_PREFLIGHT_ENABLED", "false").lower() == "true",
+            context_preflight_mode=os.environ.get("CONTEXT_PREFLIGHT_MODE", "reject"),
+            model_context_limits=json.loads(os.environ.get("MODEL_CONTEXT_LIMITS", "{}")),
+            request_lanes_enabled=os.environ.get("REQUEST_LANES_ENABLED", "true").lower() == "true",
+            background_model_patterns=json.loads(os.environ.get("BACKGROUND_MODEL_PATTERNS", '["*haiku*", "small"]')),
+            background_max_concurrent=int(os.environ.get("BACKGROUND_MAX_CONCURRENT", "4")),
+            background_reserved_slots=int(os.environ.get("BACKGROUND_RESERVED_SLOTS", "2")),
+            background_lightweight_pipeline=os.environ.get("BACKGROUND_LIGHTWEIGHT_PIPELINE", "true").lower() == "true",
+            request_lane_max_queue_wait=float(os.environ.get("REQUEST_LANE_MAX_QUEUE_WAIT", "30.0")),
+            rate_limit_enabled=os.environ.get("RATE_LIMIT_ENABLED", "false").lower() == "true",
+            rate_limit_requests_per_minute=int(os.environ.get("RATE_LIMIT_REQUESTS_PER_MINUTE", "60")),
+            rate_limit_tokens_per_minute=int(os.environ.get("RATE_LIMIT_TOKENS_PER_MINUTE", "100000")),
+            rate_limit_max_clients=int(os.environ.get("RATE_LIMIT_MAX_CLIENTS", "10000")),
+            usage_ledger_enabled=os.environ.get("USAGE_LEDGER_ENABLED", "true").lower() == "true",
+            usage_ledger_path=os.environ.get("USAGE_LEDGER_PATH", ""),
+            usage_ledger_flush_interval=float(os.environ.get("USAGE_LEDGER_FLUSH_INTERVAL", "2.0")),
+            usage_ledger_batch_size=int(os.environ.get("USAGE_LEDGER_BATCH_SIZE", "500")),
+            message_batch_dir=os.environ.get("MESSAGE_BATCH_DIR") or os.path.join(tempfile.gettempdir(), "openrouter-proxy-batches"),
+            message_batch_concurrency=int(os.environ.get("MESSAGE_BATCH_CONCURRENCY", "8")),
+            message_batch_max_retries=int(os.environ.get("MESSAGE_BATCH_MAX_RETRIES", "3")),
+            message_batch_retry_backoff=float(os.environ.get("MESSAGE_BATCH_RETRY_BACKOFF", "1.0")),
+            message_batch_max_requests=int(os.environ.get("MESSAGE_BATCH_MAX_REQUESTS", "100000")),
+            similarity_cache_enabled=os.environ.get("SIMILARITY_CACHE_ENABLED", "false").lower() == "true",
+            similarity_cache_routes=json.loads(os.environ.get("SIMILARITY_CACHE_ROUTES", '["/v1/messages"]')),
+            similarity_cache_threshold=float(os.environ.get("SIMILARITY_CACHE_THRESHOLD", "0.95")),
+            similarity_cache_normalizers=json.loads(os.environ.get("SIMILARITY_CACHE_NORMALIZERS", '["timestamps", "uuids", "hex", "whitespace"]')),
+            similarity_cache_max_entries=int(os.environ.get("SIMILARITY_CACHE_MAX_ENTRIES", "10000")),
+            upstream_pacing_enabled=os.environ.get("UPSTREAM_PACING_ENABLED", "false").lower() == "true",
+            upstream_pacing_threshold=float(os.environ.get("UPSTREAM_PACING_THRESHOLD", "0.2")),
+            upstream_pacing_max_delay=float(os.environ.get("UPSTREAM_PACING_MAX_DELAY", "30.0")),
+            upstream_pacing_reroute_after=float(os.environ.get("UPSTREAM_PACING_REROUTE_AFTER", "5.0")),
+            upstream_pacing_fallback_models=json.loads(os.environ.get("UPSTREAM_PACING_FALLBACK_MODELS", "{}")),
+            adaptive_timeouts_enabled=os.environ.get("ADAPTIVE_TIMEOUTS_ENABLED", "false").lower() == "true",
+            adaptive_timeout_quantile=float(os.environ.get("ADAPTIVE_TIMEOUT_QUANTILE", "0.99")),
+            adaptive_timeout_multiplier=float(os.environ.get("ADAPTIVE_TIMEOUT_MULTIPLIER", "3.0")),
+            adaptive_timeout_min_samples=int(os.environ.get("ADAPTIVE_TIMEOUT_MIN_SAMPLES", "20")),
+            adaptive_timeout_connect=float(os.environ.get("ADAPTIVE_TIMEOUT_CONNECT", "10.0")),
+            adaptive_timeout_floor=float(os.environ.get("ADAPTIVE_TIMEOUT_FLOOR", "10.0")),
+            stream_stall_detection_enabled=os.environ.get("STREAM_STALL_DETECTION_ENABLED", "false").lower() == "true",
+            stream_stall_interval=float(os.environ.get("STREAM_STALL_INTERVAL", "30.0")),
+            stream_stall_max_retries=int(os.environ.get("STREAM_STALL_MAX_RETRIES", "1")),
+            stream_stall_fallback_models=json.loads(os.environ.get("STREAM_STALL_FALLBACK_MODELS", "{}")),
+            retry_policy_enabled=os.environ.get("RETRY_POLICY_ENABLED", "true").lower() == "true",
+            retry_policies=json.loads(os.environ.get("RETRY_POLICIES", "{}")),
+            retry_budget_ratio=float(os.environ.get("RETRY_BUDGET_RATIO", "0.2")),
+            retry_budget_min_per_second=float(os.environ.get("RETRY_BUDGET_MIN_PER_SECOND", "1.0")),
+            parameter_normalization_enabled=os.environ.get("PARAMETER_NORMALIZATION_ENABLED", "false").lower() == "true",
+            model_parameter_capabilities=json.loads(os.environ.get("MODEL_PARAMETER_CAPABILITIES", "{}")),
+            parameter_rejection_ttl=float(os.environ.get("PARAMETER_REJECTION_TTL", "3600")),
+            provider_affinity_enabled=os.environ.get("PROVIDER_AFFINITY_ENABLED", "false").lower() == "true",
+            provider_affinity_providers=json.loads(os.environ.get("PROVIDER_AFFINITY_PROVIDERS", "{}")),
+            provider_affinity_session_ttl=float(os.environ.get("PROVIDER_AFFINITY_SESSION_TTL", "3600")),
+            model_tiering_mode=os.environ.get("MODEL_TIERING_MODE", "off").lower(),
+            model_tiering_cheap_model=os.environ.get("MODEL_TIERING_CHEAP_MODEL", ""),
+            model_tiering_thresholds=json.loads(os.environ.get("MODEL_TIERING_THRESHOLDS", "{}")),
+            model_tiering_prices=json.loads(os.environ.get("MODEL_TIERING_PRICES", "{}")),
+            load_shedding_enabled=os.environ.get("LOAD_SHEDDING_ENABLED", "false").lower() == "true",
+            load_shedding_max_in_flight=int(os.environ.get("LOAD_SHEDDING_MAX_IN_FLIGHT", "0")),
+            load_shedding_max_queue_wait_ms=float(os.environ.get("LOAD_SHEDDING_MAX_QUEUE_WAIT_MS", "2000")),
+            load_shedding_recovery_ratio=float(os.environ.get("LOAD_SHEDDING_RECOVERY_RATIO", "0.5")),
+            load_shedding_min_duration=float(os.environ.get("LOAD_SHEDDING_MIN_DURATION", "30")),
+            load_shedding_fallbacks=json.loads(os.environ.get("LOAD_SHEDDING_FALLBACKS", "{}")),
+            load_shedding_exempt_clients=json.loads(os.environ.get("LOAD_SHEDDING_EXEMPT_CLIENTS", "[]")),
+            optimistic_dispatch_enabled=os.environ.get("OPTIMISTIC_DISPATCH_ENABLED", "false").lower() == "true",
+            disconnect_detection_enabled=os.environ.get("DISCONNECT_DETECTION_ENABLED", "true").lower() == "true",
+            passthrough_routes=json.loads(os.environ.get("PASSTHROUGH_ROUTES", "[]")),
+            passthrough_metering_enabled=os.environ.get("PASSTHROUGH_METERING_ENABLED", "true").lower() == "true",
+            passthrough_log_requests=os.environ.get("PASSTHROUGH_LOG_REQUESTS", "true").lower() == "true",
+            tool_result_compaction_enabled=os.environ.get("TOOL_RESULT_COMPACTION_ENABLED", "false").lower() == "true",
+            tool_result_compaction_age_turns=int(os.environ.get("TOOL_RESULT_COMPACTION_AGE_TURNS", "4")),
+            tool_result_compaction_max_bytes=int(os.environ.get("TOOL_RESULT_COMPACTION_MAX_BYTES", "32768")),
+            tool_result_compaction_min_bytes=int(os.environ.get("TOOL_RESULT_COMPACTION_MIN_BYTES", "2048")),
+            tool_result_store_max_bytes=int(os.environ.get("TOOL_RESULT_STORE_MAX_BYTES", "268435456")),
+            tool_argument_cache_max_bytes=int(os.environ.get("TOOL_ARGUMENT_CACHE_MAX_BYTES", "67108864")),
+            tool_output_dir=os.environ.get("TOOL_OUTPUT_DIR") or os.path.join(tempfile.gettempdir(), "openrouter-proxy-tool-outputs"),
+            tool_output_store_max_bytes=int(os.environ.get("TOOL_OUTPUT_STORE_MAX_BYTES", "1073741824")),
+            tool_output_inline_limit=int(os.environ.get("TOOL_OUTPUT_INLINE_LIMIT", "10000")),
+            tokenizer_engine=os.environ.get("TOKENIZER_ENGINE", "tiktoken"),
+            tokenizer_vocab_path=os.environ.get("TOKENIZER_VOCAB_PATH") or None,
+            tokenizer_offload_threshold=int(os.environ.get("TOKENIZER_OFFLOAD_THRESHOLD", "32768")),
             environment=os.environ["ENVIRONMENT"],
             # Unified Logging Configuration (with defaults)
             use_unified_logging=os.environ.get("USE_UNIFIED_LOGGING", "true").lower() == "true",
@@ -251,7 +417,8 @@ class ServerConfig(BaseModel):
             "enable_caching": self.enable_caching,
             "cache_ttl": self.cache_ttl,
             "max_concurrent_requests": self.max_concurrent_requests,
-            "request_timeout": self.request_timeout
+            "request_timeout": self.request_timeout,
+            "token_count_cache_size": self.token_count_cache_size
         }
     
     def is_development(self) -> bool:
@@ -52,6 +52,14 @@ class StreamingError(OpenRouterProxyError):
     """Raised when streaming operations fail."""
     pass
 
+class UpstreamStallError(StreamingError):
+    """Raised when an upstream stream stops producing chunks."""
+    pass
+
 class ConfigurationError(OpenRouterProxyError):
     """Raised when configuration is invalid."""
-    pass
\ No newline at end of file
+    pass
+
+class ClientDisconnectedError(OpenRouterProxyError):
+    """Raised when the client disconnects before its request completes."""
+    pass
@@ -1,8 +1,9 @@
 """Instructor client setup and configuration."""
 
+import asyncio
 import instructor
-from openai import OpenAI
-from typing import Optional, Type, TypeVar, Any, Dict, List
+from openai import OpenAI, AsyncOpenAI
+from typing import Optional, Type, TypeVar, Any, Dict, List, Union
 from pydantic import BaseModel
 from .config import config
 from src.core.logging_config import get_logger
@@ -161,5 +162,222 @@ class InstructorClient:
             logger.error(f"❌ Instructor extraction failed: {e}")
             raise
 
-# Global instructor client instance
-instructor_client = InstructorClient()
\ No newline at end of file
+
+class AsyncInstructorClient:
+    """Async wrapper for Instructor-enhanced OpenAI client.
+    
+    Unlike InstructorClient, calls never block the event loop: the underlying
+    AsyncOpenAI client runs on the proxy's shared pooled HTTP connections.
+    """
+    
+    def __init__(self, http_client: Optional[Any] = None, max_concurrency: int = 5):
+        """Initialize the async Instructor client.
+        
+        Args:
+            http_client: httpx.AsyncClient to use; defaults to the shared upstream pool,
+                resolved on each call so a pool recreated after shutdown is picked up
+            max_concurrency: Default concurrency limit for batched extractions
+        """
+        self._http_client = http_client
+        self._client: Optional[Any] = None
+        self._client_pool: Optional[Any] = None
+        self.max_concurrency = max_concurrency
+        logger.info("🎯 Async Instructor client initialized for structured outputs",
+                   max_concurrency=max_concurrency)
+    
+    @property
+    def client(self) -> Any:
+        """Instructor-wrapped AsyncOpenAI client on the current upstream pool."""
+        http_client = self._http_client
+        if http_client is None:
+            from src.services.http_client import get_shared_async_client
+            http_client = get_shared_async_client()
+        
+        if self._client is None or self._client_pool is not http_client:
+            self._client = instructor.from_openai(
+                AsyncOpenAI(
+                    api_key=config.openrouter_api_key,
+                    base_url=config.openrouter_base_url,
+                    http_client=http_client
+                )
+            )
+            self._client_pool = http_client
+        return self._client
+    
+    async def create_structured_completion(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        response_model: Type[T],
+        max_tokens: int = 4096,
+        temperature: float = 0.1,
+        timeout: Optional[float] = None,
+        **kwargs
+    ) -> T:
+        """Create a structured completion using Instructor without blocking.
+        
+        Args:
+            model: The model to use for completion
+            messages: List of messages in OpenAI format
+            response_model: Pydantic model class for structured output
+            max_tokens: Maximum tokens to generate
+            temperature: Sampling temperature
+            timeout: Per-call deadline in seconds (None for no deadline)
+            **kwargs: Additional parameters for the completion
+            
+        Returns:
+            Structured response matching the response_model
+            
+        Raises:
+            asyncio.TimeoutError: If the call exceeds the timeout
+            Exception: If structured completion fails
+        """
+        try:
+            logger.info(f"🎯 Creating async structured completion with {model}")
+            logger.debug(f"Response model: {response_model.__name__}")
+            logger.debug(f"Messages count: {len(messages)}")
+            
+            response = await asyncio.wait_for(
+                self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    response_model=response_model,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    **kwargs
+                ),
+                timeout=timeout
+            )
+            
+            logger.info(f"✅ Async structured completion created: {type(response).__name__}")
+            logger.debug(f"Response: {response}")
+            return response
+            
+        except asyncio.TimeoutError:
+            logger.error(f"⏱️ Async structured completion timed out after {timeout}s")
+            raise
+        except Exception as e:
+            logger.error(f"❌ Async structured completion failed: {e}")
+            raise
+    
+    async def batch_structured_completions(
+        self,
+        requests: List[Dict[str, Any]],
+        max_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None
+    ) -> List[Union[BaseModel, Exception]]:
+        """Run several structured completions concurrently.
+        
+        Args:
+            requests: Keyword arguments for create_structured_completion, one dict per call.
+                A request may carry its own "timeout" to override the batch default.
+            max_concurrency: Maximum calls in flight (defaults to the client setting)
+            timeout: Default per-call deadline in seconds
+            
+        Returns:
+            Results in request order; failed or timed-out calls yield their exception
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_concurrency)
+        
+        async def run_one(request: Dict[str, Any]) -> Any:
+            call_kwargs = dict(request)
+            call_kwargs.setdefault("timeout", timeout)
+            async with semaphore:
+                return await self.create_structured_completion(**call_kwargs)
+        
+        results = await asyncio.gather(
+            *(run_one(request) for request in requests),
+            return_exceptions=True
+        )
+        
+        failures = sum(1 for result in results if isinstance(result, Exception))
+        logger.info("✅ Batched structured completions finished",
+                   total=len(results),
+                   failed=failures)
+        return results
+    
+    async def validate_with_instructor(
+        self,
+        data: Dict[str, Any],
+        validation_model: Type[T],
+        model: str = "anthropic/claude-3-5-sonnet-20241022",
+        timeout: Optional[float] = None
+    ) -> T:
+        """Validate data using Instructor with a validation prompt.
+        
+        Args:
+            data: Data to validate
+            validation_model: Pydantic model for validation
+            model: Model to use for validation
+            timeout: Per-call deadline in seconds
+            
+        Returns:
+            Validated and potentially corrected data
+        """
+        try:
+            validation_prompt = f"""
+            Please validate and correct the following data according to the specified schema.
+            If the data is valid, return it as-is. If there are issues, fix them and return the corrected version.
+            
+            Data to validate:
+            {data}
+            
+            Return the validated/corrected data in the proper format.
+            """
+            
+            return await self.create_structured_completion(
+                model=model,
+                messages=[{"role": "user", "content": validation_prompt}],
+                response_model=validation_model,
+                temperature=0.0,  # Use deterministic output for validation
+                timeout=timeout
+            )
+            
+        except Exception as e:
+            logger.error(f"❌ Async Instructor validation failed: {e}")
+            raise
+    
+    async def extract_structured_data(
+        self,
+        text: str,
+        extraction_model: Type[T],
+        model: str = "anthropic/claude-3-5-sonnet-20241022",
+        timeout: Optional[float] = None
+    ) -> T:
+        """Extract structured data from unstructured text using Instructor.
+        
+        Args:
+            text: Unstructured text to extract data from
+            extraction_model: Pydantic model for extracted data
+            model: Model to use for extraction
+            timeout: Per-call deadline in seconds
+            
+        Returns:
+            Extracted structured data
+        """
+        try:
+            extraction_prompt = f"""
+            Please extract structured information from the following text according to the specified schema.
+            
+            Text to analyze:
+            {text}
+            
+            Extract all relevant information and return it in the proper structured format.
+            """
+            
+            return await self.create_structured_completion(
+                model=model,
+                messages=[{"role": "user", "content": extraction_prompt}],
+                response_model=extraction_model,
+                temperature=0.1,
+                timeout=timeout
+            )
+            
+        except Exception as e:
+            logger.error(f"❌ Async Instructor extraction failed: {e}")
+            raise
+
+
+# Global instructor client instances
+instructor_client = InstructorClient()
+async_instructor_client = AsyncInstructorClient(max_concurrency=config.max_concurrent_requests)
\ No newline at end of file
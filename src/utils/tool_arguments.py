@@ -0,0 +1,130 @@
+"""
+Raw tool-call argument tracking for OpenRouter Anthropic Server.
+
+Upstream tool calls carry their arguments as JSON text. The raw text is kept
+next to the parsed object, keyed by tool call id, so each payload is parsed
+once and sent back as history with its original bytes instead of being
+re-serialized on every turn. Callers get their own copy of the parsed
+arguments, so editing a tool_use input never changes what the cache
+compares against.
+"""
+
+import copy
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .config import config
+
+
+class ToolArgumentCache:
+    """Thread-safe, byte-bounded LRU of (raw JSON text, parsed arguments) by tool call id."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        """Initialize the cache with an upper bound on stored raw text."""
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[str, Any]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.parse_hits = 0
+        self.parses = 0
+        self.raw_reuses = 0
+        self.serializations = 0
+
+    def _get(self, tool_call_id: Optional[str]) -> Optional[Tuple[str, Any]]:
+        if not tool_call_id:
+            return None
+        with self._lock:
+            entry = self._entries.get(tool_call_id)
+            if entry is not None:
+                self._entries.move_to_end(tool_call_id)
+            return entry
+
+    def _put(self, tool_call_id: Optional[str], raw: str, parsed: Any) -> None:
+        if not tool_call_id or len(raw) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(tool_call_id, None)
+            if previous is not None:
+                self._total_bytes -= len(previous[0])
+            self._entries[tool_call_id] = (raw, parsed)
+            self._total_bytes += len(raw)
+            while self._total_bytes > self.max_bytes:
+                _, (evicted_raw, _) = self._entries.popitem(last=False)
+                self._total_bytes -= len(evicted_raw)
+
+    def parse(self, tool_call_id: Optional[str], raw: Any) -> Dict[str, Any]:
+        """
+        Parse tool call arguments, reusing the earlier parse of the same text.
+
+        Args:
+            tool_call_id: Upstream tool call id
+            raw: Argument JSON text (already-parsed dicts are returned as-is)
+
+        Returns:
+            Parsed arguments (a copy the caller may modify)
+
+        Raises:
+            json.JSONDecodeError: If the text is not valid JSON
+        """
+        if not raw:
+            return {}
+        if not isinstance(raw, str):
+            return raw
+
+        entry = self._get(tool_call_id)
+        if entry is not None and (entry[0] is raw or entry[0] == raw):
+            self.parse_hits += 1
+            return copy.deepcopy(entry[1])
+
+        parsed = json.loads(raw)
+        self.parses += 1
+        self._put(tool_call_id, raw, copy.deepcopy(parsed))
+        return parsed
+
+    def serialize(self, tool_call_id: Optional[str], arguments: Any) -> str:
+        """
+        Serialize tool call arguments, returning the original text when unchanged.
+
+        Args:
+            tool_call_id: Tool call id (the Anthropic tool_use id)
+            arguments: Parsed arguments, e.g. a tool_use block's input
+
+        Returns:
+            Argument JSON text
+        """
+        entry = self._get(tool_call_id)
+        if entry is not None and entry[1] == arguments:
+            self.raw_reuses += 1
+            return entry[0]
+
+        self.serializations += 1
+        return json.dumps(arguments if arguments is not None else {})
+
+    def clear(self) -> None:
+        """Drop all entries and reset statistics."""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+            self.parse_hits = 0
+            self.parses = 0
+            self.raw_reuses = 0
+            self.serializations = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "parses": self.parses,
+                "parse_hits": self.parse_hits,
+                "raw_reuses": self.raw_reuses,
+                "serializations": self.serializations
+            }
+
+
+# Shared by response conversion, tool detection and request conversion
+tool_argument_cache = ToolArgumentCache(max_bytes=config.tool_argument_cache_max_bytes)
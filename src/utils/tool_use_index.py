@@ -0,0 +1,234 @@
+"""
+Conversation-scoped tool_use id index for OpenRouter Anthropic Server.
+
+Maps each tool_use id to its tool name, input hash and message index, and
+tracks which ids already have a tool_result. The index is extended
+incrementally as messages are appended, so pairing validation, tool name
+lookups and duplicate-call lookups are dictionary hits instead of scans
+over the whole history. Indexes keep fingerprints of the messages they
+cover, not the messages themselves.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Conversations whose indexes are kept for incremental reuse
+INDEX_REGISTRY_SIZE = 256
+
+
+def _get(obj: Any, name: str, default: Any = None) -> Any:
+    """Read a field from a pydantic model or a plain dict."""
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+def message_fingerprint(message: Any) -> str:
+    """Stable sha256 of a message's content (Message model or dict)."""
+    if hasattr(message, "model_dump"):
+        message = message.model_dump(mode="json", exclude_none=True)
+    serialized = json.dumps(message, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class ToolUseEntry:
+    """A tool_use block located in a conversation."""
+    tool_use_id: str
+    name: str
+    message_index: int
+    input: Any = field(default=None, repr=False)
+    _input_hash: Optional[str] = field(default=None, repr=False)
+
+    @property
+    def input_hash(self) -> str:
+        """Stable sha256 of the tool input, computed on first use."""
+        if self._input_hash is None:
+            serialized = json.dumps(self.input, sort_keys=True, separators=(",", ":"), default=str)
+            self._input_hash = hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+        return self._input_hash
+
+
+class ToolUseIndex:
+    """Index of tool_use blocks and their results for one conversation."""
+
+    def __init__(self, messages: Optional[Sequence[Any]] = None):
+        """Initialize the index, optionally indexing existing messages."""
+        self._reset()
+        if messages:
+            self.extend(messages)
+
+    def _reset(self) -> None:
+        self._count = 0
+        self._last_fingerprint: Optional[str] = None
+        self._uses: Dict[str, ToolUseEntry] = {}
+        self._results: Dict[str, int] = {}
+        self._signatures: Dict[Tuple[str, str], List[str]] = {}
+        self._hashed = 0
+        self.errors: List[str] = []
+
+    def append(self, message: Any) -> None:
+        """Index one appended message (Message model or dict)."""
+        self._index(message)
+        self._last_fingerprint = message_fingerprint(message)
+
+    def _index(self, message: Any) -> None:
+        message_index = self._count
+        self._count += 1
+        content = _get(message, "content")
+        if not isinstance(content, list):
+            return
+
+        for block in content:
+            block_type = _get(block, "type")
+            if block_type == "tool_use":
+                tool_id = _get(block, "id")
+                if tool_id:
+                    self._uses[tool_id] = ToolUseEntry(
+                        tool_use_id=tool_id,
+                        name=_get(block, "name", ""),
+                        message_index=message_index,
+                        input=_get(block, "input", {})
+                    )
+                else:
+                    self.errors.append(f"Tool use in message {message_index} missing ID")
+            elif block_type == "tool_result":
+                tool_use_id = _get(block, "tool_use_id")
+                if tool_use_id:
+                    self._results[tool_use_id] = message_index
+                else:
+                    self.errors.append(f"Tool result in message {message_index} missing tool_use_id")
+
+    def extend(self, messages: Sequence[Any]) -> None:
+        """Index several appended messages."""
+        for message in messages:
+            self._index(message)
+        if messages:
+            self._last_fingerprint = message_fingerprint(messages[-1])
+
+    def is_prefix_of(self, messages: Sequence[Any]) -> bool:
+        """
+        Check the indexed messages are a prefix of messages.
+
+        Only the last indexed message is compared, by fingerprint: a history
+        edited before it is not detected unless its length shrank.
+        """
+        if len(messages) < self._count:
+            return False
+        return self._count == 0 or message_fingerprint(messages[self._count - 1]) == self._last_fingerprint
+
+    def sync(self, messages: Sequence[Any]) -> "ToolUseIndex":
+        """
+        Bring the index up to date with a message list.
+
+        Only messages appended since the last sync are indexed; if the list
+        no longer extends the indexed messages the index is rebuilt.
+        """
+        if not self.is_prefix_of(messages):
+            self._reset()
+        self.extend(messages[self._count:])
+        return self
+
+    def copy(self) -> "ToolUseIndex":
+        """Independent copy that can be extended without affecting this index."""
+        clone = ToolUseIndex()
+        clone._count = self._count
+        clone._last_fingerprint = self._last_fingerprint
+        clone._uses = dict(self._uses)
+        clone._results = dict(self._results)
+        clone.errors = list(self.errors)
+        return clone
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, tool_use_id: str) -> bool:
+        return tool_use_id in self._uses
+
+    def get(self, tool_use_id: str) -> Optional[ToolUseEntry]:
+        """Look up a tool_use by id."""
+        return self._uses.get(tool_use_id)
+
+    def name_for(self, tool_use_id: str, default: str = "unknown_tool") -> str:
+        """Resolve a tool_use id (e.g. from a tool_result) to its tool name."""
+        entry = self._uses.get(tool_use_id)
+        return entry.name if entry is not None else default
+
+    def has_result(self, tool_use_id: str) -> bool:
+        """Check whether a tool_use id already has a tool_result."""
+        return tool_use_id in self._results
+
+    def result_message_index(self, tool_use_id: str) -> Optional[int]:
+        """Index of the message holding the tool_result for an id."""
+        return self._results.get(tool_use_id)
+
+    @property
+    def tool_uses(self) -> Dict[str, ToolUseEntry]:
+        """All indexed tool uses by id."""
+        return self._uses
+
+    @property
+    def tool_results(self) -> Dict[str, int]:
+        """Message index of each tool_result by tool_use_id."""
+        return self._results
+
+    def orphaned_tool_uses(self) -> List[str]:
+        """Tool use ids without a corresponding tool_result."""
+        return [tool_id for tool_id in self._uses if tool_id not in self._results]
+
+    def unmatched_results(self) -> List[str]:
+        """Tool result ids without a corresponding tool_use."""
+        return [tool_id for tool_id in self._results if tool_id not in self._uses]
+
+    def find_same_call(self, name: str, tool_input: Any) -> List[str]:
+        """
+        Ids of earlier tool uses with the same name and input, e.g. for result caching.
+
+        Input hashes are computed once per entry, the first time this is called.
+        """
+        entries = list(self._uses.values())
+        for entry in entries[self._hashed:]:
+            self._signatures.setdefault((entry.name, entry.input_hash), []).append(entry.tool_use_id)
+        self._hashed = len(entries)
+        probe = ToolUseEntry(tool_use_id="", name=name, message_index=-1, input=tool_input)
+        return list(self._signatures.get((name, probe.input_hash), []))
+
+
+_registry: "OrderedDict[str, ToolUseIndex]" = OrderedDict()
+_registry_lock = threading.Lock()
+
+
+def get_tool_use_index(messages: Sequence[Any]) -> ToolUseIndex:
+    """
+    Get the shared index for a conversation, extended to cover messages.
+
+    Conversations are keyed by the fingerprint of their first message, so
+    every step handling the same request (validation, conversion, tool
+    continuation), and the next turn of the conversation, reuses the index
+    and only indexes messages appended since. A registered index is never
+    changed: one covering a longer history is a copy, so callers holding
+    it keep a consistent view.
+    """
+    if not messages:
+        return ToolUseIndex()
+
+    key = message_fingerprint(messages[0])
+    with _registry_lock:
+        index = _registry.get(key)
+        if index is None or not index.is_prefix_of(messages):
+            index = ToolUseIndex()
+        elif len(index) < len(messages):
+            index = index.copy()
+        else:
+            _registry.move_to_end(key)
+            return index
+        index.extend(messages[len(index):])
+        _registry[key] = index
+        _registry.move_to_end(key)
+        while len(_registry) > INDEX_REGISTRY_SIZE:
+            _registry.popitem(last=False)
+        return index
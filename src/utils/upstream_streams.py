@@ -0,0 +1,100 @@
+"""
+Observation of upstream chunk streams on the client streaming path.
+
+For a streamed request, the upstream call returns LiteLLM's stream wrapper
+before any chunk has arrived, and the body is consumed later by the
+response conversion. Services that need to see the body (where it was
+served from, its usage) or its end (how long it stayed in flight) hook
+the wrapper's raw chunk stream instead of wrapping the wrapper, whose
+type the conversion code checks.
+"""
+
+import inspect
+import weakref
+from typing import Any, Callable, Optional
+
+
+class ObservedStream:
+    """Raw chunk stream that shows each chunk to a callback and reports its end once."""
+
+    def __init__(
+        self,
+        stream: Any,
+        on_chunk: Optional[Callable[[Any], None]] = None,
+        on_end: Optional[Callable[[], None]] = None
+    ):
+        self._stream = stream
+        self._on_chunk = on_chunk
+        self._on_end = on_end
+        self._ended = False
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._stream, name)
+
+    def __aiter__(self) -> "ObservedStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        try:
+            chunk = await self._stream.__anext__()
+        except BaseException:
+            self.end()
+            raise
+        if self._on_chunk is not None:
+            self._on_chunk(chunk)
+        return chunk
+
+    def end(self) -> None:
+        """Report the end of the stream, once: exhausted, failed, closed or dropped."""
+        if not self._ended:
+            self._ended = True
+            if self._on_end is not None:
+                self._on_end()
+
+    async def aclose(self) -> None:
+        self.end()
+        await _close(self._stream)
+
+
+async def _close(stream: Any) -> None:
+    """Close a raw chunk stream: async generators have aclose(), OpenAI streams an async close()."""
+    close = getattr(stream, "aclose", None) or getattr(stream, "close", None)
+    if close is not None:
+        result = close()
+        if inspect.isawaitable(result):
+            await result
+
+
+async def close_stream(response: Any) -> None:
+    """Close the upstream connection of a LiteLLM stream wrapper that will not be consumed."""
+    stream = getattr(response, "completion_stream", None)
+    if stream is not None:
+        await _close(stream)
+
+
+def observe_stream(
+    response: Any,
+    on_chunk: Optional[Callable[[Any], None]] = None,
+    on_end: Optional[Callable[[], None]] = None
+) -> bool:
+    """
+    Route a LiteLLM stream wrapper's raw chunks through callbacks.
+
+    A stream the client abandons is never exhausted or closed, so its end is
+    also reported when the wrapper is garbage collected.
+
+    Args:
+        response: Response of an upstream call
+        on_chunk: Called with each raw chunk as it is consumed
+        on_end: Called once when the stream ends
+
+    Returns:
+        Whether the response is a stream that is now observed
+    """
+    stream = getattr(response, "completion_stream", None)
+    if stream is None or not hasattr(stream, "__anext__"):
+        return False
+    observed = ObservedStream(stream, on_chunk, on_end)
+    response.completion_stream = observed
+    weakref.finalize(response, observed.end)
+    return True
@@ -5,17 +5,25 @@ This module contains the main message processing flows that replace
 the monolithic router functions with clean, testable workflows.
 """
 
+import time
 import uuid
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from prefect import flow, task
 from fastapi import HTTPException
 
 from src.models.anthropic import MessagesRequest, MessagesResponse
 from src.services.context_manager import ContextManager
 from src.core.logging_config import get_logger
-from src.services import message_validator
+from src.services import (
+    message_validator, context_window_service, model_tiering_service, optimistic_dispatch_service,
+    tool_result_compaction_service, usage_ledger_service
+)
+from src.utils.config import config
 from src.services.conversion import AnthropicToLiteLLMConverter, LiteLLMResponseToAnthropicConverter
 from src.services.http_client import HTTPClientService
+from src.services.model_tiering import TierDecision
+from src.services.rate_limiter import RateLimiterService
+from src.services.request_lanes import get_pipeline_profile
 from src.services.tool_execution import ToolExecutionService
 
 logger = get_logger(__name__)
@@ -26,7 +34,9 @@ async def process_message_request(
     request: MessagesRequest,
     request_id: str,
     streaming: bool = False,
-    api_key: Optional[str] = None
+    api_key: Optional[str] = None,
+    pipeline_profile: str = "full",
+    usage_source: str = "conversion"
 ) -> MessagesResponse:
     """
     Main message processing workflow that replaces the monolithic router function.
@@ -37,24 +47,42 @@ async def process_message_request(
     3. API call execution
     4. Tool execution if needed
     5. Response conversion and cleanup
+    
+    The "lightweight" pipeline profile (background-lane requests) skips
+    mixed content detection, tool result compaction and debug capture.
+    
+    With optimistic dispatch, validation, mixed content detection and a
+    rejecting pre-flight check run while the upstream call is in flight.
+    
+    Usage is recorded in the usage ledger under usage_source, against the
+    model the request was dispatched to (after tiering).
     """
     
+    profile = get_pipeline_profile(pipeline_profile)
+    
     # Create flow-scoped logger with request context
     flow_logger = logger.bind(
         flow_name="process_message_request",
         request_id=request_id,
         model=request.model,
         message_count=len(request.messages),
-        streaming=streaming
+        streaming=streaming,
+        pipeline_profile=profile.name
     )
     
     flow_logger.info("Message processing workflow started")
     
+    # In optimistic mode the checks run while the upstream call is in flight
+    optimistic = optimistic_dispatch_service.enabled
+    # Trimming changes the request, so only a rejecting pre-flight check can overlap
+    preflight_overlaps = optimistic and config.context_preflight_mode != "trim"
+    
     try:
         # Step 1: Create conversation context and handle mixed content
         context_result = await create_conversation_context_task(
             request=request,
-            request_id=request_id
+            request_id=request_id,
+            detect_mixed_content=profile.mixed_content_detection and not optimistic
         )
         
         cleaned_request = context_result["cleaned_request"]
@@ -63,29 +91,64 @@ async def process_message_request(
         # Step 2: Validate and convert request
         flow_logger.info("Starting request validation and conversion")
         
-        validated_request = await validate_request_task(
-            request=cleaned_request
-        )
+        if optimistic:
+            validated_request = cleaned_request
+        else:
+            validated_request = await validate_request_task(
+                request=cleaned_request
+            )
         
-        litellm_request = await convert_to_litellm_task(
-            request=validated_request,
-            api_key=api_key
+        # Replace stale tool results with digests (opt-in)
+        if profile.tool_result_compaction:
+            validated_request = await compact_tool_results_task(
+                request=validated_request
+            )
+        
+        # Send simple requests for the big model to the cheap tier (optional)
+        validated_request, tier_decision = await route_model_tier_task(
+            request=validated_request
         )
         
-        # Step 3: Execute API call
-        flow_logger.info("Executing LiteLLM API call")
+        # Reject (or trim) requests that cannot fit the model's context window
+        if not preflight_overlaps:
+            validated_request = await preflight_context_check_task(
+                request=validated_request
+            )
         
-        if streaming:
-            response = await execute_streaming_api_call_task(
-                litellm_request=litellm_request,
-                conversation_context=conversation_context
+        async def dispatch(dispatched_request: MessagesRequest) -> Any:
+            litellm_request = await convert_to_litellm_task(
+                request=dispatched_request,
+                api_key=api_key
             )
-        else:
-            response = await execute_api_call_task(
+            
+            # Step 3: Execute API call
+            flow_logger.info("Executing LiteLLM API call")
+            
+            if streaming:
+                return await execute_streaming_api_call_task(
+                    litellm_request=litellm_request,
+                    conversation_context=conversation_context,
+                    capture_debug=profile.debug_capture
+                )
+            return await execute_api_call_task(
                 litellm_request=litellm_request,
-                conversation_context=conversation_context
+                conversation_context=conversation_context,
+                capture_debug=profile.debug_capture
             )
         
+        if optimistic:
+            validated_request, response = await optimistic_dispatch_service.run(
+                validated_request,
+                dispatch,
+                lambda dispatched_request: run_request_checks(
+                    request=dispatched_request,
+                    detect_mixed_content=profile.mixed_content_detection,
+                    preflight=preflight_overlaps
+                )
+            )
+        else:
+            response = await dispatch(validated_request)
+        
         # Step 4: Handle tool execution if needed
         if await detect_tool_use_task(response):
             flow_logger.info("Tool use detected, executing tool workflow")
@@ -107,9 +170,21 @@ async def process_message_request(
             original_request=validated_request
         )
         
+        model_tiering_service.record(tier_decision, getattr(anthropic_response, "usage", None))
+        usage_ledger_service.record_response(
+            anthropic_response,
+            model=validated_request.model,
+            requested_model=request.original_model or request.model,
+            client=RateLimiterService.client_key({"x-api-key": api_key} if api_key else {}, None),
+            request_id=request_id,
+            source=usage_source
+        )
         flow_logger.info("Message processing workflow completed successfully")
         return anthropic_response
         
+    except HTTPException:
+        # Already mapped to an HTTP status (e.g. pre-flight rejection)
+        raise
     except ValueError as e:
         # Handle validation errors with HTTP 400
         if "validation failed" in str(e).lower():
@@ -148,7 +223,8 @@ async def process_message_request(
 @task(name="create_conversation_context")
 async def create_conversation_context_task(
     request: MessagesRequest,
-    request_id: str
+    request_id: str,
+    detect_mixed_content: bool = True
 ) -> Dict[str, Any]:
     """Create conversation context and handle mixed content detection."""
     
@@ -175,10 +251,13 @@ async def create_conversation_context_task(
     )
     
     # Handle mixed content detection
-    context_manager.update_conversation_step("mixed_content_detection")
-    
-    # Check for user denial pattern and clean conversation
-    cleaned_request = await detect_and_clean_mixed_content_task(request)
+    if detect_mixed_content:
+        context_manager.update_conversation_step("mixed_content_detection")
+        
+        # Check for user denial pattern and clean conversation
+        cleaned_request = await detect_and_clean_mixed_content_task(request)
+    else:
+        cleaned_request = request
     
     task_logger.info("Conversation context created successfully")
     
@@ -248,6 +327,79 @@ async def validate_request_task(request: MessagesRequest) -> MessagesRequest:
     return validated_request
 
 
+async def run_request_checks(
+    request: MessagesRequest,
+    detect_mixed_content: bool = True,
+    preflight: bool = True
+) -> MessagesRequest:
+    """
+    Run the checks an optimistically dispatched request skipped, returning it cleaned if needed.
+    
+    The checks run in the serial pipeline's order, so validation and the
+    pre-flight check see the request that is actually sent, cleaned or not,
+    and, as there, the request each check returns (e.g. trimmed) is used.
+    They run as plain coroutines rather than tasks: task-run bookkeeping
+    would hold the event loop the upstream call is being dispatched on.
+    """
+    
+    if detect_mixed_content:
+        request = await detect_and_clean_mixed_content_task.fn(request)
+    request = await message_validator.avalidate_messages_request(request)
+    if preflight:
+        request = await preflight_context_check_task.fn(request=request)
+    
+    logger.info("Optimistically dispatched request passed its checks")
+    return request
+
+
+@task(name="compact_tool_results")
+async def compact_tool_results_task(request: MessagesRequest) -> MessagesRequest:
+    """Compact stale or oversized tool results before the request is sent upstream."""
+    
+    task_logger = logger.bind(task_name="compact_tool_results")
+    
+    if not config.tool_result_compaction_enabled:
+        return request
+    
+    result = tool_result_compaction_service.compact_request(request)
+    if result.compacted_results:
+        task_logger.info("🗜️ Tool results compacted",
+                         compacted_results=result.compacted_results,
+                         prompt_tokens_before=result.original_tokens,
+                         prompt_tokens_after=result.compacted_tokens,
+                         prompt_tokens_saved=result.tokens_saved)
+    return result.request
+
+
+@task(name="route_model_tier")
+async def route_model_tier_task(request: MessagesRequest) -> Tuple[MessagesRequest, Optional[TierDecision]]:
+    """Route a simple request for the big model to the cheap tier (logged only in shadow mode)."""
+    
+    return model_tiering_service.route(request)
+
+
+@task(name="preflight_context_check")
+async def preflight_context_check_task(request: MessagesRequest) -> MessagesRequest:
+    """Check the request fits the model's context window before conversion and dispatch."""
+    
+    task_logger = logger.bind(task_name="preflight_context_check")
+    
+    if not config.context_preflight_enabled:
+        return request
+    
+    result = await context_window_service.check_request(request)
+    if not result.fits:
+        task_logger.warning("Pre-flight context check rejected request",
+                            input_tokens=result.input_tokens,
+                            max_tokens=request.max_tokens)
+        raise HTTPException(status_code=400, detail=result.error_message)
+    
+    task_logger.info("Pre-flight context check passed",
+                     input_tokens=result.input_tokens,
+                     trimmed_messages=result.trimmed_messages)
+    return result.request
+
+
 @task(name="convert_to_litellm")
 async def convert_to_litellm_task(
     request: MessagesRequest,
@@ -268,7 +420,8 @@ async def convert_to_litellm_task(
 @task(name="execute_api_call")
 async def execute_api_call_task(
     litellm_request: Any,  # This is actually a ConversionResult object
-    conversation_context: Any
+    conversation_context: Any,
+    capture_debug: bool = True
 ) -> Any:
     """Execute non-streaming API call."""
     
@@ -286,16 +439,19 @@ async def execute_api_call_task(
         request_data = litellm_request
     
     http_client = HTTPClientService()
-    response = await http_client.make_litellm_request(request_data, request_id)
+    start_time = time.perf_counter()
+    response = await http_client.make_litellm_request(request_data, request_id, capture_debug=capture_debug)
     
-    task_logger.info("API call completed")
+    task_logger.info("API call completed",
+                     duration_ms=round((time.perf_counter() - start_time) * 1000, 2))
     return response
 
 
 @task(name="execute_streaming_api_call")
 async def execute_streaming_api_call_task(
     litellm_request: Any,  # This is actually a ConversionResult object
-    conversation_context: Any
+    conversation_context: Any,
+    capture_debug: bool = True
 ) -> Any:
     """Execute streaming API call."""
     
@@ -316,7 +472,7 @@ async def execute_streaming_api_call_task(
     request_data['stream'] = True
     
     http_client = HTTPClientService()
-    response = await http_client.make_litellm_request(request_data, request_id)
+    response = await http_client.make_litellm_request(request_data, request_id, capture_debug=capture_debug)
     
     task_logger.info("Streaming API call completed")
     return response
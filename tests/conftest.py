@@ -329,4 +329,33 @@ def sample_litellm_request():
 pytest.mark.unit = pytest.mark.unit
 pytest.mark.integration = pytest.mark.integration
 pytest.mark.performance = pytest.mark.performance
-pytest.mark.slow = pytest.mark.slow
\ No newline at end of file
+pytest.mark.slow = pytest.mark.slow
+
+class FakeStreamWrapper:
+    """Client stream stand-in: LiteLLM's wrapper reads chunks from completion_stream."""
+
+    def __init__(self, completion_stream):
+        self.completion_stream = completion_stream
+
+
+@pytest.fixture
+def stream_wrapper():
+    """Wrap an async chunk iterator the way LiteLLM's CustomStreamWrapper holds it."""
+    return FakeStreamWrapper
+
+
+@pytest.fixture
+def make_service(request):
+    """
+    Factory for the service under test in the requesting module.
+
+    The module declares SERVICE_CLASS and SERVICE_DEFAULTS; keyword
+    arguments passed to the factory override the defaults.
+    """
+    module = request.module
+
+    def make(**overrides):
+        return module.SERVICE_CLASS(**{**module.SERVICE_DEFAULTS, **overrides})
+
+    return make
+
@@ -136,6 +136,26 @@ class TestMessagesEndpoint:
         assert data["content"][0]["type"] == "text"
         assert "usage" in data
     
+    @patch('src.services.http_client.HTTPClientService.make_litellm_request')
+    def test_create_message_rejects_oversized_request_before_upstream(self, mock_request, client):
+        """Test requests that cannot fit the context window fail fast without an upstream call."""
+        from src.services import context_window_service
+        avoided = context_window_service.get_stats()["upstream_calls_avoided"]
+        oversized_request = {
+            "model": "anthropic/claude-sonnet-4",
+            "max_tokens": 1000,
+            "messages": [{"role": "user", "content": "word " * 250000}]
+        }
+        
+        response = client.post("/v1/messages", json=oversized_request)
+        
+        assert response.status_code == 400
+        data = response.json()
+        assert data["error"]["type"] == "invalid_request_error"
+        assert data["error"]["message"].startswith("prompt is too long")
+        mock_request.assert_not_called()
+        assert context_window_service.get_stats()["upstream_calls_avoided"] == avoided + 1
+    
     def test_create_message_validation_error(self, client):
         """Test message creation with validation error."""
         invalid_request = {
@@ -266,7 +286,15 @@ class TestMessagesEndpoint:
 class TestTokensEndpoint:
     """Test token counting endpoint."""
     
-    @patch('litellm.token_counter')
+    @pytest.fixture(autouse=True)
+    def clear_token_cache(self):
+        """Start each test with an empty per-message token cache."""
+        from src.routers.tokens import token_counting_service
+        token_counting_service.cache.clear()
+        yield
+        token_counting_service.cache.clear()
+    
+    @patch('src.services.token_counting.TokenCountingService.count_message_tokens')
     def test_count_tokens_success(self, mock_counter, client, sample_token_request):
         """Test successful token counting."""
         mock_counter.return_value = 25
@@ -275,7 +303,23 @@ class TestTokensEndpoint:
         assert response.status_code == 200
         
         data = response.json()
-        assert data["input_tokens"] == 25
+        # One message counted per call, plus reply priming once per request
+        assert data["input_tokens"] == 25 + 3
+    
+    @patch('src.services.token_counting.TokenCountingService.count_message_tokens')
+    def test_count_tokens_reuses_cached_messages(self, mock_counter, client, sample_token_request):
+        """Test repeated counts only tokenize new messages."""
+        mock_counter.return_value = 25
+        
+        client.post("/v1/messages/count_tokens", json=sample_token_request)
+        assert mock_counter.call_count == 1
+        
+        sample_token_request["messages"].append({"role": "assistant", "content": "Fine, thanks."})
+        response = client.post("/v1/messages/count_tokens", json=sample_token_request)
+        
+        assert response.status_code == 200
+        assert response.json()["input_tokens"] == 25 * 2 + 3
+        assert mock_counter.call_count == 2
     
     def test_count_tokens_validation_error(self, client):
         """Test token counting with validation error."""
@@ -295,7 +339,7 @@ class TestTokensEndpoint:
         data = response.json()
         assert data["type"] == "error"
     
-    @patch('litellm.token_counter')
+    @patch('src.services.token_counting.TokenCountingService.count_message_tokens')
     def test_count_tokens_complex_content(self, mock_counter, client):
         """Test token counting with complex content blocks."""
         mock_counter.return_value = 50
@@ -334,7 +378,88 @@ class TestTokensEndpoint:
         assert response.status_code == 200
         
         data = response.json()
-        assert data["input_tokens"] == 50
+        assert data["input_tokens"] == 50 * 2 + 3
+
+    def test_count_tokens_batch_matches_single_counts(self, client, sample_token_request):
+        """Test batch results equal individual count_tokens results, in order."""
+        longer = {**sample_token_request, "messages": sample_token_request["messages"] + [
+            {"role": "assistant", "content": "Fine, thanks."}
+        ]}
+        
+        single = [
+            client.post("/v1/messages/count_tokens", json=body).json()["input_tokens"]
+            for body in (sample_token_request, longer)
+        ]
+        response = client.post("/v1/messages/count_tokens/batch",
+                               json={"requests": [sample_token_request, longer]})
+        
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [r["index"] for r in results] == [0, 1]
+        assert [r["input_tokens"] for r in results] == single
+    
+    @patch('src.services.token_counting.TokenCountingService.count_message_tokens')
+    def test_count_tokens_batch_tokenizes_shared_prefix_once(self, mock_counter, client):
+        """Test messages shared across batch requests are tokenized once."""
+        mock_counter.return_value = 10
+        prefix = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i}"}
+                  for i in range(20)]
+        requests = [
+            {"model": "anthropic/claude-3.7-sonnet",
+             "messages": prefix + [{"role": "user", "content": f"candidate {i}"}]}
+            for i in range(100)
+        ]
+        
+        response = client.post("/v1/messages/count_tokens/batch", json={"requests": requests})
+        
+        assert response.status_code == 200
+        assert all(r["input_tokens"] == 21 * 10 + 3 for r in response.json()["results"])
+        assert mock_counter.call_count == 20 + 100
+    
+    def test_count_tokens_batch_reports_item_errors(self, client, sample_token_request):
+        """Test an invalid request yields an error result without failing the batch."""
+        invalid = {"model": "anthropic/claude-3.7-sonnet",
+                   "messages": [{"role": "user", "content": ""}]}
+        
+        response = client.post("/v1/messages/count_tokens/batch",
+                               json={"requests": [invalid, sample_token_request]})
+        
+        assert response.status_code == 200
+        first, second = response.json()["results"]
+        assert first["error"]["type"] == "invalid_request_error"
+        assert "input_tokens" not in first
+        assert second["input_tokens"] > 0
+    
+    def test_count_tokens_batch_size_limit(self, client, sample_token_request):
+        """Test batches over the configured limit are rejected."""
+        from src.utils.config import config
+        requests = [sample_token_request] * (config.token_count_batch_max_requests + 1)
+        
+        response = client.post("/v1/messages/count_tokens/batch", json={"requests": requests})
+        
+        assert response.status_code == 400
+        assert response.json()["type"] == "error"
+
+
+class TestToolResultsEndpoint:
+    """Test compacted tool result retrieval endpoint."""
+    
+    def test_get_stored_tool_result(self, client):
+        """Test originals replaced by a digest can be fetched by sha256."""
+        from src.services import tool_result_compaction_service
+        digest = tool_result_compaction_service.store.put("full original output\n" * 100)
+        
+        response = client.get(f"/v1/tool_results/{digest}")
+        
+        assert response.status_code == 200
+        assert response.text == "full original output\n" * 100
+    
+    def test_get_unknown_tool_result(self, client):
+        """Test unknown digests return an Anthropic-format 404."""
+        response = client.get("/v1/tool_results/" + "0" * 64)
+        
+        assert response.status_code == 404
+        assert response.json()["type"] == "error"
 
 
 class TestMiddleware:
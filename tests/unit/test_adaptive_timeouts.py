@@ -0,0 +1,126 @@
+"""Unit tests for adaptive per-model upstream timeouts."""
+
+import asyncio
+from types import SimpleNamespace
+
+import litellm
+import pytest
+
+from src.services.adaptive_timeouts import AdaptiveTimeoutService, LatencyHistogram
+
+MODEL = "openrouter/anthropic/claude-3-5-haiku"
+
+
+SERVICE_CLASS = AdaptiveTimeoutService
+SERVICE_DEFAULTS = {"enabled": True, "quantile": 0.99, "multiplier": 3.0, "min_samples": 5,
+                    "connect_timeout": 5.0, "floor": 2.0, "ceiling": 300.0}
+
+
+def request_data(prompt_chars=400, max_tokens=1000, stream=False, model=MODEL):
+    return {"model": model, "max_tokens": max_tokens, "stream": stream,
+            "messages": [{"role": "user", "content": "x" * prompt_chars}]}
+
+
+def response(prompt_tokens, completion_tokens):
+    return SimpleNamespace(usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens))
+
+
+def train(service, first_byte=0.5, per_token=0.02, calls=10):
+    """Feed short completions (first byte) and long ones (per-token rate)."""
+    for _ in range(calls):
+        plan = service.plan(request_data())
+        service.record(plan, first_byte, response(100, 5))
+        service.record(plan, first_byte + per_token * 500, response(100, 500))
+
+
+class TestLatencyHistogram:
+    """Test quantiles and decay."""
+
+    def test_quantile_is_bucket_upper_bound(self):
+        histogram = LatencyHistogram()
+        assert histogram.quantile(0.5) is None
+        for seconds in [0.1] * 98 + [5.0, 5.0]:
+            histogram.observe(seconds)
+        assert 0.1 <= histogram.quantile(0.5) < 0.13
+        assert 5.0 <= histogram.quantile(0.99) < 6.3
+
+    def test_decay_keeps_distribution(self):
+        histogram = LatencyHistogram()
+        for _ in range(5000):
+            histogram.observe(1.0)
+        assert histogram.total < 2000
+        assert 1.0 <= histogram.quantile(0.99) < 1.25
+
+
+class TestTimeoutPlans:
+    """Test how deadlines follow learned latency and request size."""
+
+    def test_cold_model_uses_static_timeout(self, make_service):
+        service = make_service()
+        plan = service.plan(request_data())
+        assert not plan.adaptive
+        assert (plan.connect, plan.first_byte, plan.inter_chunk, plan.total) == (5.0, 300.0, 300.0, 300.0)
+        assert make_service(enabled=False).plan(request_data()) is None
+
+    def test_deadlines_scale_with_prompt_and_max_tokens(self, make_service):
+        service = make_service()
+        train(service)
+
+        small = service.plan(request_data(max_tokens=100))
+        large = service.plan(request_data(max_tokens=4000))
+        long_prompt = service.plan(request_data(prompt_chars=4 * 80000, max_tokens=100))
+
+        # Quantiles land on bucket bounds: ~0.52 s first byte, ~23 ms per token
+        assert small.adaptive
+        assert small.first_byte == small.inter_chunk == 2.0  # both below the floor
+        assert small.total == pytest.approx(2.0 + 3 * 0.0227 * 100, rel=0.01)
+        assert large.total == pytest.approx(2.0 + 3 * 0.0227 * 4000, rel=0.01)
+        assert long_prompt.first_byte == pytest.approx(3 * 0.522 * 11, rel=0.01)
+        assert service.plan(request_data(max_tokens=32000)).total == 300.0
+
+    def test_streaming_reads_wait_for_first_byte_or_chunk(self, make_service):
+        service = make_service()
+        train(service, first_byte=2.0)
+        streaming = service.plan(request_data(stream=True))
+        blocking = service.plan(request_data())
+
+        assert streaming.httpx_timeout().read == max(streaming.first_byte, streaming.inter_chunk)
+        assert blocking.httpx_timeout().read == blocking.total
+        assert blocking.httpx_timeout().connect == 5.0
+
+    def test_get_timeouts_reports_per_model(self, make_service):
+        service = make_service()
+        train(service)
+        report = service.get_timeouts(prompt_tokens=100, max_tokens=100)
+        entry = report["models"][MODEL]
+        assert entry["adaptive"] and entry["samples"] == 20
+        assert entry["total"] > entry["first_byte"] >= 2.0
+
+
+class TestRun:
+    """Test deadline enforcement around upstream calls."""
+
+    @pytest.mark.asyncio
+    async def test_non_streaming_call_is_cut_at_total_deadline(self, make_service):
+        service = make_service(min_samples=1, floor=0.05)
+        train(service, first_byte=0.001, per_token=0.00001, calls=1)
+        plan = service.plan(request_data(max_tokens=10))
+        assert plan.total < 0.1
+
+        with pytest.raises(litellm.Timeout):
+            await service.run(plan, asyncio.sleep(5))
+        assert service.get_stats()["timeouts"] == 1
+        # The timed-out call counts as slow, so the next deadline is longer
+        assert service.plan(request_data(max_tokens=10)).total > plan.total
+
+    @pytest.mark.asyncio
+    async def test_records_successful_calls(self, make_service):
+        service = make_service()
+
+        async def call():
+            return response(100, 5)
+
+        result = await service.run(service.plan(request_data()), call())
+        assert result.usage.completion_tokens == 5
+        assert service.get_timeouts()["models"][MODEL]["samples"] == 1
+        assert await service.run(None, asyncio.sleep(0, result="passthrough")) == "passthrough"
@@ -0,0 +1,127 @@
+"""Unit tests for tool result compaction."""
+
+import hashlib
+
+import pytest
+
+from src.models.anthropic import MessagesRequest
+from src.services.compaction import ToolResultCompactionService, ToolResultStore, build_digest
+from src.services.tokenizers import TiktokenEngine
+
+MODEL = "anthropic/claude-sonnet-4"
+
+
+def file_dump(lines: int, tag: str = "") -> str:
+    """Build a large, line-oriented tool output."""
+    return "\n".join(f"{tag}line {i}: def handler_{i}(event): return process(event)" for i in range(lines))
+
+
+def build_session(results, trailing_text: str = "continue"):
+    """Build a tool-use session with one tool_result per user turn."""
+    messages = [{"role": "user", "content": "Refactor the handlers."}]
+    for i, content in enumerate(results):
+        messages.append({"role": "assistant", "content": [
+            {"type": "tool_use", "id": f"t{i}", "name": "Read", "input": {"file_path": f"/f{i}.py"}}
+        ]})
+        messages.append({"role": "user", "content": [
+            {"type": "tool_result", "tool_use_id": f"t{i}", "content": content}
+        ]})
+    return MessagesRequest(model=MODEL, original_model=MODEL, max_tokens=1000, messages=messages)
+
+
+@pytest.fixture
+def service():
+    """Compaction service with small thresholds for testing."""
+    svc = ToolResultCompactionService(store=ToolResultStore(max_bytes=10 * 1024 * 1024), engine=TiktokenEngine())
+    svc.age_turns = 2
+    svc.max_bytes = 20000
+    svc.min_bytes = 1000
+    return svc
+
+
+def tool_result_content(request, index):
+    """Return the tool_result content of the index-th tool turn."""
+    return request.messages[2 + 2 * index].content[0].content
+
+
+class TestBuildDigest:
+    """Test digest rendering."""
+
+    def test_digest_is_deterministic_with_head_and_tail(self):
+        """Test digests keep head/tail lines, sizes and a retrieval pointer."""
+        content = file_dump(100)
+        digest = hashlib.sha256(content.encode()).hexdigest()
+        text = build_digest(content, digest)
+
+        assert text == build_digest(content, digest)
+        assert "line 0:" in text and "line 99:" in text and "line 50:" not in text
+        assert f"{len(content.encode())} bytes, 100 lines" in text
+        assert "90 lines omitted" in text
+        assert text.endswith(f"/v1/tool_results/{digest}]")
+
+    def test_long_lines_are_clipped(self):
+        """Test single-line outputs (e.g. minified JSON) are clipped."""
+        text = build_digest("x" * 5000, "0" * 64)
+        assert len(text) < 500
+
+
+class TestToolResultCompactionService:
+    """Test compaction rules, retrieval and savings."""
+
+    def test_old_results_are_compacted_and_retrievable(self, service):
+        """Test results older than the age threshold become digests with originals stored."""
+        originals = [file_dump(200, tag=f"f{i} ") for i in range(4)]
+        result = service.compact_request(build_session(originals))
+
+        # Turns 0 and 1 are >= 2 user turns old; 2 and 3 are recent
+        assert result.compacted_results == 2
+        for i in (0, 1):
+            digest_text = tool_result_content(result.request, i)
+            assert digest_text.startswith("[compacted tool result sha256:")
+            digest = digest_text.rsplit("/", 1)[1].rstrip("]")
+            assert service.store.get(digest) == originals[i]
+        assert tool_result_content(result.request, 2) == originals[2]
+        assert tool_result_content(result.request, 3) == originals[3]
+        assert result.tokens_saved > 0
+        assert result.compacted_tokens < result.original_tokens / 10
+
+    def test_oversized_results_compacted_but_latest_turn_kept(self, service):
+        """Test the size rule applies to any non-current result, never to the latest turn."""
+        huge = file_dump(1000)
+        result = service.compact_request(build_session([huge, huge]))
+
+        assert result.compacted_results == 1
+        assert tool_result_content(result.request, 0).startswith("[compacted")
+        assert tool_result_content(result.request, 1) == huge
+
+    def test_small_and_image_results_untouched(self, service):
+        """Test small text results and results containing images are never compacted."""
+        image_result = [{"type": "image", "source": {"type": "base64", "media_type": "image/png", "data": "AAAA"}}]
+        request = build_session(["ok", image_result, "done", "fine"])
+        result = service.compact_request(request)
+
+        assert result.compacted_results == 0
+        assert result.request is request
+
+    def test_compaction_is_stable_across_turns(self, service):
+        """Test a compacted turn renders identically on later requests (prefix-cache friendly)."""
+        originals = [file_dump(200, tag=f"f{i} ") for i in range(5)]
+        first = service.compact_request(build_session(originals[:4]))
+        second = service.compact_request(build_session(originals))
+
+        assert tool_result_content(first.request, 0) == tool_result_content(second.request, 0)
+        assert service.get_stats()["tokens_saved"] == first.tokens_saved + second.tokens_saved
+
+
+class TestToolResultStore:
+    """Test the content-addressed store."""
+
+    def test_store_evicts_by_bytes(self):
+        """Test the store stays within its byte bound, evicting oldest first."""
+        store = ToolResultStore(max_bytes=250)
+        first = store.put("a" * 100)
+        store.put("b" * 100)
+        store.put("c" * 100)
+
+        assert store.get(first) is None
+        assert store.get_stats()["bytes"] <= 250
@@ -0,0 +1,106 @@
+"""Unit tests for the pre-flight context window check."""
+
+import pytest
+
+from src.models.anthropic import MessagesRequest
+from src.services.context_window import ContextWindowService, ModelLimits
+from src.services.token_counting import MessageTokenCache, TokenCountingService
+
+
+def build_request(turns: int, words_per_turn: int = 10, max_tokens: int = 1000, model: str = "anthropic/claude-sonnet-4"):
+    """Build a request with alternating user/assistant turns, starting and ending with a user turn."""
+    messages = [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i} " + "word " * words_per_turn}
+        for i in range(turns)
+    ]
+    return MessagesRequest(model=model, original_model=model, max_tokens=max_tokens, messages=messages)
+
+
+@pytest.fixture
+def service():
+    """Context window service with a small model limit for testing."""
+    svc = ContextWindowService(token_counter=TokenCountingService(cache=MessageTokenCache()))
+    svc.model_limits["test/tiny-model"] = ModelLimits(context_window=2000, max_output_tokens=500)
+    return svc
+
+
+class TestModelLimits:
+    """Test model limit lookup."""
+
+    def test_lookup_strips_prefix_date_and_variant(self, service):
+        """Test routed, dated and variant model names resolve to their family limits."""
+        sonnet = service.get_limits("anthropic/claude-sonnet-4")
+        assert service.get_limits("openrouter/anthropic/claude-sonnet-4-20250514") == sonnet
+        assert service.get_limits("openrouter/anthropic/claude-sonnet-4:thinking") == sonnet
+        assert service.get_limits("openai/gpt-4o-mini") == service.get_limits("openai/gpt-4o")
+
+    def test_unknown_model_is_not_checked(self, service):
+        """Test requests for models without known limits pass unchecked."""
+        assert service.get_limits("someone/unknown-model") is None
+
+
+class TestContextWindowService:
+    """Test pre-flight rejection and trimming."""
+
+    @pytest.mark.asyncio
+    async def test_fitting_request_passes_unchanged(self, service):
+        """Test a request within limits passes through as-is."""
+        request = build_request(3, model="openrouter/test/tiny-model", max_tokens=100)
+        result = await service.check_request(request, trim=False)
+
+        assert result.fits
+        assert result.request is request
+        assert service.get_stats()["passed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_oversized_prompt_is_rejected(self, service):
+        """Test a prompt over the context window is rejected with an Anthropic-style message."""
+        request = build_request(41, words_per_turn=100, model="openrouter/test/tiny-model", max_tokens=100)
+        result = await service.check_request(request, trim=False)
+
+        assert not result.fits
+        assert result.error_message.startswith("prompt is too long:")
+        assert service.get_stats()["upstream_calls_avoided"] == 1
+
+    @pytest.mark.asyncio
+    async def test_max_tokens_over_model_limit_is_rejected(self, service):
+        """Test max_tokens above the model's output limit is rejected."""
+        request = build_request(1, model="openrouter/test/tiny-model", max_tokens=600)
+        result = await service.check_request(request, trim=False)
+
+        assert not result.fits
+        assert "maximum allowed number of output tokens" in result.error_message
+
+    @pytest.mark.asyncio
+    async def test_trim_lowers_max_tokens_when_input_fits(self, service):
+        """Test trim mode clamps max_tokens instead of rejecting."""
+        request = build_request(1, model="openrouter/test/tiny-model", max_tokens=600)
+        result = await service.check_request(request, trim=True)
+
+        assert result.fits
+        assert result.request.max_tokens == 500
+        assert result.trimmed_messages == 0
+
+    @pytest.mark.asyncio
+    async def test_trim_drops_oldest_turns_and_starts_on_user_turn(self, service):
+        """Test trim mode drops whole turns from the front until the request fits."""
+        request = build_request(41, words_per_turn=100, model="openrouter/test/tiny-model", max_tokens=100)
+        result = await service.check_request(request, trim=True)
+
+        assert result.fits
+        assert result.trimmed_messages > 0
+        assert result.request.messages[0].role == "user"
+        assert result.request.messages[-1] == request.messages[-1]
+        assert result.input_tokens + result.request.max_tokens <= 2000
+
+        recount = await service.token_counter.count_request_tokens(result.request, model=request.model)
+        assert recount + result.request.max_tokens <= 2000
+        assert service.get_stats()["trimmed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_trim_rejects_when_last_message_alone_is_too_long(self, service):
+        """Test trim mode still rejects a request whose final turn cannot fit."""
+        request = build_request(1, words_per_turn=3000, model="openrouter/test/tiny-model", max_tokens=100)
+        result = await service.check_request(request, trim=True)
+
+        assert not result.fits
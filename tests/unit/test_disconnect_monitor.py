@@ -0,0 +1,132 @@
+"""Unit tests for client disconnect detection and cancellation."""
+
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.services import disconnect_monitor_service
+from src.services.disconnect_monitor import DisconnectMonitorService
+from src.tasks.tools.system_tools import _run_command
+from src.utils.errors import ClientDisconnectedError
+
+
+class FakeRequest:
+    """Request whose client disconnects after a delay (or never)."""
+
+    def __init__(self, disconnect_after=None):
+        self.disconnect_after = disconnect_after
+        self.url = SimpleNamespace(path="/v1/messages")
+
+    async def receive(self):
+        if self.disconnect_after is None:
+            await asyncio.Event().wait()
+        await asyncio.sleep(self.disconnect_after)
+        return {"type": "http.disconnect"}
+
+
+def process_gone(pid):
+    """True once a process has exited (or is only a zombie awaiting reaping)."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split(") ")[1].startswith("Z")
+    except FileNotFoundError:
+        return True
+
+
+class TestDisconnectMonitor:
+    """Test running work under the monitor."""
+
+    @pytest.mark.asyncio
+    async def test_returns_result_while_connected(self):
+        monitor = DisconnectMonitorService(enabled=True)
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        assert await monitor.run(FakeRequest(), work()) == "done"
+        assert monitor.stats["cancelled_requests"] == 0
+        assert monitor.stats["active_requests"] == 0
+
+    @pytest.mark.asyncio
+    async def test_disconnect_cancels_work(self):
+        monitor = DisconnectMonitorService(enabled=True)
+        events = []
+
+        async def work():
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                events.append("cancelled")
+                raise
+
+        start = time.perf_counter()
+        with pytest.raises(ClientDisconnectedError):
+            await monitor.run(FakeRequest(disconnect_after=0.05), work(), request_id="req-1")
+
+        assert events == ["cancelled"]
+        assert time.perf_counter() - start < 5
+        stats = monitor.get_stats()
+        assert stats["cancelled_requests"] == 1
+        assert stats["active_requests"] == 0
+        assert stats["cancelled_work_seconds"] > 0
+
+    @pytest.mark.asyncio
+    async def test_disabled_monitor_just_awaits(self):
+        monitor = DisconnectMonitorService(enabled=False)
+
+        async def work():
+            return 42
+
+        assert await monitor.run(FakeRequest(disconnect_after=0), work()) == 42
+
+
+@pytest.mark.skipif(not hasattr(os, "killpg"), reason="process groups are POSIX-only")
+class TestCommandCancellation:
+    """Test cancelled Bash commands take their children with them."""
+
+    @pytest.mark.asyncio
+    async def test_cancel_kills_child_processes(self, tmp_path):
+        pid_file = tmp_path / "child.pid"
+        before = dict(disconnect_monitor_service.stats)
+
+        with open(tmp_path / "out", "wb") as out, open(tmp_path / "err", "wb") as err:
+            task = asyncio.ensure_future(_run_command(
+                f"sleep 30 & echo $! > {pid_file}; wait", out, err, timeout=60
+            ))
+            for _ in range(100):
+                if pid_file.exists() and pid_file.read_text().strip():
+                    break
+                await asyncio.sleep(0.05)
+            child_pid = int(pid_file.read_text())
+
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        deadline = time.time() + 5
+        while not process_gone(child_pid) and time.time() < deadline:
+            await asyncio.sleep(0.05)
+        assert process_gone(child_pid)
+        stats = disconnect_monitor_service.stats
+        assert stats["cancelled_tool_executions"] == before["cancelled_tool_executions"] + 1
+        assert stats["killed_processes"] == before["killed_processes"] + 1
+
+    @pytest.mark.asyncio
+    async def test_timeout_kills_process_group(self, tmp_path):
+        import subprocess
+
+        with open(tmp_path / "out", "wb") as out, open(tmp_path / "err", "wb") as err:
+            with pytest.raises(subprocess.TimeoutExpired):
+                await _run_command("sleep 30 & wait", out, err, timeout=0.2)
+
+    @pytest.mark.asyncio
+    async def test_returns_exit_code_and_passes_stdin(self, tmp_path):
+        with open(tmp_path / "out", "wb") as out, open(tmp_path / "err", "wb") as err:
+            code = await _run_command("cat; exit 3", out, err, timeout=10, stdin_input="hello")
+
+        assert code == 3
+        assert (tmp_path / "out").read_text() == "hello"
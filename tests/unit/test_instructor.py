@@ -1,5 +1,8 @@
 """Unit tests for Instructor integration and models."""
 
+import asyncio
+import time
+
 import pytest
 from unittest.mock import Mock, patch
 from pydantic import ValidationError
@@ -16,7 +19,7 @@ from src.models.instructor import (
     StructuredErrorInfo,
     PerformanceMetrics
 )
-from src.utils.instructor_client import InstructorClient
+from src.utils.instructor_client import InstructorClient, AsyncInstructorClient
 from src.utils.errors import StructuredOutputError
 
 
@@ -400,4 +403,101 @@ class TestInstructorClient:
                 response_model=StructuredResponse
             )
         
-        assert "API Error" in str(exc_info.value)
\ No newline at end of file
+        assert "API Error" in str(exc_info.value)
+
+
+class TestAsyncInstructorClient:
+    """Test AsyncInstructorClient functionality."""
+    
+    @staticmethod
+    def _make_client(mock_instructor, delays):
+        """Build a client whose create() sleeps per-model delays without blocking."""
+        async def fake_create(model, **kwargs):
+            await asyncio.sleep(delays.get(model, 0.0))
+            return StructuredResponse(content=f"done {model}")
+        
+        mock_client = Mock()
+        mock_client.chat.completions.create = fake_create
+        mock_instructor.from_openai.return_value = mock_client
+        return AsyncInstructorClient(http_client=Mock(), max_concurrency=4)
+    
+    @patch('src.utils.instructor_client.instructor')
+    @patch('src.utils.instructor_client.AsyncOpenAI')
+    def test_uses_shared_connection_pool(self, mock_async_openai, mock_instructor):
+        """Test the async client defaults to the shared upstream pool."""
+        from src.services.http_client import get_shared_async_client
+        
+        AsyncInstructorClient().client
+        
+        call_kwargs = mock_async_openai.call_args[1]
+        assert call_kwargs["http_client"] is get_shared_async_client()
+    
+    @pytest.mark.asyncio
+    @patch('src.utils.instructor_client.instructor')
+    @patch('src.utils.instructor_client.AsyncOpenAI')
+    async def test_follows_shared_pool_after_it_is_closed(self, mock_async_openai, mock_instructor):
+        """Test a pool recreated after shutdown replaces the closed one."""
+        from src.services.http_client import close_shared_async_client, get_shared_async_client
+        
+        client = AsyncInstructorClient()
+        client.client
+        client.client
+        assert mock_async_openai.call_count == 1
+        
+        await close_shared_async_client()
+        client.client
+        
+        assert mock_async_openai.call_count == 2
+        assert mock_async_openai.call_args[1]["http_client"] is get_shared_async_client()
+        assert not get_shared_async_client().is_closed
+    
+    @pytest.mark.asyncio
+    @patch('src.utils.instructor_client.instructor')
+    @patch('src.utils.instructor_client.AsyncOpenAI')
+    async def test_event_loop_stays_responsive(self, mock_async_openai, mock_instructor):
+        """Test the loop keeps servicing other tasks during structured calls."""
+        client = self._make_client(mock_instructor, {"slow-model": 0.3})
+        ticks = []
+        
+        async def heartbeat():
+            while True:
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.01)
+        
+        heartbeat_task = asyncio.create_task(heartbeat())
+        try:
+            result = await client.create_structured_completion(
+                model="slow-model",
+                messages=[{"role": "user", "content": "Test"}],
+                response_model=StructuredResponse
+            )
+        finally:
+            heartbeat_task.cancel()
+        
+        assert result.content == "done slow-model"
+        assert len(ticks) >= 10
+        assert max(b - a for a, b in zip(ticks, ticks[1:])) < 0.1
+    
+    @pytest.mark.asyncio
+    @patch('src.utils.instructor_client.instructor')
+    @patch('src.utils.instructor_client.AsyncOpenAI')
+    async def test_batch_runs_concurrently_with_per_call_timeouts(self, mock_async_openai, mock_instructor):
+        """Test batched extractions overlap and time out individually."""
+        client = self._make_client(mock_instructor, {"fast": 0.1, "stuck": 5.0})
+        messages = [{"role": "user", "content": "Test"}]
+        requests = [
+            {"model": "fast", "messages": messages, "response_model": StructuredResponse}
+            for _ in range(4)
+        ]
+        requests.append({
+            "model": "stuck", "messages": messages,
+            "response_model": StructuredResponse, "timeout": 0.2
+        })
+        
+        start = time.perf_counter()
+        results = await client.batch_structured_completions(requests, timeout=1.0)
+        elapsed = time.perf_counter() - start
+        
+        assert [r.content for r in results[:4]] == ["done fast"] * 4
+        assert isinstance(results[4], asyncio.TimeoutError)
+        assert elapsed < 1.0
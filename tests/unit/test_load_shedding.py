@@ -0,0 +1,132 @@
+"""Unit tests for the load-shedding model downgrade."""
+
+import contextvars
+import gc
+from types import SimpleNamespace
+
+import pytest
+
+from src.models.anthropic import MessagesRequest
+from src.services.load_shedding import LoadSheddingService
+from src.services.rate_limiter import RateLimiterService
+
+BIG = "anthropic/claude-sonnet-4"
+FAST = "anthropic/claude-3.5-haiku"
+
+
+SERVICE_CLASS = LoadSheddingService
+SERVICE_DEFAULTS = {"enabled": True, "max_in_flight": 4, "max_queue_wait_ms": 1000, "recovery_ratio": 0.5,
+                    "min_duration": 0, "fallbacks": {BIG: FAST}, "exempt_clients": []}
+
+
+def make_request(model=BIG):
+    request = MessagesRequest(model="claude-sonnet-4", max_tokens=64, messages=[{"role": "user", "content": "Hi"}])
+    return request.model_copy(update={"model": f"openrouter/{model}"})
+
+
+def saturate(service, calls=4):
+    for _ in range(calls):
+        service.upstream_started()
+
+
+@pytest.fixture
+def queue_wait(monkeypatch):
+    wait = {"ms": 0.0}
+    monkeypatch.setattr(LoadSheddingService, "queue_wait_ms", lambda self: wait["ms"])
+    return wait
+
+
+class TestLoadShedding:
+    """Test saturation signals, hysteresis, opt-out and reporting."""
+
+    def test_downgrades_only_while_saturated(self, make_service, queue_wait):
+        service = make_service()
+        assert service.apply(make_request()).model == f"openrouter/{BIG}"
+
+        saturate(service)
+        record = service.track_request({}, "127.0.0.1")
+        assert service.apply(make_request()).model == f"openrouter/{FAST}"
+        assert service.response_headers(record) == {
+            "X-Model-Downgraded-From": BIG, "X-Model-Downgraded-To": FAST
+        }
+        # Models without a fallback are left alone
+        assert service.apply(make_request(FAST)).model == f"openrouter/{FAST}"
+
+        stats = service.get_stats()
+        assert (stats["saturated"], stats["in_flight"], stats["episodes"], stats["downgraded"]) == (True, 4, 1, 1)
+        assert stats["downgrades"] == {f"{BIG} -> {FAST}": 1}
+
+    def test_queue_wait_saturates(self, make_service, queue_wait):
+        service = make_service()
+        queue_wait["ms"] = 1500
+        assert service.update() is True
+        queue_wait["ms"] = 400
+        assert service.update() is False
+
+    def test_recovers_with_hysteresis(self, make_service, queue_wait):
+        service = make_service(min_duration=60)
+        saturate(service)
+        assert service.update() is True
+
+        # Below the threshold is not enough: signals must fall to the recovery ratio
+        service.upstream_finished()
+        assert service.update() is True
+        service.upstream_finished()
+        assert service.update() is True  # still inside the minimum duration
+
+        service.saturated_since -= 60
+        assert service.update() is False
+        assert service.get_stats()["saturated_seconds"] >= 60
+
+    def test_clients_can_opt_out(self, make_service, queue_wait):
+        service = make_service(exempt_clients=[RateLimiterService.client_key({"x-api-key": "sk-vip"}, None)])
+        saturate(service)
+
+        record = service.track_request({"x-load-shedding": "off"}, "127.0.0.1")
+        assert service.apply(make_request()).model == f"openrouter/{BIG}"
+        assert service.response_headers(record) == {}
+
+        service.track_request({"x-api-key": "sk-vip"}, "127.0.0.1")
+        assert service.apply(make_request()).model == f"openrouter/{BIG}"
+        assert service.get_stats()["opted_out"] == 2
+
+    def test_disabled_service_never_downgrades(self, make_service, queue_wait):
+        service = make_service(enabled=False)
+        saturate(service, 10)
+        assert service.apply(make_request()).model == f"openrouter/{BIG}"
+        assert service.get_stats()["saturated"] is False
+
+    @pytest.mark.asyncio
+    async def test_streams_stay_in_flight_until_consumed_or_dropped(self, make_service, stream_wrapper, queue_wait):
+        service = make_service()
+
+        async def chunks():
+            yield "a"
+            yield "b"
+
+        consumed = stream_wrapper(chunks())
+        service.upstream_started()
+        assert service.track_stream(consumed) is True
+        assert service.in_flight == 1
+        assert [chunk async for chunk in consumed.completion_stream] == ["a", "b"]
+        assert service.in_flight == 0
+
+        dropped = stream_wrapper(chunks())
+        service.upstream_started()
+        service.track_stream(dropped)
+        del dropped
+        gc.collect()
+        assert service.in_flight == 0
+
+        assert service.track_stream(SimpleNamespace(choices=[])) is False
+
+    def test_batch_traffic_is_not_counted(self, make_service, queue_wait):
+        service = make_service()
+
+        def batch_calls():
+            service.mark_batch_traffic()
+            return [service.upstream_started() for _ in range(4)]
+
+        assert contextvars.copy_context().run(batch_calls) == [False] * 4
+        assert service.in_flight == 0
+        assert service.apply(make_request()).model == f"openrouter/{BIG}"
@@ -0,0 +1,236 @@
+"""Unit tests for the Message Batches API emulation."""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+import src.services as services
+from src.models.anthropic import MessageBatchRequestItem, MessagesResponse
+from src.models.base import Usage
+from src.routers import batches as batches_router
+from src.services.message_batches import MessageBatchService
+from src.services.retry_policy import RetryPolicyService
+from src.workflows import message_workflows
+
+PARAMS = {"model": "claude-3-5-haiku-20241022", "max_tokens": 16, "messages": [{"role": "user", "content": "hi"}]}
+
+
+def make_item(custom_id, **params):
+    return MessageBatchRequestItem(custom_id=custom_id, params={**PARAMS, **params})
+
+
+def make_response(text="ok"):
+    return MessagesResponse(id="msg_1", model="claude-3-5-haiku-20241022",
+                            content=[{"type": "text", "text": text}],
+                            stop_reason="end_turn", usage=Usage(input_tokens=3, output_tokens=1))
+
+
+def patch_workflow(monkeypatch, process):
+    """Replace the message workflow, whose body batches call via .fn."""
+    monkeypatch.setattr(message_workflows, "process_message_request", SimpleNamespace(fn=process))
+
+
+@pytest.fixture
+def service(tmp_path):
+    return MessageBatchService(directory=str(tmp_path), concurrency=4, max_retries=2, retry_backoff=0.001)
+
+
+async def wait_ended(service, batch_id):
+    for _ in range(500):
+        batch = await service.get(batch_id)
+        if batch.processing_status == "ended":
+            return batch
+        await asyncio.sleep(0.01)
+    raise AssertionError("batch did not end")
+
+
+def read_results(service, batch_id):
+    with open(service.results_path(batch_id)) as f:
+        return {line["custom_id"]: line["result"] for line in map(json.loads, f)}
+
+
+class TestMessageBatchService:
+    """Test batch execution, retries and cancellation."""
+
+    @pytest.mark.asyncio
+    async def test_runs_items_with_bounded_concurrency(self, service, monkeypatch):
+        active, peak = [0], [0]
+
+        async def fake_process(request, request_id, streaming, api_key, usage_source):
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            await asyncio.sleep(0.01)
+            active[0] -= 1
+            return make_response(request_id.split(":")[1])
+
+        patch_workflow(monkeypatch, fake_process)
+        batch = await service.create([make_item(f"item-{i}") for i in range(20)])
+        batch = await wait_ended(service, batch.id)
+
+        assert batch.to_api()["request_counts"]["succeeded"] == 20
+        assert batch.to_api()["results_url"] == f"/v1/messages/batches/{batch.id}/results"
+        assert peak[0] == 4
+        results = read_results(service, batch.id)
+        assert results["item-7"]["message"]["content"][0]["text"] == "item-7"
+
+    @pytest.mark.asyncio
+    async def test_retries_retryable_errors_only(self, service, monkeypatch):
+        monkeypatch.setattr(services, "retry_policy_service", RetryPolicyService(enabled=False))
+        calls = {}
+
+        async def fake_process(request, request_id, streaming, api_key, usage_source):
+            custom_id = request_id.split(":")[1]
+            calls[custom_id] = calls.get(custom_id, 0) + 1
+            if custom_id == "flaky" and calls[custom_id] < 3:
+                raise HTTPException(status_code=500, detail={"error": "x", "message": "upstream 502"})
+            if custom_id == "bad":
+                raise HTTPException(status_code=400, detail={"error": "x", "message": "prompt too long"})
+            return make_response()
+
+        patch_workflow(monkeypatch, fake_process)
+        batch = await service.create([make_item("flaky"), make_item("bad"), make_item("invalid", max_tokens="x")])
+        batch = await wait_ended(service, batch.id)
+
+        results = read_results(service, batch.id)
+        assert results["flaky"]["type"] == "succeeded" and calls["flaky"] == 3
+        assert results["bad"]["error"]["error"]["type"] == "invalid_request_error" and calls["bad"] == 1
+        assert results["invalid"]["error"]["error"]["type"] == "invalid_request_error"
+        assert (batch.succeeded, batch.errored, batch.retries) == (1, 2, 2)
+
+    @pytest.mark.asyncio
+    async def test_leaves_retries_to_the_retry_policy(self, service, monkeypatch):
+        monkeypatch.setattr(services, "retry_policy_service", RetryPolicyService(enabled=True))
+        calls = []
+
+        async def fake_process(request, request_id, streaming, api_key, usage_source):
+            calls.append(request_id)
+            raise HTTPException(status_code=429, detail={"error": "x", "message": "rate limited"})
+
+        patch_workflow(monkeypatch, fake_process)
+        batch = await service.create([make_item("limited")])
+        batch = await wait_ended(service, batch.id)
+
+        assert len(calls) == 1
+        assert (batch.errored, batch.retries) == (1, 0)
+
+    @pytest.mark.asyncio
+    async def test_cancel_marks_queued_items_canceled(self, tmp_path, monkeypatch):
+        service = MessageBatchService(directory=str(tmp_path), concurrency=1)
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def fake_process(request, request_id, streaming, api_key, usage_source):
+            started.set()
+            await release.wait()
+            return make_response()
+
+        patch_workflow(monkeypatch, fake_process)
+        batch = await service.create([make_item(f"item-{i}") for i in range(5)])
+        await started.wait()
+        await service.cancel(batch.id)
+        assert batch.to_api()["processing_status"] == "canceling"
+        release.set()
+        batch = await wait_ended(service, batch.id)
+
+        assert (batch.succeeded, batch.canceled) == (1, 4)
+
+    @pytest.mark.asyncio
+    async def test_failed_run_ends_batch_with_unfinished_items_errored(self, tmp_path, monkeypatch):
+        service = MessageBatchService(directory=str(tmp_path), concurrency=1)
+
+        async def fake_process(request, request_id, streaming, api_key, usage_source):
+            return make_response()
+
+        async def execute(batch, item):
+            if item["custom_id"] == "boom":
+                raise RuntimeError("disk full")
+            return await MessageBatchService._execute(service, batch, item)
+
+        patch_workflow(monkeypatch, fake_process)
+        monkeypatch.setattr(service, "_execute", execute)
+        batch = await service.create([make_item("a"), make_item("boom"), make_item("c")])
+        await service._runners[batch.id]
+
+        assert (batch.succeeded, batch.errored, batch.processing) == (1, 2, 0)
+        results = read_results(service, batch.id)
+        assert results["a"]["type"] == "succeeded"
+        assert results["boom"]["error"]["error"]["message"] == "Batch processing failed: RuntimeError: disk full"
+        assert results["c"]["type"] == "errored"
+        assert service.get_stats()["running_batches"] == 0
+        assert (await MessageBatchService(directory=str(tmp_path)).get(batch.id)).errored == 2
+
+    @pytest.mark.asyncio
+    async def test_unfinished_batch_from_earlier_process_expires(self, service, monkeypatch):
+        async def hang(request, request_id, streaming, api_key, usage_source):
+            await asyncio.Event().wait()
+
+        patch_workflow(monkeypatch, hang)
+        batch = await service.create([make_item("a"), make_item("b")])
+        await service.close()
+
+        reloaded = await MessageBatchService(directory=str(service.directory)).get(batch.id)
+        assert reloaded.processing_status == "ended"
+        assert reloaded.expired == 2
+        assert read_results(service, batch.id) == {"a": {"type": "expired"}, "b": {"type": "expired"}}
+
+    @pytest.mark.asyncio
+    async def test_rejects_duplicate_custom_ids(self, service):
+        with pytest.raises(HTTPException) as exc:
+            await service.create([make_item("a"), make_item("a")])
+        assert exc.value.status_code == 400
+
+
+class TestBatchesRouter:
+    """Test the Anthropic-compatible endpoints."""
+
+    def test_create_poll_and_fetch_results(self, service, monkeypatch):
+        async def fake_process(request, request_id, streaming, api_key, usage_source):
+            return make_response()
+
+        patch_workflow(monkeypatch, fake_process)
+        monkeypatch.setattr(batches_router, "message_batch_service", service)
+        app = FastAPI()
+        app.include_router(batches_router.router)
+
+        with TestClient(app) as client:
+            created = client.post("/v1/messages/batches", json={"requests": [
+                {"custom_id": "a", "params": PARAMS}, {"custom_id": "b", "params": PARAMS}
+            ]}).json()
+            assert created["type"] == "message_batch"
+            assert created["id"].startswith("msgbatch_")
+
+            for _ in range(200):
+                batch = client.get(f"/v1/messages/batches/{created['id']}").json()
+                if batch["processing_status"] == "ended":
+                    break
+            assert batch["request_counts"]["succeeded"] == 2
+
+            lines = client.get(batch["results_url"]).text.splitlines()
+            assert sorted(json.loads(line)["custom_id"] for line in lines) == ["a", "b"]
+            assert client.get("/v1/messages/batches").json()["data"][0]["id"] == created["id"]
+            assert client.get("/v1/messages/batches/msgbatch_missing").status_code == 404
+
+    def test_batches_are_private_to_their_creator(self, service, monkeypatch):
+        async def fake_process(request, request_id, streaming, api_key, usage_source):
+            return make_response()
+
+        patch_workflow(monkeypatch, fake_process)
+        monkeypatch.setattr(batches_router, "message_batch_service", service)
+        app = FastAPI()
+        app.include_router(batches_router.router)
+        owner, other = {"x-api-key": "sk-owner"}, {"x-api-key": "sk-other"}
+
+        with TestClient(app) as client:
+            created = client.post("/v1/messages/batches", headers=owner,
+                                  json={"requests": [{"custom_id": "a", "params": PARAMS}]}).json()
+            batch_url = f"/v1/messages/batches/{created['id']}"
+
+            assert client.get(batch_url, headers=owner).status_code == 200
+            assert client.get(batch_url, headers=other).status_code == 404
+            assert client.get(f"{batch_url}/results", headers=other).status_code == 404
+            assert client.post(f"{batch_url}/cancel", headers=other).status_code == 404
+            assert client.get("/v1/messages/batches", headers=other).json()["data"] == []
+            assert client.get("/v1/messages/batches", headers=owner).json()["data"][0]["id"] == created["id"]
@@ -0,0 +1,132 @@
+"""Unit tests for complexity-based model tiering."""
+
+from types import SimpleNamespace
+
+import pytest
+from litellm.types.utils import ModelResponse
+
+from src.services.http_client import HTTPClientService
+from src.services.model_tiering import ModelTieringService, last_message_type
+from src.models.anthropic import MessagesRequest
+from src.workflows import message_workflows
+
+BIG = "anthropic/claude-sonnet-4"
+CHEAP = "anthropic/claude-3.5-haiku"
+TOOL = {"name": "read_file", "description": "Read a file", "input_schema": {"type": "object"}}
+
+
+SERVICE_CLASS = ModelTieringService
+SERVICE_DEFAULTS = {"mode": "on", "big_models": [BIG], "cheap_model": CHEAP, "thresholds": {}, "prices": {}}
+
+
+def make_request(content="What is 2 + 2?", **kwargs):
+    request = MessagesRequest(model="claude-sonnet-4", max_tokens=kwargs.pop("max_tokens", 512),
+                              messages=[{"role": "user", "content": content}], **kwargs)
+    return request.model_copy(update={"model": f"openrouter/{BIG}"})
+
+
+def usage(input_tokens=1000, output_tokens=100):
+    return SimpleNamespace(input_tokens=input_tokens, output_tokens=output_tokens)
+
+
+class TestModelTiering:
+    """Test the classifier, tiering modes and per-tier reports."""
+
+    def test_classifies_prompt_size_tools_and_last_message(self, make_service):
+        service = make_service()
+
+        confidence, features = service.classify(make_request())
+        assert confidence > 0.9
+        assert (features["tool_count"], features["last_message"], features["thinking"]) == (0, "text", False)
+
+        long_prompt, _ = service.classify(make_request("x" * 20000))
+        assert long_prompt == 0.0
+
+        many_tools, features = service.classify(make_request(tools=[{**TOOL, "name": f"tool_{i}"} for i in range(24)]))
+        assert features["tool_count"] == 24 and many_tools < 0.6
+
+        results = make_request([{"type": "tool_result", "tool_use_id": "t1", "content": "ok"}])
+        assert last_message_type(results) == "tool_result"
+        image = make_request([{"type": "image", "source": {"type": "base64", "media_type": "image/png", "data": "AA=="}}])
+        assert service.classify(image)[0] == 0.0
+
+    def test_tiers_confident_requests_when_on(self, make_service):
+        service = make_service()
+
+        request, decision = service.route(make_request())
+        assert request.model == f"openrouter/{CHEAP}"
+        assert (decision.tier, decision.requested_model) == ("cheap", f"openrouter/{BIG}")
+
+        request, decision = service.route(make_request(max_tokens=16000))
+        assert request.model == f"openrouter/{BIG}"
+        assert (decision.tier, decision.would_tier) == ("big", False)
+
+        stats = service.get_stats()
+        assert (stats["classified"], stats["tiered"], stats["kept"]) == (2, 1, 1)
+
+    def test_shadow_mode_only_logs_decisions(self, make_service):
+        service = make_service(mode="shadow")
+
+        request, decision = service.route(make_request())
+
+        assert request.model == f"openrouter/{BIG}"
+        assert (decision.tier, decision.would_tier) == ("big", True)
+        assert service.get_stats()["shadow_tiered"] == 1
+
+    def test_off_mode_and_other_models_are_left_alone(self, make_service):
+        original = make_request()
+        assert make_service(mode="off").route(original) == (original, None)
+
+        small = original.model_copy(update={"model": f"openrouter/{CHEAP}"})
+        assert make_service().route(small) == (small, None)
+
+        with pytest.raises(ValueError):
+            make_service(mode="sometimes")
+
+    def test_thresholds_are_configurable(self, make_service):
+        strict = make_service(thresholds={"min_confidence": 0.99})
+        _, decision = strict.route(make_request("Summarize " + "word " * 100))
+        assert decision.tier == "big"
+
+        lenient = make_service(thresholds={"max_prompt_tokens": 100000})
+        _, decision = lenient.route(make_request("x" * 20000))
+        assert decision.tier == "cheap"
+
+    def test_reports_latency_tokens_and_cost_per_tier(self, make_service):
+        service = make_service(mode="shadow", prices={BIG: [3.0, 15.0], CHEAP: [0.8, 4.0]})
+        _, shadow = service.route(make_request())
+        service.record(shadow, usage())
+        _, kept = service.route(make_request(max_tokens=16000))
+        service.record(kept, usage(2000, 1000))
+        service.record(None, usage())
+
+        tiers = service.get_tiers()["tiers"]
+        assert set(tiers) == {"big", "big_would_tier"}
+        assert tiers["big_would_tier"]["cost"] == pytest.approx(0.0045)
+        assert tiers["big"]["cost_per_request"] == pytest.approx(0.021)
+        assert (tiers["big"]["input_tokens"], tiers["big"]["output_tokens"]) == (2000, 1000)
+        assert tiers["big"]["latency_p95"] is not None
+
+        cheap = make_service(prices={CHEAP: [0.8, 4.0]})
+        _, decision = cheap.route(make_request())
+        cheap.record(decision, usage())
+        assert cheap.get_tiers()["tiers"]["cheap"]["cost"] == pytest.approx(0.0012)
+
+    @pytest.mark.asyncio
+    async def test_ledger_records_the_tiered_model(self, make_service, monkeypatch):
+        async def make_litellm_request(self, request_data, request_id, capture_debug=True):
+            return ModelResponse(model=request_data["model"], choices=[{
+                "index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "4"}
+            }], usage={"prompt_tokens": 5, "completion_tokens": 1, "total_tokens": 6})
+
+        recorded = []
+        monkeypatch.setattr(HTTPClientService, "make_litellm_request", make_litellm_request)
+        monkeypatch.setattr(message_workflows, "model_tiering_service", make_service())
+        monkeypatch.setattr(message_workflows, "usage_ledger_service",
+                            SimpleNamespace(record_response=lambda response, **fields: recorded.append(fields)))
+
+        await message_workflows.process_message_request.fn(request=make_request(), request_id="req-1")
+
+        assert recorded[0]["model"] == f"openrouter/{CHEAP}"
+        assert recorded[0]["requested_model"] == "claude-sonnet-4"
+        assert recorded[0]["source"] == "conversion"
@@ -0,0 +1,202 @@
+"""Unit tests for optimistic upstream dispatch."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from litellm.types.utils import ModelResponse
+
+from src.models.anthropic import MessagesRequest
+from src.services.http_client import HTTPClientService
+from src.services.optimistic_dispatch import OptimisticDispatchService
+from src.workflows import message_workflows
+
+
+def make_request(content="Hi"):
+    return MessagesRequest(model="claude-sonnet-4", max_tokens=64, messages=[{"role": "user", "content": content}])
+
+
+class Calls(list):
+    """Upstream requests, with an event set once the first was sent."""
+
+
+class Upstream:
+    """Upstream stand-in recording which requests were sent and which were cancelled."""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.sent = []
+        self.cancelled = []
+
+    async def __call__(self, request):
+        self.sent.append(request)
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(request)
+            raise
+        return f"response to {request.messages[0].content}"
+
+
+class TestOptimisticDispatch:
+    """Test overlapping, aborting and re-dispatching upstream calls."""
+
+    @pytest.mark.asyncio
+    async def test_upstream_call_overlaps_checks(self):
+        service = OptimisticDispatchService(enabled=True)
+        upstream = Upstream()
+        request = make_request()
+
+        async def checks(checked):
+            await asyncio.sleep(0.03)
+            assert upstream.sent == [checked]  # already in flight
+            return checked
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        sent, response = await service.run(request, upstream, checks)
+
+        assert (sent, response) == (request, "response to Hi")
+        assert loop.time() - start < 0.075  # not 0.03 + 0.05
+        stats = service.get_stats()
+        assert (stats["dispatched"], stats["aborted"], stats["redispatched"]) == (1, 0, 0)
+        assert stats["overlapped_ms"] >= 30
+
+    @pytest.mark.asyncio
+    async def test_failed_check_cancels_upstream_call(self):
+        service = OptimisticDispatchService(enabled=True)
+        upstream = Upstream()
+
+        async def checks(checked):
+            await asyncio.sleep(0)
+            raise ValueError("Request validation failed: empty message")
+
+        with pytest.raises(ValueError):
+            await service.run(make_request(), upstream, checks)
+
+        assert len(upstream.cancelled) == 1
+        assert service.get_stats()["aborted"] == 1
+
+    @pytest.mark.asyncio
+    async def test_changed_request_is_dispatched_again(self):
+        service = OptimisticDispatchService(enabled=True)
+        upstream = Upstream()
+        cleaned = make_request("Cleaned")
+
+        async def checks(checked):
+            await asyncio.sleep(0)
+            return cleaned
+
+        sent, response = await service.run(make_request(), upstream, checks)
+
+        assert (sent, response) == (cleaned, "response to Cleaned")
+        assert [r.messages[0].content for r in upstream.cancelled] == ["Hi"]
+        assert service.get_stats()["redispatched"] == 1
+
+    @pytest.mark.asyncio
+    async def test_abandoned_stream_is_closed(self):
+        service = OptimisticDispatchService(enabled=True)
+        closed = []
+
+        class RawStream:
+            async def close(self):
+                closed.append(True)
+
+        stream = SimpleNamespace(completion_stream=RawStream())
+
+        async def upstream(request):
+            return stream
+
+        async def checks(checked):
+            await asyncio.sleep(0.01)  # the stream has already come back
+            raise ValueError("Request validation failed: empty message")
+
+        with pytest.raises(ValueError):
+            await service.run(make_request(), upstream, checks)
+
+        assert closed == [True]
+
+
+class TestOptimisticWorkflow:
+    """Test the message workflow in optimistic mode."""
+
+    @pytest.fixture
+    def upstream_calls(self, monkeypatch):
+        calls = Calls()
+        calls.started = asyncio.Event()
+
+        async def make_litellm_request(self, request_data, request_id, capture_debug=True):
+            calls.append(request_data)
+            calls.started.set()
+            return ModelResponse(model=request_data["model"], choices=[{
+                "index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "Hello"}
+            }], usage={"prompt_tokens": 5, "completion_tokens": 1, "total_tokens": 6})
+
+        monkeypatch.setattr(HTTPClientService, "make_litellm_request", make_litellm_request)
+        monkeypatch.setattr(message_workflows, "optimistic_dispatch_service", OptimisticDispatchService(enabled=True))
+        return calls
+
+    @pytest.mark.asyncio
+    async def test_workflow_dispatches_before_checks_finish(self, monkeypatch, upstream_calls):
+        async def detect(request):
+            # Would time out in the serial pipeline, where detection runs before dispatch
+            await asyncio.wait_for(upstream_calls.started.wait(), timeout=10)
+            return request
+        monkeypatch.setattr(message_workflows.detect_and_clean_mixed_content_task, "fn", detect)
+
+        response = await message_workflows.process_message_request.fn(
+            request=make_request(), request_id="req-1", api_key="sk-test"
+        )
+
+        assert response["content"][0]["text"] == "Hello"
+        assert len(upstream_calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_workflow_rejects_invalid_request(self, monkeypatch, upstream_calls):
+        async def invalid(request):
+            raise ValueError("Request validation failed: bad message")
+        monkeypatch.setattr(message_workflows.message_validator, "avalidate_messages_request", invalid)
+
+        with pytest.raises(HTTPException) as error:
+            await message_workflows.process_message_request.fn(
+                request=make_request(), request_id="req-2", api_key="sk-test"
+            )
+
+        assert error.value.status_code == 400
+        assert message_workflows.optimistic_dispatch_service.get_stats()["aborted"] == 1
+
+    @pytest.mark.asyncio
+    async def test_cleaned_request_is_validated_before_redispatch(self, monkeypatch, upstream_calls):
+        cleaned = make_request("Cleaned")
+        validated = []
+
+        async def clean(request):
+            return cleaned
+
+        async def validate(request):
+            validated.append(request)
+            return request
+
+        monkeypatch.setattr(message_workflows.detect_and_clean_mixed_content_task, "fn", clean)
+        monkeypatch.setattr(message_workflows.message_validator, "avalidate_messages_request", validate)
+
+        await message_workflows.process_message_request.fn(
+            request=make_request(), request_id="req-3", api_key="sk-test"
+        )
+
+        assert validated == [cleaned]
+        assert upstream_calls[-1]["messages"][-1]["content"] == "Cleaned"
+
+    @pytest.mark.asyncio
+    async def test_request_returned_by_validation_is_sent(self, monkeypatch, upstream_calls):
+        async def validate(request):
+            return make_request("Validated")
+
+        monkeypatch.setattr(message_workflows.message_validator, "avalidate_messages_request", validate)
+
+        await message_workflows.process_message_request.fn(
+            request=make_request(), request_id="req-4", api_key="sk-test"
+        )
+
+        assert upstream_calls[-1]["messages"][-1]["content"] == "Validated"
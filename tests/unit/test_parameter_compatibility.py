@@ -0,0 +1,145 @@
+"""Unit tests for per-model parameter compatibility."""
+
+import litellm
+import pytest
+
+import src.services as services
+from src.flows.conversion.anthropic_to_litellm_flow import AnthropicToLiteLLMFlow
+from src.models.anthropic import MessagesRequest
+from src.services.http_client import HTTPClientService
+from src.services.parameter_compatibility import DEFAULT_CAPABILITIES, ParameterCompatibilityService
+
+TOOLS = [{"type": "function", "function": {"name": "get_weather", "parameters": {"type": "object"}}}]
+
+
+SERVICE_CLASS = ParameterCompatibilityService
+SERVICE_DEFAULTS = {"enabled": True, "overrides": {}}
+
+
+def request_data(model, **kwargs):
+    return {"model": model, "max_tokens": 100, "messages": [{"role": "user", "content": "Hi"}], **kwargs}
+
+
+def rejection(message):
+    return litellm.BadRequestError(message, model="openrouter/openai/gpt-4o", llm_provider="openrouter")
+
+
+class TestParameterCompatibility:
+    """Test capability lookup, normalization and learned rejections."""
+
+    def test_looks_up_capabilities_by_longest_family_prefix(self, make_service):
+        service = make_service()
+        assert service.get_capabilities("openrouter/openai/gpt-4o-2024-08-06").top_k is False
+        assert service.get_capabilities("openrouter/openai/o1-mini").tools is False
+        assert service.get_capabilities("openrouter/anthropic/claude-sonnet-4.5").temperature_with_top_p is False
+        assert service.get_capabilities("openrouter/anthropic/claude-sonnet-4").temperature_with_top_p is True
+        assert service.get_capabilities("openrouter/unknown/model") is DEFAULT_CAPABILITIES
+
+    def test_drops_clamps_and_translates_parameters(self, make_service):
+        service = make_service()
+        data = request_data("openrouter/openai/gpt-4o", temperature=2.5, top_k=40,
+                            stop=["a", "b", "c", "d", "e", "f"], tools=TOOLS, tool_choice="required")
+
+        changes = service.normalize(data)
+
+        assert (data["temperature"], "top_k" in data, data["stop"]) == (2.0, False, ["a", "b", "c", "d"])
+        assert data["tool_choice"] == "required"
+        assert changes == ["temperature: clamped (2.5 -> 2.0)", "top_k: dropped (unsupported)",
+                           "stop: clamped (6 -> 4 sequences)"]
+
+        data = request_data("openrouter/openai/o3-mini", temperature=0.2, top_p=0.9, stop=["END"])
+        service.normalize(data)
+        assert not {"temperature", "top_p", "stop"} & set(data)
+
+        stats = service.get_stats()
+        assert (stats["requests"], stats["normalized_requests"], stats["dropped"], stats["clamped"]) == (2, 2, 4, 2)
+        assert stats["models"]["openai/o3-mini"] == {"temperature_dropped": 1, "top_p_dropped": 1, "stop_dropped": 1}
+
+    def test_fits_tool_choice_and_exclusive_sampling(self, make_service):
+        service = make_service(overrides={"meta-llama/llama-3.3": {"tool_choices": ["auto", "none"]}})
+
+        data = request_data("openrouter/meta-llama/llama-3.3-70b-instruct", tools=TOOLS,
+                            tool_choice={"type": "function", "function": {"name": "get_weather"}})
+        assert service.normalize(data) == ["tool_choice: translated (function -> auto)"]
+        assert data["tool_choice"] == "auto"
+
+        data = request_data("openrouter/openai/o1-mini", tools=TOOLS, tool_choice="auto")
+        service.normalize(data)
+        assert "tools" not in data and "tool_choice" not in data
+
+        data = request_data("openrouter/anthropic/claude-sonnet-4.5", temperature=1.0, top_p=0.8)
+        service.normalize(data)
+        assert data.get("temperature") is None and data["top_p"] == 0.8
+
+    def test_learns_rejected_parameters(self, make_service):
+        service = make_service()
+        data = request_data("openrouter/openai/gpt-4o", temperature=0.5, top_p=0.9)
+
+        assert service.learn_rejection(data, rejection("Unsupported parameter: 'top_p' is not supported")) == ["top_p"]
+        assert "top_p" not in data
+        assert service.learn_rejection(data, rejection("Invalid message: content must not be empty")) == []
+
+        later = request_data("openrouter/openai/gpt-4o-mini", top_p=0.9)
+        service.normalize(later)
+        assert "top_p" in later  # learned for gpt-4o only
+        later = request_data("openrouter/openai/gpt-4o", top_p=0.9)
+        assert service.normalize(later) == ["top_p: dropped (rejected upstream)"]
+        assert service.get_stats()["learned_rejections"] == {"openai/gpt-4o": ["top_p"]}
+
+    def test_learns_only_rejections_that_name_a_sampling_parameter(self, make_service):
+        service = make_service()
+        data = request_data("openrouter/anthropic/claude-sonnet-4", tools=TOOLS, tool_choice="auto", stop=["END"])
+
+        assert service.learn_rejection(data, rejection("Invalid schema in tools: 'format' not supported")) == []
+        assert service.learn_rejection(data, rejection("Stop reason not supported for tool_choice")) == []
+        assert {"tools", "tool_choice", "stop"} <= set(data)
+
+        o1 = request_data("openrouter/openai/o1", temperature=0.2)
+        message = "Unsupported value: 'temperature' does not support 0.2 with this model."
+        assert service.learn_rejection(o1, rejection(message)) == ["temperature"]
+
+    def test_learned_rejections_expire(self, make_service, monkeypatch):
+        service = make_service(rejection_ttl=60)
+        clock = [1000.0]
+        monkeypatch.setattr("src.services.parameter_compatibility.time.monotonic", lambda: clock[0])
+
+        model = "openrouter/mistralai/mistral-large"
+        service.learn_rejection(request_data(model, top_k=40),
+                                rejection("Unrecognized request argument supplied: top_k"))
+        assert service.normalize(request_data(model, top_k=40)) == ["top_k: dropped (rejected upstream)"]
+
+        clock[0] += 61
+        later = request_data(model, top_k=40)
+        assert service.normalize(later) == []
+        assert later["top_k"] == 40
+        assert service.get_stats()["learned_rejections"] == {}
+
+    def test_conversion_drops_tool_choice_without_tools(self, make_service, monkeypatch):
+        monkeypatch.setattr(services, "parameter_compatibility_service", make_service())
+        request = MessagesRequest(model="claude-3-5-haiku-20241022", max_tokens=64,
+                                  messages=[{"role": "user", "content": "Hi"}], tool_choice={"type": "any"})
+
+        result = AnthropicToLiteLLMFlow().convert(request)
+
+        assert result.success
+        assert "tool_choice" not in result.converted_data
+        assert result.metadata["parameter_normalizations"] == ["tool_choice: dropped (no tools)"]
+
+    @pytest.mark.asyncio
+    async def test_upstream_rejection_is_retried_without_parameter(self, make_service, monkeypatch):
+        monkeypatch.setattr(services, "parameter_compatibility_service", make_service())
+        sent = []
+
+        async def attempt(self, request_config):
+            sent.append(dict(request_config))
+            if "top_k" in request_config:
+                raise rejection("top_k: unrecognized request argument supplied")
+            return "response"
+        monkeypatch.setattr(HTTPClientService, "_attempt_upstream_call", attempt)
+
+        response = await HTTPClientService().make_litellm_request(
+            request_data("openrouter/openai/gpt-4o", top_k=40), "req-1", capture_debug=False
+        )
+
+        assert response == "response"
+        assert ["top_k" in data for data in sent] == [True, False]
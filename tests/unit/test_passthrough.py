@@ -0,0 +1,185 @@
+"""Unit tests for native passthrough to Anthropic-compatible upstreams."""
+
+import json
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from src.middleware.passthrough_middleware import PassthroughMiddleware
+from src.services.passthrough import (
+    PassthroughRoute,
+    PassthroughService,
+    UsageMeter,
+    find_top_level_model
+)
+
+SSE_BODY = (
+    b'event: message_start\n'
+    b'data: {"type":"message_start","message":{"id":"msg_1","usage":{"input_tokens":12,"output_tokens":1}}}\n\n'
+    b'event: content_block_delta\n'
+    b'data: {"type":"content_block_delta","index":0,"delta":{"type":"text_delta","text":"Hi"}}\n\n'
+    b'event: message_delta\n'
+    b'data: {"type":"message_delta","delta":{"stop_reason":"end_turn"},"usage":{"output_tokens":7}}\n\n'
+)
+
+
+class ChunkedStream(httpx.AsyncByteStream):
+    """Response body delivered in small chunks, like a real network stream."""
+
+    def __init__(self, body: bytes, chunk_size: int = 16):
+        self.chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+class FakeUpstream:
+    """Records forwarded requests and answers like the Anthropic API."""
+
+    def __init__(self):
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if json.loads(request.content).get("stream"):
+            return httpx.Response(200, stream=ChunkedStream(SSE_BODY), headers={"content-type": "text/event-stream"})
+        body = json.dumps({
+            "id": "msg_1", "type": "message", "role": "assistant",
+            "content": [{"type": "text", "text": "Hi"}],
+            "usage": {"input_tokens": 12, "output_tokens": 7}
+        }).encode()
+        return httpx.Response(200, stream=ChunkedStream(body), headers={
+            "content-type": "application/json", "request-id": "req_upstream"
+        })
+
+
+@pytest.fixture
+def upstream():
+    return FakeUpstream()
+
+
+@pytest.fixture
+def service(upstream):
+    route = PassthroughRoute(
+        name="anthropic",
+        base_url="https://upstream.test",
+        models=["claude-*"],
+        api_key="sk-route",
+        model_map={"claude-sonnet-4": "claude-sonnet-4-20250514"}
+    )
+    return PassthroughService(routes=[route], client=httpx.AsyncClient(transport=httpx.MockTransport(upstream)))
+
+
+@pytest.fixture
+def client(service):
+    app = FastAPI()
+    app.add_middleware(PassthroughMiddleware, service=service)
+
+    @app.post("/v1/messages")
+    async def converted(request: Request):
+        return {"path": "converted"}
+
+    return TestClient(app)
+
+
+class TestFindTopLevelModel:
+    """Test locating the model without parsing the body."""
+
+    def test_skips_nested_model_keys(self):
+        body = json.dumps({
+            "messages": [{"role": "assistant", "content": [
+                {"type": "tool_use", "id": "t1", "name": "Set", "input": {"model": "nested"}}
+            ]}],
+            "model": "claude-sonnet-4",
+            "system": "say \"model\": \"fake\""
+        }).encode()
+
+        start, end, model = find_top_level_model(body)
+        assert model == "claude-sonnet-4"
+        assert body[start:end] == b'"claude-sonnet-4"'
+
+    def test_missing_model(self):
+        assert find_top_level_model(b'{"messages": []}') is None
+
+
+class TestPassthroughMiddleware:
+    """Test routing, rewriting and streaming."""
+
+    def test_forwards_bytes_with_model_mapping_and_header_rewrite(self, client, upstream, service):
+        exchanges = []
+        service.add_hook(exchanges.append)
+        body = b'{"model": "claude-sonnet-4", "max_tokens": 10, "messages": [{"role": "user", "content": "hi"}]}'
+
+        response = client.post("/v1/messages", content=body, headers={
+            "x-api-key": "client-key", "anthropic-beta": "tools-2024", "content-type": "application/json"
+        })
+
+        assert response.status_code == 200
+        assert response.json()["content"][0]["text"] == "Hi"
+        assert response.headers["request-id"] == "req_upstream"
+
+        forwarded = upstream.requests[0]
+        assert str(forwarded.url) == "https://upstream.test/v1/messages"
+        assert forwarded.content == body.replace(b'"claude-sonnet-4"', b'"claude-sonnet-4-20250514"')
+        assert forwarded.headers["x-api-key"] == "sk-route"
+        assert forwarded.headers["anthropic-beta"] == "tools-2024"
+        assert forwarded.headers["anthropic-version"] == "2023-06-01"
+
+        assert exchanges[0].upstream_model == "claude-sonnet-4-20250514"
+        assert exchanges[0].usage == {"input_tokens": 12, "output_tokens": 7}
+        assert exchanges[0].response_bytes == len(response.content)
+
+    def test_streams_sse_and_meters_usage(self, client, service):
+        exchanges = []
+        service.add_hook(exchanges.append)
+
+        response = client.post("/v1/messages", json={
+            "model": "claude-3-5-haiku", "max_tokens": 10, "stream": True,
+            "messages": [{"role": "user", "content": "hi"}]
+        })
+
+        assert response.content == SSE_BODY
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert exchanges[0].usage == {"input_tokens": 12, "output_tokens": 7}
+
+    def test_unrouted_model_uses_normal_pipeline(self, client, upstream):
+        response = client.post("/v1/messages", json={"model": "gpt-4o", "max_tokens": 10, "messages": []})
+
+        assert response.json() == {"path": "converted"}
+        assert upstream.requests == []
+
+    def test_upstream_failure_returns_anthropic_error(self):
+        def refuse(request):
+            raise httpx.ConnectError("refused")
+
+        route = PassthroughRoute(name="down", base_url="https://down.test", models=["*"])
+        service = PassthroughService(routes=[route], client=httpx.AsyncClient(transport=httpx.MockTransport(refuse)))
+        app = FastAPI()
+        app.add_middleware(PassthroughMiddleware, service=service)
+
+        response = TestClient(app).post("/v1/messages", json={"model": "claude-x", "messages": []})
+
+        assert response.status_code == 502
+        assert response.json()["error"]["type"] == "api_error"
+
+
+class TestUsageMeter:
+    """Test usage extraction across chunk boundaries."""
+
+    def test_event_stream_split_across_chunks(self):
+        meter = UsageMeter(event_stream=True)
+        for i in range(0, len(SSE_BODY), 7):
+            meter.feed(SSE_BODY[i:i + 7])
+        assert meter.finish() == {"input_tokens": 12, "output_tokens": 7}
+
+    def test_json_body_keeps_only_tail(self):
+        meter = UsageMeter(event_stream=False)
+        body = json.dumps({"content": [{"type": "text", "text": "x" * 100000}],
+                           "usage": {"input_tokens": 3, "output_tokens": 4}}).encode()
+        for i in range(0, len(body), 8192):
+            meter.feed(body[i:i + 8192])
+        assert len(meter._buffer) <= UsageMeter.JSON_TAIL_BYTES
+        assert meter.finish() == {"input_tokens": 3, "output_tokens": 4}
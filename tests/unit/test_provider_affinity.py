@@ -0,0 +1,166 @@
+"""Unit tests for conversation-affinity provider routing."""
+
+import gc
+from types import SimpleNamespace
+
+import litellm
+import pytest
+from litellm.types.utils import ModelResponse
+
+from src.services.provider_affinity import ProviderAffinityService, session_key
+
+MODEL = "openrouter/anthropic/claude-sonnet-4"
+PROVIDERS = ["Anthropic", "Amazon Bedrock", "Google"]
+
+
+def turns(*contents, system="You are helpful"):
+    messages = [{"role": "system", "content": system}]
+    for index, content in enumerate(contents):
+        messages.append({"role": "user" if index % 2 == 0 else "assistant", "content": content})
+    return {"model": MODEL, "max_tokens": 100, "messages": messages}
+
+
+def response(provider=None, prompt_tokens=1000, cached_tokens=0):
+    result = ModelResponse(model=MODEL, usage={"prompt_tokens": prompt_tokens, "completion_tokens": 5,
+                                               "total_tokens": prompt_tokens + 5,
+                                               "prompt_tokens_details": {"cached_tokens": cached_tokens}})
+    if provider:
+        result.provider = provider
+    return result
+
+
+async def stream_chunks(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def stream_chunk(provider=None, usage=None):
+    return SimpleNamespace(provider=provider, usage=usage, choices=[])
+
+
+def server_error():
+    return litellm.InternalServerError("Provider down", llm_provider="openrouter", model=MODEL)
+
+
+SERVICE_CLASS = ProviderAffinityService
+SERVICE_DEFAULTS = {"enabled": True, "providers": {"anthropic/claude": PROVIDERS}, "session_ttl": 3600}
+
+
+def pinned_provider(data):
+    return data["extra_body"]["provider"]["order"][0]
+
+
+class TestProviderAffinity:
+    """Test session keys, pinning, fallback and cache reporting."""
+
+    def test_session_key_is_stable_across_turns(self):
+        first = turns("Plan a trip to Lisbon")
+        later = turns("Plan a trip to Lisbon", "Sure, when?", "In May")
+        other = turns("Plan a trip to Porto")
+
+        assert session_key(first) == session_key(later)
+        assert session_key(first) != session_key(other)
+        assert session_key(first) != session_key({**first, "model": "openrouter/openai/gpt-4o"})
+
+    def test_pins_every_turn_of_a_conversation_to_one_provider(self, make_service):
+        service = make_service()
+        providers = set()
+        for history in (("Plan a trip",), ("Plan a trip", "Sure", "In May"), ("Plan a trip", "Sure", "In May", "Ok", "Go")):
+            data = turns(*history)
+            service.complete(service.pin(data), response())
+            providers.add(pinned_provider(data))
+            assert data["extra_body"]["provider"]["allow_fallbacks"] is True
+
+        assert len(providers) == 1
+        spread = set()
+        for index in range(30):
+            data = turns(f"Conversation {index}")
+            service.pin(data)
+            spread.add(pinned_provider(data))
+        assert spread == set(PROVIDERS)
+
+    def test_falls_back_when_pinned_provider_fails(self, make_service):
+        service = make_service()
+        data = turns("Plan a trip")
+        ticket = service.pin(data)
+        first = pinned_provider(data)
+
+        service.failed(ticket, server_error())
+        retry = turns("Plan a trip")
+        service.pin(retry)
+
+        assert pinned_provider(retry) != first
+        stats = service.get_stats()
+        assert stats["pin_failures"] == 1
+        assert stats["cooling_providers"] == [f"anthropic/claude-sonnet-4:{first}"]
+
+        # Client errors say nothing about the provider
+        service.failed(service.pin(turns("Other")), litellm.BadRequestError("bad", model=MODEL, llm_provider="openrouter"))
+        assert service.get_stats()["pin_failures"] == 1
+
+    def test_learns_and_repins_from_serving_provider(self, make_service):
+        service = make_service(providers={})
+        data = turns("Plan a trip")
+        ticket = service.pin(data)
+        assert ticket.provider is None and "extra_body" not in data
+        service.complete(ticket, response(provider="Anthropic"))
+
+        data = turns("Plan a trip", "Sure", "In May")
+        ticket = service.pin(data)
+        assert pinned_provider(data) == "Anthropic"
+
+        # OpenRouter fell back to another provider: the session follows the warm cache
+        service.complete(ticket, response(provider="Google"))
+        data = turns("Plan a trip", "Sure", "In May", "Ok", "Go")
+        service.pin(data)
+        assert pinned_provider(data) == "Google"
+        assert service.get_stats()["fallbacks"] == 1
+
+    @pytest.mark.asyncio
+    async def test_learns_from_client_stream_chunks_once_consumed(self, make_service, stream_wrapper):
+        service = make_service(providers={})
+        ticket = service.pin(turns("Plan a trip"))
+        stream = stream_wrapper(stream_chunks([
+            stream_chunk("Anthropic"), stream_chunk("Anthropic"),
+            stream_chunk("Anthropic", usage={"prompt_tokens": 1000, "prompt_tokens_details": {"cached_tokens": 600}})
+        ]))
+        service.complete(ticket, stream)
+        assert ticket.session.turns == 0
+
+        [chunk async for chunk in stream.completion_stream]
+        [session] = service.get_sessions()
+        assert (session["turns"], session["prompt_tokens"], session["cache_read_tokens"]) == (1, 1000, 600)
+
+        data = turns("Plan a trip", "Sure", "In May")
+        service.pin(data)
+        assert pinned_provider(data) == "Anthropic"
+
+    def test_records_an_abandoned_client_stream(self, make_service, stream_wrapper):
+        service = make_service(providers={})
+        ticket = service.pin(turns("Plan a trip"))
+        stream = stream_wrapper(stream_chunks([stream_chunk("Anthropic")]))
+        service.complete(ticket, stream)
+        del stream
+        gc.collect()
+
+        assert ticket.session.turns == 1
+        assert ticket.session.provider is None
+
+    def test_reports_cache_reads_per_session(self, make_service):
+        service = make_service()
+        service.complete(service.pin(turns("Plan a trip")), response(cached_tokens=0))
+        service.complete(service.pin(turns("Plan a trip", "Sure", "In May")), response(cached_tokens=900))
+
+        [session] = service.get_sessions()
+        assert (session["turns"], session["prompt_tokens"], session["cache_read_tokens"]) == (2, 2000, 900)
+        assert session["cache_hit_ratio"] == 0.45
+        stats = service.get_stats()
+        assert (stats["pinned_requests"], stats["pinned_cache_hit_ratio"]) == (2, 0.45)
+
+    def test_disabled_service_leaves_requests_alone(self, make_service):
+        service = make_service(enabled=False)
+        data = turns("Plan a trip")
+        assert service.pin(data) is None
+        assert "extra_body" not in data
+        service.complete(None, response())
+        service.failed(None, server_error())
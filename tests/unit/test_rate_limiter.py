@@ -0,0 +1,128 @@
+"""Unit tests for per-client token-bucket rate limiting."""
+
+from collections import OrderedDict
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from src.middleware.rate_limit_middleware import RateLimitMiddleware
+from src.services.rate_limiter import UNKNOWN_LENGTH_TOKENS, RateLimiterService
+from src.tasks.tool_execution.metrics_tasks import check_rate_limit
+
+
+SERVICE_CLASS = RateLimiterService
+SERVICE_DEFAULTS = {"enabled": True, "requests_per_minute": 3, "tokens_per_minute": 1000, "max_clients": 100}
+
+
+class TestRateLimiterService:
+    """Test bucket accounting."""
+
+    def test_request_bucket_rejects_then_refills(self, make_service):
+        service = make_service(requests_per_minute=3)
+
+        assert all(service.check("a", now=0.0).allowed for _ in range(3))
+        decision = service.check("a", now=0.0)
+        assert not decision.allowed
+        assert decision.limit_type == "requests"
+        assert decision.retry_after == pytest.approx(20.0)
+        assert decision.retry_after_header == "20"
+
+        # One request refills every 20 seconds
+        assert service.check("a", now=20.0).allowed
+        assert not service.check("a", now=20.0).allowed
+
+    def test_token_bucket_does_not_spend_request_slot(self, make_service):
+        service = make_service(requests_per_minute=10, tokens_per_minute=1000)
+
+        assert service.check("a", tokens=900, now=0.0).allowed
+        decision = service.check("a", tokens=200, now=0.0)
+        assert not decision.allowed
+        assert decision.limit_type == "tokens"
+        assert decision.requests_remaining == 9
+        # Oversized requests only need a full bucket, so they are never starved
+        assert service.check("b", tokens=5000, now=0.0).allowed
+
+    def test_clients_are_isolated_and_evicted(self, make_service):
+        service = make_service(requests_per_minute=1, max_clients=2)
+
+        assert service.check("a", now=0.0).allowed
+        assert service.check("b", now=0.0).allowed
+        assert not service.check("a", now=0.0).allowed
+        assert service.check("c", now=0.0).allowed  # evicts b, the least recent
+
+        assert service.get_stats()["tracked_clients"] == 2
+        assert service.get_stats()["evicted_clients"] == 1
+
+    def test_client_key_hashes_api_keys(self):
+        key = RateLimiterService.client_key({"x-api-key": "sk-secret"}, "10.0.0.1")
+        bearer = RateLimiterService.client_key({"authorization": "Bearer sk-secret"}, "10.0.0.1")
+
+        assert key == bearer
+        assert key.startswith("key:") and "sk-secret" not in key
+        assert RateLimiterService.client_key({}, "10.0.0.1") == "ip:10.0.0.1"
+
+    def test_request_without_content_length_is_charged_a_default(self):
+        assert RateLimiterService.estimate_tokens("4000") == 1000
+        assert RateLimiterService.estimate_tokens(None) == UNKNOWN_LENGTH_TOKENS
+        assert RateLimiterService.estimate_tokens("chunked") == UNKNOWN_LENGTH_TOKENS
+
+
+class TestRateLimitMiddleware:
+    """Test rejected requests get Anthropic-style errors."""
+
+    def test_rejects_with_rate_limit_error(self, make_service):
+        app = FastAPI()
+        app.add_middleware(RateLimitMiddleware, service=make_service(requests_per_minute=1))
+
+        @app.post("/v1/messages")
+        async def messages():
+            return {"ok": True}
+
+        client = TestClient(app)
+        headers = {"x-api-key": "sk-test"}
+
+        assert client.post("/v1/messages", json={}, headers=headers).status_code == 200
+        response = client.post("/v1/messages", json={}, headers=headers)
+
+        assert response.status_code == 429
+        assert int(response.headers["retry-after"]) >= 1
+        assert response.json()["error"]["type"] == "rate_limit_error"
+        # Another client is unaffected
+        assert client.post("/v1/messages", json={}, headers={"x-api-key": "sk-other"}).status_code == 200
+
+    def test_batches_are_charged_per_item(self, make_service):
+        app = FastAPI()
+        app.add_middleware(RateLimitMiddleware, service=make_service(requests_per_minute=5, tokens_per_minute=100000))
+
+        @app.post("/v1/messages/batches")
+        async def batches(request: Request):
+            return {"items": len((await request.json())["requests"])}
+
+        client = TestClient(app)
+        headers = {"x-api-key": "sk-test"}
+        batch = {"requests": [{"custom_id": str(i), "params": {}} for i in range(3)]}
+
+        # The route still sees the body the middleware read
+        assert client.post("/v1/messages/batches", json=batch, headers=headers).json() == {"items": 3}
+        assert client.post("/v1/messages/batches", json=batch, headers=headers).status_code == 429
+        assert client.post("/v1/messages/batches", json={"requests": batch["requests"][:2]},
+                           headers=headers).status_code == 200
+
+
+class TestToolRateLimit:
+    """Test the tool execution window evicts expired entries from the front."""
+
+    def test_expired_entries_evicted(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr("src.tasks.tool_execution.metrics_tasks.time.time", lambda: now[0])
+        tracker = OrderedDict()
+
+        assert check_rate_limit(tracker, "r1", rate_limit_window=60, rate_limit_max_requests=2)
+        now[0] += 30
+        assert check_rate_limit(tracker, "r2", rate_limit_window=60, rate_limit_max_requests=2)
+        assert not check_rate_limit(tracker, "r3", rate_limit_window=60, rate_limit_max_requests=2)
+
+        now[0] += 31  # r1 expired, r2 still in window
+        assert check_rate_limit(tracker, "r4", rate_limit_window=60, rate_limit_max_requests=2)
+        assert list(tracker) == ["r2", "r4"]
@@ -0,0 +1,195 @@
+"""Unit tests for priority request lanes and the lightweight pipeline profile."""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from src.models.anthropic import Message, MessagesRequest
+from src.services.request_lanes import (
+    BACKGROUND_LANE,
+    MAIN_LANE,
+    RequestLaneService,
+    get_pipeline_profile
+)
+from src.workflows import message_workflows
+
+
+def make_request(model):
+    return MessagesRequest(model=model, max_tokens=16, messages=[Message(role="user", content="hi")])
+
+
+SERVICE_CLASS = RequestLaneService
+SERVICE_DEFAULTS = {"enabled": True, "max_concurrent": 4, "background_max_concurrent": 2,
+                    "background_reserved_slots": 1, "background_model_patterns": ["*haiku*", "small"],
+                    "max_queue_wait": 0}
+
+
+async def hold(service, lane, started, release, order=None, name=None):
+    """Occupy a slot in a lane until release is set."""
+    async with service.admit(lane):
+        if order is not None:
+            order.append(name)
+        started.set()
+        await release.wait()
+
+
+class TestClassification:
+    """Test requests are routed to lanes by model name."""
+
+    def test_small_models_use_background_lane(self, make_service):
+        service = make_service()
+
+        assert service.classify(make_request("claude-3-5-haiku-20241022")).name == BACKGROUND_LANE
+        assert service.classify(make_request("small")).name == BACKGROUND_LANE
+        assert service.classify(make_request("claude-sonnet-4-20250514")).name == MAIN_LANE
+
+    def test_background_lane_uses_lightweight_profile(self, make_service):
+        profile = make_service().lanes[BACKGROUND_LANE].profile
+
+        assert profile.name == "lightweight"
+        assert not profile.mixed_content_detection
+        assert not profile.debug_capture
+        assert get_pipeline_profile("unknown").name == "full"
+
+
+class TestAdmission:
+    """Test lane pools, reserved slots and priority."""
+
+    @pytest.mark.asyncio
+    async def test_background_admitted_while_main_lane_saturated(self, make_service):
+        service = make_service(max_concurrent=4, background_reserved_slots=1)
+        main, background = service.lanes[MAIN_LANE], service.lanes[BACKGROUND_LANE]
+        release = asyncio.Event()
+        holders = []
+        for _ in range(3):
+            started = asyncio.Event()
+            holders.append(asyncio.ensure_future(hold(service, main, started, release)))
+            await started.wait()
+
+        queued_started = asyncio.Event()
+        queued = asyncio.ensure_future(hold(service, main, queued_started, release))
+        await asyncio.sleep(0.01)
+        assert not queued_started.is_set()
+
+        async with service.admit(background):
+            assert service.get_stats()["lanes"][BACKGROUND_LANE]["active"] == 1
+
+        release.set()
+        await asyncio.gather(queued, *holders)
+        stats = service.get_stats()
+        assert stats["active"] == 0
+        assert stats["lanes"][MAIN_LANE]["queued"] == 1
+        assert stats["lanes"][BACKGROUND_LANE]["queued"] == 0
+
+    @pytest.mark.asyncio
+    async def test_freed_slot_goes_to_background_first(self, make_service):
+        service = make_service(max_concurrent=2, background_reserved_slots=0, background_max_concurrent=2)
+        main, background = service.lanes[MAIN_LANE], service.lanes[BACKGROUND_LANE]
+        first_release, release = asyncio.Event(), asyncio.Event()
+        order = []
+
+        started = asyncio.Event()
+        first = asyncio.ensure_future(hold(service, main, started, first_release))
+        await started.wait()
+        started = asyncio.Event()
+        second = asyncio.ensure_future(hold(service, main, started, release))
+        await started.wait()
+
+        waiting = [
+            asyncio.ensure_future(hold(service, main, asyncio.Event(), release, order, "main")),
+            asyncio.ensure_future(hold(service, background, asyncio.Event(), release, order, "background"))
+        ]
+        await asyncio.sleep(0.01)
+        assert order == []
+
+        first_release.set()
+        await first
+        await asyncio.sleep(0.01)
+        assert order == ["background"]
+
+        release.set()
+        await asyncio.gather(second, *waiting)
+        assert order == ["background", "main"]
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_leaves_queue(self, make_service):
+        service = make_service(max_concurrent=1, background_reserved_slots=0)
+        main = service.lanes[MAIN_LANE]
+        release = asyncio.Event()
+        started = asyncio.Event()
+        holder = asyncio.ensure_future(hold(service, main, started, release))
+        await started.wait()
+
+        queued = asyncio.ensure_future(hold(service, main, asyncio.Event(), release))
+        await asyncio.sleep(0.01)
+        assert service.oldest_wait_ms() >= 10
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        assert service.oldest_wait_ms() == 0.0
+
+        release.set()
+        await holder
+        assert service.get_stats()["active"] == 0
+        assert service.get_stats()["lanes"][MAIN_LANE]["waiting"] == 0
+
+    @pytest.mark.asyncio
+    async def test_queue_wait_is_bounded(self, make_service):
+        service = make_service(max_concurrent=1, background_reserved_slots=0, max_queue_wait=0.02)
+        main = service.lanes[MAIN_LANE]
+        release = asyncio.Event()
+        started = asyncio.Event()
+        holder = asyncio.ensure_future(hold(service, main, started, release))
+        await started.wait()
+
+        with pytest.raises(HTTPException) as exc:
+            async with service.admit(main):
+                pass
+        assert exc.value.status_code == 529
+        stats = service.get_stats()["lanes"][MAIN_LANE]
+        assert (stats["timed_out"], stats["waiting"]) == (1, 0)
+
+        # The slot goes to the next request, not to the one turned away
+        release.set()
+        await holder
+        async with service.admit(main):
+            assert service.get_stats()["active"] == 1
+        assert service.get_stats()["active"] == 0
+
+    @pytest.mark.asyncio
+    async def test_stream_holds_its_slot_until_consumed(self, make_service, stream_wrapper):
+        service = make_service(max_concurrent=1, background_reserved_slots=0)
+        main = service.lanes[MAIN_LANE]
+
+        async def chunks():
+            yield "a"
+        stream = stream_wrapper(chunks())
+        await service.acquire(main)
+        service.release_after_stream(main, stream)
+        assert service.get_stats()["active"] == 1
+
+        assert [chunk async for chunk in stream.completion_stream] == ["a"]
+        assert service.get_stats()["active"] == 0
+
+        await service.acquire(main)
+        service.release_after_stream(main, object())
+        assert service.get_stats()["active"] == 0
+
+
+class TestLightweightPipeline:
+    """Test the lightweight profile skips mixed content detection."""
+
+    @pytest.mark.asyncio
+    async def test_mixed_content_detection_skipped(self, monkeypatch):
+        async def fail(request):
+            raise AssertionError("mixed content detection should be skipped")
+
+        monkeypatch.setattr(message_workflows, "detect_and_clean_mixed_content_task", fail)
+        request = make_request("claude-3-5-haiku-20241022")
+
+        result = await message_workflows.create_conversation_context_task.fn(
+            request=request, request_id="req-1", detect_mixed_content=False
+        )
+
+        assert result["cleaned_request"] is request
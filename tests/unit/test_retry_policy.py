@@ -0,0 +1,135 @@
+"""Unit tests for the upstream retry policy."""
+
+import asyncio
+
+import httpx
+import litellm
+import pytest
+
+from src.services.retry_policy import RetryPolicyService, classify_error, retry_after_seconds
+
+MODEL = "openrouter/anthropic/claude-sonnet-4"
+FAST = {"max_attempts": 3, "base_delay": 0.0, "max_delay": 1.0}
+
+
+def rate_limited(headers=None):
+    response = httpx.Response(429, headers=headers or {}, request=httpx.Request("POST", "http://upstream"))
+    return litellm.RateLimitError("Rate limited", llm_provider="openrouter", model=MODEL, response=response)
+
+
+def server_error():
+    response = httpx.Response(502, request=httpx.Request("POST", "http://upstream"))
+    return litellm.InternalServerError("Bad gateway", llm_provider="openrouter", model=MODEL, response=response)
+
+
+def upstream(*outcomes):
+    """Upstream call stand-in raising or returning the given outcomes in turn."""
+    calls = []
+
+    async def call():
+        calls.append(len(calls))
+        outcome = outcomes[len(calls) - 1]
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+    call.calls = calls
+    return call
+
+
+SERVICE_CLASS = RetryPolicyService
+SERVICE_DEFAULTS = {
+    "enabled": True,
+    "policies": {error_class: FAST for error_class in ("rate_limit", "server_error", "connection", "timeout")},
+    "budget_ratio": 0.2,
+    "budget_min_per_second": 1.0
+}
+
+
+class TestRetryPolicy:
+    """Test error classification, retry decisions, budget and attribution."""
+
+    def test_classifies_upstream_errors(self):
+        assert classify_error(rate_limited()) == "rate_limit"
+        assert classify_error(server_error()) == "server_error"
+        assert classify_error(litellm.APIConnectionError("reset", llm_provider="openrouter", model=MODEL)) == "connection"
+        assert classify_error(ConnectionResetError()) == "connection"
+        assert classify_error(litellm.Timeout("slow", model=MODEL, llm_provider="openrouter")) == "timeout"
+        assert classify_error(litellm.BadRequestError("bad", model=MODEL, llm_provider="openrouter")) is None
+        assert classify_error(ValueError("bug")) is None
+
+    def test_reads_retry_after_headers(self):
+        assert retry_after_seconds(rate_limited({"retry-after": "3"})) == 3.0
+        assert retry_after_seconds(rate_limited({"retry-after-ms": "250", "retry-after": "3"})) == 0.25
+        assert 0 < retry_after_seconds(rate_limited({"retry-after": "Wed, 21 Oct 2099 07:28:00 GMT"}))
+        assert retry_after_seconds(rate_limited()) is None
+
+    @pytest.mark.asyncio
+    async def test_retries_until_success_and_attributes_request(self, make_service):
+        service = make_service()
+        record = service.track_request()
+        call = upstream(rate_limited(), server_error(), "response")
+
+        assert await service.run(MODEL, call) == "response"
+
+        assert len(call.calls) == 3
+        assert record == {"retries": 2, "reasons": ["rate_limit", "server_error"]}
+        assert service.response_headers(record) == {
+            "X-Upstream-Retries": "2",
+            "X-Upstream-Retry-Reasons": "rate_limit,server_error"
+        }
+        stats = service.get_stats()
+        assert (stats["retries"], stats["recovered_requests"]) == (2, 1)
+        assert stats["classes"]["rate_limit"]["retries"] == 1
+        assert stats["models"] == {MODEL: 2}
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_max_attempts_and_on_client_errors(self, make_service):
+        service = make_service()
+        call = upstream(server_error(), server_error(), server_error(), "response")
+        with pytest.raises(litellm.InternalServerError):
+            await service.run(MODEL, call)
+        assert len(call.calls) == 3
+        assert service.get_stats()["classes"]["server_error"]["exhausted"] == 1
+        assert service.get_stats()["failed_after_retries"] == 1
+
+        call = upstream(litellm.BadRequestError("bad", model=MODEL, llm_provider="openrouter"), "response")
+        with pytest.raises(litellm.BadRequestError):
+            await service.run(MODEL, call)
+        assert len(call.calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_honors_retry_after(self, make_service, monkeypatch):
+        service = make_service()
+        sleeps = []
+
+        async def sleep(seconds):
+            sleeps.append(seconds)
+        monkeypatch.setattr(asyncio, "sleep", sleep)
+
+        await service.run(MODEL, upstream(rate_limited({"retry-after": "0.5"}), "response"))
+        assert sleeps == [0.5]
+        assert service.get_stats()["retry_after_honored"] == 1
+
+        # A longer wait than the class allows is returned to the client instead
+        with pytest.raises(litellm.RateLimitError):
+            await service.run(MODEL, upstream(rate_limited({"retry-after": "60"}), "response"))
+        assert service.get_stats()["retry_after_too_long"] == 1
+
+    @pytest.mark.asyncio
+    async def test_budget_stops_retry_storms(self, make_service):
+        service = make_service(budget_min_per_second=0.0)
+        service._budget = 1.0
+
+        assert await service.run(MODEL, upstream(server_error(), "response")) == "response"
+        with pytest.raises(litellm.InternalServerError):
+            await service.run(MODEL, upstream(server_error(), "response"))
+        assert service.get_stats()["budget_exhausted"] == 1
+
+    @pytest.mark.asyncio
+    async def test_disabled_service_makes_a_single_attempt(self, make_service):
+        service = make_service(enabled=False)
+        call = upstream(server_error(), "response")
+        with pytest.raises(litellm.InternalServerError):
+            await service.run(MODEL, call)
+        assert len(call.calls) == 1
+        assert service.response_headers(service.track_request()) == {}
@@ -0,0 +1,99 @@
+"""Unit tests for the near-duplicate response cache."""
+
+import pytest
+
+from src.models.anthropic import MessagesRequest, MessagesResponse
+from src.models.base import Usage
+from src.services.similarity_cache import (
+    SimilarityCacheService,
+    estimate_similarity,
+    minhash_signature,
+    normalize_text
+)
+
+ROUTE = "/v1/messages"
+LOG = " ".join(f"step {i} compiled module_{i} and linked it into the release bundle" for i in range(30))
+
+
+def make_request(text, **kwargs):
+    return MessagesRequest(**{"model": "claude-3-5-haiku-20241022", "max_tokens": 64, "temperature": 0,
+                              "messages": [{"role": "user", "content": text}], **kwargs})
+
+
+def make_response(text="cached answer", stop_reason="end_turn"):
+    return MessagesResponse(id="msg_original", model="claude-3-5-haiku-20241022",
+                            content=[{"type": "text", "text": text}],
+                            stop_reason=stop_reason, usage=Usage(input_tokens=10, output_tokens=2))
+
+
+def make_cache(**kwargs):
+    return SimilarityCacheService(**{"enabled": True, "routes": [ROUTE], "threshold": 0.9,
+                                     "normalizers": ["timestamps", "uuids", "hex", "whitespace"],
+                                     "max_entries": 100, "ttl": 3600, **kwargs})
+
+
+class TestSignatures:
+    """Test normalization and similarity estimates."""
+
+    def test_normalization_masks_volatile_tokens(self):
+        text = "Run at 2025-06-15T10:00:00Z  id 0b3c7c1e-8a43-4b1f-9f0d-2b8f2a6c9d10\n\ttrace deadbeefdeadbeef42"
+        assert normalize_text(text, ["timestamps", "uuids", "hex", "whitespace"]) == "Run at <ts> id <uuid> trace <hex>"
+        assert normalize_text("Retry 3 at 10:00:01", ["timestamps", "numbers"]) == "Retry  <n>  at  <ts> "
+
+    def test_similarity_tracks_overlap(self):
+        base = minhash_signature(LOG)
+        assert estimate_similarity(base, minhash_signature(LOG)) == 1.0
+        assert estimate_similarity(base, minhash_signature(LOG + " (attempt 2)")) > 0.9
+        assert estimate_similarity(base, minhash_signature("an entirely different prompt about cats")) < 0.2
+
+
+class TestSimilarityCache:
+    """Test lookups, scoping and opt-in rules."""
+
+    def test_serves_near_duplicates_with_fresh_ids(self):
+        cache = make_cache()
+        cache.store(make_request(f"Summarize:\n{LOG}\nRequested at 2025-06-15T10:00:00Z"), make_response(), ROUTE)
+
+        exact = cache.lookup(make_request(f"Summarize:  \n{LOG}\nRequested at 2025-06-16T08:30:00Z"), ROUTE)
+        near = cache.lookup(make_request(f"Summarize:\n{LOG}\n(attempt 2)"), ROUTE)
+
+        assert exact.content[0].text == near.content[0].text == "cached answer"
+        assert exact.id != "msg_original" and exact.id != near.id
+        assert cache.lookup(make_request("Summarize the weather in Paris"), ROUTE) is None
+        assert (cache.stats["exact_hits"], cache.stats["near_hits"], cache.stats["misses"]) == (1, 1, 1)
+
+    def test_parameters_outside_the_text_must_match_exactly(self):
+        cache = make_cache()
+        cache.store(make_request(LOG), make_response(), ROUTE)
+
+        assert cache.lookup(make_request(LOG, max_tokens=128), ROUTE) is None
+        assert cache.lookup(make_request(LOG, stop_sequences=["END"]), ROUTE) is None
+        assert cache.lookup(make_request(LOG, model="claude-sonnet-4-20250514"), ROUTE) is None
+        assert cache.lookup(make_request(LOG), ROUTE) is not None
+
+    @pytest.mark.parametrize("request_kwargs, route", [
+        ({"temperature": 0.7}, ROUTE),
+        ({"stream": True}, ROUTE),
+        ({}, "/v1/messages/batches"),
+    ])
+    def test_only_deterministic_requests_on_opted_in_routes(self, request_kwargs, route):
+        cache = make_cache()
+        cache.store(make_request(LOG, **request_kwargs), make_response(), route)
+        cache.store(make_request(LOG), make_response(), ROUTE)
+
+        assert cache.lookup(make_request(LOG, **request_kwargs), route) is None
+
+    def test_skips_tool_use_and_evicts_least_recent(self):
+        cache = make_cache(max_entries=2)
+        cache.store(make_request("first " + LOG), make_response(stop_reason="tool_use"), ROUTE)
+        assert cache.get_stats()["entries"] == 0
+
+        for i in range(3):
+            cache.store(make_request(f"prompt {i} " * 20), make_response(), ROUTE)
+        assert cache.get_stats()["entries"] == 2
+        assert cache.lookup(make_request("prompt 0 " * 20), ROUTE) is None
+        assert cache.lookup(make_request("prompt 2 " * 20), ROUTE) is not None
+
+    def test_rejects_unknown_normalizers(self):
+        with pytest.raises(ValueError):
+            make_cache(normalizers=["timestamps", "stemming"])
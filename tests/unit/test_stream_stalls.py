@@ -0,0 +1,176 @@
+"""Unit tests for upstream stream stall detection."""
+
+import asyncio
+
+import litellm
+import pytest
+from litellm.types.utils import Delta, ModelResponseStream, StreamingChoices, Usage
+
+import src.services as services
+from src.services.adaptive_timeouts import AdaptiveTimeoutService
+from src.services.retry_policy import RetryPolicyService
+from src.services.stream_stalls import StreamStallService
+
+MODEL = "openrouter/anthropic/claude-sonnet-4"
+FALLBACK = "openrouter/openai/gpt-4o"
+
+
+def chunks(words=("Hello", " there"), model=MODEL):
+    parts = [ModelResponseStream(id="chatcmpl-1", model=model,
+                                 choices=[StreamingChoices(index=0, delta=Delta(role="assistant", content=word))])
+             for word in words]
+    parts.append(ModelResponseStream(id="chatcmpl-1", model=model,
+                                     choices=[StreamingChoices(index=0, delta=Delta(), finish_reason="stop")],
+                                     usage=Usage(prompt_tokens=10, completion_tokens=2, total_tokens=12)))
+    return parts
+
+
+class FakeStream:
+    """Upstream stream that hangs before chunk stall_at (never, when None)."""
+
+    def __init__(self, parts, stall_at=None):
+        self.parts = parts
+        self.stall_at = stall_at
+        self._response_headers = {"x-ratelimit-remaining-requests": "99"}
+
+    async def _chunks(self):
+        for index, part in enumerate(self.parts):
+            if index == self.stall_at:
+                await asyncio.sleep(3600)
+            yield part
+
+    def __aiter__(self):
+        return self._chunks()
+
+
+def upstream(*streams):
+    """LiteLLM stand-in returning the given streams in turn and recording requests."""
+    calls = []
+
+    async def call(data):
+        calls.append(data)
+        return streams[len(calls) - 1]
+    call.calls = calls
+    return call
+
+
+@pytest.fixture(autouse=True)
+def fast_adaptive_timeouts(monkeypatch):
+    service = AdaptiveTimeoutService(enabled=True, min_samples=1000, connect_timeout=1.0, floor=0.01, ceiling=0.2)
+    monkeypatch.setattr(services, "adaptive_timeout_service", service)
+    return service
+
+
+@pytest.fixture(autouse=True)
+def retry_policy(monkeypatch):
+    service = RetryPolicyService(enabled=True, budget_ratio=0.0, budget_min_per_second=0.0)
+    monkeypatch.setattr(services, "retry_policy_service", service)
+    return service
+
+
+SERVICE_CLASS = StreamStallService
+SERVICE_DEFAULTS = {"enabled": True, "interval": 0.05, "max_retries": 1, "fallback_models": {MODEL: [FALLBACK]}}
+
+
+def request_data(**kwargs):
+    return {"model": MODEL, "max_tokens": 100, "messages": [{"role": "user", "content": "Hi"}], **kwargs}
+
+
+class TestStreamStalls:
+    """Test internal streaming, stall recovery and reporting."""
+
+    @pytest.mark.asyncio
+    async def test_assembles_streamed_response(self, make_service, fast_adaptive_timeouts):
+        service = make_service()
+        call = upstream(FakeStream(chunks()))
+
+        response = await service.complete(request_data(), call)
+
+        assert response.choices[0].message.content == "Hello there"
+        assert response.usage.completion_tokens == 2
+        assert response._response_headers == {"x-ratelimit-remaining-requests": "99"}
+        assert call.calls[0]["stream"] is True and call.calls[0]["stream_options"] == {"include_usage": True}
+        assert fast_adaptive_timeouts.get_timeouts()["models"][MODEL]["samples"] == 1
+
+    @pytest.mark.asyncio
+    async def test_keeps_the_serving_provider(self, make_service):
+        parts = chunks()
+        for part in parts:
+            part.provider = "Google"
+        response = await make_service().complete(request_data(), upstream(FakeStream(parts)))
+
+        assert response.provider == "Google"
+
+    @pytest.mark.asyncio
+    async def test_retries_after_inter_chunk_stall(self, make_service):
+        service = make_service()
+        call = upstream(FakeStream(chunks(), stall_at=1), FakeStream(chunks()))
+
+        response = await service.complete(request_data(), call)
+
+        assert response.choices[0].message.content == "Hello there"
+        stats = service.get_stats()
+        assert (stats["stalls"], stats["retries"], stats["recovered_requests"]) == (1, 1, 1)
+        assert stats["models"][MODEL] == {"first_byte": 0, "inter_chunk": 1}
+
+    @pytest.mark.asyncio
+    async def test_fails_over_after_first_byte_stalls(self, make_service):
+        service = make_service()
+        call = upstream(FakeStream(chunks(), stall_at=0), FakeStream(chunks(), stall_at=0),
+                        FakeStream(chunks(model=FALLBACK)))
+
+        response = await service.complete(request_data(), call)
+
+        assert [c["model"] for c in call.calls] == [MODEL, MODEL, FALLBACK]
+        assert response.model == FALLBACK
+        assert response.provider is None
+        stats = service.get_stats()
+        assert (stats["failovers"], stats["models"][MODEL]["first_byte"]) == (1, 2)
+
+    @pytest.mark.asyncio
+    async def test_raises_timeout_when_every_attempt_stalls(self, make_service):
+        service = make_service(fallback_models={})
+        call = upstream(FakeStream(chunks(), stall_at=1), FakeStream(chunks(), stall_at=1))
+
+        with pytest.raises(litellm.Timeout):
+            await service.complete(request_data(), call)
+        assert service.get_stats()["failed_requests"] == 1
+
+    @pytest.mark.asyncio
+    async def test_client_streams_and_plain_responses_pass_through(self, make_service):
+        service = make_service()
+        assert not service.applies_to(request_data(stream=True))
+        assert not make_service(enabled=False).applies_to(request_data())
+
+        plain = object()
+        assert await service.complete(request_data(), upstream(plain)) is plain
+
+    @pytest.mark.asyncio
+    async def test_stall_retries_come_from_the_retry_budget(self, make_service, retry_policy):
+        service = make_service(fallback_models={})
+        call = upstream(FakeStream(chunks(), stall_at=1), FakeStream(chunks(), stall_at=1))
+
+        with pytest.raises(litellm.Timeout) as error:
+            await service.complete(request_data(), call)
+        assert retry_policy.get_stats()["classes"]["timeout"]["retries"] == 1
+
+        # The policy does not retry what stall recovery already gave up on
+        attempts = []
+
+        async def attempt():
+            attempts.append(1)
+            raise error.value
+        with pytest.raises(litellm.Timeout):
+            await retry_policy.run(MODEL, attempt)
+        assert len(attempts) == 1
+
+    @pytest.mark.asyncio
+    async def test_stall_recovery_stops_when_retry_budget_is_exhausted(self, make_service, retry_policy):
+        retry_policy._budget = 0.0
+        service = make_service()
+        call = upstream(FakeStream(chunks(), stall_at=0))
+
+        with pytest.raises(litellm.Timeout):
+            await service.complete(request_data(), call)
+        assert len(call.calls) == 1
+        assert retry_policy.get_stats()["budget_exhausted"] == 1
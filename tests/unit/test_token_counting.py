@@ -0,0 +1,244 @@
+"""Unit tests for the token counting service and its per-message cache."""
+
+import asyncio
+import base64
+import os
+import struct
+import zlib
+
+import pytest
+from unittest.mock import patch
+
+import litellm
+
+from src.models.anthropic import Message, TokenCountRequest
+from src.services.token_counting import (
+    MessageTokenCache,
+    TokenCountingService,
+    fingerprint_message,
+    get_model_family,
+)
+from src.services.tokenizers import (
+    ApproximateTokenizerEngine,
+    TiktokenEngine,
+    create_tokenizer_engine,
+    estimate_image_tokens,
+)
+
+MODEL = "openrouter/anthropic/claude-sonnet-4"
+
+
+def build_transcript(turns: int):
+    """Build an alternating user/assistant transcript with tool blocks."""
+    messages = []
+    for i in range(turns):
+        if i % 2 == 0:
+            messages.append({"role": "user", "content": f"Step {i}: please look at file_{i}.py"})
+        else:
+            messages.append({
+                "role": "assistant",
+                "content": [
+                    {"type": "text", "text": f"Reading file_{i - 1}.py"},
+                    {"type": "tool_use", "id": f"tool_{i}", "name": "Read",
+                     "input": {"file_path": f"/src/file_{i - 1}.py"}}
+                ]
+            })
+    return messages
+
+
+def png_base64(width: int, height: int) -> str:
+    """Build a base64 PNG header with the given dimensions."""
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    chunk = struct.pack(">I", len(ihdr)) + b"IHDR" + ihdr + struct.pack(">I", zlib.crc32(b"IHDR" + ihdr))
+    return base64.b64encode(b"\x89PNG\r\n\x1a\n" + chunk).decode()
+
+
+class TestMessageTokenCache:
+    """Test MessageTokenCache LRU behaviour."""
+
+    def test_lru_eviction_bound(self):
+        """Test the cache never exceeds its bound and evicts oldest entries."""
+        cache = MessageTokenCache(max_entries=2)
+        cache.put(("f", "a"), 1)
+        cache.put(("f", "b"), 2)
+        cache.get(("f", "a"))  # Refresh "a" so "b" is least recently used
+        cache.put(("f", "c"), 3)
+
+        assert len(cache) == 2
+        assert cache.get(("f", "b")) is None
+        assert cache.get(("f", "a")) == 1
+        assert cache.get_stats()["evictions"] == 1
+
+    def test_zero_size_disables_cache(self):
+        """Test a zero-sized cache stores nothing."""
+        cache = MessageTokenCache(max_entries=0)
+        cache.put(("f", "a"), 1)
+        assert cache.get(("f", "a")) is None
+
+
+class TestTokenCountingHelpers:
+    """Test model family and fingerprint helpers."""
+
+    def test_model_family_strips_routing_prefix_and_date(self):
+        """Test snapshots share a family with their base model."""
+        assert get_model_family("openrouter/anthropic/claude-3-5-haiku-20241022") == "anthropic/claude-3-5-haiku"
+        assert get_model_family("anthropic/claude-3-5-haiku") == "anthropic/claude-3-5-haiku"
+
+    def test_fingerprint_is_content_based(self):
+        """Test equal messages share a fingerprint and different ones do not."""
+        first = Message(role="user", content="hello")
+        assert fingerprint_message(first) == fingerprint_message(Message(role="user", content="hello"))
+        assert fingerprint_message(first) != fingerprint_message(Message(role="assistant", content="hello"))
+
+
+class TestTokenCountingService:
+    """Test TokenCountingService counting and memoization."""
+
+    @pytest.mark.asyncio
+    async def test_matches_uncached_litellm_count(self):
+        """Test the per-message sum equals a whole-conversation LiteLLM count."""
+        service = TokenCountingService(cache=MessageTokenCache())
+        request = TokenCountRequest(model=MODEL, messages=build_transcript(6))
+
+        expected = litellm.token_counter(
+            model=MODEL,
+            messages=[service.message_to_litellm(m) for m in request.messages]
+        )
+
+        assert await service.count_request_tokens(request, model=MODEL) == expected
+        # Second pass is served from the cache with the same result
+        assert await service.count_request_tokens(request, model=MODEL) == expected
+
+    @pytest.mark.asyncio
+    async def test_growing_history_only_tokenizes_new_messages(self):
+        """Test a 500-message history is tokenized once, then incrementally."""
+        service = TokenCountingService(cache=MessageTokenCache())
+        transcript = build_transcript(501)
+        validated = []
+
+        async def record_validation(message):
+            validated.append(message)
+
+        with patch.object(service, "count_message_tokens", wraps=service.count_message_tokens) as counter:
+            await service.count_request_tokens(
+                TokenCountRequest(model=MODEL, messages=transcript[:500]),
+                model=MODEL,
+                validate_message=record_validation
+            )
+            assert counter.call_count == 500
+
+            await service.count_request_tokens(
+                TokenCountRequest(model=MODEL, messages=transcript),
+                model=MODEL,
+                validate_message=record_validation
+            )
+            assert counter.call_count == 501
+
+        assert len(validated) == 501
+        assert service.cache.get_stats()["hits"] == 500
+
+    @pytest.mark.asyncio
+    async def test_counts_system_prompt_and_tools(self):
+        """Test system prompt and tool definitions add to the message count."""
+        service = TokenCountingService(cache=MessageTokenCache(), engine=TiktokenEngine())
+        messages = [{"role": "user", "content": "What's the weather in Paris?"}]
+        tools = [{
+            "name": "get_weather",
+            "description": "Get the current weather for a city",
+            "input_schema": {"type": "object", "properties": {"city": {"type": "string"}}}
+        }]
+
+        base = await service.count_request_tokens(
+            TokenCountRequest(model=MODEL, messages=messages), model=MODEL
+        )
+        with_system = await service.count_request_tokens(
+            TokenCountRequest(model=MODEL, messages=messages, system="You are a weather bot."),
+            model=MODEL
+        )
+        with_tools = await service.count_request_tokens(
+            TokenCountRequest(model=MODEL, messages=messages, system="You are a weather bot.", tools=tools),
+            model=MODEL
+        )
+
+        assert with_system - base == service.count_system_tokens("You are a weather bot.")
+        assert with_tools - with_system == service.count_tools_tokens(tools)
+        assert with_tools - with_system > service.engine.count("get_weather")
+
+    @pytest.mark.asyncio
+    async def test_counts_images_in_messages_and_tool_results(self):
+        """Test images are priced by dimensions, including images returned by tools."""
+        service = TokenCountingService(cache=MessageTokenCache(), engine=TiktokenEngine())
+        image = {"type": "image", "source": {"type": "base64", "media_type": "image/png",
+                                             "data": png_base64(750, 1000)}}
+        messages = [
+            {"role": "user", "content": [{"type": "text", "text": "Look"}, image]},
+            {"role": "assistant", "content": [
+                {"type": "tool_use", "id": "t1", "name": "screenshot", "input": {}}]},
+            {"role": "user", "content": [
+                {"type": "tool_result", "tool_use_id": "t1", "content": [image]}]},
+        ]
+
+        assert estimate_image_tokens(image["source"]) == 1000
+        total = await service.count_request_tokens(
+            TokenCountRequest(model=MODEL, messages=messages), model=MODEL
+        )
+        assert total > 2000
+
+    def test_large_images_are_downscaled(self):
+        """Test image estimates are capped by the upstream resize limits."""
+        huge = estimate_image_tokens({"type": "base64", "data": png_base64(8000, 8000)})
+        assert huge == 1534  # 1.15 megapixels / 750
+        assert estimate_image_tokens({"type": "url", "url": "https://example.com/a.png"}) == 1600
+
+    @pytest.mark.asyncio
+    async def test_large_inputs_are_tokenized_off_the_event_loop(self):
+        """Test uncached inputs above the threshold are counted in a worker thread."""
+        service = TokenCountingService(cache=MessageTokenCache(), engine=TiktokenEngine())
+        service.offload_threshold = 1000
+        small = TokenCountRequest(model=MODEL, messages=[{"role": "user", "content": "hi"}])
+        large = TokenCountRequest(model=MODEL, messages=[{"role": "user", "content": "word " * 1000}])
+
+        with patch("src.services.token_counting.asyncio.to_thread", wraps=asyncio.to_thread) as to_thread:
+            await service.count_request_tokens(small, model=MODEL)
+            assert to_thread.call_count == 0
+            await service.count_request_tokens(large, model=MODEL)
+            assert to_thread.call_count == 1
+
+
+class TestTokenizerEngines:
+    """Test offline tokenizer engines."""
+
+    def test_unknown_engine_falls_back_to_approximate(self):
+        """Test an unknown engine name loads the approximate engine."""
+        assert isinstance(create_tokenizer_engine("nonexistent"), ApproximateTokenizerEngine)
+
+    def test_missing_vocab_falls_back_to_approximate(self, tmp_path):
+        """Test an engine whose vocab cannot be loaded falls back instead of failing."""
+        engine = create_tokenizer_engine("huggingface", vocab_path=str(tmp_path / "missing.json"))
+        assert isinstance(engine, ApproximateTokenizerEngine)
+
+    def test_tiktoken_leaves_operator_cache_dir_alone(self, monkeypatch):
+        """Test loading the bundled vocab does not overwrite TIKTOKEN_CACHE_DIR."""
+        monkeypatch.delenv("TIKTOKEN_CACHE_DIR", raising=False)
+        TiktokenEngine()
+        assert "TIKTOKEN_CACHE_DIR" not in os.environ
+
+        monkeypatch.setenv("TIKTOKEN_CACHE_DIR", "/srv/tiktoken")
+        seen = []
+        with patch("tiktoken.get_encoding", side_effect=lambda name: seen.append(os.environ["TIKTOKEN_CACHE_DIR"])):
+            TiktokenEngine()
+            TiktokenEngine(vocab_path="/opt/vocab")
+        assert seen == ["/srv/tiktoken", "/opt/vocab"]
+        assert os.environ["TIKTOKEN_CACHE_DIR"] == "/srv/tiktoken"
+
+    def test_approximate_engine_tracks_tiktoken(self):
+        """Test the approximate engine stays close to cl100k on typical content."""
+        exact = TiktokenEngine()
+        approx = ApproximateTokenizerEngine()
+        samples = [
+            "The quick brown fox jumps over the lazy dog. " * 20,
+            "def handler(event):\n    return process(event.payload, retries=3)\n" * 20,
+            '{"name": "Read", "input": {"file_path": "/repo/src/main.py", "limit": 200}}' * 10,
+        ]
+        for text in samples:
+            assert abs(approx.count(text) - exact.count(text)) / exact.count(text) < 0.2
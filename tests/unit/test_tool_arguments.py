@@ -0,0 +1,116 @@
+"""Unit tests for raw tool-call argument reuse."""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from src.models.anthropic import Message
+from src.tasks.conversion.message_conversion_tasks import convert_anthropic_message_to_litellm
+from src.tasks.tool_execution.tool_detection_tasks import extract_tool_use_blocks
+from src.utils.tool_arguments import ToolArgumentCache, tool_argument_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_shared_cache():
+    tool_argument_cache.clear()
+    yield
+    tool_argument_cache.clear()
+
+
+def upstream_response(tool_call_id: str, arguments: str):
+    tool_call = SimpleNamespace(id=tool_call_id, function=SimpleNamespace(name="Write", arguments=arguments))
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=None, tool_calls=[tool_call]))])
+
+
+class TestToolArgumentCache:
+    """Test parse-once and raw text reuse."""
+
+    def test_parse_reuses_earlier_parse_of_same_text(self):
+        cache = ToolArgumentCache()
+        raw = '{"file_path": "/a.py", "content": "x"}'
+
+        first = cache.parse("call_1", raw)
+        second = cache.parse("call_1", raw)
+
+        assert first == {"file_path": "/a.py", "content": "x"}
+        assert second == first and second is not first
+        assert cache.get_stats()["parses"] == 1
+        assert cache.get_stats()["parse_hits"] == 1
+
+    def test_parse_reparses_changed_text(self):
+        cache = ToolArgumentCache()
+        cache.parse("call_1", '{"a": 1}')
+        assert cache.parse("call_1", '{"a": 2}') == {"a": 2}
+
+    def test_parse_handles_empty_and_parsed_input(self):
+        cache = ToolArgumentCache()
+        assert cache.parse("call_1", "") == {}
+        assert cache.parse("call_1", {"a": 1}) == {"a": 1}
+        with pytest.raises(json.JSONDecodeError):
+            cache.parse("call_2", "{not json")
+
+    def test_serialize_returns_original_text_for_unchanged_input(self):
+        cache = ToolArgumentCache()
+        raw = '{"content":  "spacing kept",\n "file_path": "/a.py"}'
+        parsed = cache.parse("call_1", raw)
+
+        assert cache.serialize("call_1", parsed) is raw
+        # A client echoing the block back sends an equal but distinct object
+        assert cache.serialize("call_1", json.loads(raw)) is raw
+
+    def test_serialize_falls_back_for_modified_or_unknown_input(self):
+        cache = ToolArgumentCache()
+        cache.parse("call_1", '{"a": 1}')
+
+        assert cache.serialize("call_1", {"a": 2}) == '{"a": 2}'
+        assert cache.serialize("call_9", {"b": 1}) == '{"b": 1}'
+        assert cache.get_stats()["serializations"] == 2
+
+    def test_mutating_parsed_arguments_does_not_touch_the_cache(self):
+        cache = ToolArgumentCache()
+        raw = '{"file_path": "/a.py"}'
+        parsed = cache.parse("call_1", raw)
+        parsed["file_path"] = "/b.py"
+
+        assert cache.parse("call_1", raw) == {"file_path": "/a.py"}
+        assert cache.serialize("call_1", parsed) == '{"file_path": "/b.py"}'
+
+    def test_cache_is_byte_bounded(self):
+        cache = ToolArgumentCache(max_bytes=100)
+        for i in range(10):
+            cache.parse(f"call_{i}", json.dumps({"content": "y" * 30}))
+
+        stats = cache.get_stats()
+        assert stats["bytes"] <= 100
+        assert cache.serialize("call_0", {"content": "y" * 30}) == json.dumps({"content": "y" * 30})
+
+
+class TestPipelineReuse:
+    """Test the pipeline parses once and sends the original bytes back."""
+
+    def test_detection_reuses_parse_and_history_reuses_raw_text(self):
+        raw = json.dumps({"file_path": "/big.py", "content": "line\n" * 200000})
+        response = upstream_response("call_big", raw)
+
+        blocks = extract_tool_use_blocks(response)
+        again = extract_tool_use_blocks(response)
+        assert again[0]["input"] == blocks[0]["input"]
+
+        history = Message(role="assistant", content=[
+            {"type": "tool_use", "id": "call_big", "name": "Write", "input": json.loads(raw)}
+        ])
+        converted = convert_anthropic_message_to_litellm(history, {"content_block_conversions": 0})
+
+        assert converted.tool_calls[0]["function"]["arguments"] is raw
+        assert tool_argument_cache.get_stats()["parses"] == 1
+
+    def test_edited_history_is_reserialized(self):
+        extract_tool_use_blocks(upstream_response("call_1", '{"file_path": "/a.py"}'))
+
+        history = Message(role="assistant", content=[
+            {"type": "tool_use", "id": "call_1", "name": "Write", "input": {"file_path": "/b.py"}}
+        ])
+        converted = convert_anthropic_message_to_litellm(history, {"content_block_conversions": 0})
+
+        assert json.loads(converted.tool_calls[0]["function"]["arguments"]) == {"file_path": "/b.py"}
@@ -0,0 +1,203 @@
+"""Unit tests for spill-to-disk storage of oversized tool outputs."""
+
+import os
+
+import pytest
+
+from src.services.tool_output_store import ToolOutputStore
+from src.tasks.tool_execution.tool_result_formatting_tasks import truncate_result_content
+from src.tasks.tools import file_tools, system_tools
+
+
+def numbered_lines(count: int) -> str:
+    return "".join(f"line {i}\n" for i in range(1, count + 1))
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Store with a small inline limit so tests spill quickly."""
+    return ToolOutputStore(directory=str(tmp_path / "outputs"), max_bytes=1024 * 1024, inline_limit=1000)
+
+
+@pytest.fixture
+def patched_store(store, monkeypatch):
+    """Route tool tasks to the test store."""
+    monkeypatch.setattr("src.services.tool_output_store._tool_output_store", store)
+    return store
+
+
+class TestToolOutputStore:
+    """Test storing, summarizing and paging outputs."""
+
+    def test_small_output_returned_inline_and_discarded(self, store):
+        handle = store.put_text("hello\n")
+        assert store.resolve(handle) == "hello\n"
+        assert not store.exists(handle)
+
+    def test_large_output_summarized_with_head_tail_and_handle(self, store):
+        handle = store.put_text(numbered_lines(500))
+        summary = store.resolve(handle, label="STDOUT")
+
+        assert store.exists(handle)
+        assert f"[STDOUT stored: handle={handle}" in summary
+        assert "500 lines" in summary
+        assert "line 1\n" in summary and "line 15\n" in summary
+        assert "line 16\n" not in summary
+        assert summary.endswith("line 500")
+        assert "[470 lines omitted]" in summary
+        assert "ReadToolOutput" in summary
+
+    def test_summary_clips_long_lines(self, store):
+        handle = store.put_text("x" * 50000)
+        summary = store.summarize(handle)
+        assert len(summary) < 1000
+        assert "1 lines" in summary
+
+    def test_read_page_by_offset(self, store):
+        handle = store.put_text(numbered_lines(100))
+        page = store.read_page(handle, offset=10, limit=5)
+
+        assert page["content"] == "line 10\nline 11\nline 12\nline 13\nline 14\n"
+        assert page["start_line"] == 10
+        assert page["end_line"] == 14
+        assert page["next_offset"] == 15
+
+    def test_read_page_stops_at_inline_limit(self, store):
+        handle = store.put_text(numbered_lines(1000))
+        page = store.read_page(handle, offset=1, limit=1000)
+
+        assert len(page["content"]) <= store.inline_limit
+        assert page["next_offset"] == page["end_line"] + 1
+
+        last = store.read_page(handle, offset=990, limit=50)
+        assert last["content"].endswith("line 1000\n")
+        assert last["next_offset"] is None
+
+    def test_read_page_truncates_over_long_line(self, store):
+        handle = store.put_text("a" * 5000 + "\nnext\n")
+        page = store.read_page(handle, offset=1, limit=2)
+
+        assert page["content"].endswith("[line truncated]\n")
+        assert page["end_line"] == 1
+        assert store.read_page(handle, offset=page["next_offset"])["content"] == "next\n"
+
+    def test_store_evicts_oldest_outputs_past_bound(self, tmp_path):
+        store = ToolOutputStore(directory=str(tmp_path / "bounded"), max_bytes=5000, inline_limit=100)
+        handles = []
+        for i in range(5):
+            handles.append(store.put_text("z" * 2000))
+            os.utime(store._path(handles[-1]), (i, i))
+        store.put_text("z" * 2000)
+
+        assert store.get_stats()["bytes"] <= 5000
+        assert not store.exists(handles[0])
+
+    def test_output_larger_than_bound_is_kept_and_summarized(self, tmp_path):
+        store = ToolOutputStore(directory=str(tmp_path / "tiny"), max_bytes=1000, inline_limit=100)
+        older = store.put_text("y" * 500)
+        handle = store.put_text(numbered_lines(500))
+
+        assert store.exists(handle)
+        assert not store.exists(older)
+        assert f"handle={handle}" in store.summarize(handle)
+
+    def test_spooled_output_survives_its_own_eviction_pass(self, tmp_path):
+        store = ToolOutputStore(directory=str(tmp_path / "spool"), max_bytes=1000, inline_limit=100)
+        handle, spool = store.new_spool()
+        with spool:
+            spool.write(numbered_lines(500).encode("utf-8"))
+
+        assert "500 lines" in store.resolve(handle, label="STDOUT")
+        assert store.exists(handle)
+
+    def test_stats_track_running_total(self, store):
+        first = store.put_text("a" * 2000)
+        store.put_text("b" * 3000)
+        assert store.get_stats()["bytes"] == 5000
+
+        store.discard(first)
+        stats = store.get_stats()
+        assert stats["outputs"] == 1
+        assert stats["bytes"] == 3000
+
+    def test_existing_outputs_are_accounted_on_startup(self, store):
+        store.put_text("c" * 2000)
+        reopened = ToolOutputStore(directory=str(store.directory), max_bytes=store.max_bytes, inline_limit=1000)
+        assert reopened.get_stats()["bytes"] == 2000
+
+    def test_invalid_handle_rejected(self, store):
+        assert not store.exists("../../etc/passwd")
+        with pytest.raises(ValueError):
+            store.read_page("../../etc/passwd")
+
+
+class TestToolTasksSpillToDisk:
+    """Test tool tasks keep large outputs on disk."""
+
+    @pytest.mark.asyncio
+    async def test_large_command_output_is_summarized_and_pageable(self, patched_store):
+        result = await system_tools.execute_command_task.fn(
+            tool_call_id="call_1",
+            tool_name="Bash",
+            tool_input={"command": "python3 -c 'print(chr(10).join(str(i) for i in range(20000)))'"}
+        )
+
+        assert result.success
+        assert "STDOUT stored: handle=" in result.result
+        assert len(result.result) < 10000
+        handle = result.result.split("handle=", 1)[1].split(",", 1)[0]
+
+        page = await system_tools.read_tool_output_task.fn(
+            tool_call_id="call_2",
+            tool_name="ReadToolOutput",
+            tool_input={"handle": handle, "offset": 5001, "limit": 3}
+        )
+        assert page.success
+        assert "5000\n5001\n5002\n" in page.result
+        assert "offset=5004" in page.result
+
+    @pytest.mark.asyncio
+    async def test_small_command_output_stays_inline(self, patched_store):
+        result = await system_tools.execute_command_task.fn(
+            tool_call_id="call_1",
+            tool_name="Bash",
+            tool_input={"command": "echo hello"}
+        )
+
+        assert result.result == "STDOUT:\nhello\n"
+        assert patched_store.get_stats()["outputs"] == 0
+
+    @pytest.mark.asyncio
+    async def test_read_unknown_handle_fails(self, patched_store):
+        result = await system_tools.read_tool_output_task.fn(
+            tool_call_id="call_1",
+            tool_name="ReadToolOutput",
+            tool_input={"handle": "0" * 32}
+        )
+        assert not result.success
+        assert "not found" in result.error
+
+    @pytest.mark.asyncio
+    async def test_large_file_read_is_summarized(self, patched_store, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "big.txt").write_text(numbered_lines(5000))
+
+        full = await file_tools.read_file_task.fn(
+            tool_call_id="call_1", tool_name="Read", tool_input={"file_path": "big.txt"}
+        )
+        assert full.success
+        assert "File big.txt stored: handle=" in full.result
+
+        sliced = await file_tools.read_file_task.fn(
+            tool_call_id="call_2", tool_name="Read",
+            tool_input={"file_path": "big.txt", "offset": 100, "limit": 2}
+        )
+        assert sliced.result == "line 100\nline 101\n"
+
+    def test_truncate_result_content_spills_instead_of_cutting(self, patched_store):
+        content = numbered_lines(3000)
+        summary = truncate_result_content(content, max_length=1000)
+
+        assert "Tool result stored: handle=" in summary
+        handle = summary.split("handle=", 1)[1].split(",", 1)[0]
+        assert patched_store.read_page(handle, offset=2999, limit=5)["content"] == "line 2999\nline 3000\n"
@@ -0,0 +1,115 @@
+"""Unit tests for the conversation-scoped tool_use id index."""
+
+from src.models.anthropic import Message
+from src.tasks.conversion.tool_conversion_tasks import find_tool_name_for_id
+from src.tasks.validation.tool_validation_tasks import validate_tool_flow_data
+from src.utils.tool_use_index import ToolUseIndex, get_tool_use_index
+
+
+def tool_turns(start: int, count: int):
+    """Build assistant tool_use / user tool_result message pairs."""
+    messages = []
+    for i in range(start, start + count):
+        messages.append(Message(role="assistant", content=[
+            {"type": "tool_use", "id": f"t{i}", "name": "Read", "input": {"file_path": f"/f{i}.py"}}
+        ]))
+        messages.append(Message(role="user", content=[
+            {"type": "tool_result", "tool_use_id": f"t{i}", "content": "ok"}
+        ]))
+    return messages
+
+
+class TestToolUseIndex:
+    """Test indexing and lookups."""
+
+    def test_indexes_name_input_and_message_index(self):
+        index = ToolUseIndex([Message(role="user", content="hi")] + tool_turns(0, 2))
+
+        entry = index.get("t1")
+        assert entry.name == "Read"
+        assert entry.message_index == 3
+        assert entry.input == {"file_path": "/f1.py"}
+        assert len(entry.input_hash) == 64
+        assert index.name_for("missing") == "unknown_tool"
+        assert index.result_message_index("t1") == 4
+
+    def test_pairing(self):
+        messages = tool_turns(0, 2)
+        messages.append(Message(role="assistant", content=[
+            {"type": "tool_use", "id": "t9", "name": "Bash", "input": {"command": "ls"}}
+        ]))
+        messages.append(Message(role="user", content=[
+            {"type": "tool_result", "tool_use_id": "ghost", "content": "?"}
+        ]))
+        index = ToolUseIndex(messages)
+
+        assert index.orphaned_tool_uses() == ["t9"]
+        assert index.unmatched_results() == ["ghost"]
+
+    def test_works_with_dict_messages(self):
+        index = ToolUseIndex([
+            {"role": "assistant", "content": [{"type": "tool_use", "id": "d1", "name": "Grep", "input": {}}]}
+        ])
+        assert index.name_for("d1") == "Grep"
+
+    def test_find_same_call_by_name_and_input(self):
+        messages = tool_turns(0, 2) + [Message(role="assistant", content=[
+            {"type": "tool_use", "id": "again", "name": "Read", "input": {"file_path": "/f0.py"}}
+        ])]
+        index = ToolUseIndex(messages)
+
+        assert index.find_same_call("Read", {"file_path": "/f0.py"}) == ["t0", "again"]
+        assert index.find_same_call("Bash", {"file_path": "/f0.py"}) == []
+
+
+class TestSharedIndex:
+    """Test the shared index is extended incrementally."""
+
+    def test_appended_messages_are_indexed_incrementally(self, monkeypatch):
+        messages = tool_turns(0, 50)
+        index = get_tool_use_index(messages)
+        assert len(index) == 100
+
+        indexed = []
+        original_index = ToolUseIndex._index
+
+        def counting_index(self, message):
+            indexed.append(message)
+            original_index(self, message)
+
+        monkeypatch.setattr(ToolUseIndex, "_index", counting_index)
+        grown = messages + tool_turns(50, 1)
+
+        extended = get_tool_use_index(grown)
+        assert len(indexed) == 2
+        assert extended.name_for("t50") == "Read"
+        # The index handed out earlier still covers only its own messages
+        assert "t50" not in index and len(index) == 100
+        assert get_tool_use_index(grown) is extended
+
+    def test_conversations_are_keyed_by_content(self):
+        messages = tool_turns(0, 3)
+        index = get_tool_use_index(messages)
+
+        # The same history re-parsed from the next request reuses the index
+        reparsed = [Message(**message.model_dump()) for message in messages]
+        assert get_tool_use_index(reparsed) is index
+
+    def test_diverged_history_is_reindexed(self):
+        messages = tool_turns(0, 3)
+        get_tool_use_index(messages)
+
+        edited = messages[:2] + tool_turns(7, 1)
+        index = get_tool_use_index(edited)
+
+        assert "t7" in index
+        assert "t1" not in index
+        assert len(index) == 4
+
+    def test_consumers_use_index(self):
+        messages = tool_turns(0, 3)[:-1]
+
+        assert find_tool_name_for_id(messages, "t2") == "Read"
+        result = validate_tool_flow_data(messages, [])
+        assert result.orphaned_tools == ["t2"]
+        assert not result.is_valid
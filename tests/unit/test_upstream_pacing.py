@@ -0,0 +1,167 @@
+"""Unit tests for upstream rate-limit pacing."""
+
+import asyncio
+
+import pytest
+
+from src.services.upstream_pacing import UpstreamBudget, UpstreamPacingService, parse_reset
+
+NOW = 1750000000.0
+
+
+def request_data(model="openrouter/anthropic/claude-sonnet-4", api_key="sk-a"):
+    return {"model": model, "api_key": api_key, "max_tokens": 100,
+            "messages": [{"role": "user", "content": "x" * 400}]}
+
+
+SERVICE_CLASS = UpstreamPacingService
+SERVICE_DEFAULTS = {"enabled": True, "threshold": 0.2, "max_delay": 30.0, "reroute_after": 5.0,
+                    "fallback_models": {}}
+
+
+class TestHeaderParsing:
+    """Test reset formats and budget updates."""
+
+    @pytest.mark.parametrize("value, expected", [
+        ("1.5s", NOW + 1.5),
+        ("1m30s", NOW + 90),
+        ("250ms", NOW + 0.25),
+        ("20", NOW + 20),
+        ("1750000060", NOW + 60),
+        ("1750000060000", NOW + 60),
+        ("2025-06-15T15:07:40Z", 1750000060.0),
+    ])
+    def test_parse_reset(self, value, expected):
+        assert parse_reset(value, NOW) == pytest.approx(expected)
+
+    def test_update_reads_openai_anthropic_and_retry_after(self):
+        budget = UpstreamBudget()
+        assert not budget.update({"content-type": "application/json"}, 200, NOW)
+
+        budget.update({"x-ratelimit-limit-requests": "100", "x-ratelimit-remaining-requests": "7",
+                       "x-ratelimit-reset-requests": "6s", "anthropic-ratelimit-tokens-remaining": "5000",
+                       "anthropic-ratelimit-tokens-reset": "2025-06-15T15:07:40Z"}, 200, NOW)
+        assert (budget.limit_requests, budget.remaining_requests, budget.remaining_tokens) == (100, 7, 5000)
+        assert (budget.requests_reset_at, budget.tokens_reset_at) == (NOW + 6, NOW + 60)
+
+        budget.update({"retry-after": "3"}, 429, NOW)
+        assert budget.blocked_until == NOW + 3
+
+
+class TestUpstreamBudget:
+    """Test dispatch scheduling against a budget."""
+
+    def test_unknown_budget_is_not_paced(self):
+        assert UpstreamBudget().dispatch_time(1000, NOW, 0.2, commit=True) == NOW
+
+    def test_spreads_remaining_requests_below_threshold(self):
+        budget = UpstreamBudget()
+        budget.update({"x-ratelimit-limit-requests": "100", "x-ratelimit-remaining-requests": "50",
+                       "x-ratelimit-reset-requests": "10s"}, 200, NOW)
+        assert budget.dispatch_time(0, NOW, 0.2, commit=True) == NOW  # plenty left
+
+        budget.update({"x-ratelimit-limit-requests": "100", "x-ratelimit-remaining-requests": "11",
+                       "x-ratelimit-reset-requests": "10s"}, 200, NOW)
+        starts = [budget.dispatch_time(0, NOW, 0.2, commit=True) for _ in range(3)]
+        assert starts[0] == NOW
+        assert starts[1] == pytest.approx(NOW + 10 / 11)
+        assert starts[2] > starts[1]
+        assert budget.remaining_requests == 8
+        assert budget.dispatch_time(0, NOW + 10, 0.2) == NOW + 10  # spacing ends with the window
+
+    def test_spent_budget_waits_for_reset_and_queues_into_later_windows(self):
+        budget = UpstreamBudget()
+        budget.update({"x-ratelimit-limit-requests": "2", "x-ratelimit-remaining-requests": "0",
+                       "x-ratelimit-reset-requests": "4s"}, 200, NOW)
+        starts = [budget.dispatch_time(0, NOW, 0.0, commit=True) for _ in range(5)]
+        assert starts == [NOW + 4, NOW + 4, NOW + 8, NOW + 8, NOW + 12]
+
+        # At the reset the first window's worth of queued requests takes the new budget
+        assert budget.dispatch_time(0, NOW + 4, 0.0) == NOW + 12
+        assert (budget.remaining_requests, budget.queued) == (0, 3)
+
+    def test_headers_only_lower_the_count_within_a_window(self):
+        budget = UpstreamBudget()
+        headers = {"x-ratelimit-limit-requests": "10", "x-ratelimit-remaining-requests": "9",
+                   "x-ratelimit-reset-requests": "10s"}
+        budget.update(headers, 200, NOW)
+        for _ in range(3):
+            budget.dispatch_time(0, NOW, 0.0, commit=True)
+
+        budget.update({**headers, "x-ratelimit-remaining-requests": "8"}, 200, NOW)
+        assert budget.remaining_requests == 6
+        budget.update({**headers, "x-ratelimit-remaining-requests": "2"}, 200, NOW)
+        assert budget.remaining_requests == 2
+        budget.update({**headers, "x-ratelimit-remaining-requests": "9",
+                       "x-ratelimit-reset-requests": "1s"}, 200, NOW + 9)
+        assert budget.remaining_requests == 2
+        budget.update({**headers, "x-ratelimit-remaining-requests": "9",
+                       "x-ratelimit-reset-requests": "9s"}, 200, NOW + 11)
+        assert (budget.remaining_requests, budget.requests_reset_at) == (9, NOW + 20)
+
+    def test_first_headers_discount_requests_in_flight(self):
+        budget = UpstreamBudget()
+        for _ in range(5):
+            budget.dispatch_time(0, NOW, 0.2, commit=True)
+        budget.update({"x-ratelimit-limit-requests": "10", "x-ratelimit-remaining-requests": "9",
+                       "x-ratelimit-reset-requests": "10s"}, 200, NOW)
+        assert (budget.remaining_requests, budget.in_flight) == (5, 4)
+
+    def test_token_budget_and_429_block(self):
+        budget = UpstreamBudget()
+        budget.update({"x-ratelimit-remaining-tokens": "500", "x-ratelimit-reset-tokens": "2s"}, 200, NOW)
+        assert budget.dispatch_time(400, NOW, 0.2) == NOW
+        assert budget.dispatch_time(600, NOW, 0.2) == NOW + 2
+
+        budget.update({"retry-after-ms": "1500"}, 429, NOW)
+        assert budget.dispatch_time(0, NOW, 0.2) == NOW + 1.5
+
+
+class TestUpstreamPacingService:
+    """Test acquire/complete, rerouting and per-key budgets."""
+
+    @pytest.mark.asyncio
+    async def test_delays_until_reset(self, make_service, monkeypatch):
+        service = make_service()
+        ticket = await service.acquire(request_data())
+        service.complete(ticket, {"x-ratelimit-limit-requests": "10", "x-ratelimit-remaining-requests": "0",
+                                  "x-ratelimit-reset-requests": "50ms"})
+
+        sleeps = []
+        monkeypatch.setattr(asyncio, "sleep", lambda delay: sleeps.append(delay) or _done())
+        ticket = await service.acquire(request_data())
+        assert 0 < sleeps[0] == ticket.delay <= 0.05
+        assert service.get_stats()["paced_requests"] == 1
+
+    @pytest.mark.asyncio
+    async def test_budgets_are_per_key_and_model(self, make_service):
+        service = make_service()
+        ticket = await service.acquire(request_data(api_key="sk-a"))
+        service.complete(ticket, {"retry-after": "60"}, 429)
+
+        other_key = await service.acquire(request_data(api_key="sk-b"))
+        other_model = await service.acquire(request_data(model="openrouter/openai/gpt-4o"))
+        assert other_key.delay == other_model.delay == 0
+        assert service.get_stats()["upstream_429s"] == 1
+
+    @pytest.mark.asyncio
+    async def test_reroutes_to_free_fallback(self, make_service):
+        service = make_service(fallback_models={"openrouter/anthropic/claude-sonnet-4": ["openrouter/openai/gpt-4o"]})
+        ticket = await service.acquire(request_data())
+        service.complete(ticket, {"retry-after": "60"}, 429)
+
+        data = request_data()
+        ticket = await service.acquire(data)
+        assert data["model"] == ticket.model == "openrouter/openai/gpt-4o"
+        assert ticket.rerouted_from == "openrouter/anthropic/claude-sonnet-4"
+        assert service.get_stats()["rerouted_requests"] == 1
+
+    @pytest.mark.asyncio
+    async def test_disabled_is_a_no_op(self, make_service):
+        service = make_service(enabled=False)
+        assert await service.acquire(request_data()) is None
+        service.complete(None, {"retry-after": "60"}, 429)
+
+
+async def _done():
+    return None
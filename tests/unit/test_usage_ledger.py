@@ -0,0 +1,138 @@
+"""Unit tests for the usage accounting ledger."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.models.anthropic import MessagesResponse
+from src.models.base import Usage
+from src.routers import usage as usage_router
+from src.services import usage_ledger
+from src.services.usage_ledger import UsageLedgerService, UsageRecord
+
+HOUR = 1750000000 - 1750000000 % 3600  # an hour boundary
+
+
+def make_ledger(tmp_path, **kwargs):
+    return UsageLedgerService(path=str(tmp_path / "usage.sqlite3"), enabled=True, **kwargs)
+
+
+def make_record(ts, model="openrouter/anthropic/claude-sonnet-4", client="key:a", input_tokens=100, output_tokens=10):
+    return UsageRecord(ts=ts, request_id="req", source="conversion", model=model,
+                       requested_model="claude-sonnet-4", client=client,
+                       input_tokens=input_tokens, output_tokens=output_tokens)
+
+
+class TestUsageLedger:
+    """Test recording, batching and rollups."""
+
+    @pytest.mark.asyncio
+    async def test_rollup_by_model_client_and_hour(self, tmp_path):
+        ledger = make_ledger(tmp_path)
+        ledger.record(make_record(HOUR + 10))
+        ledger.record(make_record(HOUR + 20, input_tokens=50))
+        ledger.record(make_record(HOUR + 3600, client="key:b"))
+        ledger.record(make_record(HOUR + 30, model="openrouter/openai/gpt-4o"))
+
+        rows = await ledger.query(group_by=["model", "hour"])
+        assert rows[0] == {
+            "model": "openrouter/anthropic/claude-sonnet-4", "hour": "2025-06-15T15:00:00Z", "requests": 2,
+            "input_tokens": 150, "output_tokens": 20,
+            "cache_creation_input_tokens": 0, "cache_read_input_tokens": 0
+        }
+        assert [row["hour"] for row in rows[1:]] == ["2025-06-15T16:00:00Z", "2025-06-15T15:00:00Z"]
+
+        by_client = await ledger.query(group_by=["client"], start=HOUR, end="2025-06-15T16:00:00Z")
+        assert [(row["client"], row["requests"]) for row in by_client] == [("key:a", 3)]
+        await ledger.close()
+
+    @pytest.mark.asyncio
+    async def test_record_does_not_touch_disk(self, tmp_path):
+        ledger = make_ledger(tmp_path, flush_interval=3600)
+        ledger.record(make_record(HOUR))
+
+        assert not (tmp_path / "usage.sqlite3").exists()
+        assert ledger.get_stats()["pending"] == 1
+        await ledger.close()
+        assert ledger.get_stats()["written"] == 1
+
+    @pytest.mark.asyncio
+    async def test_batch_size_triggers_background_write(self, tmp_path):
+        ledger = make_ledger(tmp_path, flush_interval=3600, batch_size=3)
+        for i in range(3):
+            ledger.record(make_record(HOUR + i))
+
+        for _ in range(100):
+            if ledger.stats["written"] == 3:
+                break
+            await asyncio.sleep(0.01)
+        assert ledger.stats["written"] == 3
+        await ledger.close()
+
+    @pytest.mark.asyncio
+    async def test_failed_write_is_retried_then_dropped(self, tmp_path, monkeypatch):
+        ledger = make_ledger(tmp_path, flush_interval=3600)
+        write = ledger._write
+        monkeypatch.setattr(ledger, "_write", lambda batch: (_ for _ in ()).throw(OSError("disk full")))
+        ledger.record(make_record(HOUR))
+
+        assert await ledger.flush() == 0
+        ledger.record(make_record(HOUR + 1))
+        assert [record.ts for record in ledger._pending] == [HOUR, HOUR + 1]
+
+        for _ in range(usage_ledger.MAX_FLUSH_ATTEMPTS - 1):
+            await ledger.flush()
+        assert ledger._pending == []
+        assert ledger.stats["dropped"] == 2
+
+        monkeypatch.setattr(ledger, "_write", write)
+        ledger.record(make_record(HOUR + 2))
+        assert await ledger.flush() == 1
+        await ledger.close()
+
+    @pytest.mark.asyncio
+    async def test_records_responses_and_passthrough(self, tmp_path):
+        ledger = make_ledger(tmp_path)
+        response = MessagesResponse(id="msg_1", model="claude-sonnet-4", content=[], usage=Usage(
+            input_tokens=12, output_tokens=7, cache_read_input_tokens=5
+        ))
+        ledger.record_response(response, model="openrouter/anthropic/claude-sonnet-4",
+                               requested_model="claude-sonnet-4", client="key:a")
+        ledger.record_passthrough(SimpleNamespace(
+            path="/v1/messages", status_code=200, model="claude-sonnet-4",
+            upstream_model="claude-sonnet-4-20250514", client="ip:10.0.0.1",
+            usage={"input_tokens": 3, "output_tokens": 4}
+        ))
+
+        rows = await ledger.query(group_by=["source"])
+        assert [(row["source"], row["input_tokens"], row["cache_read_input_tokens"]) for row in rows] == [
+            ("conversion", 12, 5), ("passthrough", 3, 0)
+        ]
+        await ledger.close()
+
+    def test_ledger_defaults_to_the_logs_directory(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(usage_ledger.config, "usage_ledger_path", "")
+        monkeypatch.setattr(usage_ledger.config, "unified_logs_dir", str(tmp_path / "logs"))
+
+        assert UsageLedgerService().path == tmp_path / "logs" / "usage_ledger.sqlite3"
+
+
+class TestUsageRouter:
+    """Test the query endpoint."""
+
+    def test_query_and_invalid_group(self, tmp_path, monkeypatch):
+        ledger = make_ledger(tmp_path)
+        ledger.record(make_record(HOUR))
+        monkeypatch.setattr(usage_router, "usage_ledger_service", ledger)
+        app = FastAPI()
+        app.include_router(usage_router.router)
+        client = TestClient(app)
+
+        response = client.get("/v1/usage", params={"group_by": "day,client"})
+        assert response.status_code == 200
+        assert response.json()["data"][0]["day"] == "2025-06-15"
+
+        assert client.get("/v1/usage", params={"group_by": "password"}).status_code == 400